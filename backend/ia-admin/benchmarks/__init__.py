@@ -0,0 +1,3 @@
+"""
+Benchmarks do Agroisync IA Admin
+"""
@@ -0,0 +1,187 @@
+"""
+📏 AGROISYNC IA - Utilitários de Benchmark
+Percentis, metadados de execução e comparação entre resultados salvos
+"""
+
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import List, Dict, Optional
+
+# Raiz do ia-admin (para importar main/utils a partir dos scripts)
+ROOT_DIR = Path(__file__).resolve().parent.parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+RESULTS_DIR = Path(__file__).resolve().parent / 'results'
+
+# Linha no formato do ia_actions.log (timestamp | ip | ação | status | detalhes)
+SAMPLE_LINE = (
+    "2025-10-21 14:32:45 | 177.55.23.14    | Atualizou Cotação: Soja                  "
+    "| OK         | Preço: BRL 145.5, Mercado: B3\n"
+)
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """
+    Percentil pelo método nearest-rank
+
+    Args:
+        sorted_values: Valores já ordenados
+        pct: Percentil desejado (0-100)
+
+    Returns:
+        float com o valor do percentil (0.0 se vazio)
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize_latencies(latencies: List[float], elapsed: float, errors: int = 0) -> Dict:
+    """
+    Resume latências (em segundos) em req/s e percentis em milissegundos
+
+    Args:
+        latencies: Latências individuais em segundos
+        elapsed: Duração total da rodada em segundos
+        errors: Número de respostas com erro
+
+    Returns:
+        Dict com requests, errors, rps, p50/p95/p99/max em ms
+    """
+    ordered = sorted(latencies)
+    total = len(ordered)
+
+    return {
+        "requests": total,
+        "errors": errors,
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        "rps": round(total / elapsed, 2) if elapsed > 0 else 0.0,
+        "p50_ms": round(percentile(ordered, 50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3) if ordered else 0.0,
+    }
+
+
+def git_commit() -> Optional[str]:
+    """
+    Retorna o hash curto do commit atual (se disponível)
+    """
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=ROOT_DIR, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_metadata(**extra) -> Dict:
+    """
+    Metadados da execução (commit, data, Python, máquina)
+    """
+    meta = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec='seconds'),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+    meta.update(extra)
+    return meta
+
+
+def save_results(data: Dict, output: Optional[str], prefix: str) -> Path:
+    """
+    Salva resultados em JSON (padrão: benchmarks/results/<prefix>-<commit>.json)
+
+    Returns:
+        Path do arquivo gravado
+    """
+    if output:
+        path = Path(output)
+    else:
+        commit = data.get("meta", {}).get("commit") or "local"
+        path = RESULTS_DIR / f"{prefix}-{commit}.json"
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    return path
+
+
+def load_results(path: str) -> Dict:
+    """
+    Carrega um arquivo de resultados salvo anteriormente
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compare_results(baseline: Dict, current: Dict, metric: str,
+                    threshold: float = 0.10, higher_is_better: bool = False) -> List[Dict]:
+    """
+    Compara dois resultados caso a caso e marca regressões
+
+    Os resultados devem ter o formato {"results": {caso: {metric: valor}}}.
+
+    Args:
+        baseline: Resultado de referência
+        current: Resultado atual
+        metric: Métrica comparada (ex: "p99_ms", "rps", "mean_us")
+        threshold: Variação relativa tolerada antes de marcar regressão
+        higher_is_better: True para métricas como req/s
+
+    Returns:
+        Lista de dicts com caso, valores, variação e flag de regressão
+    """
+    rows = []
+    base_results = baseline.get("results", {})
+
+    for case, values in current.get("results", {}).items():
+        if case not in base_results or metric not in values:
+            continue
+        old = base_results[case].get(metric)
+        new = values[metric]
+        if not old:
+            continue
+
+        change = (new - old) / old
+        regression = change < -threshold if higher_is_better else change > threshold
+        rows.append({
+            "case": case,
+            "baseline": old,
+            "current": new,
+            "change": round(change, 4),
+            "regression": regression,
+        })
+
+    return rows
+
+
+def print_comparison(rows: List[Dict], metric: str) -> bool:
+    """
+    Imprime a tabela de comparação
+
+    Returns:
+        bool: True se houver alguma regressão
+    """
+    if not rows:
+        print("⚠️ Nenhum caso em comum com o baseline")
+        return False
+
+    print(f"\n📊 Comparação ({metric})")
+    for row in rows:
+        flag = "❌ REGRESSÃO" if row["regression"] else "✅"
+        print(f"  {row['case']:55} {row['baseline']:>12} → {row['current']:>12} "
+              f"({row['change'] * 100:+.1f}%) {flag}")
+
+    return any(row["regression"] for row in rows)
@@ -0,0 +1,357 @@
+"""
+🏋️ AGROISYNC IA - Benchmark de Carga Assíncrono
+Mede req/s e latência p50/p95/p99 por endpoint com concorrência configurável
+
+Uso:
+    # ASGI em processo (sem rede)
+    python -m benchmarks.load --concurrency 1 10 50 --requests 2000
+
+    # Servidor uvicorn real já em execução
+    python -m benchmarks.load --url http://127.0.0.1:8000
+
+    # Sobe um uvicorn com 4 workers só para o benchmark
+    python -m benchmarks.load --spawn --workers 4
+
+    # Comparar com um resultado anterior
+    python -m benchmarks.load --compare benchmarks/results/load-abc1234.json
+
+    # Ingestão enquanto admins exportam logs em segundo plano
+    python -m benchmarks.load --endpoints update-cotation --background logs-export
+"""
+
+import argparse
+import asyncio
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List, Dict, Optional, Tuple
+
+import httpx
+
+from benchmarks.common import (
+    ROOT_DIR, SAMPLE_LINE, summarize_latencies, run_metadata, save_results,
+    load_results, compare_results, print_comparison
+)
+
+BENCH_TOKEN = os.getenv('IA_SECRET_TOKEN') or 'benchmark-token'
+# Usuários "user-0".."user-999" da réplica de `users` usada pelo caso plans-check
+BENCH_USERS = 1000
+BENCH_USER_PLANS = ("gratuito", "pro", "loja")
+
+
+# ============================================
+# ENDPOINTS MEDIDOS
+# ============================================
+
+def _news_payload(i: int) -> Dict:
+    return {
+        "title": f"Safra de Soja Recorde em 2025 #{i}",
+        "content": "A safra de soja brasileira deve atingir números recordes... " * 8,
+        "category": "mercado",
+        "plan_level": "publico"
+    }
+
+
+def _cotation_payload(i: int) -> Dict:
+    return {
+        "product": "Soja",
+        "price": 145.50 + (i % 100) / 100,
+        "currency": "BRL",
+        "market": "B3",
+        "variation": 2.3,
+        "plan_level": "privado"
+    }
+
+
+# nome -> (método, caminho, gerador de JSON, gerador de query string)
+ENDPOINTS: Dict[str, Tuple[str, str, Optional[Callable], Optional[Callable]]] = {
+    "update-news": ("POST", "/api/update-news", _news_payload, None),
+    "update-cotation": ("POST", "/api/update-cotation", _cotation_payload, None),
+    "logs": ("GET", "/api/logs", None, lambda i: {"limit": 100}),
+    "logs-stats": ("GET", "/api/logs/stats", None, None),
+    "logs-export": ("GET", "/api/logs", None, lambda i: {"limit": 100000, "source": "file"}),
+    "plans-check": ("GET", "/api/plans/check", None,
+                    lambda i: {"user_id": f"user-{i % 1000}", "feature": "analytics"}),
+}
+
+
+# ============================================
+# CLIENTES
+# ============================================
+
+_workdir: Optional[Path] = None
+
+
+def bench_workdir() -> Path:
+    """
+    Diretório de dados do benchmark em processo, criado uma vez por execução
+    (os stores do app são globais: todos os níveis de concorrência usam o mesmo)
+    """
+    global _workdir
+    if _workdir is None:
+        _workdir = Path(os.environ.get('IA_DATA_DIR') or tempfile.mkdtemp(prefix='ia-bench-'))
+        os.environ['IA_DATA_DIR'] = str(_workdir)
+    return _workdir
+
+
+def seed_user_plans(path: Path, count: int = BENCH_USERS) -> Path:
+    """
+    Cria uma réplica da tabela `users` com `count` usuários, para o caso
+    plans-check medir consultas de planos de verdade (sem ela toda
+    verificação seria uma resposta de erro)
+    """
+    conn = sqlite3.connect(str(path))
+    try:
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS users (id TEXT PRIMARY KEY, role TEXT DEFAULT 'user', "
+            "plan TEXT, plan_expires_at TEXT, is_active INTEGER DEFAULT 1)"
+        )
+        conn.executemany(
+            "INSERT OR REPLACE INTO users (id, plan) VALUES (?, ?)",
+            [(f"user-{i}", BENCH_USER_PLANS[i % len(BENCH_USER_PLANS)]) for i in range(count)]
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    return path
+
+
+def make_inprocess_client(log_lines: int = 0) -> httpx.AsyncClient:
+    """
+    Cliente httpx que chama o app ASGI diretamente (sem socket)
+    Logs e dados vão para um diretório temporário para não poluir ia_actions.log e data/
+
+    Args:
+        log_lines: Linhas gravadas no arquivo de log antes do teste (para logs-export),
+            no formato real do ia_actions.log
+    """
+    workdir = bench_workdir()
+    os.environ.setdefault('IA_SECRET_TOKEN', BENCH_TOKEN)
+    os.environ.setdefault('ENVIRONMENT', 'development')
+    if 'USER_PLANS_DB_PATH' not in os.environ:
+        os.environ['USER_PLANS_DB_PATH'] = str(seed_user_plans(workdir / 'agroisync.db'))
+
+    import main
+    from utils import logger
+
+    logger.LOG_FILE = workdir / 'ia_actions.log'
+    if log_lines:
+        logger.LOG_FILE.write_text(SAMPLE_LINE * log_lines, encoding='utf-8')
+
+    transport = httpx.ASGITransport(app=main.app, client=("127.0.0.1", 50000))
+    return httpx.AsyncClient(
+        transport=transport,
+        base_url="http://ia-admin.bench",
+        headers={"Authorization": f"Bearer {os.environ['IA_SECRET_TOKEN']}"}
+    )
+
+
+def make_http_client(url: str, concurrency: int) -> httpx.AsyncClient:
+    """
+    Cliente httpx com pool keep-alive para um servidor real
+    """
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    return httpx.AsyncClient(
+        base_url=url,
+        limits=limits,
+        timeout=30.0,
+        headers={"Authorization": f"Bearer {BENCH_TOKEN}"}
+    )
+
+
+def spawn_uvicorn(port: int, workers: int) -> subprocess.Popen:
+    """
+    Sobe um uvicorn com N workers e espera o health check responder
+    """
+    env = dict(os.environ)
+    env.setdefault('IA_SECRET_TOKEN', BENCH_TOKEN)
+    env.setdefault('ENVIRONMENT', 'development')
+    if 'USER_PLANS_DB_PATH' not in env:
+        users_dir = Path(tempfile.mkdtemp(prefix='ia-bench-users-'))
+        env['USER_PLANS_DB_PATH'] = str(seed_user_plans(users_dir / 'agroisync.db'))
+
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'main:app', '--host', '127.0.0.1',
+         '--port', str(port), '--workers', str(workers), '--log-level', 'warning'],
+        cwd=ROOT_DIR, env=env
+    )
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/api/health", timeout=1).status_code == 200:
+                return proc
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+
+    proc.terminate()
+    raise RuntimeError("uvicorn não respondeu ao health check em 30s")
+
+
+# ============================================
+# EXECUÇÃO
+# ============================================
+
+async def run_endpoint(client: httpx.AsyncClient, name: str, total: int, concurrency: int) -> Dict:
+    """
+    Dispara `total` requisições em `concurrency` tarefas simultâneas
+
+    Returns:
+        Dict com req/s, erros e percentis de latência
+    """
+    method, path, body_fn, params_fn = ENDPOINTS[name]
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                response = await client.request(
+                    method, path,
+                    json=body_fn(i) if body_fn else None,
+                    params=params_fn(i) if params_fn else None
+                )
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return summarize_latencies(latencies, elapsed, errors)
+
+
+async def run_background(client: httpx.AsyncClient, name: str, concurrency: int, stop: asyncio.Event) -> int:
+    """
+    Repete o endpoint em `concurrency` tarefas até `stop`, como carga de fundo
+
+    Returns:
+        int com o número de requisições feitas
+    """
+    method, path, body_fn, params_fn = ENDPOINTS[name]
+    done = 0
+
+    async def worker():
+        nonlocal done
+        while not stop.is_set():
+            try:
+                await client.request(
+                    method, path,
+                    json=body_fn(done) if body_fn else None,
+                    params=params_fn(done) if params_fn else None
+                )
+            except httpx.HTTPError:
+                pass
+            done += 1
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return done
+
+
+async def run_benchmark(args) -> Dict:
+    results: Dict[str, Dict] = {}
+
+    for concurrency in args.concurrency:
+        if args.url:
+            client = make_http_client(args.url, concurrency)
+        else:
+            client = make_inprocess_client(args.log_lines)
+
+        async with client:
+            for name in args.endpoints:
+                # Aquecimento (imports tardios, caches, conexões)
+                await run_endpoint(client, name, min(args.warmup, args.requests), concurrency)
+
+                stop = asyncio.Event()
+                background = None
+                if args.background:
+                    background = asyncio.create_task(
+                        run_background(client, args.background, args.background_concurrency, stop)
+                    )
+                summary = await run_endpoint(client, name, args.requests, concurrency)
+                case = f"{name}@c{concurrency}"
+                if background is not None:
+                    stop.set()
+                    summary["background_requests"] = await background
+                    case += f"+{args.background}"
+                results[case] = summary
+                print(f"  {case:30} {summary['rps']:>10.1f} req/s  "
+                      f"p50 {summary['p50_ms']:>8.2f}ms  p95 {summary['p95_ms']:>8.2f}ms  "
+                      f"p99 {summary['p99_ms']:>8.2f}ms  erros {summary['errors']}")
+
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark de carga do IA Admin")
+    parser.add_argument('--url', help="URL de um servidor real (padrão: ASGI em processo)")
+    parser.add_argument('--spawn', action='store_true', help="Subir um uvicorn local para o teste")
+    parser.add_argument('--workers', type=int, default=4, help="Workers do uvicorn com --spawn")
+    parser.add_argument('--port', type=int, default=8765, help="Porta do uvicorn com --spawn")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 10, 50])
+    parser.add_argument('--requests', type=int, default=1000, help="Requisições por endpoint")
+    parser.add_argument('--warmup', type=int, default=50)
+    parser.add_argument('--endpoints', nargs='+', choices=list(ENDPOINTS),
+                        default=[name for name in ENDPOINTS if name != "logs-export"])
+    parser.add_argument('--background', choices=list(ENDPOINTS),
+                        help="Endpoint repetido em segundo plano durante as medições")
+    parser.add_argument('--background-concurrency', type=int, default=2)
+    parser.add_argument('--log-lines', type=int, default=0,
+                        help="Linhas no arquivo de log antes do teste (ASGI em processo)")
+    parser.add_argument('--output', help="Arquivo JSON de saída")
+    parser.add_argument('--compare', help="Resultado anterior para comparação")
+    parser.add_argument('--metric', default='p99_ms', help="Métrica usada na comparação")
+    parser.add_argument('--threshold', type=float, default=0.10)
+    args = parser.parse_args(argv)
+
+    proc = None
+    if args.spawn:
+        proc = spawn_uvicorn(args.port, args.workers)
+        args.url = f"http://127.0.0.1:{args.port}"
+
+    target = args.url or "in-process"
+    print(f"🏋️ Benchmark de carga → {target}")
+
+    try:
+        results = asyncio.run(run_benchmark(args))
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait(timeout=10)
+
+    data = {
+        "meta": run_metadata(
+            target=target,
+            workers=args.workers if args.spawn else None,
+            requests=args.requests,
+            concurrency=args.concurrency
+        ),
+        "results": results
+    }
+    path = save_results(data, args.output, "load")
+    print(f"\n💾 Resultados salvos em {path}")
+
+    if args.compare:
+        rows = compare_results(
+            load_results(args.compare), data, args.metric,
+            args.threshold, higher_is_better=args.metric == 'rps'
+        )
+        if print_comparison(rows, args.metric):
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,254 @@
+"""
+🔬 AGROISYNC IA - Microbenchmarks de Logger e Auth
+Mede as funções chamadas em toda requisição em função do tamanho dos dados
+
+Uso:
+    python -m benchmarks.micro                               # tamanhos padrão
+    python -m benchmarks.micro --file-sizes 1 10 100 1024    # até 1 GB de log
+    python -m benchmarks.micro --update-baseline             # grava o baseline
+    python -m benchmarks.micro --threshold 0.2               # compara com o baseline
+
+O baseline fica em benchmarks/baselines/micro.json. Ele depende da máquina:
+gere-o no mesmo host (ou runner de CI) em que as comparações serão feitas.
+"""
+
+import argparse
+import math
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List, Dict, Optional
+
+from starlette.requests import Request
+
+from benchmarks.common import (
+    SAMPLE_LINE, run_metadata, save_results, load_results, compare_results, print_comparison
+)
+from utils import auth, logger
+
+BASELINE_FILE = Path(__file__).resolve().parent / 'baselines' / 'micro.json'
+
+# ============================================
+# MEDIÇÃO
+# ============================================
+
+def measure(fn: Callable, min_time: float, repeats: int) -> Dict:
+    """
+    Mede o tempo por chamada de `fn`, calibrando o número de loops
+
+    Args:
+        fn: Função sem argumentos
+        min_time: Duração mínima (s) de cada repetição
+        repeats: Número de repetições
+
+    Returns:
+        Dict com median_us, min_us, stdev_us e loops
+    """
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or loops >= 1_000_000:
+            break
+        loops *= 10 if elapsed < min_time / 10 else 2
+
+    samples = [elapsed / loops]
+    for _ in range(repeats - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        samples.append((time.perf_counter() - start) / loops)
+
+    return {
+        "median_us": round(statistics.median(samples) * 1e6, 3),
+        "min_us": round(min(samples) * 1e6, 3),
+        "stdev_us": round(statistics.pstdev(samples) * 1e6, 3),
+        "loops": loops,
+    }
+
+
+def loglog_slope(sizes: List[float], times: List[float]) -> Optional[float]:
+    """
+    Inclinação em escala log-log (≈0 constante, ≈1 linear, ≈2 quadrática)
+    """
+    points = [(math.log(s), math.log(t)) for s, t in zip(sizes, times) if s > 0 and t > 0]
+    if len(points) < 2:
+        return None
+
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    var_x = sum((x - mean_x) ** 2 for x, _ in points)
+    if var_x == 0:
+        return None
+    cov = sum((x - mean_x) * (y - mean_y) for x, y in points)
+    return round(cov / var_x, 3)
+
+
+def make_request(headers: Dict[str, str], client_ip: str = "127.0.0.1") -> Request:
+    """
+    Request do Starlette montado a partir de um scope ASGI mínimo
+    """
+    return Request({
+        "type": "http",
+        "method": "POST",
+        "path": "/api/update-news",
+        "headers": [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers.items()],
+        "client": (client_ip, 50000),
+    })
+
+
+def fill_memory_buffer(size: int) -> None:
+    """
+    Preenche o buffer de logs em memória com `size` entradas
+    """
+    logger.MAX_LOGS_IN_MEMORY = size
+    logger._logs_memory = [
+        {
+            "timestamp": "2025-10-21 14:32:45",
+            "ip": "177.55.23.14",
+            "action": f"Atualizou Cotação #{i}",
+            "status": ("OK", "OK", "ERROR", "BLOCKED")[i % 4],
+            "details": "Preço: BRL 145.5, Mercado: B3",
+        }
+        for i in range(size)
+    ]
+
+
+def write_log_file(path: Path, size_mb: int) -> None:
+    """
+    Gera um ia_actions.log sintético com ~size_mb megabytes
+    """
+    chunk = SAMPLE_LINE * (1024 * 1024 // len(SAMPLE_LINE.encode('utf-8')))
+    with open(path, 'w', encoding='utf-8') as f:
+        for _ in range(size_mb):
+            f.write(chunk)
+
+
+# ============================================
+# CASOS
+# ============================================
+
+def bench_logger(args, workdir: Path, results: Dict, scaling: Dict) -> None:
+    original_file = logger.LOG_FILE
+    original_buffer = logger._logs_memory
+    original_max = logger.MAX_LOGS_IN_MEMORY
+
+    try:
+        logger.LOG_FILE = workdir / 'ia_actions.log'
+
+        for name, fn in (
+            ("log_action", lambda: logger.log_action("Atualizou Cotação: Soja", "OK", "177.55.23.14",
+                                                     "Preço: BRL 145.5, Mercado: B3")),
+            ("get_logs", lambda: logger.get_logs(100)),
+            ("get_log_stats", logger.get_log_stats),
+        ):
+            for size in args.buffer_sizes:
+                fill_memory_buffer(size)
+                _record(results, f"{name}[buffer={size}]", measure(fn, args.min_time, args.repeats))
+            scaling[name] = _scaling(results, name, "buffer", args.buffer_sizes)
+
+        for size_mb in args.file_sizes:
+            write_log_file(logger.LOG_FILE, size_mb)
+            _record(results, f"get_logs_from_file[file={size_mb}MB]",
+                    measure(lambda: logger.get_logs_from_file(100), args.min_time, max(3, args.repeats // 2)))
+        scaling["get_logs_from_file"] = _scaling(results, "get_logs_from_file", "file", args.file_sizes, "MB")
+    finally:
+        logger.LOG_FILE = original_file
+        logger._logs_memory = original_buffer
+        logger.MAX_LOGS_IN_MEMORY = original_max
+
+
+def bench_auth(args, results: Dict, scaling: Dict) -> None:
+    original_token = auth.IA_SECRET_TOKEN
+    original_ips = auth.ALLOWED_IPS
+
+    try:
+        auth.IA_SECRET_TOKEN = 'x' * 43
+        headers = {
+            "Authorization": f"Bearer {auth.IA_SECRET_TOKEN}",
+            "X-Forwarded-For": "10.0.0.1, 172.16.0.1",
+        }
+
+        _record(results, "verify_token",
+                measure(lambda: auth.verify_token(make_request(headers)), args.min_time, args.repeats))
+        _record(results, "get_client_ip",
+                measure(lambda: auth.get_client_ip(make_request(headers)), args.min_time, args.repeats))
+
+        for size in args.allowlist_sizes:
+            # Pior caso: IP do cliente é o último da lista
+            auth.ALLOWED_IPS = [f"192.168.{i // 256 % 256}.{i % 256}" for i in range(size - 1)]
+            auth.ALLOWED_IPS.append("10.0.0.1")
+            _record(results, f"verify_ip[allowlist={size}]",
+                    measure(lambda: auth.verify_ip(make_request(headers)), args.min_time, args.repeats))
+        scaling["verify_ip"] = _scaling(results, "verify_ip", "allowlist", args.allowlist_sizes)
+    finally:
+        auth.IA_SECRET_TOKEN = original_token
+        auth.ALLOWED_IPS = original_ips
+
+
+def _record(results: Dict, case: str, measurement: Dict) -> None:
+    results[case] = measurement
+    print(f"  {case:45} {measurement['median_us']:>12.3f} µs")
+
+
+def _scaling(results: Dict, name: str, param: str, sizes: List[int], unit: str = "") -> Dict:
+    times = [results[f"{name}[{param}={size}{unit}]"]["median_us"] for size in sizes]
+    return {"param": param, "sizes": sizes, "median_us": times, "loglog_slope": loglog_slope(sizes, times)}
+
+
+# ============================================
+# PRINCIPAL
+# ============================================
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Microbenchmarks de logger e auth")
+    parser.add_argument('--buffer-sizes', type=int, nargs='+', default=[100, 1000, 10000, 100000])
+    parser.add_argument('--file-sizes', type=int, nargs='+', default=[1, 10, 100],
+                        help="Tamanhos do ia_actions.log em MB (ex: 1 10 100 1024)")
+    parser.add_argument('--allowlist-sizes', type=int, nargs='+', default=[1, 10, 100, 1000, 10000])
+    parser.add_argument('--min-time', type=float, default=0.05, help="Duração mínima de cada repetição (s)")
+    parser.add_argument('--repeats', type=int, default=7)
+    parser.add_argument('--output', help="Arquivo JSON de saída")
+    parser.add_argument('--baseline', default=str(BASELINE_FILE))
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="Variação relativa tolerada antes de marcar regressão")
+    args = parser.parse_args(argv)
+
+    results: Dict[str, Dict] = {}
+    scaling: Dict[str, Dict] = {}
+
+    print("🔬 Microbenchmarks (mediana por chamada)")
+    with tempfile.TemporaryDirectory(prefix='ia-micro-') as workdir:
+        bench_logger(args, Path(workdir), results, scaling)
+    bench_auth(args, results, scaling)
+
+    print("\n📈 Escala (inclinação log-log: 0 = constante, 1 = linear)")
+    for name, curve in scaling.items():
+        print(f"  {name:25} {curve['param']:10} slope={curve['loglog_slope']}")
+
+    data = {"meta": run_metadata(), "results": results, "scaling": scaling}
+    path = save_results(data, args.output, "micro")
+    print(f"\n💾 Resultados salvos em {path}")
+
+    if args.update_baseline:
+        save_results(data, args.baseline, "micro")
+        print(f"📌 Baseline atualizado: {args.baseline}")
+        return 0
+
+    if Path(args.baseline).exists():
+        rows = compare_results(load_results(args.baseline), data, "median_us", args.threshold)
+        if print_comparison(rows, "median_us"):
+            return 1
+    else:
+        print(f"ℹ️ Sem baseline em {args.baseline} (use --update-baseline)")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
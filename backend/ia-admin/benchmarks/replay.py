@@ -0,0 +1,380 @@
+"""
+🔁 AGROISYNC IA - Replay de Tráfego Real
+Reconstrói a agenda de requisições a partir do ia_actions.log e a reexecuta
+em 1×–50× de velocidade, com payloads sintéticos de tamanho realista
+
+Uso:
+    # Trecho do log de produção, em 1×, 10× e 50×
+    python -m benchmarks.replay ia_actions.log --since "2025-10-21 17:00:00" \\
+        --until "2025-10-21 18:00:00" --speed 1 10 50
+
+    # Contra um servidor real, comprimindo pausas maiores que 5 s
+    python -m benchmarks.replay ia_actions.log --url http://127.0.0.1:8000 --max-gap 5
+"""
+
+import argparse
+import asyncio
+import random
+import re
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List, Dict, Optional
+
+import httpx
+
+from benchmarks.common import (
+    summarize_latencies, run_metadata, save_results, load_results, compare_results, print_comparison
+)
+from benchmarks.load import make_inprocess_client, make_http_client
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+_PRICE_RE = re.compile(r"Preço: (\w+) ([\d.]+), Mercado: (.+)$")
+_TEMP_RE = re.compile(r"Temp: (-?[\d.]+)°C, Plano: (\w+)")
+_NEWS_RE = re.compile(r"Plano: (\w+), Categoria: (.+)$")
+_LIMIT_RE = re.compile(r"Limite: (\d+)")
+_USER_RE = re.compile(r"User: ([^,]+),")
+
+
+@dataclass
+class ScheduledRequest:
+    offset: float
+    endpoint: str
+    method: str
+    path: str
+    body: Optional[Dict] = None
+    params: Optional[Dict] = None
+
+
+@dataclass
+class ReplayResult:
+    latencies: Dict[str, List[float]] = field(default_factory=dict)
+    errors: Counter = field(default_factory=Counter)
+    status_codes: Counter = field(default_factory=Counter)
+    max_lag: float = 0.0
+    elapsed: float = 0.0
+
+
+# ============================================
+# PARSER DO LOG
+# ============================================
+
+def parse_log_line(line: str) -> Optional[Dict]:
+    """
+    Converte uma linha do ia_actions.log em dict
+
+    Formato: "timestamp | ip | action | status | details"
+
+    Returns:
+        Dict com os campos ou None se a linha for inválida
+    """
+    parts = [part.strip() for part in line.rstrip('\n').split(' | ', 4)]
+    if len(parts) < 4:
+        return None
+
+    try:
+        timestamp = datetime.strptime(parts[0], TIMESTAMP_FORMAT)
+    except ValueError:
+        return None
+
+    return {
+        "timestamp": timestamp,
+        "ip": parts[1],
+        "action": parts[2],
+        "status": parts[3],
+        "details": parts[4] if len(parts) > 4 else "",
+    }
+
+
+def _content_size(rng: random.Random, median: int) -> int:
+    # Tamanhos de texto seguem cauda longa: lognormal em torno da mediana
+    return max(80, int(rng.lognormvariate(0, 0.6) * median))
+
+
+def _synthetic_text(size: int) -> str:
+    base = "A safra de soja brasileira deve atingir números recordes nesta temporada. "
+    return (base * (size // len(base) + 1))[:size]
+
+
+def entry_to_request(entry: Dict, rng: random.Random, news_median: int,
+                     insights_median: int) -> Optional[ScheduledRequest]:
+    """
+    Mapeia uma ação registrada no log para a requisição que a gerou
+
+    Returns:
+        ScheduledRequest (offset ainda zerado) ou None se a ação não for reexecutável
+    """
+    action = entry["action"]
+    details = entry["details"]
+
+    if entry["status"] == "BLOCKED":
+        return None
+
+    if action.startswith("Atualizou Notícia:"):
+        match = _NEWS_RE.search(details)
+        plan_level, category = match.groups() if match else ("publico", "geral")
+        title = action.split(":", 1)[1].strip().rstrip('.')
+        return ScheduledRequest(0, "update-news", "POST", "/api/update-news", body={
+            "title": title or "Notícia",
+            "content": _synthetic_text(_content_size(rng, news_median)),
+            "category": category,
+            "plan_level": plan_level,
+        })
+
+    if action.startswith("Atualizou Clima:"):
+        match = _TEMP_RE.search(details)
+        temperature, plan_level = (float(match.group(1)), match.group(2)) if match else (25.0, "publico")
+        return ScheduledRequest(0, "update-weather", "POST", "/api/update-weather", body={
+            "location": action.split(":", 1)[1].strip(),
+            "temperature": temperature,
+            "humidity": round(rng.uniform(30, 95), 1),
+            "description": "Parcialmente nublado",
+            "plan_level": plan_level,
+        })
+
+    if action.startswith("Atualizou Cotação:"):
+        match = _PRICE_RE.search(details)
+        currency, price, market = (match.group(1), float(match.group(2)), match.group(3)) if match \
+            else ("BRL", 100.0, "B3")
+        return ScheduledRequest(0, "update-cotation", "POST", "/api/update-cotation", body={
+            "product": action.split(":", 1)[1].strip(),
+            "price": price,
+            "currency": currency,
+            "market": market,
+            "variation": round(rng.uniform(-3, 3), 2),
+        })
+
+    if action == "Atualizou Insights da IA":
+        insight_type = details.split(":", 1)[1].strip() if ":" in details else "geral"
+        return ScheduledRequest(0, "update-ai-insights", "POST", "/api/update-ai-insights", body={
+            "type": insight_type,
+            "summary": _synthetic_text(_content_size(rng, insights_median)),
+        })
+
+    if action.startswith("Consultou Logs"):
+        match = _LIMIT_RE.search(details)
+        source = "file" if "(file)" in action else "memory"
+        return ScheduledRequest(0, "logs", "GET", "/api/logs", params={
+            "limit": int(match.group(1)) if match else 100,
+            "source": source,
+        })
+
+    if action == "Consultou Estatísticas de Logs":
+        return ScheduledRequest(0, "logs-stats", "GET", "/api/logs/stats")
+
+    if action.startswith("Verificou Acesso:"):
+        match = _USER_RE.search(details)
+        return ScheduledRequest(0, "plans-check", "GET", "/api/plans/check", params={
+            "user_id": match.group(1) if match else "user-1",
+            "feature": action.split(":", 1)[1].strip(),
+        })
+
+    return None
+
+
+def build_schedule(lines, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                   max_gap: Optional[float] = None, seed: int = 42, news_median: int = 2000,
+                   insights_median: int = 4000) -> List[ScheduledRequest]:
+    """
+    Reconstrói a agenda de requisições a partir das linhas do log
+
+    O log tem resolução de 1 segundo: as ações de um mesmo segundo são
+    distribuídas uniformemente dentro dele.
+
+    Args:
+        lines: Iterável de linhas do ia_actions.log
+        since/until: Janela do trecho a reexecutar
+        max_gap: Pausa máxima (s) entre segundos consecutivos com tráfego
+        seed: Semente dos payloads sintéticos
+        news_median/insights_median: Tamanho mediano (bytes) dos textos gerados
+
+    Returns:
+        Lista de ScheduledRequest ordenada por offset
+    """
+    rng = random.Random(seed)
+    by_second: Dict[datetime, List[ScheduledRequest]] = {}
+
+    for line in lines:
+        entry = parse_log_line(line)
+        if not entry:
+            continue
+        if since and entry["timestamp"] < since:
+            continue
+        if until and entry["timestamp"] > until:
+            break
+        request = entry_to_request(entry, rng, news_median, insights_median)
+        if request:
+            by_second.setdefault(entry["timestamp"], []).append(request)
+
+    schedule: List[ScheduledRequest] = []
+    offset = 0.0
+    previous: Optional[datetime] = None
+
+    for second in sorted(by_second):
+        if previous is not None:
+            gap = (second - previous).total_seconds()
+            offset += min(gap, max_gap) if max_gap else gap
+        previous = second
+
+        requests = by_second[second]
+        for i, request in enumerate(requests):
+            request.offset = offset + i / len(requests)
+            schedule.append(request)
+
+    return schedule
+
+
+def schedule_profile(schedule: List[ScheduledRequest]) -> Dict:
+    """
+    Forma do tráfego: duração, taxa média e pico por segundo, mix de endpoints
+    """
+    if not schedule:
+        return {"requests": 0}
+
+    per_second = Counter(int(request.offset) for request in schedule)
+    duration = schedule[-1].offset + 1
+
+    return {
+        "requests": len(schedule),
+        "duration_s": round(duration, 1),
+        "mean_rps": round(len(schedule) / duration, 2),
+        "peak_rps": max(per_second.values()),
+        "mix": dict(Counter(request.endpoint for request in schedule)),
+    }
+
+
+# ============================================
+# REPLAY
+# ============================================
+
+async def replay(client: httpx.AsyncClient, schedule: List[ScheduledRequest], speed: float,
+                 max_inflight: int) -> ReplayResult:
+    """
+    Reexecuta a agenda em malha aberta: cada requisição sai no seu horário,
+    sem esperar as anteriores (até `max_inflight` simultâneas)
+    """
+    result = ReplayResult()
+    semaphore = asyncio.Semaphore(max_inflight)
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+
+    async def fire(request: ScheduledRequest):
+        async with semaphore:
+            result.max_lag = max(result.max_lag, loop.time() - started - request.offset / speed)
+            t0 = time.perf_counter()
+            try:
+                response = await client.request(request.method, request.path,
+                                                json=request.body, params=request.params)
+                result.status_codes[response.status_code] += 1
+                if response.status_code >= 400:
+                    result.errors[request.endpoint] += 1
+            except httpx.HTTPError:
+                result.status_codes["exception"] += 1
+                result.errors[request.endpoint] += 1
+            result.latencies.setdefault(request.endpoint, []).append(time.perf_counter() - t0)
+
+    tasks = []
+    for request in schedule:
+        delay = started + request.offset / speed - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(fire(request)))
+
+    await asyncio.gather(*tasks)
+    result.elapsed = loop.time() - started
+    return result
+
+
+async def run_replays(args, schedule: List[ScheduledRequest]) -> Dict:
+    results: Dict[str, Dict] = {}
+
+    for speed in args.speed:
+        client = make_http_client(args.url, args.max_inflight) if args.url else make_inprocess_client()
+        async with client:
+            outcome = await replay(client, schedule, speed, args.max_inflight)
+
+        all_latencies = [lat for lats in outcome.latencies.values() for lat in lats]
+        summary = summarize_latencies(all_latencies, outcome.elapsed, sum(outcome.errors.values()))
+        summary["max_lag_ms"] = round(outcome.max_lag * 1000, 3)
+        summary["status_codes"] = {str(code): count for code, count in outcome.status_codes.items()}
+        results[f"all@{speed}x"] = summary
+
+        print(f"  {speed:>5}× {summary['requests']:>7} req  {summary['rps']:>9.1f} req/s  "
+              f"p50 {summary['p50_ms']:>8.2f}ms  p99 {summary['p99_ms']:>8.2f}ms  "
+              f"erros {summary['error_rate'] * 100:.2f}%  atraso máx {summary['max_lag_ms']:.1f}ms")
+
+        for endpoint, latencies in sorted(outcome.latencies.items()):
+            results[f"{endpoint}@{speed}x"] = summarize_latencies(
+                latencies, outcome.elapsed, outcome.errors[endpoint]
+            )
+
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Replay do ia_actions.log contra o IA Admin")
+    parser.add_argument('log_file', help="Trecho do ia_actions.log")
+    parser.add_argument('--since', help="Início (YYYY-MM-DD HH:MM:SS)")
+    parser.add_argument('--until', help="Fim (YYYY-MM-DD HH:MM:SS)")
+    parser.add_argument('--speed', type=float, nargs='+', default=[1.0], help="Fatores de velocidade (1–50)")
+    parser.add_argument('--max-gap', type=float, help="Comprimir pausas maiores que N segundos")
+    parser.add_argument('--max-inflight', type=int, default=256)
+    parser.add_argument('--news-size', type=int, default=2000, help="Tamanho mediano do conteúdo das notícias")
+    parser.add_argument('--insights-size', type=int, default=4000, help="Tamanho mediano dos insights")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--url', help="URL de um servidor real (padrão: ASGI em processo)")
+    parser.add_argument('--output', help="Arquivo JSON de saída")
+    parser.add_argument('--compare', help="Resultado anterior para comparação")
+    parser.add_argument('--metric', default='p99_ms')
+    parser.add_argument('--threshold', type=float, default=0.10)
+    args = parser.parse_args(argv)
+
+    for speed in args.speed:
+        if not 1 <= speed <= 50:
+            parser.error("--speed deve estar entre 1 e 50")
+
+    since = datetime.strptime(args.since, TIMESTAMP_FORMAT) if args.since else None
+    until = datetime.strptime(args.until, TIMESTAMP_FORMAT) if args.until else None
+
+    with open(args.log_file, 'r', encoding='utf-8', errors='replace') as f:
+        schedule = build_schedule(f, since, until, args.max_gap, args.seed,
+                                  args.news_size, args.insights_size)
+
+    profile = schedule_profile(schedule)
+    if not profile["requests"]:
+        print("⚠️ Nenhuma ação reexecutável no trecho informado")
+        return 1
+
+    print(f"🔁 Agenda: {profile['requests']} requisições em {profile['duration_s']}s "
+          f"(média {profile['mean_rps']} req/s, pico {profile['peak_rps']} req/s)")
+    print(f"   Mix: {profile['mix']}")
+
+    results = asyncio.run(run_replays(args, schedule))
+
+    data = {
+        "meta": run_metadata(
+            target=args.url or "in-process",
+            log_file=args.log_file,
+            since=args.since,
+            until=args.until,
+            max_gap=args.max_gap,
+            profile=profile
+        ),
+        "results": results
+    }
+    path = save_results(data, args.output, "replay")
+    print(f"\n💾 Resultados salvos em {path}")
+
+    if args.compare:
+        rows = compare_results(load_results(args.compare), data, args.metric, args.threshold)
+        if print_comparison(rows, args.metric):
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,17 +4,53 @@ Sistema de IA que gerencia e atualiza conteúdo do site automaticamente
 Integrado com planos: Público, Privado, Loja, Admin
 """
 
-from fastapi import FastAPI, Request, Depends, HTTPException
+from fastapi import FastAPI, Request, Depends, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Literal, Union
+import asyncio
+import functools
 import os
-from datetime import datetime
+import uuid
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
 
-from utils.auth import verify_token, verify_ip, get_client_ip, verify_admin_access
-from utils.logger import log_action, get_logs, get_logs_from_file, get_log_stats, clear_logs
+from utils.auth import (
+    verify_token, verify_ip, get_client_ip, verify_admin_access, authenticated_user_id, verify_user_or_admin
+)
+from utils.logger import log_action, get_logs, get_logs_from_file, get_log_stats, clear_logs, log_marker
+from utils.storage import get_news_store, close_news_store
+from utils.bulk import ingest_stream
+from utils.weather import get_weather_service, close_weather_service
+from utils.versions import bump_version, close_versions, etag_for, make_etag, if_none_match
+from utils.views import MaterializedView, MATERIALIZED_LATEST_LIMIT, dumps, dumps_list
+from utils.compression import CompressionMiddleware, COMPRESSION_MIN_SIZE
+from utils.body_limits import BodyLimitMiddleware, body_limit_stats
+from utils.news_index import get_news_indexer, close_news_indexer
+from utils.neardup import NearDuplicateIndex, minhash_many, NEWS_NEAR_DUP_POLICY
+from utils.live import get_live_hub, close_live_hub
+from utils.webhooks import get_webhook_dispatcher, close_webhook_dispatcher
+from utils.d1_sync import get_d1_outbox, close_d1_outbox, OutboxFullError
+from utils.alerts import get_alert_engine, close_alert_engine, DIRECTIONS, STATUSES
+from utils.plans import get_plan_matrix, PLANS_CHECK_BATCH_MAX
+from utils.user_plans import get_user_plan_resolver, close_user_plan_resolver, UserPlanSourceError
+from utils.quotas import get_quota_meter, close_quota_meter, QUOTA_LIMITS, QUOTA_FEATURES
+from utils.admission import get_admission, close_admission, lane_for, AdmissionRejected, ADMIN
+from utils.idempotency import (
+    get_idempotency_store, close_idempotency_store, content_hash,
+    IDEMPOTENCY_KEY_TTL, DEDUP_TTL, REPLAY, IN_PROGRESS, MISMATCH
+)
+from utils.timeseries import (
+    get_timeseries_store, close_timeseries_store, parse_resolution, series_plan_level, OutOfOrderError,
+    MAX_OHLC_BUCKETS
+)
+from utils.analytics import (
+    variations_vs_previous_close, update_series_analytics, get_series_analytics, recompute_all
+)
+from utils.memory import (
+    start_tracing, stop_tracing, take_snapshot, list_snapshots, diff_snapshots, get_memory_status
+)
 
 # Carregar variáveis de ambiente
 load_dotenv()
@@ -33,9 +69,88 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
+)
+
+# Compressão (gzip, brotli/zstd se instalados) a partir de COMPRESSION_MIN_SIZE bytes
+app.add_middleware(CompressionMiddleware, minimum_size=COMPRESSION_MIN_SIZE)
+
+# Limite de tamanho do corpo por rota (413 antes de qualquer parsing)
+app.add_middleware(BodyLimitMiddleware)
+
+
+# ============================================
+# COTAS DE USO (api_access)
+# ============================================
+
+# Rotas que não contam como chamada de API do usuário
+QUOTA_EXEMPT_PREFIXES = (
+    '/api/update-', '/api/logs', '/api/admin/', '/api/plans/', '/api/quotas/', '/api/health', '/api/status'
 )
 
 
+@app.middleware("http")
+async def quota_middleware(request: Request, call_next):
+    """
+    Conta as chamadas de API feitas em nome de um usuário (cabeçalho
+    `X-User-Id` assinado pelo gateway do Agroisync ou com o token da IA) e
+    recusa as que passam da cota do plano
+
+    Leituras continuam públicas: sem identidade confiável, com plano sem
+    `api_access` ou com o banco de usuários indisponível a requisição segue
+    sem contar.
+    """
+    path = request.url.path
+    if not path.startswith('/api/') or path.startswith(QUOTA_EXEMPT_PREFIXES):
+        return await call_next(request)
+    user_id = authenticated_user_id(request)
+    if not user_id:
+        return await call_next(request)
+    
+    try:
+        user_plan = (await resolve_user_plans([user_id]))[user_id]
+    except HTTPException:
+        return await call_next(request)
+    feature = QUOTA_FEATURES.get("api_calls")
+    if user_plan is None or (feature and not get_plan_matrix().has_access(user_plan, feature)):
+        return await call_next(request)
+    
+    try:
+        usage = await charge_quota(user_id, user_plan, "api_calls")
+    except HTTPException as e:
+        return JSONResponse(status_code=e.status_code, content=e.detail, headers=e.headers)
+    
+    response = await call_next(request)
+    response.headers.update(quota_headers(usage))
+    return response
+
+
+# ============================================
+# CONTROLE DE ADMISSÃO (FAIXAS DE CONCORRÊNCIA)
+# ============================================
+
+@app.middleware("http")
+async def admission_middleware(request: Request, call_next):
+    """
+    Limita as requisições simultâneas por faixa (ingest, admin, public):
+    acima do limite esperam na fila da faixa e, com a fila cheia ou a
+    espera esgotada, recebem 503 sem afetar as outras faixas
+    """
+    lane = lane_for(request.url.path)
+    if lane is None:
+        return await call_next(request)
+    
+    try:
+        async with get_admission().slot(lane):
+            return await call_next(request)
+    except AdmissionRejected as e:
+        return JSONResponse(
+            status_code=503,
+            content={"error": "overloaded", "message": str(e), "lane": e.lane},
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+
 # ============================================
 # MIDDLEWARE DE SEGURANÇA
 # ============================================
@@ -44,6 +159,9 @@ app.add_middleware(
 async def security_middleware(request: Request, call_next):
     """
     Middleware global que valida token e IP para rotas protegidas
+
+    Registrado por último, é o mais externo: requisições sem token ou de IP
+    não autorizado são recusadas antes de ocupar vaga nas faixas de admissão
     """
     path = request.url.path
     
@@ -53,8 +171,8 @@ async def security_middleware(request: Request, call_next):
     if path in public_routes or not path.startswith('/api/'):
         return await call_next(request)
     
-    # Rotas protegidas (começam com /api/update-* ou /api/logs)
-    if path.startswith('/api/update-') or path.startswith('/api/logs'):
+    # Rotas protegidas (começam com /api/update-*, /api/logs ou /api/admin/)
+    if path.startswith(('/api/update-', '/api/logs', '/api/admin/')):
         client_ip = get_client_ip(request)
         
         try:
@@ -90,12 +208,15 @@ async def security_middleware(request: Request, call_next):
 # MODELOS DE DADOS
 # ============================================
 
+# plan_level aceito na ingestão (as chaves de PLAN_LEVELS): outro valor é 422
+PlanLevel = Literal["publico", "privado", "loja", "admin"]
+
 class NewsUpdate(BaseModel):
     title: str
     content: str
     category: str = "geral"
     source: Optional[str] = "IA Agroisync"
-    plan_level: str = "publico"  # publico, privado, loja, admin
+    plan_level: PlanLevel = "publico"
 
 class WeatherUpdate(BaseModel):
     location: str
@@ -103,7 +224,9 @@ class WeatherUpdate(BaseModel):
     humidity: float
     description: str
     forecast: Optional[str] = None
-    plan_level: str = "publico"
+    plan_level: PlanLevel = "publico"
+    latitude: Optional[float] = None   # opcional: senão resolvido pelo gazetteer
+    longitude: Optional[float] = None
 
 class CotationUpdate(BaseModel):
     product: str
@@ -111,13 +234,94 @@ class CotationUpdate(BaseModel):
     currency: str = "BRL"
     market: str
     variation: Optional[float] = None
-    plan_level: str = "publico"
+    plan_level: PlanLevel = "publico"
+    timestamp: Optional[datetime] = None  # padrão: horário de recebimento (carga histórica)
+
+class AlertCreate(BaseModel):
+    user_id: str
+    product: str
+    market: str
+    threshold: float
+    direction: str = "cross"  # above | below | cross
+
+class PlanCheck(BaseModel):
+    user_id: str
+    feature: str
+
+class PlanCheckBatch(BaseModel):
+    checks: List[PlanCheck]
+
+class QuotaConsume(BaseModel):
+    user_id: str
+    metric: str
+    amount: int = 1
 
 class LogQuery(BaseModel):
     limit: int = 100
     status_filter: Optional[str] = None
 
 
+# Nível de acesso exigido pelo conteúdo de cada plano (mesmas chaves de PlanLevel)
+PLAN_LEVELS = {
+    "publico": 1,
+    "privado": 2,
+    "loja": 3,
+    "admin": 4
+}
+
+
+# ============================================
+# CONTROLE DE ACESSO POR PLANO
+# ============================================
+
+def plan_level_filter(request: Request, plan_level: str):
+    """
+    Filtro de plan_level do conteúdo visível para o plano pedido
+
+    Planos acima de "publico" exigem token + IP autorizado.
+    """
+    if plan_level not in PLAN_LEVELS:
+        raise HTTPException(
+            status_code=400,
+            detail={"error": "bad_request", "message": f"Plano inválido: {plan_level}"}
+        )
+
+    if plan_level != "publico":
+        verify_token(request)
+        verify_ip(request)
+
+    max_level = PLAN_LEVELS[plan_level]
+    return lambda level: plan_visible(level, max_level)
+
+
+def plan_visible(level: Optional[str], max_level: int) -> bool:
+    """
+    Conteúdo de plano `level` é visível até o nível `max_level`?
+    Plano desconhecido fica oculto (como no filtro IN das notícias)
+    """
+    return PLAN_LEVELS.get(level, max_level + 1) <= max_level
+
+
+def visible_plan_levels(plan_level: str) -> List[str]:
+    """
+    Planos cujo conteúdo é visível para `plan_level` (nível menor ou igual)
+    """
+    return [name for name, level in PLAN_LEVELS.items() if level <= PLAN_LEVELS[plan_level]]
+
+
+# ============================================
+# CACHE HTTP (ETag / If-None-Match)
+# ============================================
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """
+    Resposta 304 se o cliente já tem a versão `etag` (sem montar o payload)
+    """
+    if if_none_match(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return None
+
+
 # ============================================
 # ROTAS PÚBLICAS
 # ============================================
@@ -147,11 +351,293 @@ async def status():
     }
 
 
+# ============================================
+# APLICAÇÃO DAS ATUALIZAÇÕES
+# (compartilhada pelas rotas individuais e em lote)
+# ============================================
+
+async def publish_event(event_type: str, items: List[Dict]) -> None:
+    """
+    Publica um evento de atualização para os webhooks (entrega em segundo plano)
+    """
+    if items:
+        dispatcher = await get_webhook_dispatcher()
+        dispatcher.publish(event_type, {"count": len(items), "items": items})
+
+
+async def ensure_outbox_capacity(outbox) -> None:
+    """
+    Recusa a atualização (503) enquanto a outbox do D1 está cheia
+    """
+    try:
+        await outbox.ensure_capacity()
+    except OutboxFullError as e:
+        raise HTTPException(
+            status_code=503,
+            detail={"error": "service_unavailable", "message": str(e)},
+            headers={"Retry-After": "30"}
+        )
+
+
+async def apply_news(items: List[NewsUpdate]) -> List[Dict]:
+    """
+    Persiste notícias em uma única transação, detectando quase duplicatas
+    (contra as já gravadas e dentro do próprio lote)
+
+    Com NEWS_NEAR_DUP_POLICY=flag a notícia é gravada com near_duplicate_of
+    (fora das listagens, da busca e dos eventos); com merge ela não é
+    gravada e o id retornado é o da notícia original. Detecção e gravação
+    rodam na seção exclusiva do store: duas cópias simultâneas (mesmo em
+    workers diferentes) não passam ambas como originais.
+
+    Returns:
+        Lista com id e created_at de cada notícia (+ near_duplicate_of e
+        similarity quando é quase duplicata)
+    """
+    store = await get_news_store()
+    indexer = await get_news_indexer()
+    outbox = await get_d1_outbox()
+    await ensure_outbox_capacity(outbox)
+    signatures, valid = minhash_many([(item.title, item.content) for item in items])
+
+    async with store.exclusive():
+        # Dentro da seção: inclui o que outros workers acabaram de gravar
+        await indexer.sync(force=True)
+
+        batch_index = NearDuplicateIndex()
+        matches: List[Optional[tuple]] = []
+        payloads: Dict[int, Dict] = {}
+        for position, item in enumerate(items):
+            match = None
+            if valid[position]:
+                # Chaves do índice do lote: posição em `items` (prefixo "#")
+                match = indexer.neardup.query(signatures[position]) or batch_index.query(signatures[position])
+            if match is not None and match[0].startswith("#"):
+                match = (payloads[int(match[0][1:])]["id"], match[1])
+            matches.append(match)
+            if match is None or NEWS_NEAR_DUP_POLICY != "merge":
+                payloads[position] = {
+                    **item.model_dump(),
+                    "id": str(uuid.uuid4()),
+                    "near_duplicate_of": match[0] if match else None
+                }
+                if valid[position] and match is None:
+                    batch_index.add(f"#{position}", signatures[position])
+
+        to_insert = list(payloads)
+        rows = await store.insert_many([payloads[position] for position in to_insert])
+        if rows:
+            await outbox.enqueue("news", rows)
+            bump_version("news")
+            await indexer.sync(force=True)
+
+    originals = [row for row in rows if not row["near_duplicate_of"]]
+    if originals:
+        await publish_event("news.created", [
+            {key: row[key] for key in ("id", "title", "category", "plan_level", "created_at")}
+            for row in originals
+        ])
+    stored = dict(zip(to_insert, rows))
+
+    results = []
+    for position, match in enumerate(matches):
+        original_id = match[0] if match is not None else None
+        if position in stored:
+            result = {"id": stored[position]["id"], "created_at": stored[position]["created_at"]}
+        else:
+            original = await store.get_news(original_id)
+            result = {"id": original_id, "created_at": original["created_at"] if original else None, "merged": True}
+        if match is not None:
+            result.update(near_duplicate_of=original_id, similarity=match[1])
+        results.append(result)
+    return results
+
+
+async def apply_weather(items: List[WeatherUpdate]) -> List[Dict]:
+    """
+    Grava leituras meteorológicas e atualiza o índice espacial
+    (coordenadas do payload ou do gazetteer de municípios)
+
+    Returns:
+        Lista com UF, latitude/longitude e se a leitura foi geolocalizada
+    """
+    service = await get_weather_service()
+    results = await service.ingest([item.model_dump() for item in items])
+    await publish_event("weather.updated", [
+        {
+            "location": item.location,
+            "uf": result["uf"],
+            "temperature": item.temperature,
+            "humidity": item.humidity,
+            "description": item.description,
+            "plan_level": item.plan_level,
+            "latitude": result["latitude"],
+            "longitude": result["longitude"]
+        }
+        for item, result in zip(items, results)
+    ])
+    return results
+
+
+def _epoch(value: Optional[datetime]) -> float:
+    if value is None:
+        return datetime.now(timezone.utc).timestamp()
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+async def apply_cotations(items: List[CotationUpdate]) -> List[Dict]:
+    """
+    Acrescenta as cotações às séries temporais (produto, mercado),
+    recalcula as análises derivadas de cada série afetada e dispara os
+    alertas de preço cruzados
+
+    Sem timestamp, a cotação recebe o horário de gravação (atribuído com o
+    lock da série). A série guarda o plano mais restrito entre as cotações
+    recebidas e só aparece para planos a partir dele. Abrir a série e gravar
+    (flock + arquivos) rodam fora do event loop.
+
+    Returns:
+        Lista com timestamp e variação calculada (vs fechamento anterior)
+        de cada cotação, ou "error" se fora de ordem
+    """
+    store = get_timeseries_store()
+    alerts = await get_alert_engine()
+    await alerts.sync()
+    results: List[Dict] = [{} for _ in items]
+    hits = []
+    
+    # Agrupar por série para gravar cada uma de uma vez
+    groups: Dict[tuple, List[int]] = {}
+    for i, item in enumerate(items):
+        groups.setdefault((item.product, item.market), []).append(i)
+    
+    for (product, market), indexes in groups.items():
+        points = [
+            (None if items[i].timestamp is None else _epoch(items[i].timestamp), items[i].price)
+            for i in indexes
+        ]
+        level = max(PLAN_LEVELS[items[i].plan_level] for i in indexes)
+        series = await asyncio.to_thread(store.get, product, market, True)
+        try:
+            total = await asyncio.to_thread(series.append_many, points, level)
+        except OutOfOrderError as e:
+            for i in indexes:
+                results[i] = {"error": str(e)}
+            continue
+        
+        # Outros workers podem ter gravado depois: os pontos deste lote são [first, total)
+        ts, px = series.arrays()
+        ts, px = ts[:total], px[:total]
+        first = total - len(points)
+        previous = float(px[first - 1]) if first > 0 else None
+        new_ts, new_px = ts[first:], px[first:]
+        variations = variations_vs_previous_close(ts, px, new_ts, new_px)
+        for i, timestamp, variation in zip(indexes, new_ts, variations):
+            results[i] = {
+                "timestamp": float(timestamp),
+                "variation": round(float(variation), 4) if variation == variation else None
+            }
+        update_series_analytics(series)
+        # Alertas cruzados entre o preço anterior e cada ponto novo
+        hits.extend(alerts.match(product, market, previous, list(zip(new_ts.tolist(), new_px.tolist()))))
+    
+    bump_version("cotations")
+    triggered = await alerts.mark_triggered(hits)
+    await publish_event("cotation.updated", [
+        {
+            "product": item.product,
+            "market": item.market,
+            "price": item.price,
+            "currency": item.currency,
+            "plan_level": item.plan_level,
+            "timestamp": result["timestamp"],
+            "variation": result["variation"]
+        }
+        for item, result in zip(items, results) if "error" not in result
+    ])
+    await publish_event("alert.triggered", triggered)
+    return results
+
+
+# ============================================
+# IDEMPOTÊNCIA DAS ATUALIZAÇÕES
+# ============================================
+
+def idempotent(kind: str, payload_arg: Optional[str] = None, by_content: Union[bool, str] = True):
+    """
+    Decorator para rotas de atualização: repetições com o mesmo
+    `Idempotency-Key` (TTL IDEMPOTENCY_KEY_TTL) ou com o mesmo conteúdo
+    (TTL DEDUP_TTL) recebem a resposta original, sem gravar nem logar de novo
+    
+    Args:
+        kind: Tipo de atualização (faz parte das chaves)
+        payload_arg: Parâmetro da rota com o payload (None: só Idempotency-Key,
+            ex: lotes em streaming)
+        by_content: Deduplica também pelo conteúdo; com o nome de um campo, só
+            quando ele vem preenchido (leituras repetidas de cotação e clima
+            são dados novos, não reenvios, a menos que tragam o horário)
+    """
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def wrapper(*args, **kwargs):
+            request: Request = kwargs["request"]
+            payload = kwargs.get(payload_arg) if payload_arg else None
+            if isinstance(payload, BaseModel):
+                payload = payload.model_dump()
+            fingerprint = content_hash(payload) if payload is not None else None
+            dedup = by_content if isinstance(by_content, bool) else payload.get(by_content) is not None
+            
+            keys = []
+            header_key = request.headers.get("idempotency-key")
+            if header_key:
+                keys.append((f"key:{kind}:{header_key}", fingerprint, IDEMPOTENCY_KEY_TTL))
+            if fingerprint and dedup:
+                keys.append((f"hash:{kind}:{fingerprint}", fingerprint, DEDUP_TTL))
+            if not keys:
+                return await handler(*args, **kwargs)
+            
+            store = await get_idempotency_store()
+            outcome, stored = await store.reserve(keys)
+            if outcome == REPLAY:
+                status_code, body = stored
+                return Response(
+                    content=body,
+                    status_code=status_code,
+                    media_type="application/json",
+                    headers={"Idempotent-Replayed": "true"}
+                )
+            if outcome == IN_PROGRESS:
+                raise HTTPException(
+                    status_code=409,
+                    detail={"error": "conflict", "message": "Requisição idêntica ainda em processamento"}
+                )
+            if outcome == MISMATCH:
+                raise HTTPException(
+                    status_code=422,
+                    detail={"error": "unprocessable", "message": "Idempotency-Key já usada com outro conteúdo"}
+                )
+            
+            key_names = [key for key, _, _ in keys]
+            try:
+                result = await handler(*args, **kwargs)
+            except BaseException:
+                await store.release(key_names)
+                raise
+            
+            await store.complete(key_names, 200, dumps(result))
+            return result
+        return wrapper
+    return decorator
+
+
 # ============================================
 # ROTAS PROTEGIDAS - ATUALIZAÇÕES
 # ============================================
 
 @app.post("/api/update-news")
+@idempotent("news", "news")
 async def update_news(news: NewsUpdate, request: Request):
     """
     📰 Atualizar notícias
@@ -160,14 +646,10 @@ async def update_news(news: NewsUpdate, request: Request):
     client_ip = get_client_ip(request)
     
     # Validar nível de acesso baseado no plano
-    plan_levels = {
-        "publico": 1,
-        "privado": 2,
-        "loja": 3,
-        "admin": 4
-    }
+    required_level = PLAN_LEVELS[news.plan_level]
     
-    required_level = plan_levels.get(news.plan_level, 1)
+    # Persistir notícia
+    stored = (await apply_news([news]))[0]
     
     # Logar ação
     log_action(
@@ -177,22 +659,33 @@ async def update_news(news: NewsUpdate, request: Request):
         details=f"Plano: {news.plan_level}, Categoria: {news.category}"
     )
     
-    # Aqui você integraria com o banco de dados do Agroisync
-    # Por enquanto, retorna sucesso
+    data = {
+        "id": stored["id"],
+        "created_at": stored["created_at"],
+        "title": news.title,
+        "plan_level": news.plan_level,
+        "category": news.category,
+        "required_plan": required_level
+    }
+    if "near_duplicate_of" in stored:
+        data.update(
+            near_duplicate_of=stored["near_duplicate_of"],
+            similarity=stored["similarity"],
+            merged=stored.get("merged", False)
+        )
     
     return {
         "success": True,
-        "message": "Notícia atualizada com sucesso",
-        "data": {
-            "title": news.title,
-            "plan_level": news.plan_level,
-            "category": news.category,
-            "required_plan": required_level
-        }
+        "message": (
+            "Notícia já existente (quase duplicata)" if stored.get("merged")
+            else "Notícia atualizada com sucesso"
+        ),
+        "data": data
     }
 
 
 @app.post("/api/update-weather")
+@idempotent("weather", "weather", by_content=False)
 async def update_weather(weather: WeatherUpdate, request: Request):
     """
     🌤️ Atualizar informações meteorológicas
@@ -200,6 +693,8 @@ async def update_weather(weather: WeatherUpdate, request: Request):
     """
     client_ip = get_client_ip(request)
     
+    applied = (await apply_weather([weather]))[0]
+    
     log_action(
         action=f"Atualizou Clima: {weather.location}",
         status="OK",
@@ -214,12 +709,17 @@ async def update_weather(weather: WeatherUpdate, request: Request):
             "location": weather.location,
             "temperature": weather.temperature,
             "humidity": weather.humidity,
-            "plan_level": weather.plan_level
+            "plan_level": weather.plan_level,
+            "uf": applied["uf"],
+            "latitude": applied["latitude"],
+            "longitude": applied["longitude"],
+            "geolocated": applied["geolocated"]
         }
     }
 
 
 @app.post("/api/update-cotation")
+@idempotent("cotation", "cotation", by_content="timestamp")
 async def update_cotation(cotation: CotationUpdate, request: Request):
     """
     💰 Atualizar cotações de mercado
@@ -227,6 +727,13 @@ async def update_cotation(cotation: CotationUpdate, request: Request):
     """
     client_ip = get_client_ip(request)
     
+    applied = (await apply_cotations([cotation]))[0]
+    if applied.get("error"):
+        raise HTTPException(
+            status_code=409,
+            detail={"error": "conflict", "message": applied["error"]}
+        )
+    
     log_action(
         action=f"Atualizou Cotação: {cotation.product}",
         status="OK",
@@ -242,12 +749,15 @@ async def update_cotation(cotation: CotationUpdate, request: Request):
             "price": cotation.price,
             "currency": cotation.currency,
             "market": cotation.market,
-            "variation": cotation.variation
+            "variation": applied["variation"] if applied["variation"] is not None else cotation.variation,
+            "client_variation": cotation.variation,
+            "timestamp": applied["timestamp"]
         }
     }
 
 
 @app.post("/api/update-ai-insights")
+@idempotent("ai-insights", "data")
 async def update_ai_insights(request: Request, data: Dict[str, Any]):
     """
     🤖 Atualizar insights da IA
@@ -270,152 +780,1258 @@ async def update_ai_insights(request: Request, data: Dict[str, Any]):
 
 
 # ============================================
-# ROTAS PROTEGIDAS - LOGS E MONITORAMENTO
+# ROTAS PROTEGIDAS - INGESTÃO EM LOTE
 # ============================================
 
-@app.get("/api/logs")
-async def get_system_logs(request: Request, limit: int = 100, source: str = "memory"):
+# tipo -> (modelo, aplicação, rótulo do log)
+BULK_KINDS = {
+    "news": (NewsUpdate, apply_news, "Notícias"),
+    "weather": (WeatherUpdate, apply_weather, "Clima"),
+    "cotation": (CotationUpdate, apply_cotations, "Cotações"),
+}
+
+
+async def bulk_ingest(request: Request, kind: str) -> Dict:
     """
-    📋 Consultar logs do sistema
-    Requer: Token válido + IP autorizado
-    
-    Args:
-        limit: Número de logs a retornar (padrão: 100)
-        source: "memory" ou "file"
+    Ingestão em lote: valida o corpo (NDJSON ou array JSON) conforme chega,
+    grava em blocos e registra um único log resumido para o lote
     """
     client_ip = get_client_ip(request)
+    model, apply, label = BULK_KINDS[kind]
     
-    # Verificar acesso admin
-    verify_admin_access(request)
+    outcome = await ingest_stream(request.stream(), model, apply)
+    summary = outcome["summary"]
+    format_error = outcome["format_error"]
     
-    if source == "file":
-        logs = get_logs_from_file(limit)
-        log_format = "raw"
+    if summary["rejected"] == 0 and not format_error:
+        status = "OK"
     else:
-        logs = get_logs(limit)
-        log_format = "json"
+        status = "WARNING" if summary["accepted"] else "ERROR"
     
     log_action(
-        action=f"Consultou Logs ({source})",
-        status="OK",
+        action=f"Ingestão em Lote: {label}",
+        status=status,
         ip=client_ip,
-        details=f"Limite: {limit}"
+        details=(
+            f"Recebidos: {summary['received']}, Aceitos: {summary['accepted']}, "
+            f"Rejeitados: {summary['rejected']}, Blocos: {summary['chunks']}, Bytes: {summary['bytes']}"
+            + (f", Erro: {format_error}" if format_error else "")
+        )
     )
     
     return {
-        "success": True,
-        "format": log_format,
-        "count": len(logs),
-        "logs": logs
+        "success": status == "OK",
+        "message": format_error or f"{summary['accepted']} de {summary['received']} itens aceitos",
+        "summary": summary,
+        "results": outcome["results"]
     }
 
 
-@app.get("/api/logs/stats")
-async def get_logs_stats(request: Request):
+@app.post("/api/update-news/bulk")
+@idempotent("news-bulk")
+async def bulk_update_news(request: Request):
     """
-    📊 Estatísticas dos logs
+    📰📦 Atualizar notícias em lote (NDJSON ou array JSON de NewsUpdate)
     Requer: Token válido + IP autorizado
     """
-    client_ip = get_client_ip(request)
-    
-    verify_admin_access(request)
-    
-    stats = get_log_stats()
+    return await bulk_ingest(request, "news")
+
+
+@app.post("/api/update-weather/bulk")
+@idempotent("weather-bulk")
+async def bulk_update_weather(request: Request):
+    """
+    🌤️📦 Atualizar clima em lote (NDJSON ou array JSON de WeatherUpdate)
+    Requer: Token válido + IP autorizado
+    """
+    return await bulk_ingest(request, "weather")
+
+
+@app.post("/api/update-cotation/bulk")
+@idempotent("cotation-bulk")
+async def bulk_update_cotation(request: Request):
+    """
+    💰📦 Atualizar cotações em lote (NDJSON ou array JSON de CotationUpdate)
+    Requer: Token válido + IP autorizado
+    """
+    return await bulk_ingest(request, "cotation")
+
+
+# ============================================
+# ROTAS DE HISTÓRICO DE COTAÇÕES
+# ============================================
+
+async def visible_series(request: Request, product: str, market: str, plan_level: str):
+    """
+    Série (produto, mercado) se existir e for visível para `plan_level`
+    """
+    is_visible = plan_level_filter(request, plan_level)
+    series = await asyncio.to_thread(get_timeseries_store().get, product, market)
+    if series is None or not is_visible(series_plan_level(series.level)):
+        return None
+    return series
+
+
+@app.get("/api/cotations/series")
+async def list_cotation_series(request: Request, response: Response, plan_level: str = "publico"):
+    """
+    📈 Séries de cotação disponíveis (produto, mercado, pontos, plano)
+    """
+    is_visible = plan_level_filter(request, plan_level)
+    etag = etag_for("cotations", plan_level)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
     
-    log_action(
-        action="Consultou Estatísticas de Logs",
-        status="OK",
-        ip=client_ip
-    )
+    series = []
+    for meta in await asyncio.to_thread(get_timeseries_store().list_series):
+        meta["plan_level"] = series_plan_level(meta.pop("level"))
+        if is_visible(meta["plan_level"]):
+            series.append(meta)
+    response.headers["ETag"] = etag
     
     return {
         "success": True,
-        "stats": stats
+        "count": len(series),
+        "series": series
     }
 
 
-@app.delete("/api/logs")
-async def delete_logs(request: Request):
-    """
-    🗑️ Limpar todos os logs
-    Requer: Token válido + IP autorizado + Admin
-    ATENÇÃO: Ação irreversível!
+@app.get("/api/cotations/history")
+async def cotation_history(request: Request, product: str, market: str, resolution: str = "1d",
+                           start: Optional[datetime] = None, end: Optional[datetime] = None,
+                           plan_level: str = "publico"):
     """
-    client_ip = get_client_ip(request)
+    📈 Histórico OHLC de uma cotação
     
-    verify_admin_access(request)
+    Args:
+        product: Produto (ex: Soja)
+        market: Mercado (ex: B3)
+        resolution: Tamanho do balde ("15m", "1h", "1d", "1w" ou segundos)
+        start: Início (padrão: 1 ano antes de `end`)
+        end: Fim (padrão: agora)
+        plan_level: Plano do cliente (séries de planos acima ficam vazias)
+    """
+    series = await visible_series(request, product, market, plan_level)
+    try:
+        step = parse_resolution(resolution)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=400,
+            detail={"error": "bad_request", "message": str(e)}
+        )
     
-    success = clear_logs()
+    end_ts = _epoch(end)
+    start_ts = _epoch(start) if start else end_ts - timedelta(days=365).total_seconds()
+    start_ts -= start_ts % step  # baldes alinhados à resolução (ex: meia-noite UTC)
     
-    if success:
-        return {
-            "success": True,
-            "message": "Logs limpos com sucesso"
-        }
-    else:
+    if (end_ts - start_ts) / step > MAX_OHLC_BUCKETS:
         raise HTTPException(
-            status_code=500,
-            detail={"error": "server_error", "message": "Erro ao limpar logs"}
+            status_code=400,
+            detail={"error": "bad_request", "message": f"Intervalo gera mais de {MAX_OHLC_BUCKETS} baldes"}
         )
+    
+    ohlc = series.ohlc(start_ts, end_ts, step) if series else []
+    
+    return {
+        "success": True,
+        "product": product,
+        "market": market,
+        "resolution": step,
+        "start": start_ts,
+        "end": end_ts,
+        "count": len(ohlc),
+        "ohlc": ohlc
+    }
 
 
-# ============================================
-# ROTAS DE GERENCIAMENTO DE PLANOS
-# ============================================
-
-@app.get("/api/plans/check")
-async def check_plan_access(request: Request, user_id: str, feature: str):
+@app.get("/api/cotations/analytics")
+async def cotation_analytics(request: Request, response: Response, product: str, market: str,
+                             plan_level: str = "publico"):
     """
-    🔍 Verificar acesso a feature baseado no plano do usuário
+    🧮 Análises derivadas de uma cotação (variação, médias móveis, volatilidade, mín/máx)
     """
-    client_ip = get_client_ip(request)
+    series = await visible_series(request, product, market, plan_level)
+    etag = etag_for("cotations", plan_level)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    
+    if series is None:
+        raise HTTPException(
+            status_code=404,
+            detail={"error": "not_found", "message": f"Série não encontrada: {product} / {market}"}
+        )
     
-    # Aqui você integraria com o banco de dados do Agroisync
-    # para verificar o plano real do usuário
+    response.headers["ETag"] = etag
     
-    # Mapeamento de features por plano
-    plan_features = {
-        "gratuito": ["basic_search", "view_products", "view_freights"],
-        "pro": ["basic_search", "view_products", "view_freights", "unlimited_posts", "analytics", "api_access"],
-        "loja": ["basic_search", "view_products", "view_freights", "unlimited_posts", "analytics", "store_dashboard"],
-        "admin": ["all"]
+    return {
+        "success": True,
+        "analytics": get_series_analytics(series)
     }
+
+
+@app.post("/api/admin/cotations/analytics/recompute")
+async def recompute_cotation_analytics(request: Request):
+    """
+    🧮 Recalcular as análises de todas as séries de uma vez
+    Requer: Token válido + IP autorizado
+    """
+    client_ip = get_client_ip(request)
     
-    # Simular verificação (substituir por query real ao DB)
-    user_plan = "pro"  # Obter do DB
+    verify_admin_access(request)
     
-    has_access = feature in plan_features.get(user_plan, []) or "all" in plan_features.get(user_plan, [])
+    started = datetime.now()
+    analytics = recompute_all(get_timeseries_store())
+    elapsed_ms = (datetime.now() - started).total_seconds() * 1000
     
     log_action(
-        action=f"Verificou Acesso: {feature}",
-        status="OK" if has_access else "DENIED",
+        action="Recalculou Análises de Cotações",
+        status="OK",
         ip=client_ip,
-        details=f"User: {user_id}, Plano: {user_plan}, Feature: {feature}"
+        details=f"Séries: {len(analytics)}, Tempo: {elapsed_ms:.1f}ms"
     )
     
     return {
         "success": True,
-        "user_id": user_id,
-        "plan": user_plan,
-        "feature": feature,
-        "has_access": has_access
+        "count": len(analytics),
+        "elapsed_ms": round(elapsed_ms, 3),
+        "analytics": analytics
     }
 
 
 # ============================================
-# INICIALIZAÇÃO
+# ROTAS DE CLIMA - CONSULTA ESPACIAL
 # ============================================
 
-@app.on_event("startup")
-async def startup_event():
+def _check_coordinates(lat: float, lon: float) -> None:
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise HTTPException(
+            status_code=400,
+            detail={"error": "bad_request", "message": "Coordenadas fora do intervalo válido"}
+        )
+
+
+@app.get("/api/weather/nearest")
+async def weather_nearest(request: Request, response: Response, lat: float, lon: float, n: int = 5,
+                          plan_level: str = "publico"):
     """
-    Evento de inicialização do servidor
+    🌦️ Leituras mais recentes das N localidades mais próximas de (lat, lon)
     """
-    print("🚀 Agroisync IA Admin iniciado!")
-    print(f"📁 Logs salvos em: {os.path.abspath('ia_actions.log')}")
+    _check_coordinates(lat, lon)
+    visible = plan_level_filter(request, plan_level)
+    n = max(1, min(n, 100))
+    
+    etag = etag_for("weather")
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    response.headers["ETag"] = etag
+
+    service = await get_weather_service()
+    readings = await service.nearest(lat, lon, n, lambda reading: visible(reading["plan_level"]))
+
+    return {
+        "success": True,
+        "count": len(readings),
+        "readings": readings
+    }
+
+
+@app.get("/api/weather/radius")
+async def weather_radius(request: Request, response: Response, lat: float, lon: float, radius_km: float = 50,
+                         limit: int = 100, plan_level: str = "publico"):
+    """
+    🌦️ Leituras mais recentes das localidades a até `radius_km` de (lat, lon)
+    """
+    _check_coordinates(lat, lon)
+    if not 0 < radius_km <= 2000:
+        raise HTTPException(
+            status_code=400,
+            detail={"error": "bad_request", "message": "radius_km deve estar entre 0 e 2000"}
+        )
+    visible = plan_level_filter(request, plan_level)
+    limit = max(1, min(limit, 1000))
+    
+    etag = etag_for("weather")
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    response.headers["ETag"] = etag
+
+    service = await get_weather_service()
+    readings = await service.within(lat, lon, radius_km, limit, lambda reading: visible(reading["plan_level"]))
+
+    return {
+        "success": True,
+        "radius_km": radius_km,
+        "count": len(readings),
+        "readings": readings
+    }
+
+
+@app.get("/api/weather/regions")
+async def weather_regions(request: Request, response: Response, uf: Optional[str] = None,
+                          plan_level: str = "publico"):
+    """
+    🗺️ Médias de temperatura e umidade por estado (UF)
+    
+    Mantidas incrementalmente a cada leitura, com decaimento exponencial
+    (meia-vida WEATHER_ROLLUP_HALF_LIFE_HOURS); não agrega leituras brutas.
+    """
+    visible = plan_level_filter(request, plan_level)
+    
+    etag = etag_for("weather")
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    
+    service = await get_weather_service()
+    regions = await service.regions(visible)
+    
+    if uf:
+        regions = [region for region in regions if region["uf"] == uf.upper()]
+        if not regions:
+            raise HTTPException(
+                status_code=404,
+                detail={"error": "not_found", "message": f"Sem leituras para a UF: {uf}"}
+            )
+    
+    response.headers["ETag"] = etag
+    
+    return {
+        "success": True,
+        "half_life_hours": service.rollups.half_life_hours,
+        "count": len(regions),
+        "regions": regions
+    }
+
+
+# ============================================
+# ROTAS PÚBLICAS - ÚLTIMOS ITENS (VISÕES MATERIALIZADAS)
+# ============================================
+
+async def _build_latest_news(plan_level: str) -> Dict:
+    store = await get_news_store()
+    news = await store.list_news(plan_levels=visible_plan_levels(plan_level), limit=MATERIALIZED_LATEST_LIMIT)
+    return {"success": True, "plan_level": plan_level, "count": len(news), "news": news}
+
+
+async def _build_latest_weather(plan_level: str) -> Dict:
+    service = await get_weather_service()
+    await service.sync(force=True)
+    max_level = PLAN_LEVELS[plan_level]
+    readings = sorted(
+        (r for r in service.latest.values() if plan_visible(r["plan_level"], max_level)),
+        key=lambda r: r["recorded_at"],
+        reverse=True
+    )[:MATERIALIZED_LATEST_LIMIT]
+    readings = [{k: v for k, v in r.items() if k not in ("id", "location_key")} for r in readings]
+    return {"success": True, "plan_level": plan_level, "count": len(readings), "weather": readings}
+
+
+async def _build_latest_cotations(plan_level: str) -> Dict:
+    store = get_timeseries_store()
+    max_level = PLAN_LEVELS[plan_level]
+    cotations = []
+    for meta in await asyncio.to_thread(store.list_series):
+        series = store.get(meta["product"], meta["market"])
+        if series is None or not len(series):
+            continue
+        series_level = series_plan_level(series.level)
+        if PLAN_LEVELS[series_level] > max_level:
+            continue
+        analytics = get_series_analytics(series)
+        cotations.append({
+            "product": analytics["product"],
+            "market": analytics["market"],
+            "plan_level": series_level,
+            "price": analytics["last"],
+            "timestamp": analytics["last_timestamp"],
+            "previous_close": analytics["previous_close"],
+            "variation": analytics["variation"]
+        })
+    cotations.sort(key=lambda c: c["timestamp"], reverse=True)
+    return {"success": True, "plan_level": plan_level, "count": len(cotations), "cotations": cotations}
+
+
+LATEST_VIEWS = {
+    "news": MaterializedView("news", _build_latest_news),
+    "weather": MaterializedView("weather", _build_latest_weather),
+    "cotations": MaterializedView("cotations", _build_latest_cotations),
+}
+
+
+async def latest_response(request: Request, resource: str, plan_level: str) -> Response:
+    plan_level_filter(request, plan_level)
+    
+    cached = not_modified(request, etag_for(resource, plan_level))
+    if cached:
+        return cached
+    
+    version, body = await LATEST_VIEWS[resource].get(plan_level)
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers={"ETag": make_etag(resource, version, plan_level)}
+    )
+
+
+@app.get("/api/news/latest")
+async def latest_news(request: Request, plan_level: str = "publico"):
+    """
+    📰 Últimas notícias visíveis para o plano (payload pré-serializado)
+    """
+    return await latest_response(request, "news", plan_level)
+
+
+@app.get("/api/weather/latest")
+async def latest_weather(request: Request, plan_level: str = "publico"):
+    """
+    🌤️ Leitura mais recente de cada localidade visível para o plano
+    """
+    return await latest_response(request, "weather", plan_level)
+
+
+@app.get("/api/cotations/latest")
+async def latest_cotations(request: Request, plan_level: str = "publico"):
+    """
+    💰 Último preço e variação de cada série de cotação
+    """
+    return await latest_response(request, "cotations", plan_level)
+
+
+# ============================================
+# ROTAS PÚBLICAS - BUSCA DE NOTÍCIAS
+# ============================================
+
+@app.get("/api/news/search")
+async def search_news(request: Request, response: Response, q: str, category: Optional[str] = None,
+                      plan_level: str = "publico", limit: int = 20, offset: int = 0):
+    """
+    🔎 Busca de notícias por palavras-chave (índice invertido, ranking BM25)
+    """
+    plan_level_filter(request, plan_level)
+    if not q.strip():
+        raise HTTPException(
+            status_code=400,
+            detail={"error": "bad_request", "message": "Informe os termos da busca (q)"}
+        )
+    limit = max(1, min(limit, 100))
+    offset = max(0, offset)
+    
+    indexer = await get_news_indexer()
+    await indexer.sync()
+    
+    etag = etag_for("news", plan_level)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    response.headers["ETag"] = etag
+    
+    total, results = indexer.search.search(
+        q, category=category, plan_levels=visible_plan_levels(plan_level), limit=limit, offset=offset
+    )
+    
+    return {
+        "success": True,
+        "query": q,
+        "total": total,
+        "count": len(results),
+        "news": results
+    }
+
+
+# ============================================
+# ATUALIZAÇÕES AO VIVO (WEBSOCKET)
+# ============================================
+
+@app.websocket("/ws/live")
+async def live_updates(websocket: WebSocket, plan_level: str = "publico", topics: str = ""):
+    """
+    📡 Mudanças de cotações, clima e notícias em tempo real
+
+    Tópicos: "cotation:Soja/B3", "weather:MT", "news:mercado" (ou "tipo:*"),
+    assinados pela query `topics` (separados por vírgula) ou por mensagens
+    {"action": "subscribe" | "unsubscribe", "topics": [...]}.
+    Planos acima de "publico" exigem token + IP (cabeçalhos do handshake).
+    """
+    try:
+        visible = plan_level_filter(websocket, plan_level)
+    except HTTPException:
+        await websocket.close(code=1008)
+        return
+    
+    hub = await get_live_hub()
+    if hub.full():
+        await websocket.close(code=1013)
+        return
+    
+    await websocket.accept()
+    client = hub.connect(websocket, visible)
+    try:
+        if topics:
+            accepted, rejected = hub.subscribe(client, topics.split(","))
+            await websocket.send_json({"action": "subscribed", "topics": accepted, "rejected": rejected})
+        
+        while True:
+            try:
+                message = await websocket.receive_json()
+            except ValueError:
+                await websocket.send_json({"action": "error", "message": "Mensagem deve ser JSON"})
+                continue
+            
+            action = message.get("action") if isinstance(message, dict) else None
+            requested = message.get("topics") if isinstance(message, dict) else None
+            if isinstance(requested, str):
+                requested = [requested]
+            
+            if action == "subscribe" and isinstance(requested, list):
+                accepted, rejected = hub.subscribe(client, [str(t) for t in requested])
+                await websocket.send_json({"action": "subscribed", "topics": accepted, "rejected": rejected})
+            elif action == "unsubscribe" and isinstance(requested, list):
+                removed = hub.unsubscribe(client, [str(t) for t in requested])
+                await websocket.send_json({"action": "unsubscribed", "topics": removed})
+            elif action == "ping":
+                await websocket.send_json({"action": "pong"})
+            else:
+                await websocket.send_json({"action": "error", "message": "Ação inválida"})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        hub.disconnect(client)
+
+
+@app.get("/api/admin/live")
+async def live_status(request: Request):
+    """
+    📡 Conexões WebSocket e mensagens transmitidas por este worker
+    Requer: Token válido + IP autorizado
+    """
+    verify_admin_access(request)
+    
+    hub = await get_live_hub()
+    return {
+        "success": True,
+        "live": hub.stats()
+    }
+
+
+# ============================================
+# ROTAS PROTEGIDAS - LOGS E MONITORAMENTO
+# ============================================
+
+@app.get("/api/logs")
+async def get_system_logs(request: Request, limit: int = 100, source: str = "memory"):
+    """
+    📋 Consultar logs do sistema
+    Requer: Token válido + IP autorizado
+    
+    Args:
+        limit: Número de logs a retornar (padrão: 100)
+        source: "memory" ou "file"
+    """
+    client_ip = get_client_ip(request)
+    
+    # Verificar acesso admin
+    verify_admin_access(request)
+    
+    # ETag pelo conteúdo, sem os registros de auditoria das consultas; o
+    # arquivo traz essas linhas, então lá o ETag é fraco
+    etag = etag_for("logs", source, log_marker(source))
+    cached = not_modified(request, etag)
+    if source == "file":
+        # O arquivo também guarda as consultas (auditoria), que não entram no
+        # marcador: o conteúdo é equivalente, não idêntico, daí o ETag fraco
+        etag = "W/" + etag
+        if cached:
+            cached.headers["ETag"] = etag
+    if cached:
+        return cached
+    
+    if source == "file":
+        # Exportação do arquivo: leitura e serialização no pool de threads da
+        # faixa admin, sem ocupar o event loop que atende a ingestão
+        def export() -> bytes:
+            logs = get_logs_from_file(limit)
+            header = dumps({"success": True, "format": "raw", "count": len(logs)})[:-1]
+            return header + b',"logs":' + dumps_list(logs) + b"}"
+        
+        result = Response(content=await get_admission().run(ADMIN, export), media_type="application/json")
+    else:
+        logs = get_logs(limit)
+        result = JSONResponse({"success": True, "format": "json", "count": len(logs), "logs": logs})
+    
+    log_action(
+        action=f"Consultou Logs ({source})",
+        status="OK",
+        ip=client_ip,
+        details=f"Limite: {limit}",
+        audit=True
+    )
+    
+    result.headers["ETag"] = etag
+    return result
+
+
+@app.get("/api/logs/stats")
+async def get_logs_stats(request: Request, response: Response):
+    """
+    📊 Estatísticas dos logs
+    Requer: Token válido + IP autorizado
+    """
+    client_ip = get_client_ip(request)
+    
+    verify_admin_access(request)
+    
+    etag = etag_for("logs", "stats", log_marker())
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    
+    stats = get_log_stats()
+    
+    log_action(
+        action="Consultou Estatísticas de Logs",
+        status="OK",
+        ip=client_ip,
+        audit=True
+    )
+    
+    response.headers["ETag"] = etag
+    
+    return {
+        "success": True,
+        "stats": stats
+    }
+
+
+@app.delete("/api/logs")
+async def delete_logs(request: Request):
+    """
+    🗑️ Limpar todos os logs
+    Requer: Token válido + IP autorizado + Admin
+    ATENÇÃO: Ação irreversível!
+    """
+    client_ip = get_client_ip(request)
+    
+    verify_admin_access(request)
+    
+    success = clear_logs()
+    
+    if success:
+        return {
+            "success": True,
+            "message": "Logs limpos com sucesso"
+        }
+    else:
+        raise HTTPException(
+            status_code=500,
+            detail={"error": "server_error", "message": "Erro ao limpar logs"}
+        )
+
+
+# ============================================
+# ROTAS PROTEGIDAS - DIAGNÓSTICO DE MEMÓRIA
+# ============================================
+
+@app.get("/api/admin/memory")
+async def memory_status(request: Request):
+    """
+    🧮 Estado do tracemalloc e memória do worker
+    Requer: Token válido + IP autorizado
+    """
+    verify_admin_access(request)
+
+    return {
+        "success": True,
+        "memory": get_memory_status(),
+        "snapshots": list_snapshots()
+    }
+
+
+@app.post("/api/admin/memory/tracing")
+async def memory_tracing(request: Request, enabled: bool = True, frames: int = 1):
+    """
+    🧮 Ligar/desligar o tracemalloc em tempo de execução
+    Requer: Token válido + IP autorizado
+
+    Args:
+        enabled: True para ligar, False para desligar
+        frames: Profundidade da pilha guardada por alocação
+    """
+    client_ip = get_client_ip(request)
+
+    verify_admin_access(request)
+
+    memory = start_tracing(frames) if enabled else stop_tracing()
+
+    log_action(
+        action=f"{'Ligou' if enabled else 'Desligou'} tracemalloc",
+        status="OK",
+        ip=client_ip,
+        details=f"PID: {memory['pid']}, Frames: {memory['frames']}"
+    )
+
+    return {
+        "success": True,
+        "memory": memory
+    }
+
+
+@app.post("/api/admin/memory/snapshot")
+async def memory_snapshot(request: Request):
+    """
+    📸 Tirar snapshot das alocações atuais
+    Requer: Token válido + IP autorizado
+    """
+    client_ip = get_client_ip(request)
+
+    verify_admin_access(request)
+
+    try:
+        snapshot = await get_admission().run(ADMIN, take_snapshot)
+    except RuntimeError as e:
+        raise HTTPException(
+            status_code=409,
+            detail={"error": "conflict", "message": str(e)}
+        )
+
+    log_action(
+        action="Snapshot de Memória",
+        status="OK",
+        ip=client_ip,
+        details=f"PID: {snapshot['pid']}, Snapshot: {snapshot['id']}"
+    )
+
+    return {
+        "success": True,
+        "snapshot": snapshot
+    }
+
+
+@app.get("/api/admin/memory/diff")
+async def memory_diff(request: Request, base: Optional[str] = None, target: Optional[str] = None,
+                      top: int = 20, group_by: str = "lineno"):
+    """
+    📈 Top-N diferenças de alocação entre snapshots (por arquivo e linha)
+    Requer: Token válido + IP autorizado
+
+    Args:
+        base: Id do snapshot de referência (padrão: o mais antigo)
+        target: Id do snapshot comparado (padrão: snapshot novo)
+        top: Número de linhas do ranking
+        group_by: "lineno" ou "filename"
+    """
+    verify_admin_access(request)
+
+    try:
+        diff = await get_admission().run(ADMIN, diff_snapshots, base, target, top, group_by)
+    except RuntimeError as e:
+        raise HTTPException(
+            status_code=409,
+            detail={"error": "conflict", "message": str(e)}
+        )
+    except KeyError as e:
+        raise HTTPException(
+            status_code=404,
+            detail={"error": "not_found", "message": f"Snapshot não encontrado: {e.args[0]}"}
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=400,
+            detail={"error": "bad_request", "message": str(e)}
+        )
+
+    return {
+        "success": True,
+        "diff": diff
+    }
+
+
+# ============================================
+# ROTAS PROTEGIDAS - SINCRONIZAÇÃO COM O D1
+# ============================================
+
+@app.get("/api/admin/sync/d1")
+async def d1_sync_status(request: Request):
+    """
+    ☁️ Estado da outbox do D1: pendentes, atraso (lag) e falhas
+    Requer: Token válido + IP autorizado
+    """
+    verify_admin_access(request)
+    
+    outbox = await get_d1_outbox()
+    return {
+        "success": True,
+        "d1_sync": await outbox.stats()
+    }
+
+
+# ============================================
+# ROTAS PROTEGIDAS - WEBHOOKS
+# ============================================
+
+@app.get("/api/admin/webhooks")
+async def webhooks_status(request: Request, dead_limit: int = 50):
+    """
+    🪝 Destinos de webhooks (filas, entregas, falhas) e últimas entregas na dead letter
+    Requer: Token válido + IP autorizado
+    """
+    verify_admin_access(request)
+    
+    dispatcher = await get_webhook_dispatcher()
+    return {
+        "success": True,
+        "webhooks": await dispatcher.stats(),
+        "dead_letters": await dispatcher.list_dead(max(1, min(dead_limit, 500)))
+    }
+
+
+@app.post("/api/admin/webhooks/replay")
+async def webhooks_replay(request: Request, limit: int = 1000):
+    """
+    🔁 Reenfileira entregas da dead letter
+    Requer: Token válido + IP autorizado
+    """
+    verify_admin_access(request)
+    client_ip = get_client_ip(request)
+    
+    dispatcher = await get_webhook_dispatcher()
+    result = await dispatcher.replay_dead(max(1, limit))
+    
+    log_action(
+        action="Reenvio de Webhooks",
+        status="OK",
+        ip=client_ip,
+        details=f"Reenfileirados: {result['requeued']}, Ignorados: {result['skipped']}"
+    )
+    
+    return {
+        "success": True,
+        **result
+    }
+
+
+# ============================================
+# ROTAS PROTEGIDAS - CONTROLE DE ADMISSÃO E LIMITES DE CORPO
+# ============================================
+
+@app.get("/api/admin/admission")
+async def admission_status(request: Request):
+    """
+    🚦 Faixas de concorrência deste worker: ativas, na fila, recusadas e espera
+    Requer: Token válido + IP autorizado
+    """
+    verify_admin_access(request)
+    
+    return {
+        "success": True,
+        "admission": get_admission().stats()
+    }
+
+
+@app.get("/api/admin/body-limits")
+async def body_limits_status(request: Request):
+    """
+    📏 Limites de corpo por rota e requisições recusadas com 413 neste worker
+    Requer: Token válido + IP autorizado
+    """
+    verify_admin_access(request)
+    
+    return {
+        "success": True,
+        "body_limits": body_limit_stats.stats()
+    }
+
+
+# ============================================
+# ROTAS DE ALERTAS DE PREÇO
+# ============================================
+
+@app.post("/api/alerts")
+async def create_alert(alert: AlertCreate, request: Request):
+    """
+    🔔 Criar alerta de preço (disparado quando a cotação cruza o limiar)
+    Requer: Token válido + IP autorizado
+    """
+    verify_token(request)
+    verify_ip(request)
+    client_ip = get_client_ip(request)
+    
+    if alert.direction not in DIRECTIONS:
+        raise HTTPException(
+            status_code=400,
+            detail={"error": "bad_request", "message": f"Direção inválida: {alert.direction}"}
+        )
+    if not alert.product.strip() or not alert.market.strip():
+        raise HTTPException(
+            status_code=400,
+            detail={"error": "bad_request", "message": "Informe produto e mercado"}
+        )
+    
+    engine = await get_alert_engine()
+    created = await engine.create(alert.user_id, alert.product, alert.market, alert.direction, alert.threshold)
+    if created is None:
+        raise HTTPException(
+            status_code=409,
+            detail={"error": "conflict", "message": "Limite de alertas ativos do usuário atingido"}
+        )
+    
+    log_action(
+        action=f"Criou Alerta: {alert.product}",
+        status="OK",
+        ip=client_ip,
+        details=f"User: {alert.user_id}, Mercado: {alert.market}, {alert.direction} {alert.threshold}"
+    )
+    
+    return {
+        "success": True,
+        "alert": created
+    }
+
+
+@app.get("/api/alerts")
+async def list_alerts(request: Request, user_id: str, status: Optional[str] = None, limit: int = 100):
+    """
+    📋 Alertas do usuário (ativos, disparados e cancelados)
+    Requer: Token válido + IP autorizado
+    """
+    verify_token(request)
+    verify_ip(request)
+    
+    if status is not None and status not in STATUSES:
+        raise HTTPException(
+            status_code=400,
+            detail={"error": "bad_request", "message": f"Status inválido: {status}"}
+        )
+    
+    engine = await get_alert_engine()
+    alerts = await engine.list_alerts(user_id, status, max(1, min(limit, 500)))
+    return {
+        "success": True,
+        "count": len(alerts),
+        "alerts": alerts
+    }
+
+
+@app.delete("/api/alerts/{alert_id}")
+async def cancel_alert(request: Request, alert_id: str, user_id: str):
+    """
+    🔕 Cancelar alerta ativo do usuário
+    Requer: Token válido + IP autorizado
+    """
+    verify_token(request)
+    verify_ip(request)
+    client_ip = get_client_ip(request)
+    
+    engine = await get_alert_engine()
+    if not await engine.cancel(user_id, alert_id):
+        raise HTTPException(
+            status_code=404,
+            detail={"error": "not_found", "message": "Alerta ativo não encontrado"}
+        )
+    
+    log_action(
+        action="Cancelou Alerta",
+        status="OK",
+        ip=client_ip,
+        details=f"User: {user_id}, Alerta: {alert_id}"
+    )
+    
+    return {
+        "success": True,
+        "alert_id": alert_id
+    }
+
+
+@app.get("/api/admin/alerts")
+async def alerts_status(request: Request):
+    """
+    🔔 Alertas ativos no índice deste worker, cotações verificadas e disparos
+    Requer: Token válido + IP autorizado
+    """
+    verify_admin_access(request)
+    
+    engine = await get_alert_engine()
+    return {
+        "success": True,
+        "alerts": engine.stats()
+    }
+
+
+# ============================================
+# ROTAS DE GERENCIAMENTO DE PLANOS
+# ============================================
+
+async def resolve_user_plans(user_ids: List[str]) -> Dict[str, Optional[str]]:
+    """
+    Plano atual de cada usuário (None: usuário inexistente ou inativo)
+    """
+    resolver = await get_user_plan_resolver()
+    try:
+        return await resolver.resolve_many(user_ids)
+    except UserPlanSourceError as e:
+        raise HTTPException(
+            status_code=503,
+            detail={"error": "service_unavailable", "message": f"Banco de usuários indisponível: {e}"},
+            headers={"Retry-After": "5"}
+        )
+
+
+async def consume_quota(user_id: str, metric: str, amount: int = 1) -> Dict:
+    """
+    Conta `amount` usos da métrica para o usuário, se o plano permitir
+
+    Returns:
+        Uso da métrica nas janelas "day" e "month"
+
+    Raises:
+        HTTPException: 403 se o usuário não existe ou o plano não tem a
+            feature da métrica; 429 se a cota acabou
+    """
+    user_plan = (await resolve_user_plans([user_id]))[user_id]
+    if user_plan is None:
+        raise HTTPException(
+            status_code=403,
+            detail={"error": "forbidden", "message": "Usuário inexistente ou inativo"}
+        )
+    feature = QUOTA_FEATURES.get(metric)
+    if feature and not get_plan_matrix().has_access(user_plan, feature):
+        raise HTTPException(
+            status_code=403,
+            detail={"error": "forbidden", "message": f"O plano {user_plan} não inclui {feature}"}
+        )
+    return await charge_quota(user_id, user_plan, metric, amount)
+
+
+async def charge_quota(user_id: str, user_plan: str, metric: str, amount: int = 1) -> Dict:
+    """
+    Conta `amount` usos da métrica no saldo do plano já resolvido
+
+    Returns:
+        Uso da métrica nas janelas "day" e "month"
+
+    Raises:
+        HTTPException: 429 se a cota acabou
+    """
+    meter = await get_quota_meter()
+    allowed, usage = meter.consume(user_id, user_plan, metric, amount)
+    if not allowed:
+        raise HTTPException(
+            status_code=429,
+            detail={
+                "error": "quota_exceeded",
+                "message": f"Cota de {metric} do plano {user_plan} esgotada ({usage['exceeded']})",
+                "usage": usage
+            },
+            headers={"Retry-After": str(usage["retry_after"]), **quota_headers(usage)}
+        )
+    return usage
+
+
+def quota_headers(usage: Dict) -> Dict[str, str]:
+    """
+    Cabeçalhos X-Quota-* com limite e saldo de cada janela limitada
+    """
+    headers = {}
+    for window in ("day", "month"):
+        if usage[window]["limit"] is not None:
+            suffix = window.capitalize()
+            headers[f"X-Quota-Limit-{suffix}"] = str(usage[window]["limit"])
+            headers[f"X-Quota-Remaining-{suffix}"] = str(usage[window]["remaining"])
+    return headers
+
+
+@app.get("/api/plans/check")
+async def check_plan_access(request: Request, response: Response, user_id: str, feature: str):
+    """
+    🔍 Verificar acesso a feature baseado no plano do usuário
+    Requer: o próprio usuário (X-User-Id assinado pelo gateway) ou Token válido + IP autorizado
+    """
+    verify_user_or_admin(request, user_id)
+    client_ip = get_client_ip(request)
+    
+    user_plan = (await resolve_user_plans([user_id]))[user_id]
+    has_access = user_plan is not None and get_plan_matrix().has_access(user_plan, feature)
+    
+    usage = {}
+    if user_plan is not None:
+        meter = await get_quota_meter()
+        usage = {metric: meter.usage(user_id, user_plan, metric) for metric in QUOTA_LIMITS}
+    
+    body = {
+        "success": True,
+        "user_id": user_id,
+        "plan": user_plan,
+        "feature": feature,
+        "has_access": has_access,
+        "usage": usage
+    }
+    # O uso muda sem mudar a versão "plans": o ETag cobre a resposta inteira
+    etag = etag_for("plans", content_hash(body)[:16])
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    
+    log_action(
+        action=f"Verificou Acesso: {feature}",
+        status="OK" if has_access else "DENIED",
+        ip=client_ip,
+        details=f"User: {user_id}, Plano: {user_plan}, Feature: {feature}"
+    )
+    
+    response.headers["ETag"] = etag
+    
+    return body
+
+
+@app.post("/api/plans/check/batch")
+async def check_plan_access_batch(request: Request, batch: PlanCheckBatch):
+    """
+    🔍 Verificar vários pares (usuário, feature) em uma requisição
+    Requer: Token válido + IP autorizado
+    """
+    verify_admin_access(request)
+    client_ip = get_client_ip(request)
+    
+    if len(batch.checks) > PLANS_CHECK_BATCH_MAX:
+        raise HTTPException(
+            status_code=400,
+            detail={"error": "bad_request", "message": f"Máximo de {PLANS_CHECK_BATCH_MAX} verificações por lote"}
+        )
+    
+    matrix = get_plan_matrix()
+    plans = await resolve_user_plans([check.user_id for check in batch.checks])
+    results = []
+    denied = 0
+    for check in batch.checks:
+        user_plan = plans[check.user_id]
+        # Usuário inexistente: máscara 0
+        has_access = user_plan is not None and matrix.mask(user_plan) & matrix.bit(check.feature) != 0
+        denied += not has_access
+        results.append({
+            "user_id": check.user_id,
+            "plan": user_plan,
+            "feature": check.feature,
+            "has_access": has_access
+        })
+    
+    log_action(
+        action="Verificou Acesso em Lote",
+        status="OK",
+        ip=client_ip,
+        details=f"Verificações: {len(results)}, Usuários: {len(plans)}, Negadas: {denied}"
+    )
+    
+    return {
+        "success": True,
+        "count": len(results),
+        "results": results
+    }
+
+
+@app.post("/api/quotas/consume")
+async def quotas_consume(request: Request, consume: QuotaConsume):
+    """
+    📏 Contar usos de uma métrica com cota (ex: "posts" antes de publicar)
+    Requer: Token válido + IP autorizado
+    """
+    verify_token(request)
+    verify_ip(request)
+    
+    if consume.metric not in QUOTA_LIMITS or consume.amount < 1:
+        raise HTTPException(
+            status_code=400,
+            detail={"error": "bad_request", "message": f"Métrica inválida: {consume.metric}"}
+        )
+    
+    usage = await consume_quota(consume.user_id, consume.metric, consume.amount)
+    return {
+        "success": True,
+        "user_id": consume.user_id,
+        "metric": consume.metric,
+        "usage": usage
+    }
+
+
+@app.get("/api/admin/plans")
+async def plans_status(request: Request):
+    """
+    👤 Cache de planos por usuário e contadores de cota deste worker
+    Requer: Token válido + IP autorizado
+    """
+    verify_admin_access(request)
+    
+    resolver = await get_user_plan_resolver()
+    meter = await get_quota_meter()
+    return {
+        "success": True,
+        "plans": resolver.stats(),
+        "quotas": meter.stats()
+    }
+
+
+@app.post("/api/admin/plans/invalidate")
+async def plans_invalidate(request: Request, user_id: Optional[str] = None):
+    """
+    🔄 Descartar os planos em cache, de `user_id` ou de todos (chamar quando uma assinatura muda)
+    Requer: Token válido + IP autorizado
+    """
+    verify_admin_access(request)
+    client_ip = get_client_ip(request)
+    
+    resolver = await get_user_plan_resolver()
+    await resolver.invalidate(user_id)
+    
+    log_action(
+        action="Invalidou Cache de Planos",
+        status="OK",
+        ip=client_ip,
+        details=f"User: {user_id}" if user_id else "Todos os usuários"
+    )
+    
+    return {
+        "success": True,
+        "message": "Cache de planos invalidado em todos os workers"
+    }
+
+
+# ============================================
+# INICIALIZAÇÃO
+# ============================================
+
+@app.on_event("startup")
+async def startup_event():
+    """
+    Evento de inicialização do servidor
+    """
+    print("🚀 Agroisync IA Admin iniciado!")
+    print(f"📁 Logs salvos em: {os.path.abspath('ia_actions.log')}")
     print(f"🔐 Token configurado: {'✅ Sim' if os.getenv('IA_SECRET_TOKEN') else '❌ Não'}")
     print(f"🌐 IPs autorizados: {os.getenv('ALLOWED_IPS', 'Nenhum')}")
     
+    # Compilar a matriz de features por plano (configuração inválida impede o boot)
+    get_plan_matrix()
+    
+    # Abrir armazenamento (e índices) de notícias, clima, idempotência, outbox do D1,
+    # webhooks, alertas de preço, planos e cotas dos usuários e atualizações ao vivo
+    await get_news_store()
+    await get_news_indexer()
+    await get_weather_service()
+    await get_idempotency_store()
+    await get_d1_outbox()
+    await get_webhook_dispatcher()
+    await get_alert_engine()
+    await get_user_plan_resolver()
+    await get_quota_meter()
+    await get_live_hub()
+    
+    # Rastreamento de memória desde o boot (opcional)
+    if os.getenv('IA_TRACEMALLOC', '').lower() in ('1', 'true', 'yes'):
+        start_tracing()
+        print(f"🧮 tracemalloc ativo (PID {os.getpid()})")
+    
     log_action(
         action="Sistema Iniciado",
         status="OK",
@@ -429,12 +2045,26 @@ async def shutdown_event():
     """
     Evento de encerramento do servidor
     """
+    await close_live_hub()
+    close_news_indexer()
+    await close_news_store()
+    await close_weather_service()
+    await close_idempotency_store()
+    await close_d1_outbox()
+    await close_webhook_dispatcher()
+    await close_alert_engine()
+    await close_user_plan_resolver()
+    await close_quota_meter()
+    close_timeseries_store()
+    close_admission()
+    
     log_action(
         action="Sistema Encerrado",
         status="OK",
         ip="system",
         details="Backend IA Admin offline"
     )
+    close_versions()
 
 
 # ============================================
@@ -459,7 +2089,8 @@ async def http_exception_handler(request: Request, exc: HTTPException):
     
     return JSONResponse(
         status_code=exc.status_code,
-        content=exc.detail if isinstance(exc.detail, dict) else {"error": str(exc.detail)}
+        content=exc.detail if isinstance(exc.detail, dict) else {"error": str(exc.detail)},
+        headers=getattr(exc, "headers", None)
     )
 
 
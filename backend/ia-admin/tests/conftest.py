@@ -0,0 +1,51 @@
+"""
+🧪 AGROISYNC IA - Configuração dos Testes
+Diretório de dados temporário e app FastAPI em processo (TestClient)
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# Antes de importar o app: os módulos leem a configuração no import
+DATA_DIR = Path(tempfile.mkdtemp(prefix='ia-admin-tests-'))
+TOKEN = 'token-de-teste'
+
+os.environ['IA_DATA_DIR'] = str(DATA_DIR)
+os.environ['IA_SECRET_TOKEN'] = TOKEN
+os.environ['ALLOWED_IPS'] = ''
+os.environ['ENVIRONMENT'] = 'development'
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils import logger  # noqa: E402
+
+logger.LOG_FILE = DATA_DIR / 'ia_actions.log'
+
+
+@pytest.fixture(scope="session")
+def app():
+    import main
+    return main.app
+
+
+@pytest.fixture(scope="session")
+def client(app):
+    from fastapi.testclient import TestClient
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def auth():
+    """Cabeçalhos de quem tem o token da IA"""
+    return {"Authorization": f"Bearer {TOKEN}"}
+
+
+@pytest.fixture
+def data_dir():
+    return DATA_DIR
@@ -0,0 +1,68 @@
+"""
+🧪 Controle de admissão: filas por faixa e autenticação antes da admissão
+"""
+
+import asyncio
+
+import pytest
+
+from utils.admission import ADMIN, INGEST, PUBLIC, AdmissionRejected, Lane, get_admission, lane_for
+
+
+def test_lane_for_routes():
+    assert lane_for("/api/update-news") == INGEST
+    assert lane_for("/api/logs/stats") == ADMIN
+    assert lane_for("/api/admin/live") == ADMIN
+    assert lane_for("/api/news/latest") == PUBLIC
+    assert lane_for("/api/health") is None and lane_for("/api/admin/admission") is None
+    assert lane_for("/docs") is None
+
+
+def test_lane_queue_full_and_timeout():
+    async def scenario():
+        lane = Lane("teste", concurrency=1, max_queue=1, queue_timeout=0.05, threads=1)
+        release = asyncio.Event()
+
+        async def hold():
+            async with lane.slot():
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        assert lane.active == 1 and lane.waiting == 1
+
+        with pytest.raises(AdmissionRejected, match="fila cheia"):
+            async with lane.slot():
+                pass
+        with pytest.raises(AdmissionRejected, match="tempo de espera"):
+            await waiter
+
+        release.set()
+        await holder
+        async with lane.slot():
+            pass
+        return lane.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["admitted"] == 2 and stats["rejected_full"] == 1 and stats["rejected_timeout"] == 1
+    assert stats["active"] == 0 and stats["waiting"] == 0
+
+
+def test_unauthenticated_admin_requests_skip_admission(client, auth, monkeypatch):
+    lane = get_admission().lanes[ADMIN]
+    admitted = lane.admitted
+    for _ in range(20):
+        assert client.get("/api/logs").status_code == 401
+    assert lane.admitted == admitted
+
+    assert client.get("/api/logs", headers=auth).status_code == 200
+    assert lane.admitted == admitted + 1
+
+    # Faixa lotada: só quem passou pela autenticação recebe 503
+    monkeypatch.setattr(lane, "_semaphore", asyncio.Semaphore(0))
+    monkeypatch.setattr(lane, "max_queue", 0)
+    assert client.get("/api/admin/live").status_code == 401
+    overloaded = client.get("/api/admin/live", headers=auth)
+    assert overloaded.status_code == 503 and overloaded.json()["lane"] == ADMIN
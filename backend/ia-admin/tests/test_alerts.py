@@ -0,0 +1,89 @@
+"""
+🧪 Alertas de preço: índice ordenado por série, disparo único e rotas
+"""
+
+import asyncio
+import uuid
+
+from utils.alerts import AlertEngine
+
+
+def _rows(*alerts):
+    return [{"id": alert_id, "product": "Soja", "market": "B3", "direction": direction,
+             "threshold": threshold, "status": "active"} for alert_id, direction, threshold in alerts]
+
+
+def test_match_visits_only_crossed_thresholds(tmp_path):
+    engine = AlertEngine(tmp_path / 'alerts.db')
+    engine._apply(_rows(("a140", "above", 140.0), ("a150", "above", 150.0), ("a160", "above", 160.0),
+                        ("b120", "below", 120.0), ("c145", "cross", 145.0)))
+
+    # 130 → 150: limiares de alta em (130, 150]
+    hits = engine.match(" soja ", "b3", 130.0, [(1.0, 150.0)])
+    assert sorted(alert_id for alert_id, _, _ in hits) == ["a140", "a150", "c145"]
+    assert hits[0][1:] == (1.0, 150.0)
+    # "cross" disparado sai também do lado de baixa
+    assert engine.match("Soja", "B3", 150.0, [(2.0, 100.0)]) == [("b120", 2.0, 100.0)]
+    assert len(engine) == 1
+
+    # Série nova (sem preço anterior) não cruza nada; o primeiro ponto vira a referência
+    assert engine.match("Soja", "B3", None, [(3.0, 100.0), (4.0, 170.0)]) == [("a160", 4.0, 170.0)]
+    assert len(engine) == 0 and engine.stats()["series"] == 0
+
+
+def test_sorted_sides_after_bulk_load(tmp_path):
+    engine = AlertEngine(tmp_path / 'alerts.db')
+    engine._apply(_rows(*((f"a{i}", "above", float(i % 97)) for i in range(500))))
+    engine._apply(_rows(("extra", "above", 50.5)))
+    side = engine._books[("soja", "b3")].above
+    assert side.thresholds == sorted(side.thresholds) and len(side) == 501
+
+    engine._apply([{**_rows(("extra", "above", 50.5))[0], "status": "cancelled"}])
+    assert "extra" not in side.ids
+    hits = engine.match("Soja", "B3", 10.0, [(1.0, 11.0)])
+    assert len(hits) == sum(1 for i in range(500) if 10 < i % 97 <= 11)
+
+
+def test_trigger_is_recorded_once_across_workers(tmp_path):
+    async def scenario():
+        first, second = AlertEngine(tmp_path / 'alerts.db'), AlertEngine(tmp_path / 'alerts.db')
+        await first.open()
+        await second.open()
+        try:
+            alert = await first.create("u1", "Milho", "B3", "above", 80.0)
+            await second.sync(force=True)
+            assert len(second) == 1
+
+            hits_first = first.match("Milho", "B3", 70.0, [(1.0, 81.0)])
+            hits_second = second.match("Milho", "B3", 70.0, [(1.0, 81.0)])
+            triggered = await first.mark_triggered(hits_first) + await second.mark_triggered(hits_second)
+            assert [row["id"] for row in triggered] == [alert["id"]]
+            assert triggered[0]["triggered_price"] == 81.0
+
+            assert not await first.cancel("u1", alert["id"])
+            assert (await first.list_alerts("u1"))[0]["status"] == "triggered"
+        finally:
+            await first.close()
+            await second.close()
+
+    asyncio.run(scenario())
+
+
+def test_alert_routes_trigger_on_cotation(client, auth):
+    product, user_id = f"Alerta-{uuid.uuid4().hex[:8]}", f"u-{uuid.uuid4().hex[:8]}"
+    assert client.post("/api/update-cotation", json={"product": product, "price": 100.0, "market": "B3"},
+                       headers=auth).status_code == 200
+
+    created = client.post("/api/alerts", json={"user_id": user_id, "product": product, "market": "B3",
+                                               "direction": "above", "threshold": 110.0}, headers=auth)
+    assert created.status_code == 200
+    alert_id = created.json()["alert"]["id"]
+    assert client.post("/api/alerts", json={"user_id": user_id, "product": product, "market": "B3",
+                                            "direction": "sideways", "threshold": 1.0},
+                       headers=auth).status_code == 400
+
+    assert client.post("/api/update-cotation", json={"product": product, "price": 112.0, "market": "B3"},
+                       headers=auth).status_code == 200
+    (alert,) = client.get("/api/alerts", params={"user_id": user_id}, headers=auth).json()["alerts"]
+    assert alert["id"] == alert_id and alert["status"] == "triggered" and alert["triggered_price"] == 112.0
+    assert client.delete(f"/api/alerts/{alert_id}", params={"user_id": user_id}, headers=auth).status_code == 404
@@ -0,0 +1,75 @@
+"""
+🧪 Análises derivadas das séries: variação, médias móveis, volatilidade e cache
+"""
+
+import math
+
+import numpy as np
+
+from utils.analytics import (
+    DAY,
+    daily_closes,
+    get_series_analytics,
+    series_analytics,
+    variations_vs_previous_close,
+)
+from utils.timeseries import TimeSeriesStore
+
+
+def _series(*days_prices):
+    ts = np.array([day * DAY + hour * 3600 for day, hour, _ in days_prices], dtype='<f8')
+    px = np.array([price for _, _, price in days_prices], dtype='<f8')
+    return ts, px
+
+
+def test_daily_closes_takes_last_price_of_each_day():
+    ts, px = _series((0, 10, 100.0), (0, 15, 102.0), (1, 9, 101.0), (3, 12, 99.0))
+    days, closes = daily_closes(ts, px)
+    assert days.tolist() == [0.0, DAY, 3 * DAY]
+    assert closes.tolist() == [102.0, 101.0, 99.0]
+
+
+def test_variations_vs_previous_close():
+    ts, px = _series((0, 10, 100.0), (0, 15, 100.0), (1, 9, 110.0), (1, 12, 90.0))
+    variations = variations_vs_previous_close(ts, px, ts[2:], px[2:])
+    assert np.allclose(variations, [10.0, -10.0])
+
+    first_day = variations_vs_previous_close(ts, px, ts[:1], px[:1])
+    assert math.isnan(first_day[0])
+
+
+def test_series_analytics_windows():
+    ts, px = _series(*[(day, 12, 100.0 + day) for day in range(40)])
+    result = series_analytics(ts, px, windows=(7, 30))
+
+    assert result["points"] == 40
+    assert result["last"] == 139.0
+    assert result["previous_close"] == 138.0
+    assert result["variation"] == round((139 / 138 - 1) * 100, 4)
+
+    week = result["windows"]["7d"]
+    assert week["days"] == 8
+    assert week["min"] == 132.0 and week["max"] == 139.0
+    assert week["sma"] == round(float(np.mean(np.arange(132, 140))), 6)
+    assert week["volatility"] > 0
+
+    assert series_analytics(ts[:0], px[:0]) == {"points": 0}
+
+
+def test_single_day_series_has_no_volatility_and_no_previous_close():
+    ts, px = _series((5, 10, 50.0), (5, 11, 50.0))
+    result = series_analytics(ts, px, windows=(7,))
+    assert result["previous_close"] is None and result["variation"] is None
+    assert result["windows"]["7d"]["volatility"] is None  # um único dia: sem retornos
+
+
+def test_cached_analytics_refresh_when_series_grows(tmp_path):
+    series = TimeSeriesStore(tmp_path).get("Trigo", "B3", create=True)
+    series.append_many([(DAY + 10, 80.0)])
+    assert get_series_analytics(series)["last"] == 80.0
+
+    series.append_many([(2 * DAY + 10, 88.0)])
+    analytics = get_series_analytics(series)
+    assert analytics["points"] == 2
+    assert analytics["variation"] == 10.0
+    assert analytics["product"] == "Trigo"
@@ -0,0 +1,77 @@
+"""
+🧪 Benchmark de carga: percentis, comparação e dados do modo em processo
+"""
+
+import asyncio
+
+from benchmarks import load
+from benchmarks.common import SAMPLE_LINE, compare_results, percentile, summarize_latencies
+from benchmarks.replay import parse_log_line
+from utils import logger
+from utils.user_plans import SQLiteUserPlanSource, plan_from_row
+
+
+def test_percentile_nearest_rank():
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile(values, 100) == 100.0
+    assert percentile([], 50) == 0.0
+
+
+def test_summarize_latencies():
+    summary = summarize_latencies([0.001] * 98 + [0.5, 1.0], elapsed=2.0, errors=1)
+    assert summary["requests"] == 100
+    assert summary["rps"] == 50.0
+    assert summary["p50_ms"] == 1.0
+    assert summary["p99_ms"] == 500.0
+    assert summary["max_ms"] == 1000.0
+    assert summary["error_rate"] == 0.01
+
+
+def test_compare_results_flags_regressions():
+    baseline = {"results": {"a@c1": {"p99_ms": 10.0, "rps": 100}, "b@c1": {"p99_ms": 10.0}}}
+    current = {"results": {"a@c1": {"p99_ms": 12.0, "rps": 95}, "b@c1": {"p99_ms": 10.5}, "c@c1": {"p99_ms": 1}}}
+
+    rows = {row["case"]: row for row in compare_results(baseline, current, "p99_ms", threshold=0.1)}
+    assert set(rows) == {"a@c1", "b@c1"}
+    assert rows["a@c1"]["regression"] and not rows["b@c1"]["regression"]
+
+    rows = compare_results(baseline, current, "rps", threshold=0.1, higher_is_better=True)
+    assert [row["regression"] for row in rows] == [False]
+
+
+def test_inprocess_data_dir_is_created_once(monkeypatch):
+    monkeypatch.setattr(load, "_workdir", None)
+    monkeypatch.delenv("IA_DATA_DIR")
+
+    first = load.bench_workdir()
+    assert load.bench_workdir() == first
+    assert load.os.environ["IA_DATA_DIR"] == str(first)
+
+
+def test_prefilled_log_uses_real_format(monkeypatch, tmp_path):
+    monkeypatch.setattr(load, "_workdir", tmp_path)
+    monkeypatch.setattr(logger, "LOG_FILE", logger.LOG_FILE)
+    monkeypatch.delenv("USER_PLANS_DB_PATH", raising=False)
+
+    load.make_inprocess_client(log_lines=50)
+    lines = logger.get_logs_from_file(100)
+    assert len(lines) == 50
+    entry = parse_log_line(lines[0])
+    assert entry is not None
+    assert entry["status"] == "OK"
+    assert entry["details"] == "Preço: BRL 145.5, Mercado: B3"
+    assert parse_log_line(SAMPLE_LINE) == entry
+
+
+def test_inprocess_users_replica_has_plans(tmp_path):
+    async def scenario():
+        source = SQLiteUserPlanSource(load.seed_user_plans(tmp_path / 'agroisync.db', count=3))
+        await source.open()
+        try:
+            return {user_id: plan_from_row(row) for user_id, row in (await source.fetch(["user-0", "user-1"])).items()}
+        finally:
+            await source.close()
+
+    assert asyncio.run(scenario()) == {"user-0": "gratuito", "user-1": "pro"}
@@ -0,0 +1,72 @@
+"""
+🧪 Limite de tamanho do corpo: Content-Length declarado e corpo em streaming
+"""
+
+import asyncio
+import json
+
+import httpx
+from fastapi import FastAPI, Request
+
+from utils.body_limits import BODY_LIMIT_BULK, BODY_LIMIT_DEFAULT, BodyLimitMiddleware, BodyLimitStats, limit_for
+
+
+def test_limit_for_rules():
+    assert limit_for("/api/update-cotation") == ("/api/update-cotation", 16 * 1024)
+    assert limit_for("/api/update-news/bulk") == ("bulk", BODY_LIMIT_BULK)
+    assert limit_for("/api/outra") == ("default", BODY_LIMIT_DEFAULT)
+
+
+def _app(reads):
+    app = FastAPI()
+
+    @app.post("/api/update-cotation")
+    async def echo(request: Request):
+        reads.append(True)
+        return {"size": len(await request.body())}
+
+    stats = BodyLimitStats()
+    return BodyLimitMiddleware(app, stats), stats
+
+
+def _post(app, **kwargs):
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://teste") as client:
+            return await client.post("/api/update-cotation", **kwargs)
+
+    return asyncio.run(scenario())
+
+
+def test_declared_length_rejected_before_route():
+    reads = []
+    app, stats = _app(reads)
+    response = _post(app, content=b"x" * (16 * 1024 + 1))
+    assert response.status_code == 413 and response.json()["limit"] == 16 * 1024
+    assert reads == []
+    assert stats.rules["/api/update-cotation"] == {"content_length": 1, "stream": 0, "rejected_bytes": 16 * 1024 + 1}
+
+    assert _post(app, content=b"x" * 1024).json() == {"size": 1024}
+
+
+def test_streamed_body_is_cut_at_limit():
+    app, stats = _app([])
+
+    async def chunks():
+        for _ in range(10):
+            yield b"x" * 4096
+
+    response = _post(app, content=chunks())
+    assert response.status_code == 413
+    entry = stats.rules["/api/update-cotation"]
+    assert entry["stream"] == 1 and 16 * 1024 < entry["rejected_bytes"] < 10 * 4096
+
+
+def test_app_route_limit_and_stats(client, auth):
+    big = {"product": "Soja", "market": "B3", "price": 1.0, "currency": "x" * (20 * 1024)}
+    response = client.post("/api/update-cotation", content=json.dumps(big),
+                           headers={**auth, "Content-Type": "application/json"})
+    assert response.status_code == 413
+
+    stats = client.get("/api/admin/body-limits", headers=auth).json()["body_limits"]
+    assert stats["by_rule"]["/api/update-cotation"]["content_length"] >= 1
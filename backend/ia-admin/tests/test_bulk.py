@@ -0,0 +1,117 @@
+"""
+🧪 Ingestão em lote: parsers incrementais e rotas /bulk
+"""
+
+import asyncio
+import json
+import uuid
+
+import pytest
+from pydantic import BaseModel
+
+from utils.bulk import BulkFormatError, JSONArrayParser, NDJSONParser, ingest_stream
+
+
+class Item(BaseModel):
+    name: str
+    value: float
+
+
+def _pieces(data: bytes, size: int):
+    async def stream():
+        for start in range(0, len(data), size):
+            yield data[start:start + size]
+    return stream()
+
+
+def test_ndjson_parser_splits_across_chunks():
+    parser = NDJSONParser()
+    assert parser.feed('{"a": 1}\n{"a"') == [({"a": 1}, None)]
+    assert parser.feed(': 2}\n\n{"a": 3}') == [({"a": 2}, None)]
+    assert parser.close() == [({"a": 3}, None)]
+
+
+def test_ndjson_invalid_line_is_item_error():
+    parser = NDJSONParser()
+    (obj, error), = parser.feed("não é json\n")
+    assert obj is None and error.startswith("JSON inválido")
+    assert parser.close() == []
+
+
+def test_ndjson_line_too_long():
+    parser = NDJSONParser(max_item_bytes=10)
+    with pytest.raises(BulkFormatError):
+        parser.feed('{"a": "' + "x" * 20)
+
+
+def test_json_array_parser_incremental():
+    parser = JSONArrayParser()
+    text = json.dumps([{"a": i} for i in range(5)])
+    items = []
+    for start in range(0, len(text), 3):
+        items += parser.feed(text[start:start + 3])
+    items += parser.close()
+    assert [obj["a"] for obj, _ in items] == list(range(5))
+
+
+def test_json_array_parser_errors():
+    with pytest.raises(BulkFormatError):
+        JSONArrayParser().feed('{"a": 1}')
+    parser = JSONArrayParser()
+    parser.feed('[{"a": 1}')
+    with pytest.raises(BulkFormatError):
+        parser.close()
+
+
+def test_ingest_stream_validates_and_commits_in_chunks():
+    committed = []
+
+    async def commit(items):
+        committed.append([item.name for item in items])
+        return [{"name": item.name} for item in items]
+
+    body = b"\n".join([
+        b'{"name": "a", "value": 1}',
+        b'{"name": "b", "value": "x"}',
+        b'[1, 2]',
+        b'{"name": "c", "value": 3}',
+        b'{"name": "d", "value": 4}',
+    ])
+    outcome = asyncio.run(ingest_stream(_pieces(body, 7), Item, commit, chunk_size=2))
+
+    assert committed == [["a", "c"], ["d"]]
+    assert outcome["summary"]["received"] == 5
+    assert outcome["summary"]["accepted"] == 3
+    assert outcome["summary"]["rejected"] == 2
+    assert [result["status"] for result in outcome["results"]] == ["ok", "error", "error", "ok", "ok"]
+    assert outcome["format_error"] is None
+
+
+def test_ingest_stream_keeps_items_before_format_error():
+    async def commit(items):
+        return [{} for _ in items]
+
+    outcome = asyncio.run(ingest_stream(_pieces(b'[{"name": "a", "value": 1} {"name": "b"}]', 5), Item, commit))
+    assert outcome["summary"]["accepted"] == 1
+    assert outcome["format_error"]
+
+
+def test_bulk_cotation_route(client, auth):
+    product = f"Bulk-{uuid.uuid4().hex[:8]}"
+    body = "\n".join([
+        json.dumps({"product": product, "price": 10 + i, "market": "B3"}) for i in range(3)
+    ] + ['{"product": "x", "price": "caro", "market": "B3"}'])
+
+    response = client.post("/api/update-cotation/bulk", content=body, headers=auth)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["summary"]["accepted"] == 3
+    assert data["summary"]["rejected"] == 1
+    assert data["success"] is False
+
+    series = client.get("/api/cotations/series").json()["series"]
+    assert any(meta["product"] == product and meta["points"] == 3 for meta in series)
+
+
+def test_bulk_routes_require_token(client):
+    assert client.post("/api/update-news/bulk", content=b"[]").status_code == 401
@@ -0,0 +1,39 @@
+"""
+🧪 Compressão: negociação, cache por ETag e logs comprimidos
+"""
+
+import gzip
+
+from utils import compression
+from utils.logger import log_action
+
+
+def test_choose_encoding_respects_q_values():
+    assert compression.choose_encoding("gzip, br;q=0.5", ["br", "gzip"]) == "gzip"
+    assert compression.choose_encoding("br;q=0.9, gzip;q=0.1", ["br", "gzip"]) == "br"
+    assert compression.choose_encoding("identity", ["gzip"]) is None
+    assert compression.choose_encoding("*;q=0.3", ["gzip"]) == "gzip"
+
+
+def test_compressed_logs_are_not_stale(client, auth, monkeypatch):
+    monkeypatch.setattr(compression, "COMPRESSION_OFFLOAD_BYTES", 1 << 30)
+    headers = {**auth, "Accept-Encoding": "gzip"}
+    params = {"source": "file", "limit": 200}
+
+    for i in range(20):  # corpo acima do tamanho mínimo de compressão
+        log_action(f"Teste {i}", "OK", "127.0.0.1", "x" * 80)
+    first = client.get("/api/logs", params=params, headers=headers)
+    second = client.get("/api/logs", params=params, headers=headers)
+    assert first.headers.get("content-encoding") == "gzip"
+    # ETag fraco (as consultas de auditoria não o mudam): nada é servido do cache
+    assert first.headers["ETag"] == second.headers["ETag"] and first.headers["ETag"].startswith("W/")
+    assert second.json()["logs"][-1] != first.json()["logs"][-1]
+
+
+def test_compressed_cache_is_keyed_by_etag():
+    cache = compression.CompressedCache(max_bytes=1024)
+    cache.put(("/a?", '"v1"', "gzip"), b"x" * 600)
+    cache.put(("/a?", '"v2"', "gzip"), b"y" * 600)
+    assert cache.get(("/a?", '"v1"', "gzip")) is None  # removido por LRU
+    assert cache.get(("/a?", '"v2"', "gzip")) == b"y" * 600
+    assert gzip.decompress(compression.compress(b"abc", "gzip")) == b"abc"
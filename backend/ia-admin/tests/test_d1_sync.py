@@ -0,0 +1,121 @@
+"""
+🧪 Outbox do D1: gravação na transação das notícias e envio em lotes
+"""
+
+import asyncio
+import sqlite3
+
+import httpx
+import pytest
+
+from utils import d1_local
+from utils.d1_sync import D1_MAX_PARAMS, D1Outbox, upsert_statements
+from utils.storage import SQLiteNewsStore
+
+
+def test_upsert_statements_respect_param_limit():
+    rows = [{"id": str(i), "title": f"T{i}", "content": "c"} for i in range(70)]
+    statements = upsert_statements("news", rows)
+    assert all(len(statement["params"]) <= D1_MAX_PARAMS for statement in statements)
+    assert sum(len(statement["params"]) for statement in statements) == 70 * 3
+    assert statements[0]["sql"].startswith("INSERT OR REPLACE INTO news (id, title, content) VALUES (?, ?, ?), ")
+
+
+async def _open(tmp_path):
+    store = SQLiteNewsStore(tmp_path / 'news.db')
+    await store.open()
+    outbox = D1Outbox(path=tmp_path / 'news.db', url="http://d1.local/query", enabled=True)
+    await outbox.open()
+    # Envio manual (drain_once) contra o D1 local, sem o laço em segundo plano
+    outbox._task.cancel()
+    await outbox._client.aclose()
+    outbox._client = httpx.AsyncClient(transport=httpx.ASGITransport(app=d1_local.app))
+    assert outbox.attach(store)
+    return store, outbox
+
+
+async def _close(store, outbox):
+    await outbox.close()
+    await store.close()
+
+
+def test_news_and_outbox_commit_together(tmp_path):
+    async def scenario():
+        store, outbox = await _open(tmp_path)
+        try:
+            (row,) = await store.insert_many([{"title": "Soja", "content": "Alta"}])
+            assert (await outbox.stats())["pending"] == 1
+
+            # Falha na transação (id repetido): nem notícia nem outbox
+            with pytest.raises(sqlite3.IntegrityError):
+                await store.insert_many([{"id": "novo", "title": "A", "content": "a"},
+                                         {"id": row["id"], "title": "B", "content": "b"}])
+            assert await store.get_news("novo") is None
+            assert (await outbox.stats())["pending"] == 1
+
+            assert await outbox.drain_once() == 1
+            assert (await outbox.stats())["pending"] == 0
+            replicated = d1_local._conn.execute("SELECT title FROM news WHERE id = ?", (row["id"],)).fetchone()
+            assert replicated["title"] == "Soja"
+        finally:
+            await _close(store, outbox)
+
+    asyncio.run(scenario())
+
+
+def test_other_database_falls_back_to_enqueue(tmp_path):
+    async def scenario():
+        store = SQLiteNewsStore(tmp_path / 'news.db')
+        await store.open()
+        outbox = D1Outbox(path=tmp_path / 'outbox.db', enabled=False)
+        await outbox.open()
+        try:
+            assert not outbox.attach(store)
+            outbox.enabled = True
+            assert not outbox.attach(store)
+            await outbox.enqueue("news", [{"id": "1", "title": "T", "content": "c"}])
+            assert (await outbox.stats())["pending"] == 1
+        finally:
+            await outbox.close()
+            await store.close()
+
+    asyncio.run(scenario())
+
+
+def test_failed_send_keeps_rows_and_backs_off(tmp_path, monkeypatch):
+    monkeypatch.setattr(d1_local, "D1_LOCAL_FAIL_RATE", 1.0)
+
+    async def scenario():
+        store, outbox = await _open(tmp_path)
+        try:
+            await store.insert_many([{"title": "Milho", "content": "Baixa"}])
+            assert await outbox.drain_once() == 0
+            stats = await outbox.stats()
+            assert stats["pending"] == 1 and stats["failures"] == 1
+            assert stats["retry_in"] > 0 and "503" in stats["last_error"]
+        finally:
+            await _close(store, outbox)
+
+    asyncio.run(scenario())
+
+
+def test_rejected_row_is_isolated_and_dead_lettered(tmp_path):
+    async def scenario():
+        store, outbox = await _open(tmp_path)
+        try:
+            rows = [{"id": f"lote-{i}", "title": f"T{i}", "content": "c"} for i in range(5)]
+            rows[3]["title"] = None  # NOT NULL no D1: recusada
+            await outbox._run(outbox._enqueue, "news", rows)
+
+            assert await outbox.drain_once() == 4
+            stats = await outbox.stats()
+            assert stats["pending"] == 0 and stats["dead"] == 1
+            assert stats["consecutive_failures"] == 0 and stats["retry_in"] == 0
+            assert await outbox._run(outbox._pending) == 0
+
+            ids = {row["id"] for row in d1_local._conn.execute("SELECT id FROM news WHERE id LIKE 'lote-%'")}
+            assert ids == {"lote-0", "lote-1", "lote-2", "lote-4"}
+        finally:
+            await _close(store, outbox)
+
+    asyncio.run(scenario())
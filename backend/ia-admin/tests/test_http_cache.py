@@ -0,0 +1,29 @@
+"""
+🧪 ETags dos logs (derivados do conteúdo, sem os registros das consultas)
+"""
+
+from utils import logger
+
+
+def test_unchanged_logs_answer_304(client, auth):
+    first = client.get("/api/logs", headers=auth)
+    assert first.status_code == 200
+
+    # A consulta é só auditoria: o conteúdo e o ETag não mudam
+    second = client.get("/api/logs", headers={**auth, "If-None-Match": first.headers["ETag"]})
+    assert second.status_code == 304
+
+    stats = client.get("/api/logs/stats", headers=auth)
+    again = client.get("/api/logs/stats", headers={**auth, "If-None-Match": stats.headers["ETag"]})
+    assert again.status_code == 304
+
+    exported = client.get("/api/logs", params={"source": "file"}, headers=auth)
+    assert exported.headers["ETag"].startswith("W/")
+    assert client.get("/api/logs", params={"source": "file"},
+                      headers={**auth, "If-None-Match": exported.headers["ETag"]}).status_code == 304
+
+    # Um registro novo muda o ETag
+    logger.log_action("Atualizou Clima", "OK", "1.2.3.4")
+    changed = client.get("/api/logs", headers={**auth, "If-None-Match": first.headers["ETag"]})
+    assert changed.status_code == 200 and changed.json()["logs"][-1]["action"] == "Atualizou Clima"
+    assert client.get("/api/logs/stats", headers={**auth, "If-None-Match": stats.headers["ETag"]}).status_code == 200
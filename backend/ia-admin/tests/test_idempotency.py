@@ -0,0 +1,78 @@
+"""
+🧪 Idempotência: reservas por chave/conteúdo e repetição das respostas
+"""
+
+import asyncio
+import uuid
+
+from utils.idempotency import IN_PROGRESS, MISMATCH, NEW, REPLAY, IdempotencyStore, content_hash
+
+
+def test_content_hash_is_canonical():
+    assert content_hash({"a": 1, "b": [1, 2]}) == content_hash({"b": [1, 2], "a": 1})
+    assert content_hash({"a": 1}) != content_hash({"a": 2})
+
+
+def test_reserve_complete_replay_and_release(tmp_path):
+    async def scenario():
+        store = IdempotencyStore(tmp_path / 'idempotency.db')
+        await store.open()
+        try:
+            keys = [("key:news:k1", "f1", 60)]
+            assert await store.reserve(keys) == (NEW, None)
+            assert await store.reserve(keys) == (IN_PROGRESS, None)
+
+            await store.complete(["key:news:k1"], 200, b'{"ok":true}')
+            assert await store.reserve(keys) == (REPLAY, (200, b'{"ok":true}'))
+            assert await store.reserve([("key:news:k1", "outro", 60)]) == (MISMATCH, None)
+
+            # Falha libera a chave para uma nova tentativa
+            assert await store.reserve([("key:news:k2", "f2", 60)]) == (NEW, None)
+            await store.release(["key:news:k2"])
+            assert await store.reserve([("key:news:k2", "f2", 60)]) == (NEW, None)
+
+            # Expirada: reservada de novo
+            assert await store.reserve([("key:news:k3", "f3", -1)]) == (NEW, None)
+            assert await store.reserve([("key:news:k3", "f3", 60)]) == (NEW, None)
+        finally:
+            await store.close()
+
+    asyncio.run(scenario())
+
+
+def test_update_routes_replay_by_key_and_content(client, auth):
+    cotation = {"product": f"Idem-{uuid.uuid4().hex[:8]}", "price": 10.0, "market": "B3"}
+    headers = {**auth, "Idempotency-Key": str(uuid.uuid4())}
+
+    first = client.post("/api/update-cotation", json=cotation, headers=headers)
+    assert first.status_code == 200 and "Idempotent-Replayed" not in first.headers
+
+    again = client.post("/api/update-cotation", json=cotation, headers=headers)
+    assert again.headers["Idempotent-Replayed"] == "true"
+    assert again.json() == first.json()
+
+    changed = client.post("/api/update-cotation", json={**cotation, "price": 11.0}, headers=headers)
+    assert changed.status_code == 422
+
+    series = client.get("/api/cotations/series").json()["series"]
+    assert [meta["points"] for meta in series if meta["product"] == cotation["product"]] == [1]
+
+    # Com o horário da leitura, o mesmo conteúdo sem chave é um reenvio
+    stamped = {**cotation, "product": f"Idem-{uuid.uuid4().hex[:8]}", "timestamp": "2026-10-19T12:00:00+00:00"}
+    first = client.post("/api/update-cotation", json=stamped, headers=auth)
+    assert first.status_code == 200 and "Idempotent-Replayed" not in first.headers
+    assert client.post("/api/update-cotation", json=stamped, headers=auth).headers["Idempotent-Replayed"] == "true"
+
+
+def test_repeated_tick_without_key_is_a_new_point(client, auth):
+    cotation = {"product": f"Tick-{uuid.uuid4().hex[:8]}", "price": 10.0, "market": "B3"}
+    for _ in range(2):
+        response = client.post("/api/update-cotation", json=cotation, headers=auth)
+        assert response.status_code == 200 and "Idempotent-Replayed" not in response.headers
+
+    series = client.get("/api/cotations/series").json()["series"]
+    assert [meta["points"] for meta in series if meta["product"] == cotation["product"]] == [2]
+
+    news = {"title": f"Notícia {uuid.uuid4().hex[:8]}", "content": "..."}
+    assert "Idempotent-Replayed" not in client.post("/api/update-news", json=news, headers=auth).headers
+    assert client.post("/api/update-news", json=news, headers=auth).headers["Idempotent-Replayed"] == "true"
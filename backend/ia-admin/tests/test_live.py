@@ -0,0 +1,54 @@
+"""
+🧪 Transmissão ao vivo das cotações: plano da série e agrupamento por série
+"""
+
+import asyncio
+import json
+import uuid
+
+from utils.live import LiveHub
+from utils.timeseries import get_timeseries_store, series_plan_level
+
+
+class _Socket:
+    def __init__(self):
+        self.sent = []
+
+    async def send_text(self, text):
+        self.sent.append(json.loads(text))
+
+
+def test_series_plan_level_mapping():
+    assert [series_plan_level(level) for level in range(6)] == [
+        "publico", "publico", "privado", "loja", "admin", "admin"
+    ]
+
+
+def test_poll_cotations_respects_plan_and_coalesces_per_series():
+    store = get_timeseries_store()
+    private, public = f"Live-{uuid.uuid4().hex[:8]}", f"Live-{uuid.uuid4().hex[:8]}"
+
+    async def scenario():
+        hub = LiveHub()
+        hub._cotation_points = {}
+        anonymous = hub.connect(_Socket(), lambda level: level == "publico")
+        subscriber = hub.connect(_Socket(), lambda level: level in ("publico", "privado"))
+        for client in (anonymous, subscriber):
+            hub.subscribe(client, ["cotation:*"])
+
+        store.append(private, "B3", 10.0, level=2)
+        store.append(public, "B3", 20.0, level=1)
+        hub._poll_cotations()
+        # Nova cotação antes do envio: substitui só a pendência da mesma série
+        store.append(private, "B3", 11.0, level=2)
+        hub._poll_cotations()
+        await asyncio.sleep(0)
+        return anonymous.websocket.sent, subscriber.websocket.sent, hub.coalesced
+
+    anonymous, subscriber, coalesced = asyncio.run(scenario())
+    # Outras séries do diretório de teste também podem ser transmitidas
+    mine = (private, public)
+    assert [m["data"]["product"] for m in anonymous if m["data"]["product"] in mine] == [public]
+    prices = {m["data"]["product"]: m["data"]["price"] for m in subscriber if m["data"]["product"] in mine}
+    assert prices == {private: 11.0, public: 20.0}
+    assert coalesced == 1
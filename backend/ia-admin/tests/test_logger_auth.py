@@ -0,0 +1,80 @@
+"""
+🧪 Logger (fim do arquivo, estatísticas) e autenticação por token e IP
+"""
+
+import pytest
+from fastapi import HTTPException
+
+from benchmarks.micro import loglog_slope, make_request, measure
+from utils import auth, logger
+
+
+@pytest.fixture
+def log_file(monkeypatch, tmp_path):
+    path = tmp_path / 'ia_actions.log'
+    monkeypatch.setattr(logger, "LOG_FILE", path)
+    return path
+
+
+def test_tail_matches_readlines_across_blocks(monkeypatch, log_file):
+    monkeypatch.setattr(logger, "_TAIL_BLOCK", 97)
+    lines = [f"2025-10-21 14:32:{i % 60:02d} | 10.0.0.{i % 250} | Ação {i} | OK | {'x' * (i % 37)}" for i in range(500)]
+    log_file.write_text("\n".join(lines) + "\n", encoding='utf-8')
+
+    for limit in (1, 7, 100, 499, 500, 1000):
+        assert logger.get_logs_from_file(limit) == [line.strip() for line in lines[-limit:]]
+    assert logger.get_logs_from_file(0) == []
+
+
+def test_tail_of_missing_file(log_file):
+    assert logger.get_logs_from_file(10) == []
+
+
+def test_log_action_and_stats(monkeypatch, log_file):
+    monkeypatch.setattr(logger, "_logs_memory", [])
+    logger.log_action("Teste A", "OK", "1.2.3.4", "detalhe")
+    logger.log_action("Teste B", "BLOCKED", "1.2.3.4")
+
+    assert [entry["action"] for entry in logger.get_logs(10)] == ["Teste A", "Teste B"]
+    stats = logger.get_log_stats()
+    assert stats["total"] == 2 and stats["ok"] == 1 and stats["blocked"] == 1
+    assert stats["success_rate"] == 50.0
+    assert logger.get_logs_from_file(1)[0].split(" | ")[2].strip() == "Teste B"
+
+
+def test_verify_token():
+    assert auth.verify_token(make_request({"Authorization": f"Bearer {auth.IA_SECRET_TOKEN}"}))
+    for headers in ({}, {"Authorization": "Token x"}, {"Authorization": "Bearer errado"}):
+        with pytest.raises(HTTPException) as exc:
+            auth.verify_token(make_request(headers))
+        assert exc.value.status_code == 401
+
+
+def test_verify_ip_allow_list(monkeypatch):
+    monkeypatch.setattr(auth, "ALLOWED_IPS", ["10.0.0.1", "10.0.0.2"])
+    assert auth.verify_ip(make_request({}, client_ip="10.0.0.2"))
+    assert auth.verify_ip(make_request({"CF-Connecting-IP": "10.0.0.1"}, client_ip="8.8.8.8"))
+    with pytest.raises(HTTPException) as exc:
+        auth.verify_ip(make_request({}, client_ip="8.8.8.8"))
+    assert exc.value.status_code == 403
+
+
+def test_microbenchmark_helpers():
+    assert loglog_slope([1, 10, 100], [2, 20, 200]) == 1.0
+    assert loglog_slope([1, 10, 100], [5, 5, 5]) == 0.0
+    assert loglog_slope([1], [1]) is None
+
+    result = measure(lambda: None, min_time=0.001, repeats=3)
+    assert result["loops"] >= 1 and result["median_us"] >= 0
+
+
+def test_log_marker_ignores_audit_entries(log_file):
+    memory, file = logger.log_marker(), logger.log_marker("file")
+    logger.log_action("Consultou Logs (memory)", "OK", "1.2.3.4", audit=True)
+    assert (logger.log_marker(), logger.log_marker("file")) == (memory, file)
+    assert "Consultou Logs" in logger.get_logs_from_file(1)[0]
+    assert all(entry["action"] != "Consultou Logs (memory)" for entry in logger.get_logs())
+
+    logger.log_action("Atualizou Clima", "OK", "1.2.3.4")
+    assert logger.log_marker() != memory
+    assert logger.log_marker("file") != file
@@ -0,0 +1,49 @@
+"""
+🧪 Diagnóstico de memória (tracemalloc): snapshots e diffs
+"""
+
+
+def test_memory_routes_require_token(client):
+    assert client.get("/api/admin/memory").status_code == 401
+    assert client.post("/api/admin/memory/snapshot").status_code == 401
+
+
+def test_snapshot_requires_tracing(client, auth):
+    client.post("/api/admin/memory/tracing", params={"enabled": False}, headers=auth)
+
+    response = client.post("/api/admin/memory/snapshot", headers=auth)
+    assert response.status_code == 409
+    assert response.json()["error"] == "conflict"
+
+
+def test_snapshot_and_diff(client, auth):
+    response = client.post("/api/admin/memory/tracing", params={"enabled": True}, headers=auth)
+    assert response.status_code == 200
+    assert response.json()["memory"]["tracing"] is True
+
+    try:
+        base = client.post("/api/admin/memory/snapshot", headers=auth).json()["snapshot"]
+        retained = [bytearray(1024) for _ in range(200)]
+
+        response = client.get("/api/admin/memory/diff", params={"base": base["id"], "top": 5}, headers=auth)
+        assert response.status_code == 200
+        diff = response.json()["diff"]
+        assert diff["base"]["id"] == base["id"]
+        assert diff["target"]["id"] != base["id"]
+        assert len(diff["top"]) <= 5
+
+        status = client.get("/api/admin/memory", headers=auth).json()
+        assert [s["id"] for s in status["snapshots"]][-2:] == [base["id"], diff["target"]["id"]]
+        del retained
+    finally:
+        client.post("/api/admin/memory/tracing", params={"enabled": False}, headers=auth)
+
+
+def test_diff_errors(client, auth):
+    client.post("/api/admin/memory/tracing", params={"enabled": True}, headers=auth)
+    try:
+        client.post("/api/admin/memory/snapshot", headers=auth)
+        assert client.get("/api/admin/memory/diff", params={"base": "999999"}, headers=auth).status_code == 404
+        assert client.get("/api/admin/memory/diff", params={"group_by": "x"}, headers=auth).status_code == 400
+    finally:
+        client.post("/api/admin/memory/tracing", params={"enabled": False}, headers=auth)
@@ -0,0 +1,103 @@
+"""
+🧪 Quase duplicatas: MinHash/LSH, marcação persistida e seção exclusiva de gravação
+"""
+
+import asyncio
+import sqlite3
+import uuid
+
+from utils.neardup import NearDuplicateIndex, minhash_many
+from utils.storage import SQLiteNewsStore
+
+TEXT = (
+    "A colheita de soja no Mato Grosso avançou rapidamente nesta semana com clima seco "
+    "favorecendo as máquinas em campo e produtividade acima da média histórica da região"
+)
+
+
+def test_minhash_index_finds_near_duplicates():
+    signatures, valid = minhash_many([
+        ("Safra de soja", TEXT),
+        ("Safra de soja!", TEXT + " segundo produtores"),
+        ("Café arábica", "Preços do café arábica sobem na bolsa de Nova York com geada no sul de Minas"),
+    ])
+    assert valid.all()
+    index = NearDuplicateIndex()
+    index.add("original", signatures[0])
+
+    key, similarity = index.query(signatures[1])
+    assert key == "original" and similarity >= 0.7
+    assert index.query(signatures[2]) is None
+
+
+def test_flagged_duplicate_is_hidden_from_listing(tmp_path):
+    async def scenario():
+        store = SQLiteNewsStore(tmp_path / 'news.db')
+        await store.open()
+        try:
+            (original,) = await store.insert_many([{"title": "A", "content": TEXT}])
+            await store.insert_many([{"title": "B", "content": TEXT, "near_duplicate_of": original["id"]}])
+            assert [row["title"] for row in await store.list_news()] == ["A"]
+            assert [row["near_duplicate_of"] for row in await store.list_after(0)] == [None, original["id"]]
+        finally:
+            await store.close()
+
+    asyncio.run(scenario())
+
+
+def test_old_database_gets_the_flag_column(tmp_path):
+    path = tmp_path / 'news.db'
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE news (id TEXT PRIMARY KEY, title TEXT NOT NULL, content TEXT NOT NULL, "
+                 "author TEXT, category TEXT, image_url TEXT, published INTEGER DEFAULT 1, "
+                 "plan_level TEXT DEFAULT 'publico', created_at TEXT, updated_at TEXT)")
+    conn.close()
+
+    async def scenario():
+        store = SQLiteNewsStore(path)
+        await store.open()
+        try:
+            await store.insert_many([{"title": "A", "content": TEXT, "near_duplicate_of": "x"}])
+            assert await store.list_news() == []
+        finally:
+            await store.close()
+
+    asyncio.run(scenario())
+
+
+def test_exclusive_section_serializes_writers(tmp_path):
+    async def scenario():
+        store = SQLiteNewsStore(tmp_path / 'news.db')
+        await store.open()
+        inside = []
+        try:
+            async def writer(name):
+                async with store.exclusive():
+                    inside.append(name)
+                    assert len(inside) == 1
+                    await asyncio.sleep(0.01)
+                    inside.remove(name)
+
+            await asyncio.gather(*(writer(i) for i in range(5)))
+        finally:
+            await store.close()
+
+    asyncio.run(scenario())
+
+
+def test_copy_is_flagged_and_hidden(client, auth):
+    marker = uuid.uuid4().hex
+    title = f"Colheita {marker}"
+    body = {"title": title, "content": f"{TEXT} {marker}", "category": "mercado"}
+
+    # Um espaço a mais: com o mesmo conteúdo o hash deduplicaria antes da checagem
+    responses = [client.post("/api/update-news", json={**body, "content": body["content"] + suffix},
+                             headers=auth) for suffix in ("", " ")]
+    data = [response.json()["data"] for response in responses]
+    assert "near_duplicate_of" not in data[0]
+    assert data[1]["near_duplicate_of"] == data[0]["id"]
+
+    latest = client.get("/api/news/latest").json()["news"]
+    assert [news["id"] for news in latest if news["title"] == title] == [data[0]["id"]]
+    found = client.get("/api/news/search", params={"q": marker}).json()["news"]
+    assert [news["id"] for news in found] == [data[0]["id"]]
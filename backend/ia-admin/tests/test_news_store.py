@@ -0,0 +1,93 @@
+"""
+🧪 Armazenamento de notícias (SQLite WAL com commits em grupo)
+"""
+
+import asyncio
+import uuid
+
+from utils.storage import SQLiteNewsStore, _lock_file, _unlock_file
+
+
+def _news(title: str, **extra):
+    return {"title": title, "content": f"Conteúdo de {title}", "category": "mercado", **extra}
+
+
+def test_concurrent_inserts_are_grouped_and_listed(tmp_path):
+    async def scenario():
+        store = SQLiteNewsStore(tmp_path / 'news.db', pool_size=2, batch_size=64)
+        await store.open()
+        try:
+            rows = await asyncio.gather(*(store.insert_news(_news(f"N{i}")) for i in range(50)))
+            assert len({row["id"] for row in rows}) == 50
+
+            listed = await store.list_news(limit=100)
+            assert len(listed) == 50
+            assert (await store.get_news(rows[0]["id"]))["title"] == "N0"
+            assert await store.get_news("inexistente") is None
+
+            after = await store.list_after(0, limit=10)
+            assert [row["seq"] for row in after] == list(range(1, 11))
+            assert await store.list_after(after[-1]["seq"], limit=1000) != []
+        finally:
+            await store.close()
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_exclusive_does_not_leak_the_file_lock(tmp_path):
+    async def scenario():
+        store = SQLiteNewsStore(tmp_path / 'news.db')
+        await store.open()
+        try:
+            # Outro worker segura o flock enquanto a seção exclusiva espera
+            other = _lock_file(store.path.with_suffix('.lock'))
+
+            async def section():
+                async with store.exclusive():
+                    pass
+
+            waiting = asyncio.create_task(section())
+            await asyncio.sleep(0.05)
+            waiting.cancel()
+            await asyncio.gather(waiting, return_exceptions=True)
+            _unlock_file(other)
+
+            await asyncio.wait_for(section(), timeout=5)
+        finally:
+            await store.close()
+
+    asyncio.run(scenario())
+
+
+def test_list_news_filters_by_plan_and_category(tmp_path):
+    async def scenario():
+        store = SQLiteNewsStore(tmp_path / 'news.db')
+        await store.open()
+        try:
+            await store.insert_many([
+                _news("Pública"),
+                _news("Privada", plan_level="privado"),
+                _news("Clima", category="clima"),
+                _news("Rascunho", published=False),
+            ])
+            titles = lambda rows: sorted(row["title"] for row in rows)
+            assert titles(await store.list_news()) == ["Clima", "Privada", "Pública"]
+            assert titles(await store.list_news(plan_levels=["publico"])) == ["Clima", "Pública"]
+            assert titles(await store.list_news(category="clima")) == ["Clima"]
+            assert titles(await store.list_news(plan_level="privado")) == ["Privada"]
+        finally:
+            await store.close()
+
+    asyncio.run(scenario())
+
+
+def test_update_news_persists(client, auth):
+    title = f"Notícia persistida {uuid.uuid4()}"
+    response = client.post("/api/update-news", json={
+        "title": title, "content": "Texto único " + title, "category": "testes"
+    }, headers=auth)
+    assert response.status_code == 200
+    news_id = response.json()["data"]["id"]
+
+    latest = client.get("/api/news/latest").json()
+    assert news_id in [news["id"] for news in latest["news"]]
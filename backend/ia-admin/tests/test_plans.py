@@ -0,0 +1,42 @@
+"""
+🧪 Matriz de features por plano compilada em bitmasks
+"""
+
+import json
+
+from utils import plans
+from utils.plans import DEFAULT_PLAN_FEATURES, PlanMatrix, load_plan_features
+
+
+def test_matrix_matches_plan_lists():
+    matrix = PlanMatrix(DEFAULT_PLAN_FEATURES)
+    features = {feature for listed in DEFAULT_PLAN_FEATURES.values() for feature in listed} - {"all"}
+    for plan, listed in DEFAULT_PLAN_FEATURES.items():
+        for feature in features:
+            assert matrix.has_access(plan, feature) == ("all" in listed or feature in listed)
+    assert set(matrix.features("pro")) == set(DEFAULT_PLAN_FEATURES["pro"])
+    assert len(set(matrix.bits.values())) == len(features)
+
+
+def test_unknown_plan_and_feature():
+    matrix = PlanMatrix(DEFAULT_PLAN_FEATURES)
+    # Feature fora da matriz: só planos com "all"
+    assert matrix.has_access("admin", "nova_feature")
+    assert not matrix.has_access("pro", "nova_feature")
+    assert not matrix.has_access("inexistente", "basic_search")
+    assert matrix.features("inexistente") == []
+
+
+def test_matrix_loaded_from_config(tmp_path, monkeypatch):
+    config = {"basico": ["busca"], "completo": ["busca", "relatorios"]}
+    monkeypatch.setattr(plans, "PLAN_FEATURES_JSON", json.dumps(config))
+    assert load_plan_features() == config
+
+    plans_file = tmp_path / 'plans.json'
+    plans_file.write_text(json.dumps({"unico": ["all"]}), encoding='utf-8')
+    monkeypatch.setattr(plans, "PLAN_FEATURES_JSON", "")
+    monkeypatch.setattr(plans, "PLANS_FILE", plans_file)
+    assert PlanMatrix(load_plan_features()).has_access("unico", "qualquer")
+
+    monkeypatch.setattr(plans, "PLANS_FILE", tmp_path / 'ausente.json')
+    assert load_plan_features() == DEFAULT_PLAN_FEATURES
@@ -0,0 +1,101 @@
+"""
+🧪 Cotas de uso: identidade confiável, leituras públicas e ETag de /api/plans/check
+"""
+
+import time
+import uuid
+
+import pytest
+from starlette.requests import Request
+
+import main
+from utils import auth, quotas, user_plans
+from utils.auth import authenticated_user_id, sign_user_id
+
+SECRET = "segredo-do-gateway"
+
+
+def _request(headers):
+    return Request({"type": "http", "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()]})
+
+
+@pytest.fixture
+def gateway(monkeypatch):
+    monkeypatch.setattr(auth, "GATEWAY_SECRET", SECRET)
+
+
+def _signed(user_id, timestamp=None):
+    timestamp = int(time.time()) if timestamp is None else timestamp
+    return {"X-User-Id": user_id, "X-User-Signature": sign_user_id(SECRET, timestamp, user_id)}
+
+
+def test_user_id_requires_token_or_gateway_signature(gateway, auth):
+    assert authenticated_user_id(_request({"X-User-Id": "42"})) is None
+    assert authenticated_user_id(_request({"X-User-Id": "42", **auth})) == "42"
+    assert authenticated_user_id(_request(_signed("42"))) == "42"
+
+    forged = {**_signed("42"), "X-User-Id": "43"}
+    assert authenticated_user_id(_request(forged)) is None
+    assert authenticated_user_id(_request(_signed("42", int(time.time()) - 3600))) is None
+    assert authenticated_user_id(_request({"X-User-Id": "42", "X-User-Signature": "t=x,v1=y"})) is None
+
+
+@pytest.fixture
+def user_id():
+    return f"u-{uuid.uuid4().hex[:8]}"
+
+
+@pytest.fixture(autouse=True)
+def pro_plan(client, monkeypatch):
+    # Sem réplica nos testes todos caem no plano mais baixo; as cotas medidas são as do pro
+    monkeypatch.setattr(user_plans._user_plan_resolver.source, "plan", "pro")
+
+
+def test_only_trusted_identities_are_metered(client, gateway, user_id):
+    unsigned = client.get("/api/cotations/latest", headers={"X-User-Id": user_id})
+    assert unsigned.status_code == 200 and "X-Quota-Remaining-Day" not in unsigned.headers
+
+    signed = client.get("/api/cotations/latest", headers=_signed(user_id))
+    assert signed.status_code == 200
+    remaining = int(signed.headers["X-Quota-Remaining-Day"])
+    again = client.get("/api/cotations/latest", headers=_signed(user_id))
+    assert int(again.headers["X-Quota-Remaining-Day"]) == remaining - 1
+
+
+def test_public_reads_without_api_access_are_not_denied(client, gateway, user_id, monkeypatch):
+    monkeypatch.setattr(user_plans._user_plan_resolver.source, "plan", "gratuito")
+    response = client.get("/api/cotations/latest", headers=_signed(user_id))
+    assert response.status_code == 200 and "X-Quota-Remaining-Day" not in response.headers
+
+
+def test_exhausted_quota_returns_429(client, gateway, user_id, monkeypatch):
+    monkeypatch.setattr(quotas._quota_meter, "limits", {"api_calls": {"pro": {"day": 1, "month": 10}}})
+    assert client.get("/api/cotations/latest", headers=_signed(user_id)).status_code == 200
+    blocked = client.get("/api/cotations/latest", headers=_signed(user_id))
+    assert blocked.status_code == 429 and "Retry-After" in blocked.headers
+
+
+def test_plans_check_etag_covers_whole_body(client, auth, user_id):
+    first = client.get("/api/plans/check", params={"user_id": user_id, "feature": "analytics"}, headers=auth)
+    other = client.get("/api/plans/check", params={"user_id": user_id, "feature": "store_dashboard"}, headers=auth)
+    assert first.json()["has_access"] != other.json()["has_access"]
+    assert first.headers["ETag"] != other.headers["ETag"]
+
+    cached = client.get("/api/plans/check", params={"user_id": user_id, "feature": "analytics"},
+                        headers={**auth, "If-None-Match": first.headers["ETag"]})
+    assert cached.status_code == 304
+
+
+def test_plans_check_only_for_own_user_or_admin(client, gateway, auth, user_id, monkeypatch):
+    params = {"user_id": user_id, "feature": "analytics"}
+    assert client.get("/api/plans/check", params=params).status_code == 401
+    assert client.get("/api/plans/check", params=params, headers={"X-User-Id": user_id}).status_code == 401
+    assert client.get("/api/plans/check", params=params, headers=_signed("outro")).status_code == 403
+    own = client.get("/api/plans/check", params=params, headers=_signed(user_id))
+    assert own.status_code == 200 and own.json()["plan"] == "pro"
+
+    checks = {"checks": [{"user_id": user_id, "feature": "analytics"}] * 3}
+    assert client.post("/api/plans/check/batch", json=checks, headers=_signed(user_id)).status_code == 401
+    assert client.post("/api/plans/check/batch", json=checks, headers=auth).json()["count"] == 3
+    monkeypatch.setattr(main, "PLANS_CHECK_BATCH_MAX", 2)
+    assert client.post("/api/plans/check/batch", json=checks, headers=auth).status_code == 400
@@ -0,0 +1,54 @@
+"""
+🧪 Replay de tráfego: parser do ia_actions.log e agenda de requisições
+"""
+
+from datetime import datetime
+
+from benchmarks.replay import build_schedule, parse_log_line, schedule_profile
+
+LOG = """\
+2025-10-21 17:00:00 | 177.55.23.14    | Atualizou Cotação: Soja                  | OK         | Preço: BRL 145.5, Mercado: B3
+2025-10-21 17:00:00 | 177.55.23.14    | Atualizou Notícia: Safra de Soja Recorde... | OK         | Plano: privado, Categoria: mercado
+2025-10-21 17:00:03 | 177.55.23.14    | Atualizou Clima: Sorriso - MT            | OK         | Temp: 31.5°C, Plano: publico
+2025-10-21 17:00:03 | 10.0.0.9        | Tentativa de acesso a /api/logs          | BLOCKED    | {'error': 'unauthorized'}
+2025-10-21 17:10:00 | 177.55.23.14    | Consultou Logs (file)                    | OK         | Limite: 500
+linha inválida
+2025-10-21 18:30:00 | 177.55.23.14    | Verificou Acesso: analytics              | OK         | User: 42, Plano: pro, Feature: analytics
+"""
+
+
+def test_parse_log_line():
+    entry = parse_log_line(LOG.splitlines()[0])
+    assert entry["timestamp"] == datetime(2025, 10, 21, 17, 0, 0)
+    assert entry["action"] == "Atualizou Cotação: Soja"
+    assert entry["status"] == "OK"
+    assert entry["details"] == "Preço: BRL 145.5, Mercado: B3"
+    assert parse_log_line("linha inválida") is None
+
+
+def test_build_schedule_maps_actions_and_offsets():
+    schedule = build_schedule(LOG.splitlines(), max_gap=5)
+
+    assert [request.endpoint for request in schedule] == [
+        "update-cotation", "update-news", "update-weather", "logs", "plans-check"
+    ]
+    cotation, news, weather, logs, plans = schedule
+    assert cotation.body["price"] == 145.5 and cotation.body["market"] == "B3"
+    assert news.body["plan_level"] == "privado" and news.body["category"] == "mercado"
+    assert weather.body["temperature"] == 31.5
+    assert logs.params == {"limit": 500, "source": "file"}
+    assert plans.params == {"user_id": "42", "feature": "analytics"}
+
+    # Ações do mesmo segundo espalhadas dentro dele; pausas limitadas a max_gap
+    assert [request.offset for request in schedule] == [0.0, 0.5, 3.0, 8.0, 13.0]
+
+
+def test_build_schedule_window_and_profile():
+    schedule = build_schedule(
+        LOG.splitlines(), since=datetime(2025, 10, 21, 17, 0, 1), until=datetime(2025, 10, 21, 18, 0, 0)
+    )
+    assert [request.endpoint for request in schedule] == ["update-weather", "logs"]
+
+    profile = schedule_profile(schedule)
+    assert profile["requests"] == 2
+    assert profile["mix"] == {"update-weather": 1, "logs": 1}
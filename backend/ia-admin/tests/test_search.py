@@ -0,0 +1,70 @@
+"""
+🧪 Busca de notícias: índice invertido com ranking BM25 e filtros
+"""
+
+import math
+
+from utils.search import NewsSearchIndex
+
+
+def _news(news_id, title, content, category="mercado", plan_level="publico"):
+    return {"id": news_id, "title": title, "content": content, "category": category,
+            "plan_level": plan_level, "created_at": f"2026-10-19 00:00:{news_id[-1]}"}
+
+
+def _index(*rows):
+    index = NewsSearchIndex()
+    index.add_rows(list(rows))
+    return index
+
+
+def test_bm25_matches_reference_formula():
+    index = NewsSearchIndex(k1=1.2, b=0.75, title_weight=1)
+    index.add_rows([
+        _news("n1", "soja", "soja soja milho"),
+        _news("n2", "café", "café arábica"),
+        _news("n3", "milho", "milho safrinha"),
+    ])
+    total, results = index.search("soja")
+    assert total == 1
+
+    # tf = 3 (título + 2 no conteúdo), |d| = 4, média = 10/3, df = 1, N = 3
+    idf = math.log(1 + (3 - 1 + 0.5) / (1 + 0.5))
+    norm = 1.2 * (1 - 0.75 + 0.75 * 4 / (10 / 3))
+    assert results[0]["score"] == round(idf * 3 * 2.2 / (3 + norm), 4)
+
+
+def test_ranking_accents_and_pagination():
+    index = _index(
+        _news("n1", "Café em alta", "Preço do café arábica sobe"),
+        _news("n2", "Soja", "Exportação de soja com café na pauta"),
+        _news("n3", "Milho", "Nada a ver"),
+    )
+    total, results = index.search("CAFE")
+    assert total == 2
+    assert [r["id"] for r in results] == ["n1", "n2"]
+    assert results[0]["score"] > results[1]["score"]
+
+    assert [r["id"] for r in index.search("café", limit=1, offset=1)[1]] == ["n2"]
+    assert index.search("inexistente") == (0, [])
+    assert index.search("") == (0, [])
+
+
+def test_filters_by_category_and_plan():
+    index = _index(
+        _news("n1", "Soja", "soja", category="mercado"),
+        _news("n2", "Soja", "soja", category="clima"),
+        _news("n3", "Soja", "soja", category="mercado", plan_level="privado"),
+    )
+    assert [r["id"] for r in index.search("soja", category="clima")[1]] == ["n2"]
+    assert {r["id"] for r in index.search("soja", plan_levels=["publico"])[1]} == {"n1", "n2"}
+    assert index.search("soja", category="outra") == (0, [])
+    # Empate de escore: mais nova (slot maior) primeiro
+    assert [r["id"] for r in index.search("soja", category="mercado")[1]] == ["n3", "n1"]
+
+
+def test_cache_is_dropped_when_index_grows():
+    index = _index(_news("n1", "Soja", "soja"))
+    assert index.search("soja")[0] == 1
+    index.add(_news("n2", "Soja", "soja em alta"))
+    assert index.search("soja")[0] == 2
@@ -0,0 +1,112 @@
+"""
+🧪 Séries temporais de cotações: gravação concorrente, OHLC e plano das séries
+"""
+
+import threading
+import uuid
+
+import numpy as np
+import pytest
+
+from utils.timeseries import OutOfOrderError, TimeSeriesStore
+
+
+def test_server_timestamps_never_out_of_order(tmp_path):
+    # Um store por thread: arquivos abertos separadamente, como em workers distintos
+    stores = [TimeSeriesStore(tmp_path) for _ in range(4)]
+    errors = []
+
+    def writer(store):
+        try:
+            for i in range(50):
+                store.get("Soja", "B3", create=True).append_many([(None, 100.0 + i), (None, 101.0 + i)])
+        except OutOfOrderError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer, args=(store,)) for store in stores]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    ts, _ = TimeSeriesStore(tmp_path).get("Soja", "B3").arrays()
+    assert len(ts) == 400
+    assert np.all(np.diff(ts) >= 0)
+
+
+def test_explicit_timestamps_still_rejected_out_of_order(tmp_path):
+    series = TimeSeriesStore(tmp_path).get("Milho", "B3", create=True)
+    series.append_many([(1000.0, 50.0)])
+    with pytest.raises(OutOfOrderError):
+        series.append_many([(999.0, 51.0)])
+    assert series.append_many([(None, 52.0)]) == 2
+    assert series.arrays()[0][-1] >= 1000.0
+
+
+def test_ohlc_buckets(tmp_path):
+    series = TimeSeriesStore(tmp_path).get("Café", "ICE", create=True)
+    series.append_many([(0.0, 10.0), (30.0, 12.0), (59.0, 9.0), (120.0, 20.0)])
+
+    assert series.ohlc(0, 180, 60) == [
+        {"time": 0.0, "open": 10.0, "high": 12.0, "low": 9.0, "close": 9.0, "avg": 10.333333, "count": 3},
+        {"time": 120.0, "open": 20.0, "high": 20.0, "low": 20.0, "close": 20.0, "avg": 20.0, "count": 1},
+    ]
+
+
+def test_series_level_only_increases(tmp_path):
+    store = TimeSeriesStore(tmp_path)
+    series = store.get("Boi", "B3", create=True)
+    assert series.level == 0
+    series.append_many([(None, 300.0)], level=2)
+    series.append_many([(None, 301.0)], level=1)
+    assert series.level == 2
+    assert TimeSeriesStore(tmp_path).get("Boi", "B3").level == 2
+    assert store.list_series()[0]["level"] == 2
+
+
+def test_private_cotation_hidden_from_public_routes(client, auth):
+    product = f"Privada-{uuid.uuid4().hex[:8]}"
+    response = client.post("/api/update-cotation", json={
+        "product": product, "price": 10.0, "market": "B3", "plan_level": "privado"
+    }, headers=auth)
+    assert response.status_code == 200
+
+    params = {"product": product, "market": "B3"}
+    latest = client.get("/api/cotations/latest").json()["cotations"]
+    assert product not in [c["product"] for c in latest]
+    series = client.get("/api/cotations/series").json()["series"]
+    assert product not in [meta["product"] for meta in series]
+    assert client.get("/api/cotations/history", params=params).json()["ohlc"] == []
+    assert client.get("/api/cotations/analytics", params=params).status_code == 404
+
+    private = {**params, "plan_level": "privado"}
+    assert client.get("/api/cotations/analytics", params=private).status_code == 401
+    assert client.get("/api/cotations/analytics", params=private, headers=auth).status_code == 200
+    assert client.get("/api/cotations/history", params=private, headers=auth).json()["count"] == 1
+    latest = client.get("/api/cotations/latest", params={"plan_level": "privado"}, headers=auth).json()
+    assert [c["plan_level"] for c in latest["cotations"] if c["product"] == product] == ["privado"]
+
+
+def test_private_cotation_hides_earlier_public_points(client, auth):
+    # Comportamento esperado: o nível da série só sobe, e vale para a série inteira
+    product = f"Mista-{uuid.uuid4().hex[:8]}"
+    params = {"product": product, "market": "B3"}
+    cotation = {**params, "price": 10.0}
+    assert client.post("/api/update-cotation", json=cotation, headers=auth).status_code == 200
+    assert client.get("/api/cotations/history", params=params).json()["count"] == 1
+
+    assert client.post("/api/update-cotation", json={**cotation, "plan_level": "privado"}, headers=auth).status_code == 200
+    assert client.post("/api/update-cotation", json=cotation, headers=auth).status_code == 200
+    assert client.get("/api/cotations/history", params=params).json()["ohlc"] == []
+    private = {**params, "plan_level": "privado"}
+    assert client.get("/api/cotations/history", params=private, headers=auth).json()["count"] == 1
+
+
+def test_unknown_plan_level_is_rejected(client, auth):
+    product = f"Nivel-{uuid.uuid4().hex[:8]}"
+    response = client.post("/api/update-cotation", json={
+        "product": product, "price": 10.0, "market": "B3", "plan_level": "pro"
+    }, headers=auth)
+    assert response.status_code == 422
+    assert product not in [meta["product"] for meta in client.get("/api/cotations/series").json()["series"]]
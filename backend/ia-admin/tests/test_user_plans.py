@@ -0,0 +1,153 @@
+"""
+🧪 Plano de cada usuário: réplica somente leitura, origem ausente e invalidação
+"""
+
+import asyncio
+import re
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from utils import logger, user_plans
+from utils.user_plans import (
+    SQLiteUserPlanSource, StaticUserPlanSource, UserPlanResolver, UserPlanSource, make_user_plan_source
+)
+
+SCHEMA_SQL = Path(__file__).resolve().parents[2] / 'schema.sql'
+
+
+def _users_db(path: Path) -> Path:
+    """Tabela `users` do backend/schema.sql com alguns usuários"""
+    ddl = re.search(r"CREATE TABLE IF NOT EXISTS users \(.*?\);", SCHEMA_SQL.read_text(encoding='utf-8'), re.S)
+    conn = sqlite3.connect(str(path))
+    conn.execute(ddl.group(0))
+    # Colunas que o D1 de produção já tem (backend/src/models/schema.sql)
+    conn.execute("ALTER TABLE users ADD COLUMN plan TEXT DEFAULT 'inicial'")
+    conn.execute("ALTER TABLE users ADD COLUMN plan_expires_at DATETIME")
+    conn.executemany(
+        "INSERT INTO users (id, email, password, name, role, plan, plan_expires_at, is_active) "
+        "VALUES (?, ?, 'x', 'Nome', ?, ?, ?, ?)",
+        [("u-pro", "a@x", "user", "profissional", "2999-01-01 00:00:00", 1),
+         ("u-vencido", "b@x", "user", "pro", "2000-01-01 00:00:00", 1),
+         ("u-admin", "c@x", "admin", "gratuito", None, 1),
+         ("u-inativo", "d@x", "user", "pro", None, 0)]
+    )
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_sqlite_replica_is_read_only(tmp_path):
+    async def scenario():
+        source = SQLiteUserPlanSource(_users_db(tmp_path / 'agroisync.db'))
+        resolver = UserPlanResolver(source, invalidations_path=tmp_path / 'invalidations.db')
+        await resolver.open()
+        try:
+            plans = await resolver.resolve_many(["u-pro", "u-vencido", "u-admin", "u-inativo", "u-novo"])
+            assert plans == {"u-pro": "pro", "u-vencido": "gratuito", "u-admin": "admin",
+                             "u-inativo": None, "u-novo": None}
+            with pytest.raises(sqlite3.OperationalError):
+                await source._run(source._conn.execute, "DELETE FROM users")
+        finally:
+            await resolver.close()
+
+        missing = SQLiteUserPlanSource(tmp_path / 'ausente.db')
+        with pytest.raises(sqlite3.OperationalError):
+            await missing.open()
+        await missing.close()
+        assert not (tmp_path / 'ausente.db').exists()
+
+    asyncio.run(scenario())
+
+
+def test_missing_source_falls_back_to_static_plan(tmp_path, monkeypatch, client, auth):
+    monkeypatch.setattr(user_plans, "USER_PLANS_DB_PATH", tmp_path / 'agroisync.db')
+    source = make_user_plan_source()
+    assert isinstance(source, StaticUserPlanSource) and source.plan == "gratuito"
+    assert logger.get_logs(1)[0]["action"] == "Banco de usuários não configurado"
+    monkeypatch.setenv("ENVIRONMENT", "production")
+    with pytest.raises(RuntimeError):
+        make_user_plan_source()
+    monkeypatch.setenv("ENVIRONMENT", "development")
+
+    _users_db(tmp_path / 'agroisync.db')
+    assert isinstance(make_user_plan_source(), SQLiteUserPlanSource)
+    monkeypatch.setattr(user_plans, "USER_PLANS_SOURCE", "d1")
+    monkeypatch.setattr(user_plans, "D1_API_URL", "")
+    assert isinstance(make_user_plan_source(), StaticUserPlanSource)
+
+    # Instalação nova (sem réplica): as rotas respondem com o plano mais baixo
+    response = client.get("/api/plans/check", params={"user_id": "42", "feature": "analytics"}, headers=auth)
+    assert response.status_code == 200
+    assert response.json()["plan"] == "gratuito" and not response.json()["has_access"]
+    batch = client.post("/api/plans/check/batch", json={"checks": [{"user_id": "42", "feature": "basic_search"}]},
+                        headers=auth)
+    assert batch.status_code == 200 and batch.json()["results"][0]["has_access"] is True
+
+
+class _CountingSource(UserPlanSource):
+    def __init__(self):
+        self.fetched = []
+
+    async def fetch(self, user_ids):
+        self.fetched.extend(user_ids)
+        return {user_id: {"id": user_id, "plan": "pro"} for user_id in user_ids}
+
+
+def test_invalidate_one_user_across_workers(tmp_path):
+    async def scenario():
+        path = tmp_path / 'invalidations.db'
+        first = UserPlanResolver(_CountingSource(), invalidations_path=path)
+        second = UserPlanResolver(_CountingSource(), invalidations_path=path)
+        await first.open()
+        await second.open()
+        try:
+            for resolver in (first, second):
+                await resolver.resolve_many(["u1", "u2"])
+                resolver.source.fetched.clear()
+
+            await first.invalidate("u1")
+            await second.resolve_many(["u1", "u2"])
+            assert second.source.fetched == ["u1"]
+            await first.resolve_many(["u1", "u2"])
+            assert first.source.fetched == ["u1"]
+
+            await first.invalidate()
+            await second.resolve_many(["u1", "u2"])
+            assert second.source.fetched == ["u1", "u1", "u2"]
+        finally:
+            await first.close()
+            await second.close()
+
+    asyncio.run(scenario())
+
+
+def test_invalidations_pruned_clear_everything(tmp_path, monkeypatch):
+    monkeypatch.setattr(user_plans, "PLAN_INVALIDATIONS_KEEP", 1)
+
+    async def scenario():
+        path = tmp_path / 'invalidations.db'
+        first = UserPlanResolver(_CountingSource(), invalidations_path=path)
+        second = UserPlanResolver(_CountingSource(), invalidations_path=path)
+        await first.open()
+        await second.open()
+        try:
+            await second.resolve_many(["u1", "u2", "u3"])
+            second.source.fetched.clear()
+            await first.invalidate("u1")
+            await first.invalidate("u2")
+            # A invalidação de u1 já foi apagada: o segundo worker descarta tudo
+            await second.resolve_many(["u1", "u2", "u3"])
+            assert second.source.fetched == ["u1", "u2", "u3"]
+        finally:
+            await first.close()
+            await second.close()
+
+    asyncio.run(scenario())
+
+
+def test_invalidate_route(client, auth):
+    response = client.post("/api/admin/plans/invalidate", params={"user_id": "42"}, headers=auth)
+    assert response.status_code == 200
+    assert client.post("/api/admin/plans/invalidate").status_code == 401
@@ -0,0 +1,68 @@
+"""
+🧪 Visões materializadas dos últimos itens por plan_level
+"""
+
+import asyncio
+import json
+import uuid
+
+from utils.versions import bump_version
+from utils.views import MaterializedView
+from utils.weather import get_weather_service
+
+
+def test_view_rebuilds_only_when_version_changes():
+    builds = []
+
+    async def build(plan_level):
+        builds.append(plan_level)
+        return {"plan_level": plan_level, "builds": len(builds)}
+
+    async def scenario():
+        view = MaterializedView("alerts", build)
+        results = await asyncio.gather(*(view.get("publico") for _ in range(10)))
+        assert len({body for _, body in results}) == 1
+        assert builds == ["publico"]
+
+        await view.get("privado")
+        version, body = await view.get("publico")
+        assert builds == ["publico", "privado"]
+
+        bump_version("alerts")
+        new_version, new_body = await view.get("publico")
+        assert new_version > version and json.loads(new_body)["builds"] == 3
+
+    asyncio.run(scenario())
+
+
+def test_latest_news_partitions_and_etag(client, auth):
+    title = f"Privada {uuid.uuid4()}"
+    assert client.post("/api/update-news", json={
+        "title": title, "content": "Conteúdo " + title, "category": "mercado", "plan_level": "privado"
+    }, headers=auth).status_code == 200
+
+    public = client.get("/api/news/latest")
+    assert public.status_code == 200
+    assert title not in [news["title"] for news in public.json()["news"]]
+
+    private = client.get("/api/news/latest", params={"plan_level": "privado"}, headers=auth)
+    assert title in [news["title"] for news in private.json()["news"]]
+    assert private.headers["ETag"] != public.headers["ETag"]
+
+    cached = client.get("/api/news/latest", headers={"If-None-Match": public.headers["ETag"]})
+    assert cached.status_code == 304
+
+    assert client.get("/api/news/latest", params={"plan_level": "privado"}).status_code == 401
+    assert client.get("/api/news/latest", params={"plan_level": "vip"}).status_code == 400
+
+
+def test_latest_weather_hides_unknown_plan_level(client, auth):
+    async def ingest():
+        service = await get_weather_service()
+        await service.ingest([{"location": "Legada Última - RR", "temperature": 50.0, "humidity": 1.0,
+                               "description": "Legada", "plan_level": "xx"}])
+
+    client.portal.call(ingest)
+    for params, headers in (({}, {}), ({"plan_level": "admin"}, auth)):
+        weather = client.get("/api/weather/latest", params=params, headers=headers).json()["weather"]
+        assert "Legada Última - RR" not in [r["location"] for r in weather]
@@ -0,0 +1,154 @@
+"""
+🧪 Clima: índice espacial (grade lat/lon), retenção e médias por UF
+"""
+
+import asyncio
+import random
+import time
+
+from utils import weather
+from utils.weather import RegionalRollups, SpatialIndex, WeatherService, get_weather_service, haversine_km
+
+
+def test_nearest_and_within_match_brute_force():
+    rng = random.Random(7)
+    index = SpatialIndex(cell_deg=0.5)
+    points = {f"p{i}": (rng.uniform(-34, 5), rng.uniform(-74, -34)) for i in range(500)}
+    for key, (lat, lon) in points.items():
+        index.upsert(key, lat, lon, {"key": key})
+
+    lat, lon = -12.54, -55.72
+    by_distance = sorted(points, key=lambda key: haversine_km(lat, lon, *points[key]))
+    assert [entry.key for _, entry in index.nearest(lat, lon, 10)] == by_distance[:10]
+
+    inside = [key for key in by_distance if haversine_km(lat, lon, *points[key]) <= 300]
+    assert [entry.key for _, entry in index.within(lat, lon, 300, limit=1000)] == inside
+
+
+def test_upsert_moves_entry_between_cells():
+    index = SpatialIndex(cell_deg=1.0)
+    index.upsert("a", 0.5, 0.5, {})
+    index.upsert("a", 10.5, 10.5, {})
+    assert len(index) == 1
+    assert index.within(0.5, 0.5, 50) == []
+    index.remove("a")
+    assert index.nearest(10.5, 10.5) == []
+
+
+def test_retention_prunes_latest_and_grid(monkeypatch, tmp_path):
+    monkeypatch.setattr(weather, "WEATHER_RETENTION_DAYS", 1)
+
+    async def scenario():
+        service = WeatherService(tmp_path / 'weather.db')
+        await service.open()
+        try:
+            now = time.time()
+            await service.ingest([
+                {"location": "Antiga - MT", "temperature": 30, "humidity": 50,
+                 "latitude": -12.5, "longitude": -55.7, "recorded_at": now - 2 * 86400},
+                {"location": "Nova - MT", "temperature": 31, "humidity": 55,
+                 "latitude": -12.6, "longitude": -55.8, "recorded_at": now},
+            ])
+            assert len(service.latest) == 2 and len(service.index) == 2
+
+            await service._prune()
+            assert [r["location"] for r in service.latest.values()] == ["Nova - MT"]
+            assert [r["location"] for r in await service.nearest(-12.5, -55.7, 5)] == ["Nova - MT"]
+            assert service._conn.execute("SELECT COUNT(*) FROM weather_readings").fetchone()[0] == 1
+        finally:
+            await service.close()
+
+    asyncio.run(scenario())
+
+
+def _reading(uf, temperature, humidity, at, plan_level="publico", location="A"):
+    return {"uf": uf, "temperature": temperature, "humidity": humidity, "recorded_at": at,
+            "plan_level": plan_level, "location_key": f"{location}|{uf}"}
+
+
+def test_rollups_decay_older_readings():
+    rollups = RegionalRollups(half_life_hours=1)
+    rollups.add(_reading("MT", 20.0, 40.0, 0.0))
+    rollups.add(_reading("MT", 30.0, 60.0, 3600.0, location="B"))
+
+    (mt,) = rollups.snapshot()
+    # A leitura de uma hora antes pesa metade: (0.5·20 + 30) / 1.5
+    assert mt["temperature"] == round(40 / 1.5, 2)
+    assert mt["humidity"] == round(80 / 1.5, 2)
+    assert mt["weight"] == 1.5
+    assert mt["readings"] == 2 and mt["locations"] == 2
+    assert mt["last_reading_at"] == 3600.0
+
+    # Leitura atrasada entra já decaída, com o mesmo resultado da ordem natural
+    reordered = RegionalRollups(half_life_hours=1)
+    reordered.add(_reading("MT", 30.0, 60.0, 3600.0, location="B"))
+    reordered.add(_reading("MT", 20.0, 40.0, 0.0))
+    assert reordered.snapshot() == rollups.snapshot()
+
+
+def test_rollups_average_per_station_then_prune():
+    rollups = RegionalRollups(half_life_hours=1)
+    for _ in range(10):
+        rollups.add(_reading("GO", 20.0, 40.0, 3600.0))
+    rollups.add(_reading("GO", 30.0, 60.0, 3600.0, location="B"))
+    rollups.add(_reading("GO", 26.0, 50.0, 0.0, location="C"))
+
+    # Cada estação pesa pelo tempo desde a sua última leitura, não pelo número de leituras
+    (go,) = rollups.snapshot()
+    assert go["temperature"] == round((20 + 30 + 0.5 * 26) / 2.5, 2)
+    assert go["readings"] == 12 and go["locations"] == 3
+
+    assert rollups.prune(1800.0) == 1
+    (go,) = rollups.snapshot()
+    assert go["temperature"] == 25.0 and go["locations"] == 2
+    assert rollups.prune(7200.0) == 2 and rollups.snapshot() == []
+
+
+def test_rollups_filter_by_plan_and_skip_readings_without_uf():
+    rollups = RegionalRollups()
+    rollups.add(_reading("SP", 25.0, 70.0, 100.0))
+    rollups.add(_reading("SP", 35.0, 70.0, 100.0, plan_level="privado"))
+    rollups.add(_reading(None, 99.0, 99.0, 100.0))
+
+    assert [r["uf"] for r in rollups.snapshot()] == ["SP"]
+    assert rollups.snapshot(lambda plan: plan == "publico")[0]["temperature"] == 25.0
+    assert rollups.snapshot()[0]["temperature"] == 30.0
+
+
+def test_weather_regions_route(client, auth):
+    response = client.post("/api/update-weather", json={
+        "location": "Rondonópolis - MT", "temperature": 33.0, "humidity": 45.0, "description": "Sol"
+    }, headers=auth)
+    assert response.status_code == 200
+
+    regions = client.get("/api/weather/regions", params={"uf": "mt"})
+    assert regions.status_code == 200
+    assert regions.json()["regions"][0]["uf"] == "MT"
+    assert client.get("/api/weather/regions", params={"uf": "ZZ"}).status_code == 404
+    assert client.get("/api/weather/regions", params={"plan_level": "privado"}).status_code == 401
+
+
+def _ingest_unknown_plan(client, location):
+    """Leitura legada com plan_level fora de PLAN_LEVELS (a API recusa com 422)"""
+    async def ingest():
+        service = await get_weather_service()
+        await service.ingest([{"location": location, "temperature": 50.0, "humidity": 1.0,
+                               "description": "Legada", "plan_level": "xx",
+                               "latitude": -9.0, "longitude": -51.0}])
+
+    client.portal.call(ingest)
+
+
+def test_unknown_plan_level_is_hidden_from_nearby_reads(client, auth):
+    _ingest_unknown_plan(client, "Legada Próxima - PA")
+    for params, headers in (({}, {}), ({"plan_level": "admin"}, auth)):
+        readings = client.get("/api/weather/nearest", params={"lat": -9.0, "lon": -51.0, "n": 100, **params},
+                              headers=headers).json()["readings"]
+        assert "Legada Próxima - PA" not in [r["location"] for r in readings]
+
+
+def test_unknown_plan_level_is_left_out_of_regions(client, auth):
+    _ingest_unknown_plan(client, "Legada Regional - AP")
+    assert client.get("/api/weather/regions", params={"uf": "AP"}).status_code == 404
+    admin = client.get("/api/weather/regions", params={"uf": "AP", "plan_level": "admin"}, headers=auth)
+    assert admin.status_code == 404
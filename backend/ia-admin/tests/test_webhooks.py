@@ -0,0 +1,109 @@
+"""
+🧪 Webhooks: assinatura, filtro de eventos, novas tentativas e dead letter
+"""
+
+import asyncio
+import hashlib
+import hmac
+import json
+
+import httpx
+
+from utils import webhooks
+from utils.webhooks import SIGNATURE_HEADER, WebhookDispatcher, WebhookTarget, sign
+
+
+def test_sign_matches_receiver_check():
+    body = b'{"id":"1"}'
+    header = sign("segredo", 1700000000, body)
+    timestamp, digest = (part.split("=", 1)[1] for part in header.split(","))
+    expected = hmac.new(b"segredo", f"{timestamp}.".encode() + body, hashlib.sha256).hexdigest()
+    assert digest == expected
+
+
+def test_target_event_filter():
+    assert WebhookTarget("http://a").wants("news.created")
+    target = WebhookTarget("http://a", events=["news", "alert.triggered"])
+    assert target.wants("news.created") and target.wants("alert.triggered")
+    assert not target.wants("cotation.updated")
+
+
+class _Receiver:
+    """Destino ASGI que responde com os status de `statuses` (depois 200)"""
+
+    def __init__(self, *statuses):
+        self.statuses = list(statuses)
+        self.requests = []
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        status = self.statuses.pop(0) if self.statuses else 200
+        return httpx.Response(status)
+
+
+async def _dispatcher(tmp_path, receiver, *targets):
+    dispatcher = WebhookDispatcher(list(targets), path=tmp_path / 'webhooks.db')
+    await dispatcher.open()
+    await dispatcher._client.aclose()
+    dispatcher._client = httpx.AsyncClient(transport=httpx.MockTransport(receiver.handler))
+    return dispatcher
+
+
+def test_delivery_is_signed_and_retried(tmp_path, monkeypatch):
+    monkeypatch.setattr(webhooks, "WEBHOOK_RETRY_BASE", 0.001)
+    receiver = _Receiver(503, 500)
+
+    async def scenario():
+        target = WebhookTarget("http://destino/hook", secret="segredo", concurrency=1)
+        dispatcher = await _dispatcher(tmp_path, receiver, target)
+        try:
+            event_id = dispatcher.publish("news.created", {"count": 1})
+            await asyncio.wait_for(target.queue.join(), timeout=5)
+        finally:
+            await dispatcher.close()
+        return target, event_id
+
+    target, event_id = asyncio.run(scenario())
+    assert target.delivered == 1 and target.retries == 2
+    last = receiver.requests[-1]
+    assert last.headers["X-Agroisync-Attempt"] == "3"
+    assert last.headers["X-Agroisync-Delivery"] == event_id
+    timestamp = int(last.headers[SIGNATURE_HEADER].split(",")[0][2:])
+    assert last.headers[SIGNATURE_HEADER] == sign("segredo", timestamp, last.content)
+    assert json.loads(last.content)["type"] == "news.created"
+
+
+def test_client_error_goes_to_dead_letter_and_replays(tmp_path):
+    receiver = _Receiver(400)
+
+    async def scenario():
+        target = WebhookTarget("http://destino/hook", concurrency=1)
+        dispatcher = await _dispatcher(tmp_path, receiver, target)
+        try:
+            dispatcher.publish("cotation.updated", {"count": 1})
+            await asyncio.wait_for(target.queue.join(), timeout=5)
+            await dispatcher._run(lambda: None)  # espera a gravação da dead letter
+
+            (dead,) = await dispatcher.list_dead()
+            assert dead["error"] == "HTTP 400" and dead["attempts"] == 1
+
+            assert await dispatcher.replay_dead() == {"requeued": 1, "skipped": 0}
+            await asyncio.wait_for(target.queue.join(), timeout=5)
+            assert await dispatcher.list_dead() == []
+            assert target.delivered == 1
+        finally:
+            await dispatcher.close()
+
+    asyncio.run(scenario())
+
+
+def test_unsubscribed_event_is_not_published(tmp_path):
+    async def scenario():
+        dispatcher = await _dispatcher(tmp_path, _Receiver(), WebhookTarget("http://a", events=["news"]))
+        try:
+            assert dispatcher.publish("weather.updated", {}) is None
+            assert dispatcher.published == 0
+        finally:
+            await dispatcher.close()
+
+    asyncio.run(scenario())
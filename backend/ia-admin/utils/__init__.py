@@ -2,18 +2,111 @@
 Utils package for Agroisync IA Admin
 """
 
-from .auth import verify_token, verify_ip, get_client_ip, verify_admin_access
-from .logger import log_action, get_logs, get_logs_from_file, get_log_stats, clear_logs
+from .auth import (
+    verify_token, verify_ip, get_client_ip, verify_admin_access, authenticated_user_id, sign_user_id,
+    verify_user_or_admin
+)
+from .logger import log_action, get_logs, get_logs_from_file, get_log_stats, clear_logs, log_marker
+from .storage import NewsStore, SQLiteNewsStore, get_news_store, close_news_store
+from .neardup import NearDuplicateIndex, minhash
+from .search import NewsSearchIndex
+from .news_index import NewsIndexer, get_news_indexer, close_news_indexer
+from .weather import SpatialIndex, RegionalRollups, WeatherService, get_weather_service, close_weather_service
+from .versions import get_version, bump_version, close_versions
+from .views import MaterializedView
+from .compression import CompressionMiddleware, CompressedCache
+from .body_limits import BodyLimitMiddleware, PayloadTooLarge
+from .live import LiveHub, get_live_hub, close_live_hub
+from .webhooks import WebhookDispatcher, get_webhook_dispatcher, close_webhook_dispatcher
+from .plans import PlanMatrix, get_plan_matrix
+from .user_plans import UserPlanResolver, get_user_plan_resolver, close_user_plan_resolver
+from .quotas import QuotaMeter, get_quota_meter, close_quota_meter
+from .admission import AdmissionController, get_admission, close_admission
+from .alerts import AlertEngine, get_alert_engine, close_alert_engine
+from .d1_sync import D1Outbox, OutboxFullError, get_d1_outbox, close_d1_outbox
+from .idempotency import IdempotencyStore, get_idempotency_store, close_idempotency_store
+from .timeseries import TimeSeriesStore, PriceSeries, get_timeseries_store, close_timeseries_store
+from .analytics import series_analytics, get_series_analytics, recompute_all
+from .memory import (
+    start_tracing, stop_tracing, take_snapshot, list_snapshots, diff_snapshots, get_memory_status
+)
 
 __all__ = [
     'verify_token',
     'verify_ip',
     'get_client_ip',
     'verify_admin_access',
+    'authenticated_user_id',
+    'sign_user_id',
+    'verify_user_or_admin',
     'log_action',
     'get_logs',
     'get_logs_from_file',
     'get_log_stats',
-    'clear_logs'
+    'clear_logs',
+    'log_marker',
+    'NewsStore',
+    'SQLiteNewsStore',
+    'get_news_store',
+    'close_news_store',
+    'NearDuplicateIndex',
+    'minhash',
+    'NewsSearchIndex',
+    'NewsIndexer',
+    'get_news_indexer',
+    'close_news_indexer',
+    'SpatialIndex',
+    'RegionalRollups',
+    'WeatherService',
+    'get_weather_service',
+    'close_weather_service',
+    'get_version',
+    'bump_version',
+    'close_versions',
+    'MaterializedView',
+    'CompressionMiddleware',
+    'CompressedCache',
+    'BodyLimitMiddleware',
+    'PayloadTooLarge',
+    'LiveHub',
+    'get_live_hub',
+    'close_live_hub',
+    'WebhookDispatcher',
+    'get_webhook_dispatcher',
+    'close_webhook_dispatcher',
+    'PlanMatrix',
+    'get_plan_matrix',
+    'UserPlanResolver',
+    'get_user_plan_resolver',
+    'close_user_plan_resolver',
+    'QuotaMeter',
+    'get_quota_meter',
+    'close_quota_meter',
+    'AdmissionController',
+    'get_admission',
+    'close_admission',
+    'AlertEngine',
+    'get_alert_engine',
+    'close_alert_engine',
+    'D1Outbox',
+    'OutboxFullError',
+    'get_d1_outbox',
+    'close_d1_outbox',
+    'IdempotencyStore',
+    'get_idempotency_store',
+    'close_idempotency_store',
+    'TimeSeriesStore',
+    'PriceSeries',
+    'get_timeseries_store',
+    'close_timeseries_store',
+    'series_analytics',
+    'get_series_analytics',
+    'recompute_all',
+    'start_tracing',
+    'stop_tracing',
+    'take_snapshot',
+    'list_snapshots',
+    'diff_snapshots',
+    'get_memory_status'
 ]
 
@@ -0,0 +1,205 @@
+"""
+🚦 AGROISYNC IA - Controle de Admissão
+Faixas de concorrência separadas para ingestão, leituras de admin e
+leituras públicas: cada faixa tem seu limite de requisições simultâneas,
+fila com tempo máximo de espera e pool de threads próprio para trabalho
+bloqueante, então exportações pesadas de admin não atrasam a ingestão
+"""
+
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+# Configurações (por faixa: simultâneas, fila, espera máxima em segundos, threads)
+ADMISSION_INGEST_CONCURRENCY = int(os.getenv('ADMISSION_INGEST_CONCURRENCY', '64'))
+ADMISSION_INGEST_QUEUE = int(os.getenv('ADMISSION_INGEST_QUEUE', '1000'))
+ADMISSION_INGEST_TIMEOUT = float(os.getenv('ADMISSION_INGEST_TIMEOUT', '10'))
+ADMISSION_INGEST_THREADS = int(os.getenv('ADMISSION_INGEST_THREADS', '4'))
+
+ADMISSION_ADMIN_CONCURRENCY = int(os.getenv('ADMISSION_ADMIN_CONCURRENCY', '2'))
+ADMISSION_ADMIN_QUEUE = int(os.getenv('ADMISSION_ADMIN_QUEUE', '8'))
+ADMISSION_ADMIN_TIMEOUT = float(os.getenv('ADMISSION_ADMIN_TIMEOUT', '30'))
+ADMISSION_ADMIN_THREADS = int(os.getenv('ADMISSION_ADMIN_THREADS', '1'))
+
+ADMISSION_PUBLIC_CONCURRENCY = int(os.getenv('ADMISSION_PUBLIC_CONCURRENCY', '256'))
+ADMISSION_PUBLIC_QUEUE = int(os.getenv('ADMISSION_PUBLIC_QUEUE', '2000'))
+ADMISSION_PUBLIC_TIMEOUT = float(os.getenv('ADMISSION_PUBLIC_TIMEOUT', '2'))
+ADMISSION_PUBLIC_THREADS = int(os.getenv('ADMISSION_PUBLIC_THREADS', '4'))
+
+INGEST = "ingest"
+ADMIN = "admin"
+PUBLIC = "public"
+
+# Rotas fora do controle (health checks e o próprio diagnóstico das faixas)
+EXEMPT_PATHS = ('/api/health', '/api/status', '/api/admin/admission')
+
+
+def lane_for(path: str) -> Optional[str]:
+    """
+    Faixa da rota (None: sem controle de admissão)
+    """
+    if not path.startswith('/api/') or path in EXEMPT_PATHS:
+        return None
+    if path.startswith('/api/update-'):
+        return INGEST
+    if path.startswith(('/api/logs', '/api/admin/')):
+        return ADMIN
+    return PUBLIC
+
+
+class AdmissionRejected(Exception):
+    """Requisição recusada: fila da faixa cheia ou espera esgotada"""
+
+    def __init__(self, lane: str, reason: str, retry_after: int):
+        super().__init__(f"Faixa {lane} sobrecarregada ({reason})")
+        self.lane = lane
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Lane:
+    """
+    Semáforo de uma faixa com fila limitada e métricas de espera
+    """
+
+    def __init__(self, name: str, concurrency: int, max_queue: int, queue_timeout: float, threads: int):
+        self.name = name
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.threads = threads
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected_full = 0
+        self.rejected_timeout = 0
+        self.queued = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix=f'lane-{self.name}')
+        return self._executor
+
+    @asynccontextmanager
+    async def slot(self):
+        """
+        Ocupa uma vaga da faixa enquanto o bloco roda
+
+        Raises:
+            AdmissionRejected: se a fila está cheia ou a espera passa de queue_timeout
+        """
+        if self._semaphore.locked():
+            if self.waiting >= self.max_queue:
+                self.rejected_full += 1
+                raise AdmissionRejected(self.name, "fila cheia", max(1, int(self.queue_timeout)))
+            self.waiting += 1
+            self.queued += 1
+            started = time.monotonic()
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.rejected_timeout += 1
+                raise AdmissionRejected(self.name, "tempo de espera esgotado", max(1, int(self.queue_timeout)))
+            finally:
+                self.waiting -= 1
+            waited = time.monotonic() - started
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+        else:
+            await self._semaphore.acquire()
+
+        self.active += 1
+        self.admitted += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> Dict:
+        return {
+            "concurrency": self.concurrency,
+            "max_queue": self.max_queue,
+            "queue_timeout": self.queue_timeout,
+            "threads": self.threads,
+            "active": self.active,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected_full": self.rejected_full,
+            "rejected_timeout": self.rejected_timeout,
+            "wait_avg_ms": round(self.wait_total / self.queued * 1000, 2) if self.queued else 0.0,
+            "wait_max_ms": round(self.wait_max * 1000, 2)
+        }
+
+
+class AdmissionController:
+    """
+    Faixas ingest, admin e public de um worker
+    """
+
+    def __init__(self):
+        self.lanes: Dict[str, Lane] = {
+            INGEST: Lane(INGEST, ADMISSION_INGEST_CONCURRENCY, ADMISSION_INGEST_QUEUE,
+                         ADMISSION_INGEST_TIMEOUT, ADMISSION_INGEST_THREADS),
+            ADMIN: Lane(ADMIN, ADMISSION_ADMIN_CONCURRENCY, ADMISSION_ADMIN_QUEUE,
+                        ADMISSION_ADMIN_TIMEOUT, ADMISSION_ADMIN_THREADS),
+            PUBLIC: Lane(PUBLIC, ADMISSION_PUBLIC_CONCURRENCY, ADMISSION_PUBLIC_QUEUE,
+                         ADMISSION_PUBLIC_TIMEOUT, ADMISSION_PUBLIC_THREADS),
+        }
+
+    def slot(self, lane: str):
+        return self.lanes[lane].slot()
+
+    async def run(self, lane: str, fn, *args):
+        """
+        Executa trabalho bloqueante no pool de threads da faixa (fora do event loop)
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.lanes[lane].executor, fn, *args)
+
+    def close(self) -> None:
+        for lane in self.lanes.values():
+            lane.close()
+
+    def stats(self) -> Dict:
+        return {
+            "pid": os.getpid(),
+            "lanes": {name: lane.stats() for name, lane in self.lanes.items()}
+        }
+
+
+_admission: Optional[AdmissionController] = None
+
+
+def get_admission() -> AdmissionController:
+    """
+    Retorna o AdmissionController global (criado na primeira chamada)
+    """
+    global _admission
+    if _admission is None:
+        _admission = AdmissionController()
+    return _admission
+
+
+def close_admission() -> None:
+    """
+    Encerra os pools de threads das faixas (chamado no shutdown)
+    """
+    global _admission
+    if _admission is not None:
+        _admission.close()
+        _admission = None
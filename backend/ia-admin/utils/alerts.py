@@ -0,0 +1,485 @@
+"""
+🔔 AGROISYNC IA - Alertas de Preço
+Assinaturas "avise-me quando a soja na B3 cruzar R$ 150" guardadas em
+SQLite e indexadas em memória por série (produto, mercado), em listas
+ordenadas de limiares: cada cotação visita só os alertas cruzados
+entre o preço anterior e o novo
+"""
+
+import asyncio
+import os
+import time
+import uuid
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .storage import DATA_DIR, connect_sqlite, utc_now
+from .timeseries import series_key
+from .versions import bump_version, get_version
+
+# Configurações
+ALERTS_DB_PATH = Path(os.getenv('ALERTS_DB_PATH', DATA_DIR / 'alerts.db'))
+ALERTS_MAX_PER_USER = int(os.getenv('ALERTS_MAX_PER_USER', '100'))
+ALERTS_SYNC_INTERVAL = float(os.getenv('ALERTS_SYNC_INTERVAL', '5'))
+
+# above: preço sobe até o limiar; below: desce até ele; cross: qualquer sentido
+DIRECTIONS = ("above", "below", "cross")
+STATUSES = ("active", "triggered", "cancelled")
+
+ALERTS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS alerts (
+  id TEXT PRIMARY KEY,
+  seq INTEGER NOT NULL,
+  user_id TEXT NOT NULL,
+  product TEXT NOT NULL,
+  market TEXT NOT NULL,
+  direction TEXT NOT NULL,
+  threshold REAL NOT NULL,
+  status TEXT NOT NULL DEFAULT 'active',
+  created_at TEXT NOT NULL,
+  triggered_at TEXT,
+  triggered_price REAL
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_alerts_seq ON alerts(seq);
+CREATE INDEX IF NOT EXISTS idx_alerts_user ON alerts(user_id, status);
+"""
+
+ALERT_COLUMNS = ("id", "user_id", "product", "market", "direction", "threshold",
+                 "status", "created_at", "triggered_at", "triggered_price")
+
+_FETCH_LIMIT = 5000
+# Lotes maiores que isso (em relação ao lado) reordenam o lado inteiro em vez de insort
+_REBUILD_FRACTION = 0.1
+
+
+def _format_timestamp(timestamp: float) -> str:
+    # Mesmo formato de utc_now()
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+class _Side:
+    """
+    Limiares de um sentido de uma série, ordenados, com os ids em paralelo
+
+    Os alertas cruzados por um movimento de preço formam uma fatia
+    contígua: localizada com bisect e removida com um único `del`.
+    """
+
+    __slots__ = ("thresholds", "ids")
+
+    def __init__(self):
+        self.thresholds: List[float] = []
+        self.ids: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def add(self, threshold: float, alert_id: str) -> None:
+        position = bisect_right(self.thresholds, threshold)
+        self.thresholds.insert(position, threshold)
+        self.ids.insert(position, alert_id)
+
+    def extend(self, entries: List[Tuple[float, str]]) -> None:
+        if len(entries) < _REBUILD_FRACTION * len(self.ids):
+            for threshold, alert_id in entries:
+                self.add(threshold, alert_id)
+            return
+        merged = sorted(zip(self.thresholds + [t for t, _ in entries], self.ids + [i for _, i in entries]),
+                        key=lambda entry: entry[0])
+        self.thresholds = [t for t, _ in merged]
+        self.ids = [i for _, i in merged]
+
+    def remove(self, threshold: float, alert_id: str) -> bool:
+        position = bisect_left(self.thresholds, threshold)
+        end = bisect_right(self.thresholds, threshold, position)
+        for i in range(position, end):
+            if self.ids[i] == alert_id:
+                del self.thresholds[i]
+                del self.ids[i]
+                return True
+        return False
+
+    def take(self, low: int, high: int) -> List[str]:
+        taken = self.ids[low:high]
+        del self.thresholds[low:high]
+        del self.ids[low:high]
+        return taken
+
+
+class _Book:
+    """
+    Alertas ativos de uma série: limiares de alta e de baixa
+    """
+
+    __slots__ = ("above", "below")
+
+    def __init__(self):
+        self.above = _Side()
+        self.below = _Side()
+
+    def __len__(self) -> int:
+        return len(self.above) + len(self.below)
+
+    def crossed(self, old: float, new: float) -> List[str]:
+        """
+        Retira e retorna os alertas cruzados pelo movimento old → new
+
+        Alta: limiares em (old, new]; baixa: limiares em [new, old).
+        """
+        if new > old:
+            side = self.above
+            low = bisect_right(side.thresholds, old)
+            high = bisect_right(side.thresholds, new, low)
+        elif new < old:
+            side = self.below
+            low = bisect_left(side.thresholds, new)
+            high = bisect_left(side.thresholds, old, low)
+        else:
+            return []
+        return side.take(low, high) if high > low else []
+
+
+class AlertEngine:
+    """
+    Alertas de preço ativos indexados por série, sincronizados com o SQLite
+
+    Toda mudança na tabela (criação, disparo, cancelamento) recebe um `seq`
+    novo; cada worker aplica as mudanças com `seq` maior que o último visto
+    quando a versão "alerts" muda, então alertas criados em outro worker
+    também disparam aqui. O disparo grava `status = 'triggered'` só se o
+    alerta ainda estiver ativo: dois workers nunca notificam o mesmo alerta.
+    """
+
+    def __init__(self, path: Path = ALERTS_DB_PATH, sync_interval: float = ALERTS_SYNC_INTERVAL):
+        self.path = Path(path)
+        self.sync_interval = sync_interval
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._conn = None
+        self._books: Dict[Tuple[str, str], _Book] = {}
+        # id → (série, direção, limiar), para remover do livro
+        self._alerts: Dict[str, Tuple[Tuple[str, str], str, float]] = {}
+        self._sync_lock = asyncio.Lock()
+        self._last_seq = 0
+        self._last_sync = 0.0
+        self._synced_version: Optional[int] = None
+        self.ticks = 0
+        self.triggered = 0
+
+    def __len__(self) -> int:
+        return len(self._alerts)
+
+    async def _run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    async def open(self) -> None:
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='alerts')
+        self._conn = await self._run(connect_sqlite, self.path)
+        await self._run(self._conn.executescript, ALERTS_SCHEMA)
+        version = get_version("alerts")
+        last_seq, rows = await self._run(self._load_active)
+        await asyncio.to_thread(self._apply, rows)
+        self._last_seq = last_seq
+        self._last_sync = time.monotonic()
+        self._synced_version = version
+
+    async def close(self) -> None:
+        if self._conn is not None:
+            await self._run(self._conn.close)
+            self._conn = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    # ---------- índice em memória ----------
+
+    def _apply(self, rows: List[Dict]) -> None:
+        # Agrupa as inserções por lado para ordenar uma vez só na carga inicial
+        pending: Dict[int, Tuple[_Side, List[Tuple[float, str]]]] = {}
+        for row in rows:
+            alert_id = row["id"]
+            if row["status"] != "active":
+                self._remove(alert_id)
+                continue
+            if alert_id in self._alerts:
+                continue
+            key = series_key(row["product"], row["market"])
+            book = self._books.get(key)
+            if book is None:
+                book = self._books[key] = _Book()
+            direction = row["direction"]
+            threshold = row["threshold"]
+            self._alerts[alert_id] = (key, direction, threshold)
+            sides = (book.above, book.below) if direction == "cross" else \
+                (book.above,) if direction == "above" else (book.below,)
+            for side in sides:
+                pending.setdefault(id(side), (side, []))[1].append((threshold, alert_id))
+        for side, entries in pending.values():
+            side.extend(entries)
+
+    def _remove(self, alert_id: str) -> None:
+        entry = self._alerts.pop(alert_id, None)
+        if entry is None:
+            return
+        key, direction, threshold = entry
+        book = self._books[key]
+        if direction in ("above", "cross"):
+            book.above.remove(threshold, alert_id)
+        if direction in ("below", "cross"):
+            book.below.remove(threshold, alert_id)
+        if not len(book):
+            del self._books[key]
+
+    def match(self, product: str, market: str, previous: Optional[float],
+              points: Sequence[Tuple[float, float]]) -> List[Tuple[str, float, float]]:
+        """
+        Retira do índice os alertas cruzados pela sequência de preços
+
+        Args:
+            product: Produto da série
+            market: Mercado da série
+            previous: Último preço antes dos pontos (None: série nova, nada cruza)
+            points: Pontos novos (timestamp, preço), em ordem
+
+        Returns:
+            Lista de (id do alerta, timestamp, preço que o disparou)
+        """
+        key = series_key(product, market)
+        self.ticks += len(points)
+        book = self._books.get(key)
+        if book is None:
+            return []
+
+        hits = []
+        old = previous
+        for timestamp, price in points:
+            if old is not None:
+                for alert_id in book.crossed(old, price):
+                    entry = self._alerts.pop(alert_id)
+                    if entry[1] == "cross":
+                        other = book.below if price > old else book.above
+                        other.remove(entry[2], alert_id)
+                    hits.append((alert_id, timestamp, price))
+            old = price
+        if not len(book):
+            del self._books[key]
+        return hits
+
+    # ---------- operações (na thread do executor) ----------
+
+    def _next_seq(self) -> int:
+        return self._conn.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM alerts").fetchone()[0]
+
+    def _load_active(self) -> Tuple[int, List[Dict]]:
+        conn = self._conn
+        conn.execute("BEGIN")
+        try:
+            last_seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM alerts").fetchone()[0]
+            rows = [dict(row) for row in conn.execute(
+                "SELECT id, product, market, direction, threshold, status FROM alerts WHERE status = 'active'"
+            )]
+        finally:
+            conn.execute("COMMIT")
+        return last_seq, rows
+
+    def _changes_after(self, seq: int, limit: int) -> List[Dict]:
+        return [dict(row) for row in self._conn.execute(
+            "SELECT seq, id, product, market, direction, threshold, status FROM alerts "
+            "WHERE seq > ? ORDER BY seq LIMIT ?",
+            (seq, limit)
+        )]
+
+    def _create(self, alert: Dict) -> Optional[Dict]:
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            active = conn.execute(
+                "SELECT COUNT(*) FROM alerts WHERE user_id = ? AND status = 'active'", (alert["user_id"],)
+            ).fetchone()[0]
+            if active >= ALERTS_MAX_PER_USER:
+                conn.execute("ROLLBACK")
+                return None
+            conn.execute(
+                "INSERT INTO alerts (id, seq, user_id, product, market, direction, threshold, status, created_at) "
+                "VALUES (:id, :seq, :user_id, :product, :market, :direction, :threshold, 'active', :created_at)",
+                {**alert, "seq": self._next_seq()}
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return {**alert, "status": "active", "triggered_at": None, "triggered_price": None}
+
+    def _cancel(self, user_id: str, alert_id: str) -> bool:
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = conn.execute(
+                "UPDATE alerts SET status = 'cancelled', seq = ? WHERE id = ? AND user_id = ? AND status = 'active'",
+                (self._next_seq(), alert_id, user_id)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return cursor.rowcount > 0
+
+    def _mark_triggered(self, hits: List[Tuple[str, float, float]]) -> List[Dict]:
+        conn = self._conn
+        triggered = []
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            seq = self._next_seq()
+            for alert_id, timestamp, price in hits:
+                row = conn.execute(
+                    "UPDATE alerts SET status = 'triggered', seq = ?, triggered_at = ?, triggered_price = ? "
+                    "WHERE id = ? AND status = 'active' RETURNING " + ", ".join(ALERT_COLUMNS),
+                    (seq, _format_timestamp(timestamp), price, alert_id)
+                ).fetchone()
+                if row is not None:
+                    triggered.append(dict(row))
+                    seq += 1
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return triggered
+
+    def _list(self, user_id: str, status: Optional[str], limit: int) -> List[Dict]:
+        sql = "SELECT " + ", ".join(ALERT_COLUMNS) + " FROM alerts WHERE user_id = ?"
+        params: list = [user_id]
+        if status:
+            sql += " AND status = ?"
+            params.append(status)
+        sql += " ORDER BY seq DESC LIMIT ?"
+        params.append(limit)
+        return [dict(row) for row in self._conn.execute(sql, params)]
+
+    # ---------- API assíncrona ----------
+
+    async def sync(self, force: bool = False) -> int:
+        """
+        Aplica as mudanças nos alertas feitas desde a última sincronização
+
+        Args:
+            force: Ignorar o intervalo mínimo entre sincronizações
+
+        Returns:
+            int com o número de mudanças lidas
+        """
+        version = get_version("alerts")
+        recent = time.monotonic() - self._last_sync < self.sync_interval
+        if not force and version == self._synced_version and recent:
+            return 0
+
+        applied = 0
+        async with self._sync_lock:
+            while True:
+                rows = await self._run(self._changes_after, self._last_seq, _FETCH_LIMIT)
+                if rows:
+                    self._apply(rows)
+                    self._last_seq = rows[-1]["seq"]
+                applied += len(rows)
+                if len(rows) < _FETCH_LIMIT:
+                    break
+            self._last_sync = time.monotonic()
+            self._synced_version = version
+        return applied
+
+    async def create(self, user_id: str, product: str, market: str,
+                     direction: str, threshold: float) -> Optional[Dict]:
+        """
+        Cria um alerta ativo
+
+        Returns:
+            Dict com o alerta, ou None se o usuário já tem ALERTS_MAX_PER_USER ativos
+        """
+        alert = await self._run(self._create, {
+            "id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "product": product,
+            "market": market,
+            "direction": direction,
+            "threshold": float(threshold),
+            "created_at": utc_now()
+        })
+        if alert is not None:
+            bump_version("alerts")
+            await self.sync(force=True)
+        return alert
+
+    async def cancel(self, user_id: str, alert_id: str) -> bool:
+        """
+        Cancela um alerta ativo do usuário
+
+        Returns:
+            True se o alerta existia e estava ativo
+        """
+        cancelled = await self._run(self._cancel, user_id, alert_id)
+        if cancelled:
+            bump_version("alerts")
+            await self.sync(force=True)
+        return cancelled
+
+    async def mark_triggered(self, hits: List[Tuple[str, float, float]]) -> List[Dict]:
+        """
+        Grava o disparo dos alertas retornados por `match`
+
+        Returns:
+            Alertas efetivamente disparados (os que outro worker já disparou
+            ou que foram cancelados antes ficam de fora)
+        """
+        if not hits:
+            return []
+        triggered = await self._run(self._mark_triggered, hits)
+        if triggered:
+            self.triggered += len(triggered)
+            bump_version("alerts")
+        return triggered
+
+    async def list_alerts(self, user_id: str, status: Optional[str] = None, limit: int = 100) -> List[Dict]:
+        """
+        Alertas do usuário, mais recentes (criados ou alterados) primeiro
+        """
+        return await self._run(self._list, user_id, status, limit)
+
+    def stats(self) -> Dict:
+        return {
+            "pid": os.getpid(),
+            "active": len(self._alerts),
+            "series": len(self._books),
+            "ticks": self.ticks,
+            "triggered": self.triggered
+        }
+
+
+_alert_engine: Optional[AlertEngine] = None
+_alert_engine_lock = asyncio.Lock()
+
+
+async def get_alert_engine() -> AlertEngine:
+    """
+    Retorna o AlertEngine global, carregando os alertas ativos na primeira chamada
+    """
+    global _alert_engine
+    if _alert_engine is None:
+        async with _alert_engine_lock:
+            if _alert_engine is None:
+                engine = AlertEngine()
+                await engine.open()
+                _alert_engine = engine
+    return _alert_engine
+
+
+async def close_alert_engine() -> None:
+    """
+    Fecha o AlertEngine global (chamado no shutdown)
+    """
+    global _alert_engine
+    if _alert_engine is not None:
+        await _alert_engine.close()
+        _alert_engine = None
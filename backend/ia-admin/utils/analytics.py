@@ -0,0 +1,157 @@
+"""
+🧮 AGROISYNC IA - Análises de Cotações
+Campos derivados calculados no servidor a partir do histórico de preços
+(variação vs fechamento anterior, médias móveis, volatilidade, mín/máx)
+com operações vetorizadas do NumPy sobre as colunas das séries
+"""
+
+import os
+import time
+from typing import List, Dict, Optional, Tuple
+
+import numpy as np
+
+from .timeseries import PriceSeries, TimeSeriesStore
+
+# Configurações
+ANALYTICS_WINDOWS_DAYS = tuple(
+    int(w) for w in os.getenv('ANALYTICS_WINDOWS_DAYS', '7,30,90').split(',') if w.strip()
+)
+TRADING_DAYS_PER_YEAR = 252
+DAY = 86400
+
+# Última análise calculada por série (chave normalizada)
+_latest: Dict[Tuple[str, str], Dict] = {}
+
+
+def _round(value: float, digits: int = 6) -> Optional[float]:
+    return None if value is None or not np.isfinite(value) else round(float(value), digits)
+
+
+def daily_closes(ts: np.ndarray, px: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Último preço de cada dia (UTC)
+
+    Returns:
+        (dias como epoch do início do dia, preços de fechamento)
+    """
+    if not len(ts):
+        return np.empty(0), np.empty(0)
+
+    days = np.floor(ts / DAY)
+    last_of_day = np.append(np.flatnonzero(np.diff(days)), len(ts) - 1)
+    return days[last_of_day] * DAY, px[last_of_day]
+
+
+def variations_vs_previous_close(ts: np.ndarray, px: np.ndarray,
+                                 new_ts: np.ndarray, new_px: np.ndarray) -> np.ndarray:
+    """
+    Variação percentual de cada novo ponto contra o fechamento do dia anterior
+
+    Args:
+        ts, px: Histórico completo (já incluindo os novos pontos)
+        new_ts, new_px: Pontos recém-gravados
+
+    Returns:
+        Array com a variação em % (NaN quando não há fechamento anterior)
+    """
+    day_starts = np.floor(new_ts / DAY) * DAY
+    prev_index = np.searchsorted(ts, day_starts, side='left') - 1
+    prev_close = np.where(prev_index >= 0, px[np.maximum(prev_index, 0)], np.nan)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (new_px / prev_close - 1) * 100
+
+
+def series_analytics(ts: np.ndarray, px: np.ndarray,
+                     windows: Tuple[int, ...] = ANALYTICS_WINDOWS_DAYS) -> Dict:
+    """
+    Análises da série no instante do último ponto
+
+    Para cada janela (em dias): média móvel dos fechamentos diários,
+    volatilidade anualizada dos retornos logarítmicos diários e mín/máx dos preços.
+
+    Returns:
+        Dict com last, previous_close, variation e métricas por janela
+    """
+    if not len(ts):
+        return {"points": 0}
+
+    last_ts = float(ts[-1])
+    max_window = max(windows) if windows else 0
+
+    # Só o trecho necessário para a maior janela (+1 dia para o fechamento anterior)
+    lo = int(np.searchsorted(ts, last_ts - (max_window + 1) * DAY, side='left'))
+    ts, px = ts[lo:], px[lo:]
+    days, closes = daily_closes(ts, px)
+
+    today = np.floor(last_ts / DAY) * DAY
+    previous = closes[days < today]
+    previous_close = float(previous[-1]) if len(previous) else None
+
+    result = {
+        "points": int(lo + len(ts)),
+        "last": float(px[-1]),
+        "last_timestamp": last_ts,
+        "previous_close": previous_close,
+        "variation": _round((px[-1] / previous_close - 1) * 100, 4) if previous_close else None,
+        "windows": {},
+        "computed_at": time.time(),
+    }
+
+    for window in windows:
+        since = last_ts - window * DAY
+        window_closes = closes[days >= np.floor(since / DAY) * DAY]
+        window_prices = px[int(np.searchsorted(ts, since, side='left')):]
+
+        returns = np.diff(np.log(window_closes)) if len(window_closes) > 1 else np.empty(0)
+        volatility = returns.std(ddof=1) * np.sqrt(TRADING_DAYS_PER_YEAR) if len(returns) > 1 else None
+
+        result["windows"][f"{window}d"] = {
+            "sma": _round(window_closes.mean()) if len(window_closes) else None,
+            "volatility": _round(volatility),
+            "min": _round(window_prices.min()) if len(window_prices) else None,
+            "max": _round(window_prices.max()) if len(window_prices) else None,
+            "days": int(len(window_closes)),
+        }
+
+    return result
+
+
+# ============================================
+# CACHE DE ANÁLISES
+# ============================================
+
+def update_series_analytics(series: PriceSeries) -> Dict:
+    """
+    Recalcula e guarda a análise de uma série
+    """
+    ts, px = series.arrays()
+    analytics = {"product": series.product, "market": series.market, **series_analytics(ts, px)}
+    _latest[series.key] = analytics
+    return analytics
+
+
+def get_series_analytics(series: PriceSeries) -> Dict:
+    """
+    Análise guardada da série (recalcula se a série recebeu pontos depois dela)
+    """
+    cached = _latest.get(series.key)
+    if cached is None or cached.get("points") != len(series):
+        return update_series_analytics(series)
+    return cached
+
+
+def recompute_all(store: TimeSeriesStore) -> List[Dict]:
+    """
+    Recalcula as análises de todas as séries existentes
+
+    Returns:
+        Lista de análises, uma por série
+    """
+    results = []
+    for meta in store.list_series():
+        series = store.get(meta["product"], meta["market"])
+        if series is not None:
+            results.append(update_series_analytics(series))
+    return results
@@ -3,7 +3,10 @@
 Módulo responsável por validar tokens e IPs autorizados
 """
 
+import hashlib
+import hmac
 import os
+import time
 from typing import Optional
 from fastapi import Request, HTTPException
 from dotenv import load_dotenv
@@ -13,6 +16,13 @@ load_dotenv()
 # Configurações de segurança
 IA_SECRET_TOKEN = os.getenv('IA_SECRET_TOKEN', '')
 ALLOWED_IPS = os.getenv('ALLOWED_IPS', '').split(',')
+# Segredo do gateway do Agroisync para assinar o cabeçalho X-User-Id
+GATEWAY_SECRET = os.getenv('GATEWAY_SECRET', '')
+# Idade máxima (segundos) da assinatura do gateway
+GATEWAY_SIGNATURE_TOLERANCE = int(os.getenv('GATEWAY_SIGNATURE_TOLERANCE', '300'))
+
+USER_ID_HEADER = "X-User-Id"
+USER_SIGNATURE_HEADER = "X-User-Signature"
 
 def verify_token(request: Request) -> bool:
     """
@@ -146,3 +156,82 @@ def verify_admin_access(request: Request) -> bool:
     
     return True
 
+
+def sign_user_id(secret: str, timestamp: int, user_id: str) -> str:
+    """
+    Assinatura do gateway para X-User-Id: "t=<timestamp>,v1=<HMAC-SHA256 hex>"
+    de "<timestamp>.<user_id>" (mesmo formato dos webhooks)
+    """
+    digest = hmac.new(secret.encode(), f"{timestamp}.{user_id}".encode(), hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={digest}"
+
+
+def authenticated_user_id(request: Request) -> Optional[str]:
+    """
+    Usuário em nome de quem a requisição é feita, se a identidade é confiável
+
+    O cabeçalho X-User-Id só vale com o token da IA ou com a assinatura do
+    gateway (X-User-Signature, GATEWAY_SECRET) dentro de
+    GATEWAY_SIGNATURE_TOLERANCE segundos; sem isso é ignorado.
+
+    Args:
+        request: Request do FastAPI
+
+    Returns:
+        str com o user_id, ou None
+    """
+    user_id = request.headers.get(USER_ID_HEADER)
+    if not user_id:
+        return None
+
+    signature = request.headers.get(USER_SIGNATURE_HEADER)
+    if signature and GATEWAY_SECRET:
+        parts = dict(part.split('=', 1) for part in signature.split(',') if '=' in part)
+        try:
+            timestamp = int(parts.get('t', ''))
+        except ValueError:
+            return None
+        if abs(time.time() - timestamp) > GATEWAY_SIGNATURE_TOLERANCE:
+            return None
+        expected = sign_user_id(GATEWAY_SECRET, timestamp, user_id)
+        return user_id if hmac.compare_digest(signature, expected) else None
+
+    try:
+        verify_token(request)
+    except HTTPException:
+        return None
+    return user_id
+
+
+def verify_user_or_admin(request: Request, user_id: str) -> bool:
+    """
+    Verifica se quem pede os dados de `user_id` é o próprio usuário
+    (identidade confiável, ver authenticated_user_id) ou um administrador
+
+    Args:
+        request: Request do FastAPI
+        user_id: Usuário consultado
+
+    Returns:
+        bool: True se permitido
+
+    Raises:
+        HTTPException: 401 sem identidade confiável, 403 se for outro usuário
+    """
+    # Com o token da IA, vale a regra do administrador (token + IP)
+    if request.headers.get('Authorization'):
+        return verify_admin_access(request)
+
+    caller = authenticated_user_id(request)
+    if caller is None:
+        raise HTTPException(
+            status_code=401,
+            detail={"error": "unauthorized", "message": "Identidade do usuário não fornecida"}
+        )
+    if caller != user_id:
+        raise HTTPException(
+            status_code=403,
+            detail={"error": "forbidden", "message": "Consulta permitida só para o próprio usuário"}
+        )
+
+    return True
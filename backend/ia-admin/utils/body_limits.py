@@ -0,0 +1,163 @@
+"""
+📏 AGROISYNC IA - Limite de Tamanho do Corpo
+Middleware ASGI que recusa com 413 corpos acima do limite da rota antes
+de qualquer parsing: pelo Content-Length declarado e, sem ele (ou com um
+valor falso), contando os bytes conforme o corpo chega
+"""
+
+import json
+import os
+from typing import Dict, Tuple
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+# Configurações (bytes; 0 desativa o limite)
+BODY_LIMIT_DEFAULT = int(os.getenv('BODY_LIMIT_DEFAULT', str(1024 * 1024)))
+# Rotas de lote (/bulk) recebem NDJSON/arrays grandes em streaming
+BODY_LIMIT_BULK = int(os.getenv('BODY_LIMIT_BULK', str(64 * 1024 * 1024)))
+# JSON {"rota": bytes} com limites por rota exata
+BODY_LIMITS: Dict[str, int] = json.loads(os.getenv('BODY_LIMITS', '') or json.dumps({
+    "/api/update-news": 256 * 1024,
+    "/api/update-weather": 16 * 1024,
+    "/api/update-cotation": 16 * 1024,
+    "/api/update-ai-insights": 64 * 1024,
+    "/api/alerts": 16 * 1024,
+    "/api/quotas/consume": 16 * 1024
+}))
+
+
+def limit_for(path: str) -> Tuple[str, int]:
+    """
+    Regra e limite da rota
+
+    Returns:
+        (regra, limite em bytes): a própria rota se está em BODY_LIMITS,
+        "bulk" para rotas /bulk ou "default"
+    """
+    if path in BODY_LIMITS:
+        return path, BODY_LIMITS[path]
+    if path.endswith('/bulk'):
+        return "bulk", BODY_LIMIT_BULK
+    return "default", BODY_LIMIT_DEFAULT
+
+
+class PayloadTooLarge(HTTPException):
+    """Corpo passou do limite enquanto era lido (vira 413 no handler global)"""
+
+    def __init__(self, limit: int):
+        super().__init__(
+            status_code=413,
+            detail={
+                "error": "payload_too_large",
+                "message": f"Corpo da requisição maior que o limite de {limit} bytes",
+                "limit": limit
+            },
+            headers={"Connection": "close"}
+        )
+
+
+class BodyLimitStats:
+    """
+    Recusas por regra de limite (contadores deste worker)
+    """
+
+    def __init__(self):
+        self.rules: Dict[str, Dict[str, int]] = {}
+
+    def record(self, rule: str, how: str, size: int) -> None:
+        entry = self.rules.setdefault(rule, {"content_length": 0, "stream": 0, "rejected_bytes": 0})
+        entry[how] += 1
+        entry["rejected_bytes"] += size
+
+    def stats(self) -> Dict:
+        return {
+            "pid": os.getpid(),
+            "default": BODY_LIMIT_DEFAULT,
+            "bulk": BODY_LIMIT_BULK,
+            "routes": BODY_LIMITS,
+            "rejected": {
+                "content_length": sum(entry["content_length"] for entry in self.rules.values()),
+                "stream": sum(entry["stream"] for entry in self.rules.values()),
+                "bytes": sum(entry["rejected_bytes"] for entry in self.rules.values())
+            },
+            "by_rule": self.rules
+        }
+
+
+body_limit_stats = BodyLimitStats()
+
+
+# ============================================
+# MIDDLEWARE ASGI
+# ============================================
+
+class BodyLimitMiddleware:
+    """
+    Aplica o limite de corpo da rota (limit_for)
+
+    - Content-Length acima do limite: 413 imediato, sem ler o corpo
+    - Sem Content-Length: os bytes são contados em `receive` e a leitura
+      que passa do limite levanta PayloadTooLarge (o JSON nunca é montado);
+      lotes em streaming já gravados até ali continuam gravados
+    - Bytes recusados = Content-Length declarado ou bytes lidos até o corte
+    """
+
+    def __init__(self, app, stats: BodyLimitStats = body_limit_stats):
+        self.app = app
+        self.stats = stats
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        rule, limit = limit_for(scope["path"])
+        if limit <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        for name, value in scope.get("headers", ()):
+            if name == b"content-length":
+                try:
+                    declared = int(value)
+                except ValueError:
+                    break
+                if declared > limit:
+                    self.stats.record(rule, "content_length", declared)
+                    error = PayloadTooLarge(limit)
+                    response = JSONResponse(status_code=413, content=error.detail, headers=error.headers)
+                    await response(scope, receive, send)
+                    return
+                break
+
+        received = 0
+        rejected = False
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received, rejected
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    if not rejected:
+                        rejected = True
+                        self.stats.record(rule, "stream", received)
+                    raise PayloadTooLarge(limit)
+            return message
+
+        async def tracking_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except PayloadTooLarge as e:
+            # Lido fora de uma rota (ex: por um middleware): responde aqui mesmo
+            if response_started:
+                raise
+            response = JSONResponse(status_code=413, content=e.detail, headers=e.headers)
+            await response(scope, receive, send)
@@ -0,0 +1,265 @@
+"""
+📦 AGROISYNC IA - Ingestão em Lote
+Parser incremental de NDJSON / arrays JSON e validação item a item
+enquanto o corpo da requisição ainda está chegando
+"""
+
+import codecs
+import json
+import os
+from typing import AsyncIterator, Awaitable, Callable, List, Dict, Optional, Tuple, Type
+
+from pydantic import BaseModel, ValidationError
+
+# Configurações
+BULK_CHUNK_SIZE = int(os.getenv('BULK_CHUNK_SIZE', '500'))
+BULK_MAX_ITEM_BYTES = int(os.getenv('BULK_MAX_ITEM_BYTES', str(256 * 1024)))
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\r\n'
+
+
+class BulkFormatError(ValueError):
+    """Corpo em formato irrecuperável (ex: array JSON malformado)"""
+
+
+def _validation_errors(exc: ValidationError) -> List[Dict]:
+    return [
+        {"loc": [str(part) for part in error.get("loc", ())], "msg": error.get("msg", "")}
+        for error in exc.errors()
+    ]
+
+
+# ============================================
+# PARSERS INCREMENTAIS
+# ============================================
+
+class NDJSONParser:
+    """
+    Um objeto JSON por linha; linhas inválidas viram erros individuais
+    """
+
+    def __init__(self, max_item_bytes: int = BULK_MAX_ITEM_BYTES):
+        self.max_item_bytes = max_item_bytes
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[Tuple[Optional[Dict], Optional[str]]]:
+        self._buffer += text
+        *lines, self._buffer = self._buffer.split('\n')
+
+        if len(self._buffer) > self.max_item_bytes:
+            self._buffer = ""
+            raise BulkFormatError(f"Linha maior que {self.max_item_bytes} bytes")
+
+        return [self._parse(line) for line in lines if line.strip()]
+
+    def close(self) -> List[Tuple[Optional[Dict], Optional[str]]]:
+        line, self._buffer = self._buffer, ""
+        return [self._parse(line)] if line.strip() else []
+
+    @staticmethod
+    def _parse(line: str) -> Tuple[Optional[Dict], Optional[str]]:
+        try:
+            return json.loads(line), None
+        except json.JSONDecodeError as e:
+            return None, f"JSON inválido: {e.msg}"
+
+
+class JSONArrayParser:
+    """
+    Array JSON de objetos, decodificado elemento a elemento
+    """
+
+    def __init__(self, max_item_bytes: int = BULK_MAX_ITEM_BYTES):
+        self.max_item_bytes = max_item_bytes
+        self._buffer = ""
+        self._started = False
+        self._finished = False
+        self._expect_comma = False
+        self._error: Optional[BulkFormatError] = None
+
+    def feed(self, text: str) -> List[Tuple[Optional[Dict], Optional[str]]]:
+        if self._error:
+            raise self._error
+        self._buffer += text
+        items = []
+
+        try:
+            self._parse_items(items)
+        except BulkFormatError as e:
+            # Entrega os itens anteriores ao erro; o erro sobe na próxima chamada
+            if not items:
+                raise
+            self._error = e
+
+        return items
+
+    def _parse_items(self, items: List) -> None:
+        while True:
+            buffer = self._buffer.lstrip(_WHITESPACE)
+            self._buffer = buffer
+            if not buffer:
+                break
+
+            if self._finished:
+                raise BulkFormatError("Conteúdo após o fim do array")
+
+            if not self._started:
+                if buffer[0] != '[':
+                    raise BulkFormatError("Esperado '[' no início do array")
+                self._started = True
+                self._buffer = buffer[1:]
+                continue
+
+            if buffer[0] == ']':
+                self._finished = True
+                self._buffer = buffer[1:]
+                continue
+
+            if self._expect_comma:
+                if buffer[0] != ',':
+                    raise BulkFormatError("Esperado ',' entre os itens do array")
+                self._expect_comma = False
+                self._buffer = buffer[1:]
+                continue
+
+            try:
+                obj, end = _decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                # Item incompleto: espera o próximo pedaço do corpo
+                if len(buffer) > self.max_item_bytes:
+                    raise BulkFormatError(f"Item maior que {self.max_item_bytes} bytes ou JSON inválido")
+                break
+
+            items.append((obj, None))
+            self._expect_comma = True
+            self._buffer = buffer[end:]
+
+    def close(self) -> List[Tuple[Optional[Dict], Optional[str]]]:
+        if self._error:
+            raise self._error
+        if self._buffer.strip(_WHITESPACE) or (self._started and not self._finished):
+            raise BulkFormatError("Array JSON incompleto")
+        return []
+
+
+async def iter_bulk_items(stream: AsyncIterator[bytes],
+                          max_item_bytes: int = BULK_MAX_ITEM_BYTES
+                          ) -> AsyncIterator[Tuple[Optional[Dict], Optional[str], int]]:
+    """
+    Itera os itens do corpo conforme os bytes chegam
+
+    O formato é detectado pelo primeiro caractere: '[' → array JSON, senão NDJSON.
+
+    Args:
+        stream: request.stream() do Starlette
+        max_item_bytes: Tamanho máximo de um item
+
+    Yields:
+        (objeto, erro, bytes lidos até aqui)
+
+    Raises:
+        BulkFormatError: se o corpo não puder ser interpretado
+    """
+    text_decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    parser = None
+    total_bytes = 0
+
+    async for chunk in stream:
+        total_bytes += len(chunk)
+        text = text_decoder.decode(chunk)
+        if parser is None:
+            stripped = text.lstrip(_WHITESPACE)
+            if not stripped:
+                continue
+            parser = JSONArrayParser(max_item_bytes) if stripped[0] == '[' else NDJSONParser(max_item_bytes)
+        for obj, error in parser.feed(text):
+            yield obj, error, total_bytes
+
+    if parser is not None:
+        for obj, error in parser.feed(text_decoder.decode(b'', final=True)) + parser.close():
+            yield obj, error, total_bytes
+
+
+# ============================================
+# INGESTÃO
+# ============================================
+
+async def ingest_stream(stream: AsyncIterator[bytes], model: Type[BaseModel],
+                        commit_chunk: Callable[[List[BaseModel]], Awaitable[List[Dict]]],
+                        chunk_size: int = BULK_CHUNK_SIZE) -> Dict:
+    """
+    Valida cada item com `model` e grava em blocos de `chunk_size`
+
+    Args:
+        stream: request.stream() do Starlette
+        model: Modelo Pydantic (NewsUpdate, WeatherUpdate, CotationUpdate)
+        commit_chunk: Corrotina que grava um bloco e retorna um dict por item
+            (um dict com "error" marca só aquele item como rejeitado)
+        chunk_size: Itens por bloco gravado
+
+    Returns:
+        Dict com "results" (um por item, na ordem recebida), "summary"
+        e "format_error" (se o corpo foi interrompido por erro de formato)
+    """
+    results: List[Dict] = []
+    pending: List[Tuple[int, BaseModel]] = []
+    summary = {"received": 0, "accepted": 0, "rejected": 0, "chunks": 0, "bytes": 0}
+
+    async def flush():
+        if not pending:
+            return
+        indexes = [index for index, _ in pending]
+        items = [item for _, item in pending]
+        pending.clear()
+        summary["chunks"] += 1
+
+        try:
+            committed = await commit_chunk(items)
+        except Exception as e:
+            summary["rejected"] += len(indexes)
+            for index in indexes:
+                results[index] = {"index": index, "status": "error", "error": f"Erro ao gravar: {e}"}
+            return
+
+        for index, extra in zip(indexes, committed):
+            if extra and extra.get("error"):
+                summary["rejected"] += 1
+                results[index] = {"index": index, "status": "error", **extra}
+            else:
+                summary["accepted"] += 1
+                results[index] = {"index": index, "status": "ok", **(extra or {})}
+
+    format_error = None
+    try:
+        async for obj, error, total_bytes in iter_bulk_items(stream):
+            summary["bytes"] = total_bytes
+            index = summary["received"]
+            summary["received"] += 1
+            results.append({"index": index, "status": "pending"})
+
+            if error is None:
+                if not isinstance(obj, dict):
+                    error = "Item deve ser um objeto JSON"
+                else:
+                    try:
+                        pending.append((index, model(**obj)))
+                    except ValidationError as e:
+                        summary["rejected"] += 1
+                        results[index] = {"index": index, "status": "error", "errors": _validation_errors(e)}
+                        continue
+
+            if error is not None:
+                summary["rejected"] += 1
+                results[index] = {"index": index, "status": "error", "error": error}
+                continue
+
+            if len(pending) >= chunk_size:
+                await flush()
+    except BulkFormatError as e:
+        # Itens já validados continuam sendo gravados; o restante do corpo é descartado
+        format_error = str(e)
+
+    await flush()
+
+    return {"results": results, "summary": summary, "format_error": format_error}
@@ -0,0 +1,310 @@
+"""
+🗜️ AGROISYNC IA - Compressão de Respostas
+Middleware ASGI com negociação de Accept-Encoding (zstd, brotli, gzip),
+tamanho mínimo, suporte a respostas em streaming e cache dos bytes
+comprimidos de respostas com ETag
+"""
+
+import asyncio
+import gzip
+import os
+import zlib
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # brotli é opcional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # zstandard é opcional
+    zstandard = None
+
+# Configurações
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', '1024'))
+COMPRESSION_GZIP_LEVEL = int(os.getenv('COMPRESSION_GZIP_LEVEL', '6'))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv('COMPRESSION_BROTLI_QUALITY', '5'))
+COMPRESSION_ZSTD_LEVEL = int(os.getenv('COMPRESSION_ZSTD_LEVEL', '3'))
+COMPRESSION_CACHE_MAX_BYTES = int(os.getenv('COMPRESSION_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+# Corpos maiores que isso são comprimidos fora do event loop
+COMPRESSION_OFFLOAD_BYTES = int(os.getenv('COMPRESSION_OFFLOAD_BYTES', str(256 * 1024)))
+
+COMPRESSIBLE_TYPES = (
+    'application/json', 'application/x-ndjson', 'application/javascript',
+    'application/xml', 'text/'
+)
+
+
+def available_encodings() -> List[str]:
+    """
+    Codificações suportadas, em ordem de preferência do servidor
+    """
+    encodings = []
+    if zstandard is not None:
+        encodings.append('zstd')
+    if brotli is not None:
+        encodings.append('br')
+    encodings.append('gzip')
+    return encodings
+
+
+def choose_encoding(accept_encoding: str, encodings: Optional[List[str]] = None) -> Optional[str]:
+    """
+    Escolhe a codificação pelo cabeçalho Accept-Encoding (respeitando q=)
+
+    Returns:
+        "zstd", "br", "gzip" ou None (sem compressão)
+    """
+    encodings = encodings or available_encodings()
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name] = q
+
+    best, best_q = None, 0.0
+    for encoding in encodings:
+        q = weights.get(encoding, weights.get('*', 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    """
+    Comprime um corpo completo
+    """
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor(level=COMPRESSION_ZSTD_LEVEL).compress(data)
+    if encoding == 'br':
+        return brotli.compress(data, quality=COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+class StreamCompressor:
+    """
+    Compressor incremental: cada pedaço é descarregado (flush) para o
+    cliente receber os dados do streaming sem esperar o fim
+    """
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == 'zstd':
+            self._obj = zstandard.ZstdCompressor(level=COMPRESSION_ZSTD_LEVEL).compressobj()
+        elif encoding == 'br':
+            self._obj = brotli.Compressor(quality=COMPRESSION_BROTLI_QUALITY)
+        else:
+            self._obj = zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def feed(self, data: bytes) -> bytes:
+        if self.encoding == 'zstd':
+            return self._obj.compress(data) + self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        if self.encoding == 'br':
+            return self._obj.process(data) + self._obj.flush()
+        return self._obj.compress(data) + self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == 'zstd':
+            return self._obj.flush()
+        if self.encoding == 'br':
+            return self._obj.finish()
+        return self._obj.flush()
+
+
+class CompressedCache:
+    """
+    LRU de corpos comprimidos por (caminho+query, ETag, codificação),
+    limitado pelo total de bytes guardados
+    """
+
+    def __init__(self, max_bytes: int = COMPRESSION_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._items: "OrderedDict[Tuple[str, str, str], bytes]" = OrderedDict()
+
+    def get(self, key: Tuple[str, str, str]) -> Optional[bytes]:
+        body = self._items.get(key)
+        if body is None:
+            self.misses += 1
+            return None
+        self._items.move_to_end(key)
+        self.hits += 1
+        return body
+
+    def put(self, key: Tuple[str, str, str], body: bytes) -> None:
+        if len(body) > self.max_bytes:
+            return
+        previous = self._items.pop(key, None)
+        if previous is not None:
+            self.bytes -= len(previous)
+        self._items[key] = body
+        self.bytes += len(body)
+        while self.bytes > self.max_bytes:
+            _, evicted = self._items.popitem(last=False)
+            self.bytes -= len(evicted)
+
+    def stats(self) -> Dict:
+        return {"entries": len(self._items), "bytes": self.bytes, "hits": self.hits, "misses": self.misses}
+
+
+compressed_cache = CompressedCache()
+
+
+# ============================================
+# MIDDLEWARE ASGI
+# ============================================
+
+class CompressionMiddleware:
+    """
+    Comprime respostas HTTP conforme o Accept-Encoding do cliente
+
+    - Corpo completo (uma mensagem) só é comprimido a partir de `minimum_size`
+    - Streaming (more_body) é comprimido pedaço a pedaço, sem Content-Length
+    - Respostas com ETag forte guardam os bytes comprimidos no cache; o ETag
+      enviado passa a ser fraco (W/), como a representação comprimida exige
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE,
+                 cache: Optional[CompressedCache] = None):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.cache = cache or compressed_cache
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("method") == "HEAD":
+            await self.app(scope, receive, send)
+            return
+
+        accept = ""
+        for name, value in scope.get("headers", ()):
+            if name == b"accept-encoding":
+                accept = value.decode("latin-1")
+                break
+        encoding = choose_encoding(accept) if accept else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressingSender(self, scope, send, encoding)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressingSender:
+    def __init__(self, middleware: CompressionMiddleware, scope, send, encoding: str):
+        self.middleware = middleware
+        self.scope = scope
+        self.downstream = send
+        self.encoding = encoding
+        self.start_message = None
+        self.compressor: Optional[StreamCompressor] = None
+        self.passthrough = False
+
+    def _eligible(self, headers: List[Tuple[bytes, bytes]], status: int) -> bool:
+        if status < 200 or status in (204, 304):
+            return False
+        content_type = b""
+        for name, value in headers:
+            lower = name.lower()
+            if lower == b"content-encoding":
+                return False
+            if lower == b"content-type":
+                content_type = value.lower()
+        return content_type.decode("latin-1").startswith(COMPRESSIBLE_TYPES)
+
+    def _compressed_headers(self, length: Optional[int]) -> List[Tuple[bytes, bytes]]:
+        headers = []
+        vary = [b"Accept-Encoding"]
+        for name, value in self.start_message.get("headers", []):
+            lower = name.lower()
+            if lower == b"content-length":
+                continue
+            if lower == b"vary":
+                vary.extend(v.strip() for v in value.split(b",") if v.strip().lower() != b"accept-encoding")
+                continue
+            if lower == b"etag" and not value.startswith(b"W/"):
+                value = b"W/" + value
+            headers.append((name, value))
+        headers.append((b"content-encoding", self.encoding.encode()))
+        headers.append((b"vary", b", ".join(vary)))
+        if length is not None:
+            headers.append((b"content-length", str(length).encode()))
+        return headers
+
+    def _etag(self) -> Optional[str]:
+        for name, value in self.start_message.get("headers", []):
+            if name.lower() == b"etag" and not value.startswith(b"W/"):
+                return value.decode("latin-1")
+        return None
+
+    async def send(self, message):
+        if self.passthrough:
+            await self.downstream(message)
+            return
+
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            if not self._eligible(message.get("headers", []), message["status"]):
+                self.passthrough = True
+                await self.downstream(message)
+            return
+
+        if message["type"] != "http.response.body":
+            await self.downstream(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.compressor is None and not more_body:
+            await self._send_complete(body)
+            return
+
+        if self.compressor is None:
+            # Streaming: cabeçalhos sem Content-Length e compressão incremental
+            self.compressor = StreamCompressor(self.encoding)
+            await self.downstream({**self.start_message, "headers": self._compressed_headers(None)})
+
+        chunk = self.compressor.feed(body) if body else b""
+        if not more_body:
+            chunk += self.compressor.finish()
+        if chunk or not more_body:
+            await self.downstream({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+    async def _send_complete(self, body: bytes) -> None:
+        if len(body) < self.middleware.minimum_size:
+            await self.downstream(self.start_message)
+            await self.downstream({"type": "http.response.body", "body": body})
+            return
+
+        etag = self._etag()
+        key = None
+        compressed = None
+        if etag is not None:
+            query = self.scope.get("query_string", b"").decode("latin-1")
+            key = (f"{self.scope['path']}?{query}", etag, self.encoding)
+            compressed = self.middleware.cache.get(key)
+
+        if compressed is None:
+            if len(body) > COMPRESSION_OFFLOAD_BYTES:
+                loop = asyncio.get_running_loop()
+                compressed = await loop.run_in_executor(None, compress, body, self.encoding)
+            else:
+                compressed = compress(body, self.encoding)
+            if key is not None:
+                self.middleware.cache.put(key, compressed)
+
+        await self.downstream({**self.start_message, "headers": self._compressed_headers(len(compressed))})
+        await self.downstream({"type": "http.response.body", "body": compressed})
@@ -0,0 +1,87 @@
+"""
+🧪 AGROISYNC IA - D1 Local
+Imitação da API HTTP /query do Cloudflare D1 sobre um SQLite local,
+para testar a sincronização sem conta na Cloudflare
+
+Uso:
+    uvicorn utils.d1_local:app --port 8787
+    D1_SYNC_ENABLED=true D1_API_URL=http://127.0.0.1:8787/query uvicorn main:app
+"""
+
+import asyncio
+import os
+import random
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from .storage import DATA_DIR, NEWS_SCHEMA, connect_sqlite
+
+# Configurações
+D1_LOCAL_DB_PATH = Path(os.getenv('D1_LOCAL_DB_PATH', DATA_DIR / 'd1_local.db'))
+# Fração de chamadas que falham com 503 (para exercitar o backoff)
+D1_LOCAL_FAIL_RATE = float(os.getenv('D1_LOCAL_FAIL_RATE', '0'))
+# Atraso artificial por chamada, em segundos (latência da rede até o D1)
+D1_LOCAL_LATENCY = float(os.getenv('D1_LOCAL_LATENCY', '0'))
+
+app = FastAPI(title="D1 Local")
+
+_conn = connect_sqlite(D1_LOCAL_DB_PATH)
+_conn.executescript(NEWS_SCHEMA)
+_conn_lock = threading.Lock()
+
+
+def _execute(statements: List[Dict[str, Any]]) -> List[Dict]:
+    results = []
+    with _conn_lock:
+        _conn.execute("BEGIN")
+        try:
+            for statement in statements:
+                started = time.perf_counter()
+                cursor = _conn.execute(statement["sql"], statement.get("params") or [])
+                rows = [dict(row) for row in cursor.fetchall()]
+                results.append({
+                    "results": rows,
+                    "success": True,
+                    "meta": {
+                        "changes": cursor.rowcount if cursor.rowcount >= 0 else 0,
+                        "duration": round((time.perf_counter() - started) * 1000, 3)
+                    }
+                })
+            _conn.execute("COMMIT")
+        except Exception:
+            _conn.execute("ROLLBACK")
+            raise
+    return results
+
+
+@app.post("/query")
+@app.post("/client/v4/accounts/{account_id}/d1/database/{database_id}/query")
+async def query(request: Request):
+    """
+    Executa uma instrução ({"sql", "params"}) ou várias ({"batch": [...]})
+    em uma transação, respondendo no envelope da API da Cloudflare
+    """
+    if D1_LOCAL_LATENCY:
+        await asyncio.sleep(D1_LOCAL_LATENCY)
+    if D1_LOCAL_FAIL_RATE and random.random() < D1_LOCAL_FAIL_RATE:
+        return JSONResponse(
+            status_code=503,
+            content={"success": False, "errors": [{"code": 7500, "message": "D1 local: falha simulada"}]}
+        )
+
+    body = await request.json()
+    statements = body["batch"] if "batch" in body else [body]
+    try:
+        results = _execute(statements)
+    except sqlite3.Error as e:
+        return JSONResponse(
+            status_code=400,
+            content={"success": False, "errors": [{"code": 7500, "message": str(e)}], "result": []}
+        )
+    return {"success": True, "errors": [], "messages": [], "result": results}
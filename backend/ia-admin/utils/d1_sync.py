@@ -0,0 +1,489 @@
+"""
+☁️ AGROISYNC IA - Sincronização com o Cloudflare D1
+Outbox local (SQLite) gravada junto com cada atualização e drenada em
+segundo plano para a API HTTP do D1, em lotes e com backoff; linhas
+recusadas pelo D1 são isoladas dividindo o lote e vão para outbox_dead
+
+Só a tabela `news` é replicada: o D1 (backend/schema.sql) não tem tabelas
+de clima nem de cotações.
+"""
+
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+import httpx
+
+from .logger import log_action
+from .storage import NEWS_DB_PATH, NewsStore, connect_sqlite, get_news_store
+
+try:
+    import fcntl
+except ImportError:  # Windows: um único worker drena a outbox
+    fcntl = None
+
+# Configurações
+CLOUDFLARE_ACCOUNT_ID = os.getenv('CLOUDFLARE_ACCOUNT_ID', '')
+CLOUDFLARE_DATABASE_ID = os.getenv('CLOUDFLARE_DATABASE_ID', '')
+CLOUDFLARE_API_TOKEN = os.getenv('CLOUDFLARE_API_TOKEN', '')
+# URL do endpoint /query (ex: o D1 local de utils/d1_local.py em testes)
+D1_API_URL = os.getenv('D1_API_URL') or (
+    f"https://api.cloudflare.com/client/v4/accounts/{CLOUDFLARE_ACCOUNT_ID}"
+    f"/d1/database/{CLOUDFLARE_DATABASE_ID}/query"
+)
+D1_SYNC_ENABLED = os.getenv('D1_SYNC_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+# Mesmo banco das notícias: a linha da outbox entra na transação da notícia
+D1_OUTBOX_DB_PATH = Path(os.getenv('D1_OUTBOX_DB_PATH', NEWS_DB_PATH))
+D1_SYNC_BATCH_SIZE = int(os.getenv('D1_SYNC_BATCH_SIZE', '200'))
+D1_SYNC_INTERVAL = float(os.getenv('D1_SYNC_INTERVAL', '1'))
+D1_SYNC_TIMEOUT = float(os.getenv('D1_SYNC_TIMEOUT', '15'))
+D1_SYNC_MAX_BACKOFF = float(os.getenv('D1_SYNC_MAX_BACKOFF', '300'))
+# Depois de tantas falhas transitórias a linha vai para a tabela outbox_dead
+# (uma linha recusada pelo D1 vai na primeira recusa)
+D1_SYNC_MAX_ATTEMPTS = int(os.getenv('D1_SYNC_MAX_ATTEMPTS', '20'))
+# Acima disso as atualizações são recusadas (503) até a outbox esvaziar
+D1_OUTBOX_MAX_PENDING = int(os.getenv('D1_OUTBOX_MAX_PENDING', '100000'))
+
+# Limite de parâmetros por instrução do D1
+D1_MAX_PARAMS = 100
+
+OUTBOX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+  seq INTEGER PRIMARY KEY AUTOINCREMENT,
+  table_name TEXT NOT NULL,
+  payload TEXT NOT NULL,
+  created_at REAL NOT NULL,
+  attempts INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS outbox_dead (
+  seq INTEGER PRIMARY KEY,
+  table_name TEXT NOT NULL,
+  payload TEXT NOT NULL,
+  created_at REAL NOT NULL,
+  attempts INTEGER NOT NULL,
+  error TEXT,
+  failed_at REAL NOT NULL
+);
+"""
+
+
+class OutboxFullError(Exception):
+    """Outbox com mais de D1_OUTBOX_MAX_PENDING linhas pendentes"""
+
+
+class D1Error(Exception):
+    """Falha na chamada à API do D1"""
+
+    def __init__(self, message: str, transient: bool = True):
+        super().__init__(message)
+        # False: o D1 recusou o conteúdo (SQL inválido, restrição); repetir não adianta
+        self.transient = transient
+
+
+# Respostas em que o D1 recusa as linhas enviadas (as outras são da rede,
+# da Cloudflare ou da configuração e valem para qualquer lote)
+D1_REJECTED_STATUS = {400, 409, 413, 422}
+
+
+def upsert_statements(table: str, rows: List[Dict]) -> List[Dict]:
+    """
+    INSERT OR REPLACE de várias linhas, dividido para respeitar D1_MAX_PARAMS
+
+    Returns:
+        Lista de {"sql", "params"} no formato da API /query do D1
+    """
+    columns = list(rows[0].keys())
+    per_statement = max(1, D1_MAX_PARAMS // len(columns))
+    placeholders = "(" + ", ".join("?" for _ in columns) + ")"
+    statements = []
+    for start in range(0, len(rows), per_statement):
+        chunk = rows[start:start + per_statement]
+        statements.append({
+            "sql": (
+                f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) "
+                f"VALUES {', '.join(placeholders for _ in chunk)}"
+            ),
+            "params": [row.get(column) for row in chunk for column in columns]
+        })
+    return statements
+
+
+def outbox_statements(rows: List[Dict]) -> List[Dict]:
+    """
+    Instruções de um lote da outbox: linhas consecutivas da mesma tabela
+    viram um INSERT de várias linhas
+    """
+    statements: List[Dict] = []
+    group: List[Dict] = []
+    table = rows[0]["table_name"]
+    for row in rows:
+        if row["table_name"] != table:
+            statements.extend(upsert_statements(table, group))
+            group, table = [], row["table_name"]
+        group.append(json.loads(row["payload"]))
+    statements.extend(upsert_statements(table, group))
+    return statements
+
+
+class D1Outbox:
+    """
+    Fila durável de linhas a replicar no D1
+
+    As rotas só fazem um INSERT local: na própria transação do NewsStore
+    quando a outbox está no mesmo banco (`attach`), senão em `enqueue`. Um
+    único worker por vez (flock no arquivo .outbox.lock) lê os mais antigos
+    em lotes de `batch_size`,
+    envia tudo em uma chamada à API e apaga o que foi aceito. Se o D1
+    recusa o lote, ele é dividido ao meio até isolar as linhas recusadas,
+    que vão para outbox_dead sem travar as outras; falhas transitórias
+    esperam um backoff exponencial com jitter. A fila é ilimitada até
+    `max_pending`, quando `ensure_capacity` passa a recusar novas escritas.
+    """
+
+    def __init__(self, path: Path = D1_OUTBOX_DB_PATH, url: str = D1_API_URL,
+                 token: str = CLOUDFLARE_API_TOKEN, enabled: bool = D1_SYNC_ENABLED,
+                 batch_size: int = D1_SYNC_BATCH_SIZE, interval: float = D1_SYNC_INTERVAL,
+                 max_pending: int = D1_OUTBOX_MAX_PENDING):
+        self.path = Path(path)
+        self.url = url
+        self.token = token
+        self.enabled = enabled
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_pending = max_pending
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._conn = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._task: Optional[asyncio.Task] = None
+        self._lock_fd: Optional[int] = None
+        self._wake = asyncio.Event()
+        # Tabelas gravadas na transação do próprio store (ver `attach`)
+        self._attached: Set[str] = set()
+        # Estatísticas do worker que drena
+        self.sent = 0
+        self.calls = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.last_success_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._next_attempt = 0.0
+
+    async def _run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    async def open(self) -> None:
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='d1-outbox')
+        self._conn = await self._run(connect_sqlite, self.path)
+        await self._run(self._conn.executescript, OUTBOX_SCHEMA)
+        if self.enabled:
+            headers = {"Authorization": f"Bearer {self.token}"} if self.token else {}
+            self._client = httpx.AsyncClient(timeout=D1_SYNC_TIMEOUT, headers=headers)
+            self._task = asyncio.create_task(self._drain_loop())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        self._release_lock()
+        if self._conn is not None:
+            await self._run(self._conn.close)
+            self._conn = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    # ---------- operações (na thread do executor) ----------
+
+    def _enqueue(self, table: str, rows: List[Dict], conn: Optional[sqlite3.Connection] = None) -> None:
+        now = time.time()
+        (conn or self._conn).executemany(
+            "INSERT INTO outbox (table_name, payload, created_at) VALUES (?, ?, ?)",
+            [(table, json.dumps(row, ensure_ascii=False, default=str), now) for row in rows]
+        )
+
+    def _pending(self) -> int:
+        # COUNT(*): linhas isoladas em outbox_dead deixam buracos na faixa de seq
+        return self._conn.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    def _fetch(self) -> List[Dict]:
+        rows = self._conn.execute(
+            "SELECT seq, table_name, payload, created_at, attempts FROM outbox ORDER BY seq LIMIT ?",
+            (self.batch_size,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def _delete(self, seqs: List[int]) -> None:
+        self._conn.executemany("DELETE FROM outbox WHERE seq = ?", [(s,) for s in seqs])
+
+    def _dead_letter(self, seqs: List[int], error: str) -> None:
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT INTO outbox_dead (seq, table_name, payload, created_at, attempts, error, failed_at) "
+                "SELECT seq, table_name, payload, created_at, attempts + 1, ?, ? FROM outbox WHERE seq = ?",
+                [(error, time.time(), s) for s in seqs]
+            )
+            conn.executemany("DELETE FROM outbox WHERE seq = ?", [(s,) for s in seqs])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _record_failure(self, seqs: List[int], error: str) -> int:
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany("UPDATE outbox SET attempts = attempts + 1 WHERE seq = ?", [(s,) for s in seqs])
+            dead = conn.execute(
+                "INSERT INTO outbox_dead (seq, table_name, payload, created_at, attempts, error, failed_at) "
+                "SELECT seq, table_name, payload, created_at, attempts, ?, ? FROM outbox WHERE attempts >= ?",
+                (error, time.time(), D1_SYNC_MAX_ATTEMPTS)
+            ).rowcount
+            conn.execute("DELETE FROM outbox WHERE attempts >= ?", (D1_SYNC_MAX_ATTEMPTS,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return dead
+
+    def _stats(self) -> Dict:
+        row = self._conn.execute("SELECT COUNT(*) AS pending, MIN(created_at) AS oldest FROM outbox").fetchone()
+        dead = self._conn.execute("SELECT COUNT(*) AS dead FROM outbox_dead").fetchone()["dead"]
+        return {"pending": row["pending"], "oldest": row["oldest"], "dead": dead}
+
+    # ---------- lock entre workers ----------
+
+    def _acquire_lock(self) -> bool:
+        if fcntl is None or self._lock_fd is not None:
+            return True
+        fd = os.open(self.path.with_suffix('.outbox.lock'), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        return True
+
+    def _release_lock(self) -> None:
+        if self._lock_fd is not None:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    # ---------- envio ----------
+
+    async def _send(self, statements: List[Dict]) -> None:
+        body = statements[0] if len(statements) == 1 else {"batch": statements}
+        try:
+            response = await self._client.post(self.url, json=body)
+        except httpx.HTTPError as e:
+            raise D1Error(f"{type(e).__name__}: {e}") from e
+
+        try:
+            data = response.json()
+        except ValueError:
+            data = {}
+        if response.status_code >= 400 or not data.get("success", False):
+            errors = data.get("errors") or response.text[:200]
+            rejected = response.status_code < 400 or response.status_code in D1_REJECTED_STATUS
+            raise D1Error(f"HTTP {response.status_code}: {errors}", transient=not rejected)
+
+    async def _deliver(self, rows: List[Dict]) -> Tuple[int, int]:
+        """
+        Envia `rows` e apaga da outbox o que o D1 aceitou; numa recusa divide
+        o lote ao meio até isolar as linhas recusadas (outbox_dead)
+
+        Returns:
+            (linhas replicadas, linhas movidas para outbox_dead)
+
+        Raises:
+            D1Error: falha transitória (as linhas ainda não enviadas ficam na outbox)
+        """
+        self.calls += 1
+        try:
+            await self._send(outbox_statements(rows))
+        except D1Error as e:
+            if e.transient:
+                raise
+            self.failures += 1
+            self.last_error = str(e)
+            if len(rows) == 1:
+                await self._run(self._dead_letter, [rows[0]["seq"]], str(e))
+                return 0, 1
+            half = len(rows) // 2
+            first = await self._deliver(rows[:half])
+            second = await self._deliver(rows[half:])
+            return first[0] + second[0], first[1] + second[1]
+
+        await self._run(self._delete, [row["seq"] for row in rows])
+        self.sent += len(rows)
+        return len(rows), 0
+
+    async def drain_once(self) -> int:
+        """
+        Envia um lote da outbox ao D1
+
+        Returns:
+            int com o número de linhas replicadas (0 se vazia ou se falhou)
+        """
+        rows = await self._run(self._fetch)
+        if not rows:
+            return 0
+
+        try:
+            sent, rejected = await self._deliver(rows)
+        except D1Error as e:
+            self.failures += 1
+            self.consecutive_failures += 1
+            self.last_error = str(e)
+            backoff = min(D1_SYNC_MAX_BACKOFF, self.interval * 2 ** self.consecutive_failures)
+            self._next_attempt = time.monotonic() + backoff * (0.5 + random.random() / 2)
+            # Linhas já aceitas numa divisão do lote saíram da outbox: só as outras contam
+            dead = await self._run(self._record_failure, [row["seq"] for row in rows], str(e))
+            if dead:
+                log_action("D1: linhas movidas para outbox_dead", "ERROR", "system",
+                           f"{dead} linha(s) após {D1_SYNC_MAX_ATTEMPTS} tentativas: {e}")
+            return 0
+
+        if rejected:
+            log_action("D1: linhas recusadas movidas para outbox_dead", "ERROR", "system",
+                       f"{rejected} de {len(rows)} linha(s): {self.last_error}")
+        self.consecutive_failures = 0
+        self.last_success_at = time.time()
+        return sent
+
+    async def _drain_loop(self) -> None:
+        while True:
+            try:
+                if not self._acquire_lock():
+                    # Outro worker está drenando
+                    await asyncio.sleep(self.interval * 5)
+                    continue
+
+                wait = self._next_attempt - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+
+                sent = await self.drain_once()
+                if sent < self.batch_size:
+                    self._wake.clear()
+                    try:
+                        await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+                    except asyncio.TimeoutError:
+                        pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                await asyncio.sleep(self.interval)
+
+    # ---------- API assíncrona ----------
+
+    async def ensure_capacity(self) -> None:
+        """
+        Raises:
+            OutboxFullError: se a outbox já tem `max_pending` linhas
+        """
+        if self.enabled and await self._run(self._pending) >= self.max_pending:
+            raise OutboxFullError(f"Outbox do D1 com {self.max_pending} linhas pendentes")
+
+    def attach(self, store: NewsStore, table: str = "news") -> bool:
+        """
+        Grava a outbox de `table` dentro da transação de escrita do store
+        (mesmo arquivo SQLite): a notícia e a linha a replicar são gravadas
+        juntas ou nenhuma delas
+
+        Returns:
+            bool: True se ligada (False: replicação desligada ou outro banco)
+        """
+        if not self.enabled:
+            return False
+        if store.add_write_hook(self.path, lambda conn, rows: self._enqueue(table, rows, conn)):
+            self._attached.add(table)
+            return True
+        return False
+
+    async def enqueue(self, table: str, rows: List[Dict]) -> None:
+        """
+        Agenda linhas (dicts coluna → valor) para INSERT OR REPLACE no D1
+
+        Tabelas ligadas por `attach` já foram gravadas na transação do store:
+        aqui só o envio é acordado.
+        """
+        if not self.enabled or not rows:
+            return
+        if table not in self._attached:
+            await self._run(self._enqueue, table, rows)
+        self._wake.set()
+
+    async def stats(self) -> Dict:
+        """
+        Estado da replicação: pendentes, atraso (lag) e contadores do envio
+
+        Returns:
+            Dict com pending, lag_seconds, dead e, no worker que drena,
+            sent, calls, failures, last_success_at, last_error
+        """
+        counts = await self._run(self._stats)
+        now = time.time()
+        return {
+            "enabled": self.enabled,
+            "pending": counts["pending"],
+            "dead": counts["dead"],
+            "lag_seconds": round(now - counts["oldest"], 3) if counts["oldest"] else 0.0,
+            "draining": self._lock_fd is not None or (fcntl is None and self.enabled),
+            "pid": os.getpid(),
+            "sent": self.sent,
+            "calls": self.calls,
+            "failures": self.failures,
+            "consecutive_failures": self.consecutive_failures,
+            "retry_in": round(max(0.0, self._next_attempt - time.monotonic()), 3),
+            "last_success_at": self.last_success_at,
+            "last_error": self.last_error
+        }
+
+
+_d1_outbox: Optional[D1Outbox] = None
+_d1_outbox_lock = asyncio.Lock()
+
+
+async def get_d1_outbox() -> D1Outbox:
+    """
+    Retorna a D1Outbox global, abrindo-a (e o envio, se habilitado) na primeira chamada
+    """
+    global _d1_outbox
+    if _d1_outbox is None:
+        async with _d1_outbox_lock:
+            if _d1_outbox is None:
+                outbox = D1Outbox()
+                await outbox.open()
+                outbox.attach(await get_news_store())
+                _d1_outbox = outbox
+    return _d1_outbox
+
+
+async def close_d1_outbox() -> None:
+    """
+    Para o envio e fecha a outbox global (pendências ficam para o próximo boot)
+    """
+    global _d1_outbox
+    if _d1_outbox is not None:
+        await _d1_outbox.close()
+        _d1_outbox = None
@@ -0,0 +1,119 @@
+"""
+🗺️ AGROISYNC IA - Gazetteer de Municípios
+Resolve localizações no formato "Município - UF" em coordenadas
+"""
+
+import csv
+import os
+import re
+import unicodedata
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+# Arquivo opcional com todos os municípios (CSV: municipio,uf,latitude,longitude)
+GAZETTEER_FILE = os.getenv('GAZETTEER_FILE', '')
+
+UFS = {
+    'AC', 'AL', 'AP', 'AM', 'BA', 'CE', 'DF', 'ES', 'GO', 'MA', 'MT', 'MS', 'MG', 'PA',
+    'PB', 'PR', 'PE', 'PI', 'RJ', 'RN', 'RS', 'RO', 'RR', 'SC', 'SP', 'SE', 'TO'
+}
+
+# Capitais e principais polos agrícolas (municipio, uf, lat, lon)
+_BUILTIN = (
+    ("Rio Branco", "AC", -9.9754, -67.8249),
+    ("Maceió", "AL", -9.6498, -35.7089),
+    ("Macapá", "AP", 0.0349, -51.0694),
+    ("Manaus", "AM", -3.1190, -60.0217),
+    ("Salvador", "BA", -12.9777, -38.5016),
+    ("Barreiras", "BA", -12.1439, -44.9968),
+    ("Luís Eduardo Magalhães", "BA", -12.0956, -45.7866),
+    ("Fortaleza", "CE", -3.7319, -38.5267),
+    ("Brasília", "DF", -15.7939, -47.8828),
+    ("Vitória", "ES", -20.3155, -40.3128),
+    ("Goiânia", "GO", -16.6869, -49.2648),
+    ("Rio Verde", "GO", -17.7923, -50.9192),
+    ("São Luís", "MA", -2.5307, -44.3068),
+    ("Cuiabá", "MT", -15.6014, -56.0979),
+    ("Sorriso", "MT", -12.5425, -55.7211),
+    ("Sinop", "MT", -11.8604, -55.5091),
+    ("Lucas do Rio Verde", "MT", -13.0588, -55.9042),
+    ("Rondonópolis", "MT", -16.4673, -54.6372),
+    ("Campo Grande", "MS", -20.4697, -54.6201),
+    ("Dourados", "MS", -22.2231, -54.8120),
+    ("Belo Horizonte", "MG", -19.9167, -43.9345),
+    ("Uberlândia", "MG", -18.9186, -48.2772),
+    ("Belém", "PA", -1.4558, -48.4902),
+    ("João Pessoa", "PB", -7.1195, -34.8450),
+    ("Curitiba", "PR", -25.4284, -49.2733),
+    ("Cascavel", "PR", -24.9573, -53.4590),
+    ("Londrina", "PR", -23.3045, -51.1696),
+    ("Maringá", "PR", -23.4205, -51.9333),
+    ("Recife", "PE", -8.0476, -34.8770),
+    ("Teresina", "PI", -5.0920, -42.8038),
+    ("Rio de Janeiro", "RJ", -22.9068, -43.1729),
+    ("Natal", "RN", -5.7945, -35.2110),
+    ("Porto Alegre", "RS", -30.0346, -51.2177),
+    ("Passo Fundo", "RS", -28.2620, -52.4083),
+    ("Porto Velho", "RO", -8.7612, -63.9004),
+    ("Boa Vista", "RR", 2.8235, -60.6758),
+    ("Florianópolis", "SC", -27.5954, -48.5480),
+    ("Chapecó", "SC", -27.1004, -52.6152),
+    ("São Paulo", "SP", -23.5505, -46.6333),
+    ("Campinas", "SP", -22.9056, -47.0608),
+    ("Ribeirão Preto", "SP", -21.1775, -47.8103),
+    ("Aracaju", "SE", -10.9472, -37.0731),
+    ("Palmas", "TO", -10.1840, -48.3336),
+)
+
+_coordinates: Dict[Tuple[str, str], Tuple[float, float]] = {}
+
+
+def normalize_name(name: str) -> str:
+    """
+    Nome sem acentos, minúsculo e com espaços simples
+    """
+    ascii_name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode()
+    return re.sub(r'\s+', ' ', ascii_name).strip().lower()
+
+
+def parse_location(location: str) -> Tuple[str, Optional[str]]:
+    """
+    Separa "São Paulo - SP" em ("São Paulo", "SP")
+
+    Returns:
+        (município, UF ou None se não houver sufixo de UF válido)
+    """
+    match = re.match(r'^(.*?)\s*[-/,]\s*([A-Za-z]{2})\s*$', location.strip())
+    if match and match.group(2).upper() in UFS:
+        return match.group(1).strip(), match.group(2).upper()
+    return location.strip(), None
+
+
+def _load() -> None:
+    for name, uf, lat, lon in _BUILTIN:
+        _coordinates[(normalize_name(name), uf)] = (lat, lon)
+
+    if GAZETTEER_FILE and Path(GAZETTEER_FILE).exists():
+        with open(GAZETTEER_FILE, 'r', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                try:
+                    key = (normalize_name(row['municipio']), row['uf'].strip().upper())
+                    _coordinates[key] = (float(row['latitude']), float(row['longitude']))
+                except (KeyError, ValueError):
+                    continue
+
+
+def resolve(location: str) -> Optional[Tuple[float, float]]:
+    """
+    Coordenadas (lat, lon) de uma localização "Município - UF"
+
+    Returns:
+        (lat, lon) ou None se o município não estiver no gazetteer
+    """
+    if not _coordinates:
+        _load()
+
+    name, uf = parse_location(location)
+    if uf is None:
+        return None
+    return _coordinates.get((normalize_name(name), uf))
@@ -0,0 +1,202 @@
+"""
+🔁 AGROISYNC IA - Idempotência e Deduplicação
+Tabela SQLite (compartilhada entre os workers) com as respostas já dadas
+por chave `Idempotency-Key` e por hash do conteúdo das atualizações
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, List, Optional, Tuple
+
+from .storage import DATA_DIR, connect_sqlite
+
+# Configurações
+IDEMPOTENCY_DB_PATH = Path(os.getenv('IDEMPOTENCY_DB_PATH', DATA_DIR / 'idempotency.db'))
+IDEMPOTENCY_KEY_TTL = float(os.getenv('IDEMPOTENCY_KEY_TTL', str(24 * 3600)))
+DEDUP_TTL = float(os.getenv('DEDUP_TTL', '600'))
+IDEMPOTENCY_MAX_ENTRIES = int(os.getenv('IDEMPOTENCY_MAX_ENTRIES', '100000'))
+# Requisição "em andamento" abandonada (worker morto) expira depois disso
+IDEMPOTENCY_PENDING_TIMEOUT = float(os.getenv('IDEMPOTENCY_PENDING_TIMEOUT', '60'))
+
+IDEMPOTENCY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS idempotency (
+  key TEXT PRIMARY KEY,
+  fingerprint TEXT,
+  status INTEGER,
+  response BLOB,
+  created_at REAL NOT NULL,
+  expires_at REAL NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_idempotency_expires ON idempotency(expires_at);
+"""
+
+# Resultados de reserve()
+NEW = "new"
+REPLAY = "replay"
+IN_PROGRESS = "in_progress"
+MISMATCH = "mismatch"
+
+
+def content_hash(payload: Any) -> str:
+    """
+    SHA-256 do JSON canônico (chaves ordenadas) do payload
+    """
+    canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class IdempotencyStore:
+    """
+    Reserva chaves antes de processar uma atualização e guarda a resposta depois
+
+    A reserva é um INSERT na chave primária: duas requisições iguais em
+    workers diferentes não passam ambas. A tabela é limitada por TTL e por
+    `max_entries` (as mais antigas saem primeiro).
+    """
+
+    def __init__(self, path: Path = IDEMPOTENCY_DB_PATH, max_entries: int = IDEMPOTENCY_MAX_ENTRIES):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._conn = None
+        self._writes = 0
+
+    async def _run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    async def open(self) -> None:
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='idempotency')
+        self._conn = await self._run(connect_sqlite, self.path)
+        await self._run(self._conn.executescript, IDEMPOTENCY_SCHEMA)
+        await self._run(self._prune)
+
+    async def close(self) -> None:
+        if self._conn is not None:
+            await self._run(self._conn.close)
+            self._conn = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    # ---------- operações (na thread do executor) ----------
+
+    def _reserve(self, keys: List[Tuple[str, Optional[str], float]]) -> Tuple[str, Optional[Tuple[int, bytes]]]:
+        now = time.time()
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for key, fingerprint, _ in keys:
+                row = conn.execute(
+                    "SELECT fingerprint, status, response, created_at, expires_at FROM idempotency WHERE key = ?",
+                    (key,)
+                ).fetchone()
+                if row is None or row["expires_at"] < now:
+                    continue
+                if row["status"] is None:
+                    if now - row["created_at"] < IDEMPOTENCY_PENDING_TIMEOUT:
+                        conn.execute("COMMIT")
+                        return IN_PROGRESS, None
+                    continue
+                if fingerprint and row["fingerprint"] and fingerprint != row["fingerprint"]:
+                    conn.execute("COMMIT")
+                    return MISMATCH, None
+                conn.execute("COMMIT")
+                return REPLAY, (row["status"], row["response"])
+
+            conn.executemany(
+                "INSERT OR REPLACE INTO idempotency (key, fingerprint, status, response, created_at, expires_at) "
+                "VALUES (?, ?, NULL, NULL, ?, ?)",
+                [(key, fingerprint, now, now + ttl) for key, fingerprint, ttl in keys]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return NEW, None
+
+    def _complete(self, keys: List[str], status: int, response: bytes) -> None:
+        self._conn.executemany(
+            "UPDATE idempotency SET status = ?, response = ? WHERE key = ?",
+            [(status, response, key) for key in keys]
+        )
+        self._writes += 1
+        if self._writes % 1000 == 0:
+            self._prune()
+
+    def _release(self, keys: List[str]) -> None:
+        self._conn.executemany(
+            "DELETE FROM idempotency WHERE key = ? AND status IS NULL",
+            [(key,) for key in keys]
+        )
+
+    def _prune(self) -> None:
+        self._conn.execute("DELETE FROM idempotency WHERE expires_at < ?", (time.time(),))
+        self._conn.execute(
+            "DELETE FROM idempotency WHERE key IN ("
+            "SELECT key FROM idempotency ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+    # ---------- API assíncrona ----------
+
+    async def reserve(self, keys: List[Tuple[str, Optional[str], float]]
+                      ) -> Tuple[str, Optional[Tuple[int, bytes]]]:
+        """
+        Tenta reservar as chaves para uma nova requisição
+
+        Args:
+            keys: Lista de (chave, fingerprint do payload ou None, TTL em segundos)
+
+        Returns:
+            (NEW, None) se pode processar; (REPLAY, (status, corpo)) se já há
+            resposta; (IN_PROGRESS, None) se outra requisição igual está em
+            andamento; (MISMATCH, None) se a chave foi usada com outro payload
+        """
+        return await self._run(self._reserve, keys)
+
+    async def complete(self, keys: List[str], status: int, response: bytes) -> None:
+        """
+        Guarda a resposta das chaves reservadas
+        """
+        await self._run(self._complete, keys, status, response)
+
+    async def release(self, keys: List[str]) -> None:
+        """
+        Libera as chaves de uma requisição que falhou (pode ser repetida)
+        """
+        await self._run(self._release, keys)
+
+
+_idempotency_store: Optional[IdempotencyStore] = None
+_idempotency_store_lock = asyncio.Lock()
+
+
+async def get_idempotency_store() -> IdempotencyStore:
+    """
+    Retorna o IdempotencyStore global, abrindo-o na primeira chamada
+    """
+    global _idempotency_store
+    if _idempotency_store is None:
+        async with _idempotency_store_lock:
+            if _idempotency_store is None:
+                store = IdempotencyStore()
+                await store.open()
+                _idempotency_store = store
+    return _idempotency_store
+
+
+async def close_idempotency_store() -> None:
+    """
+    Fecha o IdempotencyStore global (chamado no shutdown)
+    """
+    global _idempotency_store
+    if _idempotency_store is not None:
+        await _idempotency_store.close()
+        _idempotency_store = None
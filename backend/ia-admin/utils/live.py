@@ -0,0 +1,346 @@
+"""
+📡 AGROISYNC IA - Atualizações ao Vivo (WebSocket)
+Tópicos por série de cotação, UF e categoria de notícia; cada mudança é
+serializada uma vez e enviada aos assinantes do tópico, com as mensagens
+pendentes de clientes lentos agrupadas (só a mais recente por chave)
+"""
+
+import asyncio
+import json
+import os
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from .news_index import get_news_indexer
+from .text import fold
+from .timeseries import get_timeseries_store, series_key, series_plan_level
+from .analytics import get_series_analytics
+from .versions import get_version
+from .weather import get_weather_service
+
+# Configurações
+LIVE_POLL_INTERVAL = float(os.getenv('LIVE_POLL_INTERVAL', '0.25'))
+LIVE_MAX_CONNECTIONS = int(os.getenv('LIVE_MAX_CONNECTIONS', '10000'))
+LIVE_MAX_TOPICS = int(os.getenv('LIVE_MAX_TOPICS', '50'))
+# Mensagens pendentes (chaves distintas) por cliente lento; as mais antigas saem
+LIVE_MAX_PENDING = int(os.getenv('LIVE_MAX_PENDING', '100'))
+# Cliente que não recebe uma mensagem nesse tempo é desconectado
+LIVE_SEND_TIMEOUT = float(os.getenv('LIVE_SEND_TIMEOUT', '10'))
+
+TOPIC_KINDS = ("cotation", "weather", "news")
+
+
+def normalize_topic(topic: str) -> Optional[str]:
+    """
+    Forma canônica do tópico, ou None se inválido
+
+    - "cotation:Soja/B3" → "cotation:soja/b3" ("cotation:*" para todas as séries)
+    - "weather:mt" → "weather:MT" (UF; "weather:*" para todas)
+    - "news:Mercado" → "news:mercado" (categoria; "news:*" para todas)
+    """
+    kind, _, name = topic.strip().partition(':')
+    kind = kind.lower()
+    name = name.strip()
+    if kind not in TOPIC_KINDS or not name:
+        return None
+    if name == '*':
+        return f"{kind}:*"
+    if kind == "cotation":
+        product, _, market = name.partition('/')
+        if not product.strip() or not market.strip():
+            return None
+        return "cotation:" + "/".join(series_key(product, market))
+    if kind == "weather":
+        return f"weather:{name.upper()}"
+    return f"news:{fold(name)}"
+
+
+class LiveClient:
+    """
+    Conexão WebSocket: tópicos assinados e mensagens ainda não enviadas
+
+    Sem mensagens pendentes não há tarefa de envio nem dict alocados,
+    para milhares de conexões ociosas ocuparem pouco por worker.
+    """
+
+    __slots__ = ("websocket", "visible", "topics", "pending", "sender")
+
+    def __init__(self, websocket, visible: Callable[[str], bool]):
+        self.websocket = websocket
+        self.visible = visible
+        self.topics: Set[str] = set()
+        self.pending: Optional[Dict[str, str]] = None
+        self.sender: Optional[asyncio.Task] = None
+
+
+class LiveHub:
+    """
+    Assinaturas de tópicos dos clientes conectados a este worker
+
+    As mudanças chegam pelas mesmas sincronizações que mantêm os índices
+    locais (leituras de clima, notícias) e pela contagem de pontos das
+    séries de cotação, verificadas quando a versão do recurso muda — assim
+    atualizações recebidas por outros workers também são transmitidas.
+    """
+
+    def __init__(self):
+        self.clients: Set[LiveClient] = set()
+        self._topics: Dict[str, Set[LiveClient]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._versions: Dict[str, int] = {}
+        self._cotation_points: Dict[Tuple[str, str], int] = {}
+        self.messages = 0
+        self.deliveries = 0
+        self.coalesced = 0
+        self.dropped_clients = 0
+
+    # ---------- ciclo de vida ----------
+
+    async def open(self) -> None:
+        service = await get_weather_service()
+        service.add_listener(self._on_weather)
+        indexer = await get_news_indexer()
+        indexer.add_listener(self._on_news)
+
+        for resource in ("weather", "news", "cotations"):
+            self._versions[resource] = get_version(resource)
+        self._cotation_points = {
+            series_key(meta["product"], meta["market"]): meta["points"]
+            for meta in get_timeseries_store().list_series()
+        }
+        self._task = asyncio.create_task(self._poll_loop())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for client in list(self.clients):
+            if client.sender is not None:
+                client.sender.cancel()
+            try:
+                await client.websocket.close(code=1001)
+            except Exception:
+                pass
+        self.clients.clear()
+        self._topics.clear()
+
+    # ---------- conexões e assinaturas ----------
+
+    def full(self) -> bool:
+        return len(self.clients) >= LIVE_MAX_CONNECTIONS
+
+    def connect(self, websocket, visible: Callable[[str], bool]) -> LiveClient:
+        client = LiveClient(websocket, visible)
+        self.clients.add(client)
+        return client
+
+    def disconnect(self, client: LiveClient) -> None:
+        self.clients.discard(client)
+        for topic in client.topics:
+            subscribers = self._topics.get(topic)
+            if subscribers is not None:
+                subscribers.discard(client)
+                if not subscribers:
+                    del self._topics[topic]
+        client.topics.clear()
+        client.pending = None
+        if client.sender is not None and client.sender is not asyncio.current_task():
+            client.sender.cancel()
+        client.sender = None
+
+    def subscribe(self, client: LiveClient, topics: Iterable[str]) -> Tuple[List[str], List[str]]:
+        """
+        Returns:
+            (tópicos assinados, na forma canônica; tópicos rejeitados)
+        """
+        accepted, rejected = [], []
+        for topic in topics:
+            canonical = normalize_topic(topic)
+            if canonical is None or (canonical not in client.topics and len(client.topics) >= LIVE_MAX_TOPICS):
+                rejected.append(topic)
+                continue
+            client.topics.add(canonical)
+            self._topics.setdefault(canonical, set()).add(client)
+            accepted.append(canonical)
+        return accepted, rejected
+
+    def unsubscribe(self, client: LiveClient, topics: Iterable[str]) -> List[str]:
+        removed = []
+        for topic in topics:
+            canonical = normalize_topic(topic)
+            if canonical is None or canonical not in client.topics:
+                continue
+            client.topics.discard(canonical)
+            subscribers = self._topics.get(canonical)
+            if subscribers is not None:
+                subscribers.discard(client)
+                if not subscribers:
+                    del self._topics[canonical]
+            removed.append(canonical)
+        return removed
+
+    # ---------- transmissão ----------
+
+    def broadcast(self, topic: str, key: str, plan_level: str, data: Dict) -> int:
+        """
+        Envia uma mudança aos assinantes do tópico (e do curinga "tipo:*")
+
+        Args:
+            topic: Tópico canônico (ex: "cotation:soja/b3")
+            key: Chave de agrupamento: pendências com a mesma chave são substituídas
+            plan_level: Plano do conteúdo (clientes de planos menores não recebem)
+            data: Conteúdo da mensagem
+
+        Returns:
+            int com o número de clientes que receberam a mensagem
+        """
+        kind = topic.partition(':')[0]
+        recipients = self._topics.get(topic, set()) | self._topics.get(f"{kind}:*", set())
+        if not recipients:
+            return 0
+
+        text = None
+        delivered = 0
+        for client in recipients:
+            if not client.visible(plan_level):
+                continue
+            if text is None:
+                # Serializada uma única vez para todos os clientes
+                text = json.dumps({"topic": topic, "type": kind, "data": data},
+                                  ensure_ascii=False, separators=(",", ":"), default=str)
+                self.messages += 1
+            self._push(client, key, text)
+            delivered += 1
+        self.deliveries += delivered
+        return delivered
+
+    def _push(self, client: LiveClient, key: str, text: str) -> None:
+        if client.pending is None:
+            client.pending = {}
+        elif key in client.pending:
+            del client.pending[key]
+            self.coalesced += 1
+        client.pending[key] = text
+        if len(client.pending) > LIVE_MAX_PENDING:
+            del client.pending[next(iter(client.pending))]
+            self.coalesced += 1
+        if client.sender is None:
+            client.sender = asyncio.create_task(self._flush(client))
+
+    async def _flush(self, client: LiveClient) -> None:
+        try:
+            while client.pending:
+                batch, client.pending = client.pending, None
+                for text in batch.values():
+                    await asyncio.wait_for(client.websocket.send_text(text), timeout=LIVE_SEND_TIMEOUT)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Cliente lento demais ou conexão perdida
+            self.dropped_clients += 1
+            self.disconnect(client)
+            try:
+                await client.websocket.close(code=1008)
+            except Exception:
+                pass
+        finally:
+            client.sender = None
+
+    # ---------- fontes das mudanças ----------
+
+    def _on_weather(self, reading: Dict) -> None:
+        if not reading.get("uf"):
+            return
+        data = {k: v for k, v in reading.items() if k not in ("id", "location_key")}
+        self.broadcast(f"weather:{reading['uf']}", f"weather:{reading['location_key']}",
+                       reading["plan_level"], data)
+
+    def _on_news(self, rows: List[Dict]) -> None:
+        for row in rows:
+            data = {key: row[key] for key in ("id", "title", "category", "plan_level", "created_at")}
+            self.broadcast(f"news:{fold(row['category'] or '')}", f"news:{row['id']}", row["plan_level"], data)
+
+    def _poll_cotations(self) -> None:
+        store = get_timeseries_store()
+        for meta in store.list_series():
+            key = series_key(meta["product"], meta["market"])
+            if self._cotation_points.get(key, 0) == meta["points"]:
+                continue
+            self._cotation_points[key] = meta["points"]
+            series = store.get(meta["product"], meta["market"])
+            if series is None or not len(series):
+                continue
+            analytics = get_series_analytics(series)
+            topic = "cotation:" + "/".join(key)
+            self.broadcast(topic, topic, series_plan_level(meta["level"]), {
+                "product": analytics["product"],
+                "market": analytics["market"],
+                "price": analytics["last"],
+                "timestamp": analytics["last_timestamp"],
+                "previous_close": analytics["previous_close"],
+                "variation": analytics["variation"]
+            })
+
+    async def _poll_loop(self) -> None:
+        service = await get_weather_service()
+        indexer = await get_news_indexer()
+        while True:
+            await asyncio.sleep(LIVE_POLL_INTERVAL)
+            try:
+                for resource in ("weather", "news", "cotations"):
+                    version = get_version(resource)
+                    if version == self._versions.get(resource):
+                        continue
+                    self._versions[resource] = version
+                    if resource == "weather":
+                        await service.sync()
+                    elif resource == "news":
+                        await indexer.sync()
+                    else:
+                        self._poll_cotations()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"📡 Live: erro ao verificar atualizações: {type(e).__name__}: {e}")
+
+    def stats(self) -> Dict:
+        return {
+            "pid": os.getpid(),
+            "connections": len(self.clients),
+            "topics": len(self._topics),
+            "messages": self.messages,
+            "deliveries": self.deliveries,
+            "coalesced": self.coalesced,
+            "dropped_clients": self.dropped_clients
+        }
+
+
+_live_hub: Optional[LiveHub] = None
+_live_hub_lock = asyncio.Lock()
+
+
+async def get_live_hub() -> LiveHub:
+    """
+    Retorna o LiveHub global, ligando-o às fontes de mudanças na primeira chamada
+    """
+    global _live_hub
+    if _live_hub is None:
+        async with _live_hub_lock:
+            if _live_hub is None:
+                hub = LiveHub()
+                await hub.open()
+                _live_hub = hub
+    return _live_hub
+
+
+async def close_live_hub() -> None:
+    """
+    Fecha as conexões WebSocket e para a verificação de mudanças (chamado no shutdown)
+    """
+    global _live_hub
+    if _live_hub is not None:
+        await _live_hub.close()
+        _live_hub = None
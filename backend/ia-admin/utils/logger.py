@@ -12,11 +12,23 @@ from pathlib import Path
 _logs_memory: List[Dict] = []
 MAX_LOGS_IN_MEMORY = 100
 
+# Registros feitos por este worker desde o início (só cresce; marca o conteúdo da memória)
+_logged = 0
+
 # Arquivo de logs
 LOG_FILE = Path(__file__).parent.parent / 'ia_actions.log'
 
 
-def log_action(action: str, status: str = "OK", ip: str = "unknown", details: str = "") -> None:
+def _marker_file() -> Path:
+    # Tamanho do arquivo após o último registro que não é de auditoria (compartilhado entre workers)
+    return LOG_FILE.with_name(LOG_FILE.name + '.marker')
+
+# Leitura do fim do arquivo em blocos deste tamanho
+_TAIL_BLOCK = 64 * 1024
+
+
+def log_action(action: str, status: str = "OK", ip: str = "unknown", details: str = "",
+               audit: bool = False) -> None:
     """
     Registra uma ação da IA nos logs
     
@@ -25,7 +37,11 @@ def log_action(action: str, status: str = "OK", ip: str = "unknown", details: st
         status: Status da ação (OK, ERROR, BLOCKED, WARNING)
         ip: IP do cliente
         details: Detalhes adicionais (opcional)
+        audit: Registro só de auditoria (consultas aos próprios logs): vai
+            para o arquivo, mas não para a memória nem para log_marker(),
+            senão cada leitura mudaria o ETag da próxima
     """
+    global _logged
     timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     
     # Formatar log
@@ -41,7 +57,9 @@ def log_action(action: str, status: str = "OK", ip: str = "unknown", details: st
         "status": status,
         "details": details
     }
-    _logs_memory.append(log_dict)
+    if not audit:
+        _logs_memory.append(log_dict)
+        _logged += 1
     
     # Manter apenas últimos 100 em memória
     if len(_logs_memory) > MAX_LOGS_IN_MEMORY:
@@ -54,10 +72,30 @@ def log_action(action: str, status: str = "OK", ip: str = "unknown", details: st
         
         with open(LOG_FILE, 'a', encoding='utf-8') as f:
             f.write(log_entry + '\n')
+            size = f.tell()
+        if not audit:
+            _marker_file().write_text(str(size), encoding='utf-8')
     except Exception as e:
         print(f"❌ Erro ao salvar log em arquivo: {e}")
 
 
+def log_marker(source: str = "memory") -> str:
+    """
+    Marca do conteúdo atual dos logs, para compor ETags
+
+    Muda a cada registro que não é de auditoria: na memória, pelo contador
+    deste worker (com o PID); no arquivo, pelo tamanho após o último desses
+    registros (de qualquer worker). No arquivo as linhas de auditoria
+    continuam aparecendo, então o ETag derivado dela deve ser fraco.
+    """
+    if source != "file":
+        return f"{os.getpid()}-{_logged}"
+    try:
+        return _marker_file().read_text(encoding='utf-8').strip() or "0"
+    except OSError:
+        return "0"
+
+
 def get_logs(limit: int = 100) -> List[Dict]:
     """
     Retorna os logs mais recentes da memória
@@ -81,13 +119,29 @@ def get_logs_from_file(limit: int = 100) -> List[str]:
     Returns:
         Lista de strings com logs
     """
+    if limit <= 0:
+        return []
     try:
         if not LOG_FILE.exists():
             return []
         
-        with open(LOG_FILE, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-            return [line.strip() for line in lines[-limit:]]
+        # Lê blocos a partir do fim até ter `limit` linhas (sem carregar o arquivo todo)
+        with open(LOG_FILE, 'rb') as f:
+            position = f.seek(0, os.SEEK_END)
+            blocks = []
+            newlines = 0
+            while position > 0 and newlines <= limit:
+                size = min(_TAIL_BLOCK, position)
+                position -= size
+                f.seek(position)
+                block = f.read(size)
+                blocks.append(block)
+                newlines += block.count(b'\n')
+        lines = b''.join(reversed(blocks)).decode('utf-8', errors='replace').splitlines()
+        if position > 0:
+            # Primeira linha do bloco pode estar cortada
+            lines = lines[1:]
+        return [line.strip() for line in lines[-limit:]]
     except Exception as e:
         print(f"❌ Erro ao ler arquivo de log: {e}")
         return []
@@ -110,6 +164,7 @@ def clear_logs() -> bool:
         # Limpar arquivo
         if LOG_FILE.exists():
             LOG_FILE.unlink()
+        _marker_file().unlink(missing_ok=True)
         
         log_action("Logs limpos", "OK", "system", "Todos os logs foram removidos")
         return True
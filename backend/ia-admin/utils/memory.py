@@ -0,0 +1,194 @@
+"""
+🧮 AGROISYNC IA - Diagnóstico de Memória
+Módulo responsável por snapshots do tracemalloc e diffs de alocação
+"""
+
+import os
+import tracemalloc
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, Dict, Optional
+
+# Configurações
+MAX_SNAPSHOTS = int(os.getenv('IA_MEMORY_MAX_SNAPSHOTS', '5'))
+DEFAULT_FRAMES = int(os.getenv('IA_TRACEMALLOC_FRAMES', '1'))
+
+# Snapshots guardados por id (os mais antigos são descartados)
+_snapshots: "OrderedDict[str, Dict]" = OrderedDict()
+_snapshot_counter = 0
+
+# Ignorar alocações do próprio tracemalloc e do mecanismo de import
+_SNAPSHOT_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+
+
+def _current_rss_bytes() -> Optional[int]:
+    """
+    Lê o RSS atual do processo (apenas Linux, via /proc)
+
+    Returns:
+        int com bytes residentes ou None se indisponível
+    """
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def start_tracing(frames: int = DEFAULT_FRAMES) -> Dict:
+    """
+    Liga o tracemalloc em tempo de execução
+
+    Args:
+        frames: Profundidade da pilha guardada por alocação
+
+    Returns:
+        Dict com o estado do rastreamento
+    """
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(max(1, frames))
+    return get_memory_status()
+
+
+def stop_tracing() -> Dict:
+    """
+    Desliga o tracemalloc e descarta os snapshots (que ficam inválidos)
+
+    Returns:
+        Dict com o estado do rastreamento
+    """
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _snapshots.clear()
+    return get_memory_status()
+
+
+def take_snapshot() -> Dict:
+    """
+    Tira um snapshot das alocações atuais
+
+    Returns:
+        Dict com id e metadados do snapshot
+
+    Raises:
+        RuntimeError: se o tracemalloc estiver desligado
+    """
+    global _snapshot_counter
+
+    if not tracemalloc.is_tracing():
+        raise RuntimeError("tracemalloc não está ativo")
+
+    snapshot = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+    current, peak = tracemalloc.get_traced_memory()
+
+    _snapshot_counter += 1
+    snapshot_id = str(_snapshot_counter)
+    meta = {
+        "id": snapshot_id,
+        "pid": os.getpid(),
+        "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        "traced_current": current,
+        "traced_peak": peak,
+        "rss": _current_rss_bytes(),
+    }
+    _snapshots[snapshot_id] = {"snapshot": snapshot, "meta": meta}
+
+    while len(_snapshots) > MAX_SNAPSHOTS:
+        _snapshots.popitem(last=False)
+
+    return meta
+
+
+def list_snapshots() -> List[Dict]:
+    """
+    Lista os snapshots guardados neste worker
+
+    Returns:
+        Lista de metadados dos snapshots
+    """
+    return [entry["meta"] for entry in _snapshots.values()]
+
+
+def diff_snapshots(base_id: Optional[str] = None, target_id: Optional[str] = None,
+                   top: int = 20, group_by: str = "lineno") -> Dict:
+    """
+    Compara dois snapshots e retorna as N maiores diferenças de alocação
+
+    Args:
+        base_id: Snapshot de referência (padrão: o mais antigo guardado)
+        target_id: Snapshot comparado (padrão: um snapshot novo, tirado agora)
+        top: Número de linhas do ranking
+        group_by: "lineno" (arquivo e linha) ou "filename"
+
+    Returns:
+        Dict com o ranking de diferenças
+
+    Raises:
+        RuntimeError: se o tracemalloc estiver desligado
+        KeyError: se algum snapshot não existir
+        ValueError: se group_by for inválido
+    """
+    if group_by not in ("lineno", "filename"):
+        raise ValueError("group_by deve ser 'lineno' ou 'filename'")
+
+    if not _snapshots:
+        raise KeyError("nenhum snapshot guardado")
+
+    if base_id is None:
+        base_id = next(iter(_snapshots))
+    base = _snapshots[base_id]
+
+    if target_id is None:
+        target_meta = take_snapshot()
+        target_id = target_meta["id"]
+    target = _snapshots[target_id]
+
+    stats = target["snapshot"].compare_to(base["snapshot"], group_by)
+
+    top_stats = []
+    for stat in stats[:max(1, top)]:
+        frame = stat.traceback[0]
+        top_stats.append({
+            "file": frame.filename,
+            "line": frame.lineno if group_by == "lineno" else None,
+            "size": stat.size,
+            "size_diff": stat.size_diff,
+            "count": stat.count,
+            "count_diff": stat.count_diff,
+        })
+
+    return {
+        "pid": os.getpid(),
+        "base": base["meta"],
+        "target": target["meta"],
+        "group_by": group_by,
+        "total_size_diff": sum(stat.size_diff for stat in stats),
+        "top": top_stats,
+    }
+
+
+def get_memory_status() -> Dict:
+    """
+    Retorna o estado do rastreamento de memória deste worker
+
+    Returns:
+        Dict com estado, memória rastreada e RSS
+    """
+    tracing = tracemalloc.is_tracing()
+    current, peak = tracemalloc.get_traced_memory() if tracing else (0, 0)
+
+    return {
+        "pid": os.getpid(),
+        "tracing": tracing,
+        "frames": tracemalloc.get_traceback_limit() if tracing else 0,
+        "traced_current": current,
+        "traced_peak": peak,
+        "rss": _current_rss_bytes(),
+        "snapshots": len(_snapshots),
+    }
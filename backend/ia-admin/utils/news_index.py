@@ -0,0 +1,122 @@
+"""
+🗂️ AGROISYNC IA - Índices de Notícias em Memória
+Acompanha a tabela `news` (gravada por qualquer worker) e alimenta os
+índices locais do processo: quase duplicatas e busca por palavras-chave
+"""
+
+import asyncio
+import os
+import time
+from typing import Callable, Dict, List, Optional
+
+from .neardup import NearDuplicateIndex
+from .search import NewsSearchIndex
+from .storage import NewsStore, get_news_store
+from .versions import get_version
+
+# Configurações
+NEWS_INDEX_SYNC_INTERVAL = float(os.getenv('NEWS_INDEX_SYNC_INTERVAL', '5'))
+
+_FETCH_LIMIT = 5000
+
+
+class NewsIndexer:
+    """
+    Lê as notícias novas (por rowid) quando a versão "news" muda e repassa
+    cada lote de linhas aos listeners (sem as quase duplicatas marcadas:
+    ficam fora da busca e as novas notícias só casam com as originais)
+
+    A carga inicial roda em uma thread antes do indexador ser publicado;
+    depois disso os lotes são pequenos e aplicados no event loop.
+    """
+
+    def __init__(self, store: NewsStore, sync_interval: float = NEWS_INDEX_SYNC_INTERVAL):
+        self.store = store
+        self.sync_interval = sync_interval
+        self.neardup = NearDuplicateIndex()
+        self.search = NewsSearchIndex()
+        self._listeners: List[Callable[[List[Dict]], None]] = [self.neardup.add_rows, self.search.add_rows]
+        self._sync_lock = asyncio.Lock()
+        self._last_seq = 0
+        self._last_sync = 0.0
+        self._synced_version: Optional[int] = None
+
+    def add_listener(self, listener: Callable[[List[Dict]], None]) -> None:
+        """
+        Registra uma função chamada com cada lote de notícias novas
+        """
+        self._listeners.append(listener)
+
+    def _dispatch(self, rows: List[Dict]) -> None:
+        rows = [row for row in rows if not row.get("near_duplicate_of")]
+        if not rows:
+            return
+        for listener in self._listeners:
+            listener(rows)
+
+    async def open(self) -> None:
+        version = get_version("news")
+        while True:
+            rows = await self.store.list_after(self._last_seq, _FETCH_LIMIT)
+            if rows:
+                await asyncio.to_thread(self._dispatch, rows)
+                self._last_seq = rows[-1]["seq"]
+            if len(rows) < _FETCH_LIMIT:
+                break
+        self._last_sync = time.monotonic()
+        self._synced_version = version
+
+    async def sync(self, force: bool = False) -> int:
+        """
+        Aplica as notícias gravadas desde a última sincronização
+
+        Args:
+            force: Ignorar o intervalo mínimo entre sincronizações
+
+        Returns:
+            int com o número de notícias aplicadas
+        """
+        version = get_version("news")
+        recent = time.monotonic() - self._last_sync < self.sync_interval
+        if not force and version == self._synced_version and recent:
+            return 0
+
+        applied = 0
+        async with self._sync_lock:
+            while True:
+                rows = await self.store.list_after(self._last_seq, _FETCH_LIMIT)
+                if rows:
+                    self._dispatch(rows)
+                    self._last_seq = rows[-1]["seq"]
+                applied += len(rows)
+                if len(rows) < _FETCH_LIMIT:
+                    break
+            self._last_sync = time.monotonic()
+            self._synced_version = version
+        return applied
+
+
+_news_indexer: Optional[NewsIndexer] = None
+_news_indexer_lock = asyncio.Lock()
+
+
+async def get_news_indexer() -> NewsIndexer:
+    """
+    Retorna o NewsIndexer global, carregando as notícias na primeira chamada
+    """
+    global _news_indexer
+    if _news_indexer is None:
+        async with _news_indexer_lock:
+            if _news_indexer is None:
+                indexer = NewsIndexer(await get_news_store())
+                await indexer.open()
+                _news_indexer = indexer
+    return _news_indexer
+
+
+def close_news_indexer() -> None:
+    """
+    Descarta os índices em memória (chamado no shutdown)
+    """
+    global _news_indexer
+    _news_indexer = None
@@ -0,0 +1,96 @@
+"""
+🎫 AGROISYNC IA - Matriz de Features por Plano
+Features e planos lidos da configuração e compilados em bitmasks:
+cada feature vira um bit, cada plano a máscara das suas features, e
+verificar o acesso é um único AND
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .storage import DATA_DIR
+
+# Configurações
+# JSON {"plano": ["feature", ...]}; "all" libera todas as features, inclusive as não listadas
+PLANS_FILE = Path(os.getenv('PLANS_FILE', DATA_DIR / 'plans.json'))
+PLAN_FEATURES_JSON = os.getenv('PLAN_FEATURES_JSON', '')
+PLANS_CHECK_BATCH_MAX = int(os.getenv('PLANS_CHECK_BATCH_MAX', '100'))
+
+# Usada quando nem PLAN_FEATURES_JSON nem PLANS_FILE existem
+DEFAULT_PLAN_FEATURES: Dict[str, List[str]] = {
+    "gratuito": ["basic_search", "view_products", "view_freights"],
+    "pro": ["basic_search", "view_products", "view_freights", "unlimited_posts", "analytics", "api_access"],
+    "loja": ["basic_search", "view_products", "view_freights", "unlimited_posts", "analytics", "store_dashboard"],
+    "admin": ["all"]
+}
+
+ALL_FEATURES = "all"
+
+
+def load_plan_features() -> Dict[str, List[str]]:
+    """
+    Matriz plano → features da configuração (PLAN_FEATURES_JSON, PLANS_FILE ou padrão)
+    """
+    if PLAN_FEATURES_JSON.strip():
+        return json.loads(PLAN_FEATURES_JSON)
+    if PLANS_FILE.exists():
+        return json.loads(PLANS_FILE.read_text(encoding='utf-8'))
+    return DEFAULT_PLAN_FEATURES
+
+
+class PlanMatrix:
+    """
+    Matriz compilada: feature → bit e plano → máscara (ints do Python)
+
+    Features que não aparecem em nenhum plano compartilham um bit reservado,
+    presente só nas máscaras dos planos com "all"; plano desconhecido tem
+    máscara 0.
+    """
+
+    def __init__(self, plan_features: Dict[str, List[str]]):
+        self.bits: Dict[str, int] = {}
+        for features in plan_features.values():
+            for feature in features:
+                if feature != ALL_FEATURES and feature not in self.bits:
+                    self.bits[feature] = 1 << len(self.bits)
+        self.unknown_bit = 1 << len(self.bits)
+        everything = (self.unknown_bit << 1) - 1
+
+        self.masks: Dict[str, int] = {}
+        for plan, features in plan_features.items():
+            mask = 0
+            for feature in features:
+                mask |= everything if feature == ALL_FEATURES else self.bits[feature]
+            self.masks[plan] = mask
+
+    def bit(self, feature: str) -> int:
+        return self.bits.get(feature, self.unknown_bit)
+
+    def mask(self, plan: str) -> int:
+        return self.masks.get(plan, 0)
+
+    def has_access(self, plan: str, feature: str) -> bool:
+        return self.mask(plan) & self.bit(feature) != 0
+
+    def features(self, plan: str) -> List[str]:
+        """
+        Features conhecidas liberadas para o plano
+        """
+        mask = self.mask(plan)
+        return [feature for feature, bit in self.bits.items() if mask & bit]
+
+
+_plan_matrix: Optional[PlanMatrix] = None
+
+
+def get_plan_matrix() -> PlanMatrix:
+    """
+    Retorna a matriz global, compilando a configuração na primeira chamada
+    """
+    global _plan_matrix
+    if _plan_matrix is None:
+        _plan_matrix = PlanMatrix(load_plan_features())
+    return _plan_matrix
+
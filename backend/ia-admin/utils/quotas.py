@@ -0,0 +1,377 @@
+"""
+📏 AGROISYNC IA - Cotas de Uso por Usuário
+Contadores por usuário e métrica (chamadas de API, publicações) em janelas
+deslizantes de 24 horas e 30 dias, mantidos na memória do worker e
+gravados no SQLite em lotes
+"""
+
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from .storage import DATA_DIR, connect_sqlite
+
+# Configurações
+QUOTAS_DB_PATH = Path(os.getenv('QUOTAS_DB_PATH', DATA_DIR / 'quotas.db'))
+# Métrica → plano → {"day": limite em 24h, "month": limite em 30 dias}; plano ausente = ilimitado
+QUOTA_LIMITS: Dict[str, Dict[str, Dict[str, int]]] = json.loads(os.getenv('QUOTA_LIMITS', '') or json.dumps({
+    "api_calls": {"pro": {"day": 10000, "month": 200000}},
+    "posts": {"gratuito": {"day": 5, "month": 30}}
+}))
+# Feature do plano exigida por cada métrica
+QUOTA_FEATURES: Dict[str, str] = json.loads(os.getenv('QUOTA_FEATURES', '') or json.dumps({
+    "api_calls": "api_access"
+}))
+QUOTA_FLUSH_INTERVAL = float(os.getenv('QUOTA_FLUSH_INTERVAL', '1'))
+# Contagens de outros workers são relidas do banco nesse intervalo (usuários ativos)
+QUOTA_REFRESH_INTERVAL = float(os.getenv('QUOTA_REFRESH_INTERVAL', '5'))
+QUOTA_MAX_ENTRIES = int(os.getenv('QUOTA_MAX_ENTRIES', '100000'))
+
+HOUR = 3600
+DAY = 86400
+DAY_BUCKETS = 24    # janela "day": 24 baldes de 1 hora
+MONTH_BUCKETS = 30  # janela "month": 30 baldes de 1 dia
+
+QUOTAS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS quota_usage (
+  user_id TEXT NOT NULL,
+  metric TEXT NOT NULL,
+  period TEXT NOT NULL,
+  bucket INTEGER NOT NULL,
+  count INTEGER NOT NULL,
+  PRIMARY KEY (user_id, metric, period, bucket)
+) WITHOUT ROWID;
+"""
+
+_PRUNE_EVERY = 600
+
+
+class _Usage:
+    """
+    Baldes (hora → contagem, dia → contagem) de um usuário em uma métrica,
+    com os totais das janelas e os incrementos ainda não gravados
+
+    Os totais só são recalculados quando a hora ou o dia mudam (no máximo
+    24 ou 30 baldes), então consultar e incrementar custa O(1).
+    """
+
+    __slots__ = ("hours", "days", "hour", "day", "day_total", "month_total",
+                 "pending_hours", "pending_days", "loaded_at")
+
+    def __init__(self):
+        self.hours: Dict[int, int] = {}
+        self.days: Dict[int, int] = {}
+        self.hour = -1
+        self.day = -1
+        self.day_total = 0
+        self.month_total = 0
+        self.pending_hours: Dict[int, int] = {}
+        self.pending_days: Dict[int, int] = {}
+        self.loaded_at = 0.0
+
+    def roll(self, now: float) -> None:
+        hour = int(now // HOUR)
+        if hour != self.hour:
+            self.hour = hour
+            self.hours = {b: c for b, c in self.hours.items() if b > hour - DAY_BUCKETS}
+            self.day_total = sum(self.hours.values())
+        day = int(now // DAY)
+        if day != self.day:
+            self.day = day
+            self.days = {b: c for b, c in self.days.items() if b > day - MONTH_BUCKETS}
+            self.month_total = sum(self.days.values())
+
+    def add(self, amount: int) -> None:
+        self.hours[self.hour] = self.hours.get(self.hour, 0) + amount
+        self.days[self.day] = self.days.get(self.day, 0) + amount
+        self.pending_hours[self.hour] = self.pending_hours.get(self.hour, 0) + amount
+        self.pending_days[self.day] = self.pending_days.get(self.day, 0) + amount
+        self.day_total += amount
+        self.month_total += amount
+
+    def load(self, hours: Dict[int, int], days: Dict[int, int], now: float) -> None:
+        # Contagens do banco (todos os workers) + o que este worker ainda não gravou
+        for bucket, count in self.pending_hours.items():
+            hours[bucket] = hours.get(bucket, 0) + count
+        for bucket, count in self.pending_days.items():
+            days[bucket] = days.get(bucket, 0) + count
+        self.hours, self.days = hours, days
+        self.hour = self.day = -1
+        self.roll(now)
+        self.loaded_at = time.monotonic()
+
+    def retry_after(self, window: str, now: float) -> int:
+        # Segundos até o balde mais antigo sair da janela
+        if window == "day":
+            oldest = min(self.hours, default=self.hour)
+            return max(1, int((oldest + DAY_BUCKETS) * HOUR - now))
+        oldest = min(self.days, default=self.day)
+        return max(1, int((oldest + MONTH_BUCKETS) * DAY - now))
+
+
+class QuotaMeter:
+    """
+    Cotas por (usuário, métrica) nas janelas "day" (24 h) e "month" (30 dias)
+
+    `consume` decide só com os contadores em memória. A cada
+    `flush_interval` os incrementos acumulados vão ao banco em uma
+    transação e os usuários ativos têm as contagens relidas, incluindo as
+    dos outros workers — entre duas leituras um usuário pode passar do
+    limite em no máximo o que fez nos outros workers nesse intervalo.
+    """
+
+    def __init__(self, path: Path = QUOTAS_DB_PATH,
+                 limits: Dict[str, Dict[str, Dict[str, int]]] = QUOTA_LIMITS,
+                 flush_interval: float = QUOTA_FLUSH_INTERVAL,
+                 refresh_interval: float = QUOTA_REFRESH_INTERVAL,
+                 max_entries: int = QUOTA_MAX_ENTRIES):
+        self.path = Path(path)
+        self.limits = limits
+        self.flush_interval = flush_interval
+        self.refresh_interval = refresh_interval
+        self.max_entries = max_entries
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._conn = None
+        self._task: Optional[asyncio.Task] = None
+        self._entries: Dict[Tuple[str, str], _Usage] = {}
+        self._dirty: Set[Tuple[str, str]] = set()
+        self._stale: Set[Tuple[str, str]] = set()
+        self._flushes = 0
+        self.allowed = 0
+        self.denied = 0
+        self.flushed_rows = 0
+        self.flush_errors = 0
+
+    async def _run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    async def open(self) -> None:
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='quotas')
+        self._conn = await self._run(connect_sqlite, self.path)
+        await self._run(self._conn.executescript, QUOTAS_SCHEMA)
+        self._task = asyncio.create_task(self._flush_loop())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._conn is not None:
+            await self.flush()
+            await self._run(self._conn.close)
+            self._conn = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    # ---------- contadores (event loop) ----------
+
+    def limit(self, metric: str, plan: str) -> Optional[Dict[str, int]]:
+        """
+        Limites {"day", "month"} da métrica no plano (None: ilimitado)
+        """
+        return self.limits.get(metric, {}).get(plan)
+
+    def _entry(self, user_id: str, metric: str, now: float) -> _Usage:
+        key = (user_id, metric)
+        entry = self._entries.get(key)
+        if entry is None:
+            if len(self._entries) >= self.max_entries:
+                self._evict()
+            entry = self._entries[key] = _Usage()
+        if time.monotonic() - entry.loaded_at > self.refresh_interval:
+            self._stale.add(key)
+        entry.roll(now)
+        return entry
+
+    def _evict(self) -> None:
+        # Descarta entradas já gravadas (as com incrementos pendentes ficam)
+        for key in [k for k in self._entries if k not in self._dirty][:max(1, self.max_entries // 10)]:
+            del self._entries[key]
+            self._stale.discard(key)
+
+    @staticmethod
+    def _describe(entry: _Usage, limits: Optional[Dict[str, int]]) -> Dict:
+        usage = {}
+        for window, used in (("day", entry.day_total), ("month", entry.month_total)):
+            limit = limits.get(window) if limits else None
+            usage[window] = {
+                "used": used,
+                "limit": limit,
+                "remaining": max(0, limit - used) if limit is not None else None
+            }
+        return usage
+
+    def consume(self, user_id: str, plan: str, metric: str, amount: int = 1) -> Tuple[bool, Dict]:
+        """
+        Conta `amount` usos se couberem nas duas janelas
+
+        Returns:
+            (permitido, uso por janela {"used", "limit", "remaining"} e, se
+            negado, "retry_after" em segundos)
+        """
+        now = time.time()
+        entry = self._entry(user_id, metric, now)
+        limits = self.limit(metric, plan)
+        if limits:
+            for window, used in (("day", entry.day_total), ("month", entry.month_total)):
+                limit = limits.get(window)
+                if limit is not None and used + amount > limit:
+                    self.denied += 1
+                    usage = self._describe(entry, limits)
+                    usage["exceeded"] = window
+                    usage["retry_after"] = entry.retry_after(window, now)
+                    return False, usage
+        entry.add(amount)
+        self._dirty.add((user_id, metric))
+        self.allowed += 1
+        return True, self._describe(entry, limits)
+
+    def usage(self, user_id: str, plan: str, metric: str) -> Dict:
+        """
+        Uso atual da métrica nas duas janelas, sem contar
+        """
+        return self._describe(self._entry(user_id, metric, time.time()), self.limit(metric, plan))
+
+    # ---------- gravação em lote (thread do executor) ----------
+
+    def _write(self, deltas: List[Tuple], keys: List[Tuple[str, str]], now: float) -> Dict:
+        conn = self._conn
+        loaded: Dict[Tuple[str, str], Tuple[Dict[int, int], Dict[int, int]]] = {}
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT INTO quota_usage (user_id, metric, period, bucket, count) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (user_id, metric, period, bucket) DO UPDATE SET count = count + excluded.count",
+                deltas
+            )
+            first_hour = int(now // HOUR) - DAY_BUCKETS + 1
+            first_day = int(now // DAY) - MONTH_BUCKETS + 1
+            for user_id, metric in keys:
+                hours, days = {}, {}
+                for row in conn.execute(
+                    "SELECT period, bucket, count FROM quota_usage WHERE user_id = ? AND metric = ? "
+                    "AND ((period = 'h' AND bucket >= ?) OR (period = 'd' AND bucket >= ?))",
+                    (user_id, metric, first_hour, first_day)
+                ):
+                    (hours if row["period"] == 'h' else days)[row["bucket"]] = row["count"]
+                loaded[(user_id, metric)] = (hours, days)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        self._flushes += 1
+        if self._flushes % _PRUNE_EVERY == 0:
+            conn.execute(
+                "DELETE FROM quota_usage WHERE (period = 'h' AND bucket < ?) OR (period = 'd' AND bucket < ?)",
+                (first_hour, first_day)
+            )
+        return loaded
+
+    async def flush(self) -> int:
+        """
+        Grava os incrementos pendentes e relê as contagens dos usuários ativos
+
+        Returns:
+            int com o número de linhas (usuário, métrica, balde) gravadas
+        """
+        dirty, self._dirty = self._dirty, set()
+        stale, self._stale = self._stale, set()
+        taken: Dict[Tuple[str, str], Tuple[Dict[int, int], Dict[int, int]]] = {}
+        deltas = []
+        for key in dirty:
+            entry = self._entries.get(key)
+            if entry is None:
+                continue
+            taken[key] = (entry.pending_hours, entry.pending_days)
+            entry.pending_hours, entry.pending_days = {}, {}
+            user_id, metric = key
+            deltas.extend((user_id, metric, 'h', b, c) for b, c in taken[key][0].items())
+            deltas.extend((user_id, metric, 'd', b, c) for b, c in taken[key][1].items())
+        refresh = [key for key in stale | dirty if key in self._entries]
+        if not deltas and not refresh:
+            return 0
+
+        now = time.time()
+        try:
+            loaded = await self._run(self._write, deltas, refresh, now)
+        except Exception:
+            # Devolve os incrementos para a próxima tentativa
+            self.flush_errors += 1
+            for key, (hours, days) in taken.items():
+                entry = self._entries.get(key)
+                if entry is None:
+                    entry = self._entries[key] = _Usage()
+                for bucket, count in hours.items():
+                    entry.pending_hours[bucket] = entry.pending_hours.get(bucket, 0) + count
+                for bucket, count in days.items():
+                    entry.pending_days[bucket] = entry.pending_days.get(bucket, 0) + count
+                self._dirty.add(key)
+            self._stale |= stale
+            raise
+
+        now = time.time()
+        for key, (hours, days) in loaded.items():
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.load(hours, days, now)
+        self.flushed_rows += len(deltas)
+        return len(deltas)
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"📏 Cotas: erro ao gravar contadores: {type(e).__name__}: {e}")
+
+    def stats(self) -> Dict:
+        return {
+            "pid": os.getpid(),
+            "entries": len(self._entries),
+            "pending": len(self._dirty),
+            "allowed": self.allowed,
+            "denied": self.denied,
+            "flushed_rows": self.flushed_rows,
+            "flush_errors": self.flush_errors
+        }
+
+
+_quota_meter: Optional[QuotaMeter] = None
+_quota_meter_lock = asyncio.Lock()
+
+
+async def get_quota_meter() -> QuotaMeter:
+    """
+    Retorna o QuotaMeter global, iniciando a gravação em lote na primeira chamada
+    """
+    global _quota_meter
+    if _quota_meter is None:
+        async with _quota_meter_lock:
+            if _quota_meter is None:
+                meter = QuotaMeter()
+                await meter.open()
+                _quota_meter = meter
+    return _quota_meter
+
+
+async def close_quota_meter() -> None:
+    """
+    Grava os contadores pendentes e fecha o banco (chamado no shutdown)
+    """
+    global _quota_meter
+    if _quota_meter is not None:
+        await _quota_meter.close()
+        _quota_meter = None
@@ -0,0 +1,216 @@
+"""
+🔎 AGROISYNC IA - Busca de Notícias
+Índice invertido em memória (título + conteúdo) com ranking BM25 e
+listas de postings em arrays ordenados de inteiros
+"""
+
+import math
+import os
+from array import array
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .text import tokenize
+
+# Configurações
+SEARCH_BM25_K1 = float(os.getenv('SEARCH_BM25_K1', '1.2'))
+SEARCH_BM25_B = float(os.getenv('SEARCH_BM25_B', '0.75'))
+# Cada token do título conta como N ocorrências
+SEARCH_TITLE_WEIGHT = int(os.getenv('SEARCH_TITLE_WEIGHT', '2'))
+# Contribuições BM25 já calculadas por termo (descartadas quando o índice muda)
+SEARCH_CACHE_MAX_BYTES = int(os.getenv('SEARCH_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+
+_MAX_TF = 65535
+
+
+class _Postings:
+    """
+    Documentos (slots crescentes, int32) e frequências (uint16) de um termo
+    """
+
+    __slots__ = ("docs", "freqs")
+
+    def __init__(self):
+        self.docs = array('i')
+        self.freqs = array('H')
+
+
+class NewsSearchIndex:
+    """
+    Índice invertido das notícias
+
+    Cada notícia recebe um slot sequencial; como as notícias só são
+    acrescentadas, os postings de cada termo ficam ordenados sem reordenar.
+    Na consulta os arrays são lidos pelo NumPy sem cópia (np.frombuffer) e os
+    escores BM25 acumulados em um vetor denso do tamanho do índice. Entre
+    duas inserções, a contribuição de cada termo e as máscaras de filtro
+    ficam em cache.
+    """
+
+    def __init__(self, k1: float = SEARCH_BM25_K1, b: float = SEARCH_BM25_B,
+                 title_weight: int = SEARCH_TITLE_WEIGHT, cache_max_bytes: int = SEARCH_CACHE_MAX_BYTES):
+        self.k1 = k1
+        self.b = b
+        self.title_weight = title_weight
+        self._postings: Dict[str, _Postings] = {}
+        self._docs: List[Tuple[str, str, str, str, str]] = []
+        self._lengths = array('f')
+        self._total_length = 0.0
+        # Categoria e plano codificados por slot, para filtrar sem olhar os dicts
+        self._categories = array('H')
+        self._plans = array('B')
+        self._category_codes: Dict[str, int] = {}
+        self._plan_codes: Dict[str, int] = {}
+        self.cache_max_bytes = cache_max_bytes
+        self._cache: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+        self._cache_bytes = 0
+        self._cache_size = 0
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    @property
+    def terms(self) -> int:
+        return len(self._postings)
+
+    def add(self, news: Dict) -> None:
+        """
+        Indexa uma notícia (linha da tabela `news`)
+        """
+        slot = len(self._docs)
+        tokens = tokenize(news["title"]) * self.title_weight + tokenize(news["content"] or "")
+        for term, tf in Counter(tokens).items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = _Postings()
+            postings.docs.append(slot)
+            postings.freqs.append(min(tf, _MAX_TF))
+
+        category = news["category"] or ""
+        plan_level = news["plan_level"] or "publico"
+        self._categories.append(self._category_codes.setdefault(category, len(self._category_codes)))
+        self._plans.append(self._plan_codes.setdefault(plan_level, len(self._plan_codes)))
+        self._lengths.append(len(tokens))
+        self._total_length += len(tokens)
+        self._docs.append((news["id"], news["title"], category, plan_level, news["created_at"]))
+
+    def add_rows(self, rows: List[Dict]) -> None:
+        """
+        Indexa linhas da tabela `news` (listener do NewsIndexer)
+        """
+        for row in rows:
+            self.add(row)
+
+    # ---------- cache (válido enquanto o número de notícias não muda) ----------
+
+    def _cached(self, key: tuple, build) -> np.ndarray:
+        if self._cache_size != len(self._docs):
+            self._cache.clear()
+            self._cache_bytes = 0
+            self._cache_size = len(self._docs)
+
+        value = self._cache.get(key)
+        if value is not None:
+            self._cache.move_to_end(key)
+            return value
+
+        value = build()
+        if value.nbytes <= self.cache_max_bytes:
+            self._cache[key] = value
+            self._cache_bytes += value.nbytes
+            while self._cache_bytes > self.cache_max_bytes:
+                _, evicted = self._cache.popitem(last=False)
+                self._cache_bytes -= evicted.nbytes
+        return value
+
+    def _norms(self) -> np.ndarray:
+        # k1 · (1 - b + b · |d| / média |d|), por documento
+        def build():
+            lengths = np.frombuffer(self._lengths, dtype=np.float32)
+            avg_length = self._total_length / len(self._docs)
+            return (self.k1 * (1 - self.b + self.b * lengths / avg_length)).astype(np.float32)
+        return self._cached(("norms",), build)
+
+    def _impact(self, term: str) -> np.ndarray:
+        # Escore BM25 do termo em cada documento dos seus postings
+        def build():
+            postings = self._postings[term]
+            count = len(self._docs)
+            df = len(postings.docs)
+            idf = math.log(1 + (count - df + 0.5) / (df + 0.5))
+            docs = np.frombuffer(postings.docs, dtype=np.int32)
+            tf = np.frombuffer(postings.freqs, dtype=np.uint16).astype(np.float32)
+            return (idf * tf * (self.k1 + 1) / (tf + self._norms()[docs])).astype(np.float32)
+        return self._cached(("term", term), build)
+
+    def _mask(self, category: Optional[str], plan_levels: Optional[Sequence[str]]) -> np.ndarray:
+        # Documentos que passam nos filtros (vetor booleano denso)
+        def build():
+            mask = np.ones(len(self._docs), dtype=bool)
+            if category is not None:
+                mask &= np.frombuffer(self._categories, dtype=np.uint16) == self._category_codes[category]
+            if plan_levels is not None:
+                codes = [self._plan_codes[p] for p in plan_levels if p in self._plan_codes]
+                mask &= np.isin(np.frombuffer(self._plans, dtype=np.uint8), codes)
+            return mask
+        plans_key = tuple(sorted(plan_levels)) if plan_levels is not None else None
+        return self._cached(("mask", category, plans_key), build)
+
+    def search(self, query: str, category: Optional[str] = None,
+               plan_levels: Optional[Sequence[str]] = None,
+               limit: int = 20, offset: int = 0) -> Tuple[int, List[Dict]]:
+        """
+        Busca por palavras-chave (qualquer termo), ordenada por BM25
+
+        Args:
+            query: Texto da busca (acentos e maiúsculas são ignorados)
+            category: Só notícias desta categoria
+            plan_levels: Só notícias destes planos
+            limit: Máximo de resultados
+            offset: Resultados a pular (paginação)
+
+        Returns:
+            (total de notícias encontradas, página de resultados com score)
+        """
+        count = len(self._docs)
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not count or not terms:
+            return 0, []
+        if category is not None and category not in self._category_codes:
+            return 0, []
+
+        scores = np.zeros(count, dtype=np.float32)
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            # Cada documento aparece uma vez por termo: soma direta no índice
+            scores[np.frombuffer(postings.docs, dtype=np.int32)] += self._impact(term)
+
+        if category is not None or plan_levels is not None:
+            scores *= self._mask(category, plan_levels)
+        candidates = np.flatnonzero(scores)
+
+        total = len(candidates)
+        wanted = offset + limit
+        if total > wanted:
+            top = np.argpartition(-scores[candidates], wanted - 1)[:wanted]
+            candidates = candidates[top]
+        # Maior escore primeiro; empate: notícia mais nova primeiro
+        order = np.lexsort((-candidates, -scores[candidates]))
+        page = candidates[order][offset:wanted]
+
+        results = []
+        for slot in page.tolist():
+            news_id, title, news_category, plan_level, created_at = self._docs[slot]
+            results.append({
+                "id": news_id,
+                "title": title,
+                "category": news_category,
+                "plan_level": plan_level,
+                "created_at": created_at,
+                "score": round(float(scores[slot]), 4)
+            })
+        return total, results
@@ -0,0 +1,434 @@
+"""
+🗄️ AGROISYNC IA - Armazenamento de Notícias
+Camada de persistência das notícias publicadas pela IA
+Segue a tabela `news` de backend/schema.sql (+ colunas plan_level e near_duplicate_of)
+"""
+
+import asyncio
+import os
+import sqlite3
+import uuid
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import AsyncIterator, Callable, List, Dict, Optional, Sequence, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: um único worker, sem lock entre processos
+    fcntl = None
+
+# Configurações
+DATA_DIR = Path(os.getenv('IA_DATA_DIR', Path(__file__).parent.parent / 'data'))
+NEWS_STORE_BACKEND = os.getenv('NEWS_STORE_BACKEND', 'sqlite')
+NEWS_DB_PATH = Path(os.getenv('NEWS_DB_PATH', DATA_DIR / 'agroisync_ia.db'))
+NEWS_DB_POOL_SIZE = int(os.getenv('NEWS_DB_POOL_SIZE', '4'))
+NEWS_DB_BATCH_SIZE = int(os.getenv('NEWS_DB_BATCH_SIZE', '256'))
+
+NEWS_COLUMNS = (
+    "id", "title", "content", "author", "category", "image_url",
+    "published", "plan_level", "near_duplicate_of", "created_at", "updated_at"
+)
+
+NEWS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS news (
+  id TEXT PRIMARY KEY,
+  title TEXT NOT NULL,
+  content TEXT NOT NULL,
+  author TEXT,
+  category TEXT,
+  image_url TEXT,
+  published INTEGER DEFAULT 1,
+  plan_level TEXT DEFAULT 'publico',
+  near_duplicate_of TEXT,
+  created_at TEXT DEFAULT (datetime('now')),
+  updated_at TEXT DEFAULT (datetime('now'))
+);
+
+CREATE INDEX IF NOT EXISTS idx_news_category ON news(category);
+CREATE INDEX IF NOT EXISTS idx_news_published ON news(published);
+CREATE INDEX IF NOT EXISTS idx_news_plan_level_created ON news(plan_level, created_at);
+CREATE INDEX IF NOT EXISTS idx_news_category_plan_level_created ON news(category, plan_level, created_at);
+"""
+
+
+def utc_now() -> str:
+    """
+    Timestamp no mesmo formato do datetime('now') do SQLite/D1
+    """
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def connect_sqlite(path: Path) -> sqlite3.Connection:
+    """
+    Abre uma conexão SQLite em modo WAL, segura para uso em threads do pool
+
+    Args:
+        path: Caminho do arquivo do banco
+
+    Returns:
+        sqlite3.Connection configurada
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path), timeout=5.0, check_same_thread=False, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=5000")
+    return conn
+
+
+def news_row(news: Dict) -> Dict:
+    """
+    Converte o payload de NewsUpdate em uma linha da tabela `news`
+
+    Args:
+        news: Dict com title, content, category, source, plan_level
+
+    Returns:
+        Dict com todas as colunas de NEWS_COLUMNS
+    """
+    now = utc_now()
+    return {
+        "id": news.get("id") or str(uuid.uuid4()),
+        "title": news["title"],
+        "content": news["content"],
+        "author": news.get("author") or news.get("source"),
+        "category": news.get("category") or "geral",
+        "image_url": news.get("image_url"),
+        "published": 1 if news.get("published", True) else 0,
+        "plan_level": news.get("plan_level") or "publico",
+        "near_duplicate_of": news.get("near_duplicate_of"),
+        "created_at": news.get("created_at") or now,
+        "updated_at": now,
+    }
+
+
+# ============================================
+# INTERFACE
+# ============================================
+
+class NewsStore(ABC):
+    """
+    Interface de armazenamento de notícias
+    Implementações: SQLite local (padrão); D1/Postgres podem ser plugados aqui
+    """
+
+    async def open(self) -> None:
+        """Prepara conexões e schema"""
+
+    async def close(self) -> None:
+        """Grava pendências e fecha conexões"""
+
+    @asynccontextmanager
+    async def exclusive(self) -> AsyncIterator[None]:
+        """
+        Seção exclusiva entre consultar e gravar (ex: detecção de quase duplicatas)
+        """
+        yield
+
+    def add_write_hook(self, path: Path, hook: Callable[[sqlite3.Connection, List[Dict]], None]) -> bool:
+        """
+        Registra uma função chamada dentro da transação de cada gravação, com a
+        conexão de escrita e as linhas gravadas (ex: outbox do D1 no mesmo banco)
+
+        Args:
+            path: Banco em que a função grava (precisa ser o do store)
+
+        Returns:
+            bool: True se registrada (False: o store não grava nesse banco)
+        """
+        return False
+
+    async def insert_news(self, news: Dict) -> Dict:
+        """
+        Persiste uma notícia
+
+        Returns:
+            Dict com a linha gravada (incluindo id e created_at)
+        """
+        rows = await self.insert_many([news])
+        return rows[0]
+
+    @abstractmethod
+    async def insert_many(self, items: List[Dict]) -> List[Dict]:
+        """Persiste várias notícias em uma única transação"""
+
+    @abstractmethod
+    async def get_news(self, news_id: str) -> Optional[Dict]:
+        """Busca uma notícia pelo id"""
+
+    @abstractmethod
+    async def list_after(self, seq: int, limit: int = 1000) -> List[Dict]:
+        """Notícias gravadas depois da sequência `seq` (campo "seq"), em ordem de gravação"""
+
+    @abstractmethod
+    async def list_news(self, category: Optional[str] = None, plan_level: Optional[str] = None,
+                        limit: int = 50, offset: int = 0,
+                        plan_levels: Optional[Sequence[str]] = None) -> List[Dict]:
+        """
+        Lista notícias publicadas, mais recentes primeiro (plan_levels: qualquer
+        um dos planos); quase duplicatas marcadas ficam de fora
+        """
+
+
+# ============================================
+# SQLITE
+# ============================================
+
+class SQLiteNewsStore(NewsStore):
+    """
+    Armazenamento em SQLite (WAL) com pool de leitura e commits em grupo
+
+    Todas as escritas passam por uma única conexão de escrita: as inserções
+    que chegam enquanto um commit está em andamento são agrupadas no commit
+    seguinte, então a latência não cresce com a taxa de escrita.
+    """
+
+    def __init__(self, path: Path = NEWS_DB_PATH, pool_size: int = NEWS_DB_POOL_SIZE,
+                 batch_size: int = NEWS_DB_BATCH_SIZE):
+        self.path = Path(path)
+        self.pool_size = max(1, pool_size)
+        self.batch_size = max(1, batch_size)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._writer: Optional[sqlite3.Connection] = None
+        self._readers: Optional[asyncio.Queue] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        self._exclusive = asyncio.Lock()
+        self._write_hooks: List[Callable[[sqlite3.Connection, List[Dict]], None]] = []
+
+    async def _run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    async def open(self) -> None:
+        # +1 thread reservada para a conexão de escrita
+        self._executor = ThreadPoolExecutor(max_workers=self.pool_size + 1, thread_name_prefix='news-store')
+
+        self._writer = await self._run(connect_sqlite, self.path)
+        await self._run(self._migrate)
+        await self._run(self._writer.executescript, NEWS_SCHEMA)
+
+        self._readers = asyncio.Queue()
+        for _ in range(self.pool_size):
+            self._readers.put_nowait(await self._run(connect_sqlite, self.path))
+
+        self._queue = asyncio.Queue()
+        self._writer_task = asyncio.create_task(self._writer_loop())
+
+    async def close(self) -> None:
+        if self._writer_task:
+            self._queue.put_nowait(None)
+            await self._writer_task
+            self._writer_task = None
+
+        if self._readers:
+            while not self._readers.empty():
+                self._readers.get_nowait().close()
+        if self._writer:
+            self._writer.close()
+            self._writer = None
+        if self._executor:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def _migrate(self) -> None:
+        # Bancos criados antes da coluna near_duplicate_of
+        columns = {row["name"] for row in self._writer.execute("PRAGMA table_info(news)")}
+        if columns and "near_duplicate_of" not in columns:
+            self._writer.execute("ALTER TABLE news ADD COLUMN near_duplicate_of TEXT")
+
+    # ---------- escrita ----------
+
+    @asynccontextmanager
+    async def exclusive(self) -> AsyncIterator[None]:
+        # asyncio.Lock entre as tarefas do worker + flock entre os workers
+        async with self._exclusive:
+            acquire = asyncio.ensure_future(asyncio.to_thread(_lock_file, self.path.with_suffix('.lock')))
+            try:
+                fd = await asyncio.shield(acquire)
+            except asyncio.CancelledError:
+                # A thread continua esperando o flock: solta assim que ele vier,
+                # senão o lock (e o fd) ficariam presos e as gravações travariam
+                acquire.add_done_callback(_unlock_acquired)
+                raise
+            try:
+                yield
+            finally:
+                _unlock_file(fd)
+
+    def add_write_hook(self, path: Path, hook: Callable[[sqlite3.Connection, List[Dict]], None]) -> bool:
+        if Path(path).resolve() != self.path.resolve():
+            return False
+        self._write_hooks.append(hook)
+        return True
+
+    async def insert_many(self, items: List[Dict]) -> List[Dict]:
+        if not items:
+            return []
+        if self._writer_task is None:
+            raise RuntimeError("NewsStore não foi aberto")
+
+        rows = [news_row(item) for item in items]
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((rows, future))
+        await future
+        return rows
+
+    async def _writer_loop(self) -> None:
+        stopping = False
+
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+
+            batch: List[Tuple[List[Dict], asyncio.Future]] = [item]
+            pending_rows = len(item[0])
+
+            # Junta o que chegou enquanto o commit anterior rodava
+            while pending_rows < self.batch_size and not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+                pending_rows += len(item[0])
+
+            rows = [row for rows, _ in batch for row in rows]
+            try:
+                await self._run(self._write_rows, rows)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_result(None)
+
+    def _write_rows(self, rows: List[Dict]) -> None:
+        placeholders = ", ".join(f":{column}" for column in NEWS_COLUMNS)
+        sql = f"INSERT INTO news ({', '.join(NEWS_COLUMNS)}) VALUES ({placeholders})"
+
+        self._writer.execute("BEGIN")
+        try:
+            self._writer.executemany(sql, rows)
+            for hook in self._write_hooks:
+                hook(self._writer, rows)
+            self._writer.execute("COMMIT")
+        except Exception:
+            self._writer.execute("ROLLBACK")
+            raise
+
+    # ---------- leitura ----------
+
+    async def _read(self, sql: str, params: Tuple) -> List[Dict]:
+        conn = await self._readers.get()
+        try:
+            rows = await self._run(lambda: conn.execute(sql, params).fetchall())
+            return [dict(row) for row in rows]
+        finally:
+            self._readers.put_nowait(conn)
+
+    async def get_news(self, news_id: str) -> Optional[Dict]:
+        rows = await self._read(f"SELECT {', '.join(NEWS_COLUMNS)} FROM news WHERE id = ?", (news_id,))
+        return rows[0] if rows else None
+
+    async def list_after(self, seq: int, limit: int = 1000) -> List[Dict]:
+        # rowid cresce com as inserções (notícias não são apagadas)
+        return await self._read(
+            f"SELECT rowid AS seq, {', '.join(NEWS_COLUMNS)} FROM news WHERE rowid > ? ORDER BY rowid LIMIT ?",
+            (seq, limit)
+        )
+
+    async def list_news(self, category: Optional[str] = None, plan_level: Optional[str] = None,
+                        limit: int = 50, offset: int = 0,
+                        plan_levels: Optional[Sequence[str]] = None) -> List[Dict]:
+        where = ["published = 1", "near_duplicate_of IS NULL"]
+        params: List = []
+        if category:
+            where.append("category = ?")
+            params.append(category)
+        if plan_level:
+            where.append("plan_level = ?")
+            params.append(plan_level)
+        if plan_levels:
+            where.append(f"plan_level IN ({', '.join('?' * len(plan_levels))})")
+            params.extend(plan_levels)
+        params.extend([limit, offset])
+
+        sql = (
+            f"SELECT {', '.join(NEWS_COLUMNS)} FROM news WHERE {' AND '.join(where)} "
+            "ORDER BY created_at DESC, rowid DESC LIMIT ? OFFSET ?"
+        )
+        return await self._read(sql, tuple(params))
+
+
+def _lock_file(path: Path) -> Optional[int]:
+    if fcntl is None:
+        return None
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    fcntl.flock(fd, fcntl.LOCK_EX)
+    return fd
+
+
+def _unlock_file(fd: Optional[int]) -> None:
+    if fd is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+
+def _unlock_acquired(acquire: "asyncio.Future[Optional[int]]") -> None:
+    if not acquire.cancelled() and acquire.exception() is None:
+        _unlock_file(acquire.result())
+
+
+# ============================================
+# INSTÂNCIA GLOBAL
+# ============================================
+
+_news_store: Optional[NewsStore] = None
+_news_store_lock = asyncio.Lock()
+
+
+def create_news_store(backend: str = NEWS_STORE_BACKEND) -> NewsStore:
+    """
+    Cria o NewsStore configurado em NEWS_STORE_BACKEND
+
+    Raises:
+        ValueError: se o backend não for suportado
+    """
+    if backend == 'sqlite':
+        return SQLiteNewsStore()
+    raise ValueError(f"Backend de notícias não suportado: {backend}")
+
+
+async def get_news_store() -> NewsStore:
+    """
+    Retorna o NewsStore global, abrindo-o na primeira chamada
+
+    Returns:
+        NewsStore pronto para uso
+    """
+    global _news_store
+    if _news_store is None:
+        async with _news_store_lock:
+            if _news_store is None:
+                store = create_news_store()
+                await store.open()
+                _news_store = store
+    return _news_store
+
+
+async def close_news_store() -> None:
+    """
+    Grava pendências e fecha o NewsStore global (chamado no shutdown)
+    """
+    global _news_store
+    if _news_store is not None:
+        await _news_store.close()
+        _news_store = None
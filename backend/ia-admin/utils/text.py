@@ -0,0 +1,42 @@
+"""
+🔤 AGROISYNC IA - Processamento de Texto
+Normalização e tokenização de textos em português (sem acentos,
+minúsculas, sem stopwords) usadas na deduplicação e na busca
+"""
+
+import re
+import unicodedata
+from typing import List
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset("""
+a ao aos as ate com como da das de del do dos e ela elas ele eles em entre era essa esse esta este
+eu foi for ha isso isto ja la mais mas me mesmo na nas nao nem no nos num numa o os ou para pela
+pelas pelo pelos por qual quando que quem se sem ser seu seus sua suas sobre so tambem te tem teve
+um uma umas uns vai via
+""".split())
+
+
+def fold(text: str) -> str:
+    """
+    Texto em minúsculas e sem acentos ("Safra Recorde de Café" → "safra recorde de cafe")
+    """
+    if text.isascii():
+        return text.lower()
+    decomposed = unicodedata.normalize('NFKD', text.casefold())
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def tokenize(text: str, keep_stopwords: bool = False) -> List[str]:
+    """
+    Tokens alfanuméricos normalizados, sem stopwords (por padrão)
+    """
+    if not text.isascii():
+        # Só [a-z0-9] vira token: descartar o que não é ASCII após a
+        # decomposição equivale a fold() e é bem mais rápido
+        text = unicodedata.normalize('NFKD', text.casefold()).encode('ascii', 'ignore').decode('ascii')
+    tokens = _TOKEN.findall(text.lower())
+    if keep_stopwords:
+        return tokens
+    return [token for token in tokens if token not in STOPWORDS]
@@ -0,0 +1,405 @@
+"""
+📈 AGROISYNC IA - Séries Temporais de Cotações
+Histórico de preços por (produto, mercado) em colunas append-only
+persistidas em arquivos mapeados em memória (mmap), com rollups OHLC
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+import unicodedata
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Dict, Optional, Tuple
+
+import numpy as np
+
+from .storage import DATA_DIR
+
+try:
+    import fcntl
+except ImportError:  # Windows: um único worker, sem lock entre processos
+    fcntl = None
+
+# Configurações
+TIMESERIES_DIR = Path(os.getenv('TIMESERIES_DIR', DATA_DIR / 'timeseries'))
+TIMESERIES_INITIAL_CAPACITY = int(os.getenv('TIMESERIES_INITIAL_CAPACITY', '4096'))
+MAX_OHLC_BUCKETS = int(os.getenv('MAX_OHLC_BUCKETS', '5000'))
+
+# Cabeçalho do arquivo de timestamps: contador de pontos (int64), nível de
+# acesso (int64, o mais restrito já gravado; 0 = sem nível) + padding
+HEADER_BYTES = 64
+_COUNT = struct.Struct('<q')
+_LEVEL_OFFSET = 8
+ITEM_BYTES = 8
+
+# Plano de cada nível do cabeçalho (1..4, os mesmos níveis de PLAN_LEVELS no main)
+LEVEL_PLANS = ("publico", "privado", "loja", "admin")
+
+RESOLUTIONS = {
+    's': 1,
+    'm': 60,
+    'h': 3600,
+    'd': 86400,
+    'w': 7 * 86400,
+}
+
+
+class OutOfOrderError(ValueError):
+    """Ponto com timestamp anterior ao último ponto da série"""
+
+
+def parse_resolution(value: str) -> int:
+    """
+    Converte "15m", "1h", "1d", "1w" (ou segundos) em segundos
+
+    Raises:
+        ValueError: se o formato for inválido
+    """
+    match = re.fullmatch(r"(\d+)([smhdw]?)", value.strip().lower())
+    if not match or int(match.group(1)) <= 0:
+        raise ValueError(f"Resolução inválida: {value}")
+    return int(match.group(1)) * RESOLUTIONS.get(match.group(2) or 's')
+
+
+def series_key(product: str, market: str) -> Tuple[str, str]:
+    """
+    Chave normalizada da série (sem diferenciar maiúsculas/espaços)
+    """
+    return product.strip().casefold(), market.strip().casefold()
+
+
+def series_plan_level(level: int) -> str:
+    """
+    Plano de uma série de cotação pelo nível do cabeçalho (sem nível = "publico")
+    """
+    return LEVEL_PLANS[min(max(level, 1), len(LEVEL_PLANS)) - 1]
+
+
+def _slug(text: str) -> str:
+    ascii_text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode()
+    return re.sub(r'[^a-z0-9]+', '-', ascii_text.lower()).strip('-') or 'x'
+
+
+def _file_base(key: Tuple[str, str]) -> str:
+    digest = hashlib.sha1('\x00'.join(key).encode('utf-8')).hexdigest()[:10]
+    return f"{_slug(key[0])}__{_slug(key[1])}-{digest}"
+
+
+# ============================================
+# SÉRIE
+# ============================================
+
+class PriceSeries:
+    """
+    Série append-only de (timestamp, preço) em dois arquivos float64:
+    `<base>.ts` (cabeçalho + timestamps) e `<base>.px` (preços)
+
+    Escritas são serializadas entre workers com flock no arquivo de timestamps;
+    leituras só consultam o contador do cabeçalho e criam views NumPy sobre o mmap.
+    O cabeçalho guarda também o nível de acesso da série (plano mínimo para
+    vê-la), que só aumenta: pontos de um plano restrito nunca ficam visíveis
+    para planos abaixo dele.
+    """
+
+    def __init__(self, directory: Path, product: str, market: str,
+                 initial_capacity: int = TIMESERIES_INITIAL_CAPACITY):
+        self.product = product.strip()
+        self.market = market.strip()
+        self.key = series_key(product, market)
+        base = directory / _file_base(self.key)
+        self.ts_path = base.with_suffix('.ts')
+        self.px_path = base.with_suffix('.px')
+        self.meta_path = base.with_suffix('.json')
+        self.initial_capacity = max(16, initial_capacity)
+        self._lock = threading.Lock()
+
+        directory.mkdir(parents=True, exist_ok=True)
+        self._ts_fd = os.open(self.ts_path, os.O_RDWR | os.O_CREAT, 0o644)
+        self._px_fd = os.open(self.px_path, os.O_RDWR | os.O_CREAT, 0o644)
+
+        with self._file_lock():
+            if os.fstat(self._ts_fd).st_size < HEADER_BYTES:
+                os.ftruncate(self._ts_fd, HEADER_BYTES + self.initial_capacity * ITEM_BYTES)
+                os.ftruncate(self._px_fd, self.initial_capacity * ITEM_BYTES)
+            if not self.meta_path.exists():
+                self.meta_path.write_text(
+                    json.dumps({"product": self.product, "market": self.market}, ensure_ascii=False),
+                    encoding='utf-8'
+                )
+
+        self._ts_mm: Optional[mmap.mmap] = None
+        self._px_mm: Optional[mmap.mmap] = None
+        self._capacity = 0
+        self._remap()
+
+    # ---------- mmap ----------
+
+    @contextmanager
+    def _file_lock(self):
+        with self._lock:
+            if fcntl:
+                fcntl.flock(self._ts_fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(self._ts_fd, fcntl.LOCK_UN)
+
+    def _remap(self) -> None:
+        # Mapas antigos não são fechados: views NumPy ainda podem apontar para eles
+        # e serão liberados pelo GC quando não houver mais referências
+        ts_size = os.fstat(self._ts_fd).st_size
+        px_size = os.fstat(self._px_fd).st_size
+        self._ts_mm = mmap.mmap(self._ts_fd, ts_size)
+        self._px_mm = mmap.mmap(self._px_fd, px_size)
+        self._capacity = min((ts_size - HEADER_BYTES) // ITEM_BYTES, px_size // ITEM_BYTES)
+
+    def _ensure_capacity(self, needed: int) -> None:
+        if needed <= self._capacity:
+            return
+
+        # Outro worker pode já ter aumentado os arquivos
+        self._remap()
+        if needed <= self._capacity:
+            return
+
+        capacity = max(self._capacity, self.initial_capacity)
+        while capacity < needed:
+            capacity *= 2
+        os.ftruncate(self._ts_fd, HEADER_BYTES + capacity * ITEM_BYTES)
+        os.ftruncate(self._px_fd, capacity * ITEM_BYTES)
+        self._remap()
+
+    def __len__(self) -> int:
+        return _COUNT.unpack_from(self._ts_mm, 0)[0]
+
+    @property
+    def level(self) -> int:
+        """Nível de acesso da série (o mais restrito entre os pontos gravados)"""
+        return _COUNT.unpack_from(self._ts_mm, _LEVEL_OFFSET)[0]
+
+    # ---------- escrita ----------
+
+    def append_many(self, points: List[Tuple[Optional[float], float]], level: int = 0) -> int:
+        """
+        Acrescenta pontos (timestamp epoch em segundos, preço) em ordem
+
+        Timestamp None é o horário de recebimento, atribuído já com o lock
+        da série: nunca anterior ao último ponto, mesmo com vários workers
+        gravando a mesma série ao mesmo tempo.
+
+        Args:
+            points: Pontos (timestamp ou None, preço)
+            level: Nível de acesso dos pontos (a série fica com o maior)
+
+        Returns:
+            int com o total de pontos da série; os pontos gravados são os
+            índices [total - len(points), total)
+
+        Raises:
+            OutOfOrderError: se algum timestamp informado for anterior ao último gravado
+        """
+        if not points:
+            return len(self)
+
+        px = np.fromiter((p[1] for p in points), dtype='<f8', count=len(points))
+
+        with self._file_lock():
+            count = len(self)
+            if count > self._capacity:
+                self._remap()
+            last = float(self._ts_view(count)[-1]) if count else -np.inf
+
+            now = time.time()
+            ts = np.empty(len(points), dtype='<f8')
+            previous = last
+            for i, (timestamp, _) in enumerate(points):
+                ts[i] = previous = max(now, previous) if timestamp is None else timestamp
+            if ts[0] < last or (len(ts) > 1 and np.any(np.diff(ts) < 0)):
+                raise OutOfOrderError("Timestamps devem ser crescentes dentro da série")
+
+            self._ensure_capacity(count + len(points))
+            self._ts_view(count + len(points))[count:] = ts
+            self._px_view(count + len(points))[count:] = px
+            if level > self.level:
+                _COUNT.pack_into(self._ts_mm, _LEVEL_OFFSET, level)
+            _COUNT.pack_into(self._ts_mm, 0, count + len(points))
+
+        return count + len(points)
+
+    # ---------- leitura ----------
+
+    def _ts_view(self, count: int) -> np.ndarray:
+        return np.frombuffer(self._ts_mm, dtype='<f8', count=count, offset=HEADER_BYTES)
+
+    def _px_view(self, count: int) -> np.ndarray:
+        return np.frombuffer(self._px_mm, dtype='<f8', count=count)
+
+    def arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Views somente-leitura (sem cópia) de timestamps e preços
+        """
+        count = len(self)
+        if count > self._capacity:
+            with self._lock:
+                self._remap()
+        ts, px = self._ts_view(count), self._px_view(count)
+        ts.flags.writeable = False
+        px.flags.writeable = False
+        return ts, px
+
+    def window(self, start: Optional[float] = None, end: Optional[float] = None
+               ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Pontos com start <= timestamp < end (busca binária, sem varredura)
+        """
+        ts, px = self.arrays()
+        lo = 0 if start is None else int(np.searchsorted(ts, start, side='left'))
+        hi = len(ts) if end is None else int(np.searchsorted(ts, end, side='left'))
+        return ts[lo:hi], px[lo:hi]
+
+    def ohlc(self, start: float, end: float, resolution: int) -> List[Dict]:
+        """
+        Rollup OHLC/média/contagem em baldes de `resolution` segundos
+
+        Returns:
+            Lista de baldes (apenas os que têm pontos), em ordem cronológica
+        """
+        ts, px = self.window(start, end)
+        if not len(ts):
+            return []
+
+        # Limites dos baldes por busca binária: O(baldes · log n), sem dividir cada ponto
+        n_buckets = int(np.ceil((end - start) / resolution))
+        edges = start + np.arange(n_buckets, dtype='<f8') * resolution
+        bounds = np.searchsorted(ts, edges, side='left')
+        counts_all = np.diff(np.append(bounds, len(ts)))
+        nonempty = np.flatnonzero(counts_all)
+
+        starts = bounds[nonempty]
+        counts = counts_all[nonempty]
+        ends = starts + counts
+
+        opens = px[starts]
+        closes = px[ends - 1]
+        highs = np.maximum.reduceat(px, starts)
+        lows = np.minimum.reduceat(px, starts)
+        avgs = np.add.reduceat(px, starts) / counts
+        bucket_times = edges[nonempty]
+
+        return [
+            {
+                "time": float(t),
+                "open": float(o),
+                "high": float(h),
+                "low": float(lo),
+                "close": float(c),
+                "avg": round(float(a), 6),
+                "count": int(n),
+            }
+            for t, o, h, lo, c, a, n in zip(bucket_times, opens, highs, lows, closes, avgs, counts)
+        ]
+
+    def close(self) -> None:
+        for fd in (self._ts_fd, self._px_fd):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+# ============================================
+# REGISTRO DE SÉRIES
+# ============================================
+
+class TimeSeriesStore:
+    """
+    Conjunto de séries de cotação abertas sob um diretório
+    """
+
+    def __init__(self, directory: Path = TIMESERIES_DIR):
+        self.directory = Path(directory)
+        self._series: Dict[Tuple[str, str], PriceSeries] = {}
+        self._lock = threading.Lock()
+
+    def get(self, product: str, market: str, create: bool = False) -> Optional[PriceSeries]:
+        """
+        Retorna a série (abrindo os arquivos na primeira vez)
+
+        Args:
+            create: Criar a série se ainda não existir
+        """
+        key = series_key(product, market)
+        series = self._series.get(key)
+        if series is not None:
+            return series
+
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                exists = (self.directory / _file_base(key)).with_suffix('.ts').exists()
+                if not exists and not create:
+                    return None
+                series = PriceSeries(self.directory, product, market)
+                self._series[key] = series
+        return series
+
+    def append(self, product: str, market: str, price: float, timestamp: Optional[float] = None,
+               level: int = 0) -> int:
+        """
+        Acrescenta uma cotação à série (timestamp padrão: agora, atribuído sob o lock)
+        """
+        return self.get(product, market, create=True).append_many([(timestamp, price)], level)
+
+    def list_series(self) -> List[Dict]:
+        """
+        Lista as séries existentes no diretório com o número de pontos
+        """
+        if not self.directory.exists():
+            return []
+
+        result = []
+        for meta_path in sorted(self.directory.glob('*.json')):
+            try:
+                meta = json.loads(meta_path.read_text(encoding='utf-8'))
+            except (OSError, ValueError):
+                continue
+            series = self.get(meta["product"], meta["market"])
+            if series is not None:
+                result.append({**meta, "points": len(series), "level": series.level})
+        return result
+
+    def close(self) -> None:
+        with self._lock:
+            for series in self._series.values():
+                series.close()
+            self._series.clear()
+
+
+_timeseries_store: Optional[TimeSeriesStore] = None
+
+
+def get_timeseries_store() -> TimeSeriesStore:
+    """
+    Retorna o TimeSeriesStore global
+    """
+    global _timeseries_store
+    if _timeseries_store is None:
+        _timeseries_store = TimeSeriesStore()
+    return _timeseries_store
+
+
+def close_timeseries_store() -> None:
+    """
+    Fecha os arquivos das séries (chamado no shutdown)
+    """
+    global _timeseries_store
+    if _timeseries_store is not None:
+        _timeseries_store.close()
+        _timeseries_store = None
@@ -0,0 +1,492 @@
+"""
+👤 AGROISYNC IA - Plano de Cada Usuário
+Consulta o plano na tabela `users` do Agroisync (SQLite local ou
+Cloudflare D1) com cache LRU + TTL por worker, cache negativo para
+usuários desconhecidos e uma única consulta por usuário em andamento;
+sem banco de usuários configurado, todos recebem USER_PLAN_FALLBACK (o
+plano mais baixo) e, em produção, o serviço não sobe
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import httpx
+
+from .d1_sync import CLOUDFLARE_API_TOKEN, D1_API_URL, D1_MAX_PARAMS
+from .logger import log_action
+from .storage import DATA_DIR, connect_sqlite, utc_now
+from .versions import bump_version, get_version
+
+# Configurações
+# sqlite: cópia local do banco do Agroisync; d1: API HTTP do Cloudflare D1;
+# static: todos os usuários com USER_PLAN_FALLBACK
+USER_PLANS_SOURCE = os.getenv('USER_PLANS_SOURCE', 'sqlite').lower()
+USER_PLANS_DB_PATH = Path(os.getenv('USER_PLANS_DB_PATH', DATA_DIR / 'agroisync.db'))
+USER_PLANS_TIMEOUT = float(os.getenv('USER_PLANS_TIMEOUT', '5'))
+USER_PLAN_CACHE_SIZE = int(os.getenv('USER_PLAN_CACHE_SIZE', '100000'))
+USER_PLAN_CACHE_TTL = float(os.getenv('USER_PLAN_CACHE_TTL', '60'))
+# Usuários inexistentes ficam em cache por menos tempo (cadastro recente)
+USER_PLAN_NEGATIVE_TTL = float(os.getenv('USER_PLAN_NEGATIVE_TTL', '10'))
+# Plano de quem tem assinatura vencida
+USER_PLAN_DEFAULT = os.getenv('USER_PLAN_DEFAULT', 'gratuito')
+# Plano de todos quando a origem não existe (réplica ausente, D1 não configurado):
+# o mais baixo, para que uma réplica faltando não libere features pagas
+USER_PLAN_FALLBACK = os.getenv('USER_PLAN_FALLBACK', 'gratuito')
+# Invalidações de cache (usuário ou todos), lidas pelos outros workers
+PLAN_INVALIDATIONS_DB_PATH = Path(os.getenv('PLAN_INVALIDATIONS_DB_PATH', DATA_DIR / 'plan_invalidations.db'))
+PLAN_INVALIDATIONS_KEEP = int(os.getenv('PLAN_INVALIDATIONS_KEEP', '10000'))
+# Slug do plano no banco do Agroisync → plano da matriz de features
+USER_PLAN_ALIASES: Dict[str, str] = json.loads(os.getenv('USER_PLAN_ALIASES', '') or json.dumps({
+    "inicial": "gratuito",
+    "free": "gratuito",
+    "profissional": "pro",
+    "empresarial": "pro",
+    "premium": "pro",
+    "enterprise": "pro"
+}))
+
+# Mesmas colunas que o worker lê (backend/src/cloudflare-worker.js, checkUserLimit)
+USER_PLANS_SQL = (
+    "SELECT id, plan, plan_expires_at, role IN ('admin', 'super-admin') AS is_admin "
+    "FROM users WHERE is_active = 1 AND id IN ({})"
+)
+
+# user_id NULL: todos os usuários
+PLAN_INVALIDATIONS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS plan_invalidations (
+  seq INTEGER PRIMARY KEY AUTOINCREMENT,
+  user_id TEXT,
+  created_at TEXT NOT NULL
+);
+"""
+
+
+class UserPlanSourceError(Exception):
+    """Banco de usuários indisponível"""
+
+
+def plan_from_row(row: Dict) -> str:
+    """
+    Plano efetivo de uma linha de `users` (admin, assinatura vencida, apelidos)
+    """
+    if row.get("is_admin"):
+        return "admin"
+    expires_at = row.get("plan_expires_at")
+    if isinstance(expires_at, (int, float)):
+        # Bancos antigos guardam o vencimento em epoch (segundos)
+        if expires_at < time.time():
+            return USER_PLAN_DEFAULT
+    elif expires_at and str(expires_at).replace('T', ' ')[:19] < utc_now():
+        return USER_PLAN_DEFAULT
+    plan = row.get("plan") or USER_PLAN_DEFAULT
+    return USER_PLAN_ALIASES.get(plan, plan)
+
+
+def _chunks(items: List[str], size: int = D1_MAX_PARAMS) -> Iterable[List[str]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class UserPlanSource(ABC):
+    """
+    Origem das linhas de `users`
+    """
+
+    async def open(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    @abstractmethod
+    async def fetch(self, user_ids: List[str]) -> Dict[str, Dict]:
+        """
+        Linhas (id, plan, plan_expires_at, is_admin) dos usuários ativos encontrados
+
+        Raises:
+            UserPlanSourceError: se o banco não responder
+        """
+
+
+class SQLiteUserPlanSource(UserPlanSource):
+    """
+    Tabela `users` em um arquivo SQLite (réplica local do banco do Agroisync),
+    aberto só para leitura: nunca cria um banco vazio no lugar da réplica
+    """
+
+    def __init__(self, path: Path = USER_PLANS_DB_PATH):
+        self.path = Path(path)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._conn = None
+
+    async def _run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    async def open(self) -> None:
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='user-plans')
+        self._conn = await self._run(self._connect)
+
+    def _connect(self) -> sqlite3.Connection:
+        uri = self.path.resolve().as_uri() + "?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, timeout=5.0, check_same_thread=False, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    async def close(self) -> None:
+        if self._conn is not None:
+            await self._run(self._conn.close)
+            self._conn = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def _fetch(self, user_ids: List[str]) -> Dict[str, Dict]:
+        rows = {}
+        for chunk in _chunks(user_ids):
+            sql = USER_PLANS_SQL.format(", ".join("?" * len(chunk)))
+            for row in self._conn.execute(sql, chunk):
+                rows[row["id"]] = dict(row)
+        return rows
+
+    async def fetch(self, user_ids: List[str]) -> Dict[str, Dict]:
+        try:
+            return await self._run(self._fetch, user_ids)
+        except sqlite3.Error as e:
+            raise UserPlanSourceError(f"SQLite: {e}") from e
+
+
+class D1UserPlanSource(UserPlanSource):
+    """
+    Tabela `users` no Cloudflare D1, pela API HTTP /query
+    """
+
+    def __init__(self, url: str = D1_API_URL, token: str = CLOUDFLARE_API_TOKEN):
+        self.url = url
+        self.token = token
+        self._client: Optional[httpx.AsyncClient] = None
+
+    async def open(self) -> None:
+        headers = {"Authorization": f"Bearer {self.token}"} if self.token else {}
+        self._client = httpx.AsyncClient(timeout=USER_PLANS_TIMEOUT, headers=headers)
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def fetch(self, user_ids: List[str]) -> Dict[str, Dict]:
+        statements = [
+            {"sql": USER_PLANS_SQL.format(", ".join("?" * len(chunk))), "params": chunk}
+            for chunk in _chunks(user_ids)
+        ]
+        body = statements[0] if len(statements) == 1 else {"batch": statements}
+        try:
+            response = await self._client.post(self.url, json=body)
+            data = response.json()
+        except (httpx.HTTPError, ValueError) as e:
+            raise UserPlanSourceError(f"D1: {type(e).__name__}: {e}") from e
+        if response.status_code >= 400 or not data.get("success", False):
+            raise UserPlanSourceError(f"D1: HTTP {response.status_code}: {data.get('errors')}")
+
+        rows = {}
+        for result in data.get("result") or []:
+            for row in result.get("results") or []:
+                rows[row["id"]] = row
+        return rows
+
+
+class StaticUserPlanSource(UserPlanSource):
+    """
+    Sem banco de usuários: todo usuário existe e tem o mesmo plano
+    """
+
+    def __init__(self, plan: str = USER_PLAN_FALLBACK):
+        self.plan = plan
+
+    async def fetch(self, user_ids: List[str]) -> Dict[str, Dict]:
+        return {user_id: {"id": user_id, "plan": self.plan} for user_id in user_ids}
+
+
+def make_user_plan_source() -> UserPlanSource:
+    """
+    Origem configurada em USER_PLANS_SOURCE, ou a estática se ela não existe
+
+    Em produção uma origem ausente é erro de implantação: o serviço não sobe
+    (a estática só vale pedida explicitamente, USER_PLANS_SOURCE=static)
+    """
+    if USER_PLANS_SOURCE == 'd1' and D1_API_URL:
+        return D1UserPlanSource()
+    if USER_PLANS_SOURCE == 'sqlite' and USER_PLANS_DB_PATH.exists():
+        return SQLiteUserPlanSource()
+    if USER_PLANS_SOURCE != 'static':
+        if os.getenv('ENVIRONMENT') == 'production':
+            raise RuntimeError(f"Banco de usuários ({USER_PLANS_SOURCE}) não configurado")
+        log_action(
+            action="Banco de usuários não configurado",
+            status="WARNING",
+            ip="system",
+            details=f"Origem {USER_PLANS_SOURCE}: todos com o plano {USER_PLAN_FALLBACK}"
+        )
+    return StaticUserPlanSource()
+
+
+class UserPlanResolver:
+    """
+    Plano por usuário com cache LRU + TTL
+
+    - Usuários desconhecidos ficam em cache como None (USER_PLAN_NEGATIVE_TTL)
+    - Pedidos simultâneos do mesmo usuário fora do cache esperam uma única
+      consulta ao banco (single-flight); lotes consultam só os que faltam
+    - `invalidate()` grava a invalidação (de um usuário ou de todos) e
+      incrementa a versão "plans": na próxima consulta cada worker lê as
+      invalidações novas e descarta só as entradas afetadas; os ETags de
+      /api/plans/check mudam
+    """
+
+    def __init__(self, source: UserPlanSource, max_entries: int = USER_PLAN_CACHE_SIZE,
+                 ttl: float = USER_PLAN_CACHE_TTL, negative_ttl: float = USER_PLAN_NEGATIVE_TTL,
+                 invalidations_path: Path = PLAN_INVALIDATIONS_DB_PATH):
+        self.source = source
+        self.invalidations_path = Path(invalidations_path)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._conn = None
+        self._last_seq = 0
+        self._sync_lock = asyncio.Lock()
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._cache: "OrderedDict[str, Tuple[Optional[str], float]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._version: Optional[int] = None
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.queries = 0
+        self.errors = 0
+        self.invalidations = 0
+
+    async def _run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    async def open(self) -> None:
+        await self.source.open()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='plan-invalidations')
+        self._conn = await self._run(connect_sqlite, self.invalidations_path)
+        await self._run(self._conn.executescript, PLAN_INVALIDATIONS_SCHEMA)
+        self._version = get_version("plans")
+        self._last_seq = (await self._run(self._invalidations_after, 0))[0]
+
+    async def close(self) -> None:
+        await self.source.close()
+        if self._conn is not None:
+            await self._run(self._conn.close)
+            self._conn = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    # ---------- invalidações (na thread do executor) ----------
+
+    def _log_invalidation(self, user_id: Optional[str]) -> None:
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            seq = conn.execute(
+                "INSERT INTO plan_invalidations (user_id, created_at) VALUES (?, ?)", (user_id, utc_now())
+            ).lastrowid
+            conn.execute("DELETE FROM plan_invalidations WHERE seq <= ?", (seq - PLAN_INVALIDATIONS_KEEP,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _invalidations_after(self, seq: int) -> Tuple[int, Optional[List[Optional[str]]]]:
+        """
+        Returns:
+            (último seq, usuários invalidados depois de `seq`); None no lugar
+            da lista se as invalidações seguintes já foram apagadas
+        """
+        conn = self._conn
+        conn.execute("BEGIN")
+        try:
+            first, last = conn.execute("SELECT MIN(seq), MAX(seq) FROM plan_invalidations").fetchone()
+            if last is None or last <= seq:
+                return seq, []
+            if first > seq + 1:
+                return last, None
+            rows = conn.execute("SELECT user_id FROM plan_invalidations WHERE seq > ? ORDER BY seq", (seq,))
+            return last, [row["user_id"] for row in rows]
+        finally:
+            conn.execute("COMMIT")
+
+    async def _check_version(self) -> int:
+        version = get_version("plans")
+        if version != self._version:
+            async with self._sync_lock:
+                if version != self._version:
+                    last_seq, user_ids = await self._run(self._invalidations_after, self._last_seq)
+                    if user_ids is None or None in user_ids:
+                        self._cache.clear()
+                    else:
+                        for user_id in user_ids:
+                            self._cache.pop(user_id, None)
+                    self._last_seq = last_seq
+                    self._version = version
+        return version
+
+    def _store(self, user_id: str, plan: Optional[str], now: float) -> None:
+        self._cache[user_id] = (plan, now + (self.ttl if plan is not None else self.negative_ttl))
+        self._cache.move_to_end(user_id)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    async def resolve(self, user_id: str) -> Optional[str]:
+        """
+        Plano do usuário (None se não existe ou está inativo)
+
+        Raises:
+            UserPlanSourceError: se o banco não responder
+        """
+        return (await self.resolve_many([user_id]))[user_id]
+
+    async def resolve_many(self, user_ids: Iterable[str]) -> Dict[str, Optional[str]]:
+        """
+        Plano de vários usuários, consultando o banco uma vez para os que faltam
+
+        Returns:
+            Dict user_id → plano (None se não existe ou está inativo)
+
+        Raises:
+            UserPlanSourceError: se o banco não responder
+        """
+        version = await self._check_version()
+        now = time.monotonic()
+        plans: Dict[str, Optional[str]] = {}
+        waiting: Dict[str, asyncio.Future] = {}
+        missing: List[str] = []
+
+        for user_id in dict.fromkeys(user_ids):
+            cached = self._cache.get(user_id)
+            if cached is not None and cached[1] > now:
+                self._cache.move_to_end(user_id)
+                plans[user_id] = cached[0]
+                if cached[0] is None:
+                    self.negative_hits += 1
+                else:
+                    self.hits += 1
+            elif user_id in self._inflight:
+                waiting[user_id] = self._inflight[user_id]
+                self.coalesced += 1
+            else:
+                missing.append(user_id)
+
+        if missing:
+            self.misses += len(missing)
+            loop = asyncio.get_running_loop()
+            futures = {user_id: loop.create_future() for user_id in missing}
+            self._inflight.update(futures)
+            try:
+                self.queries += 1
+                rows = await self.source.fetch(missing)
+            except BaseException as e:
+                if isinstance(e, Exception):
+                    self.errors += 1
+                    error = e
+                else:
+                    # Requisição que fazia a consulta foi cancelada: quem esperava recebe um erro
+                    error = UserPlanSourceError("Consulta ao banco de usuários interrompida")
+                for future in futures.values():
+                    future.set_exception(error)
+                    # Evita o aviso "exception was never retrieved" sem ninguém esperando
+                    future.exception()
+                raise
+            finally:
+                for user_id, future in futures.items():
+                    if self._inflight.get(user_id) is future:
+                        del self._inflight[user_id]
+
+            # Consulta iniciada antes de uma invalidação não vai para o cache
+            cacheable = get_version("plans") == version
+            now = time.monotonic()
+            for user_id in missing:
+                row = rows.get(user_id)
+                plan = plan_from_row(row) if row is not None else None
+                plans[user_id] = plan
+                futures[user_id].set_result(plan)
+                if cacheable:
+                    self._store(user_id, plan, now)
+
+        for user_id, future in waiting.items():
+            plans[user_id] = await future
+        return plans
+
+    async def invalidate(self, user_id: Optional[str] = None) -> None:
+        """
+        Descarta o plano em cache em todos os workers (assinatura criada,
+        alterada ou cancelada)
+
+        Args:
+            user_id: Usuário cuja assinatura mudou (None: todos)
+        """
+        await self._run(self._log_invalidation, user_id)
+        if user_id is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(user_id, None)
+        self.invalidations += 1
+        bump_version("plans")
+
+    def stats(self) -> Dict:
+        return {
+            "pid": os.getpid(),
+            "source": type(self.source).__name__,
+            "cached": len(self._cache),
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "queries": self.queries,
+            "errors": self.errors,
+            "invalidations": self.invalidations
+        }
+
+
+_user_plan_resolver: Optional[UserPlanResolver] = None
+_user_plan_resolver_lock = asyncio.Lock()
+
+
+async def get_user_plan_resolver() -> UserPlanResolver:
+    """
+    Retorna o UserPlanResolver global, conectando à origem (USER_PLANS_SOURCE) na primeira chamada
+    """
+    global _user_plan_resolver
+    if _user_plan_resolver is None:
+        async with _user_plan_resolver_lock:
+            if _user_plan_resolver is None:
+                resolver = UserPlanResolver(make_user_plan_source())
+                await resolver.open()
+                _user_plan_resolver = resolver
+    return _user_plan_resolver
+
+
+async def close_user_plan_resolver() -> None:
+    """
+    Fecha a conexão com o banco de usuários (chamado no shutdown)
+    """
+    global _user_plan_resolver
+    if _user_plan_resolver is not None:
+        await _user_plan_resolver.close()
+        _user_plan_resolver = None
@@ -0,0 +1,152 @@
+"""
+🔢 AGROISYNC IA - Versões de Conteúdo
+Contadores monotônicos por recurso (notícias, clima, cotações, logs...)
+compartilhados entre os workers em um arquivo mapeado em memória
+"""
+
+import mmap
+import os
+import secrets
+import struct
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional
+
+from .storage import DATA_DIR
+
+try:
+    import fcntl
+except ImportError:  # Windows: um único worker, sem lock entre processos
+    fcntl = None
+
+# Configurações
+VERSIONS_FILE = Path(os.getenv('VERSIONS_FILE', DATA_DIR / 'versions.bin'))
+
+# Posição fixa de cada recurso no arquivo (novos recursos entram no fim)
+RESOURCES = ("news", "weather", "cotations", "logs", "plans", "alerts")
+MAX_SLOTS = 64
+
+_SLOT = struct.Struct('<q')
+# Slot 0: época do arquivo (aleatória), para versões não se repetirem se o arquivo for recriado
+_EPOCH_OFFSET = 0
+
+
+class VersionCounters:
+    """
+    Um int64 por recurso em um arquivo de 512 bytes
+
+    Leituras consultam o mmap diretamente; incrementos são serializados
+    entre processos com flock.
+    """
+
+    def __init__(self, path: Path = VERSIONS_FILE):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+
+        with self._file_lock():
+            if os.fstat(self._fd).st_size < MAX_SLOTS * _SLOT.size:
+                os.ftruncate(self._fd, MAX_SLOTS * _SLOT.size)
+            self._mm = mmap.mmap(self._fd, MAX_SLOTS * _SLOT.size)
+            if _SLOT.unpack_from(self._mm, _EPOCH_OFFSET)[0] == 0:
+                _SLOT.pack_into(self._mm, _EPOCH_OFFSET, secrets.randbits(62) + 1)
+
+        self.epoch = format(_SLOT.unpack_from(self._mm, _EPOCH_OFFSET)[0], 'x')
+
+    @contextmanager
+    def _file_lock(self):
+        with self._lock:
+            if fcntl:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _offset(resource: str) -> int:
+        return (1 + RESOURCES.index(resource)) * _SLOT.size
+
+    def get(self, resource: str) -> int:
+        return _SLOT.unpack_from(self._mm, self._offset(resource))[0]
+
+    def all(self) -> Dict[str, int]:
+        return {resource: self.get(resource) for resource in RESOURCES}
+
+    def bump(self, *resources: str) -> None:
+        with self._file_lock():
+            for resource in resources:
+                offset = self._offset(resource)
+                _SLOT.pack_into(self._mm, offset, _SLOT.unpack_from(self._mm, offset)[0] + 1)
+
+    def close(self) -> None:
+        self._mm.close()
+        os.close(self._fd)
+
+
+_versions: Optional[VersionCounters] = None
+
+
+def get_versions() -> VersionCounters:
+    """
+    Retorna os contadores globais (abre o arquivo na primeira chamada)
+    """
+    global _versions
+    if _versions is None:
+        _versions = VersionCounters()
+    return _versions
+
+
+def get_version(resource: str) -> int:
+    """
+    Versão atual do recurso
+    """
+    return get_versions().get(resource)
+
+
+def bump_version(*resources: str) -> None:
+    """
+    Incrementa a versão dos recursos (após gravar conteúdo novo)
+    """
+    get_versions().bump(*resources)
+
+
+def make_etag(resource: str, version: int, *parts) -> str:
+    """
+    ETag forte: recurso, época do arquivo de versões, versão e partes extras
+    (ex: plan_level, PID para conteúdo que só existe na memória do worker)
+    """
+    tag = '.'.join([resource, get_versions().epoch, str(version), *(str(p) for p in parts if p != '')])
+    return f'"{tag}"'
+
+
+def etag_for(resource: str, *parts) -> str:
+    """
+    ETag da versão atual do recurso
+    """
+    return make_etag(resource, get_version(resource), *parts)
+
+
+def if_none_match(header: Optional[str], etag: str) -> bool:
+    """
+    True se o cabeçalho If-None-Match casa com o ETag (comparação fraca)
+    """
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    candidates = (tag.strip() for tag in header.split(','))
+    return any((tag[2:] if tag.startswith('W/') else tag) == etag for tag in candidates)
+
+
+def close_versions() -> None:
+    """
+    Fecha o arquivo de versões (chamado no shutdown)
+    """
+    global _versions
+    if _versions is not None:
+        _versions.close()
+        _versions = None
@@ -0,0 +1,77 @@
+"""
+📚 AGROISYNC IA - Visões Materializadas
+Últimos itens por plano guardados já serializados em JSON (bytes),
+reconstruídos apenas quando a versão do recurso muda
+"""
+
+import asyncio
+import json
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+from .versions import get_version
+
+# Configurações
+MATERIALIZED_LATEST_LIMIT = int(os.getenv('MATERIALIZED_LATEST_LIMIT', '50'))
+
+
+def dumps(payload: Any) -> bytes:
+    """
+    Serializa como o JSONResponse do FastAPI (UTF-8, sem espaços)
+    """
+    return json.dumps(
+        payload, ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=str
+    ).encode("utf-8")
+
+
+def dumps_list(items: List[Any], chunk: int = 1000) -> bytes:
+    """
+    Serializa uma lista longa em pedaços de `chunk` itens
+
+    O mesmo JSON de dumps(items), mas cada json.dumps é curto: rodando em
+    uma thread, não segura o GIL (e o event loop) durante toda a serialização.
+    """
+    parts = [dumps(items[start:start + chunk])[1:-1] for start in range(0, len(items), chunk)]
+    return b"[" + b",".join(parts) + b"]"
+
+
+class MaterializedView:
+    """
+    Payload JSON por plan_level, ligado à versão compartilhada de um recurso
+
+    Uma leitura com a versão inalterada é só uma consulta ao dict; quando
+    qualquer worker grava conteúdo novo (bump_version), a partição é
+    reconstruída por `build` na próxima leitura, uma vez por worker.
+    """
+
+    def __init__(self, resource: str, build: Callable[[str], Awaitable[Any]]):
+        self.resource = resource
+        self.build = build
+        self._partitions: Dict[str, Tuple[int, bytes]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def get(self, plan_level: str) -> Tuple[int, bytes]:
+        """
+        Retorna (versão, JSON serializado) da partição do plano
+        """
+        version = get_version(self.resource)
+        cached = self._partitions.get(plan_level)
+        if cached is not None and cached[0] == version:
+            return cached
+
+        lock = self._locks.setdefault(plan_level, asyncio.Lock())
+        async with lock:
+            # Outra requisição pode ter reconstruído enquanto esperávamos
+            version = get_version(self.resource)
+            cached = self._partitions.get(plan_level)
+            if cached is not None and cached[0] == version:
+                return cached
+
+            # Versão lida antes de construir: uma gravação concorrente
+            # deixa a partição desatualizada e força nova reconstrução
+            body = dumps(await self.build(plan_level))
+            self._partitions[plan_level] = (version, body)
+            return version, body
+
+    def invalidate(self) -> None:
+        self._partitions.clear()
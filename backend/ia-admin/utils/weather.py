@@ -0,0 +1,616 @@
+"""
+🌦️ AGROISYNC IA - Leituras Meteorológicas
+Registro das leituras em SQLite compartilhado entre os workers, índice
+espacial em memória (grade lat/lon) das leituras mais recentes por local
+e médias regionais por UF mantidas incrementalmente
+"""
+
+import asyncio
+import heapq
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterable, List, Dict, Optional, Tuple
+
+from .gazetteer import parse_location, normalize_name, resolve
+from .storage import DATA_DIR, connect_sqlite
+from .versions import bump_version, get_version
+
+# Configurações
+WEATHER_DB_PATH = Path(os.getenv('WEATHER_DB_PATH', DATA_DIR / 'weather.db'))
+WEATHER_GRID_CELL_DEG = float(os.getenv('WEATHER_GRID_CELL_DEG', '0.25'))
+WEATHER_SYNC_INTERVAL = float(os.getenv('WEATHER_SYNC_INTERVAL', '5'))
+WEATHER_RETENTION_DAYS = float(os.getenv('WEATHER_RETENTION_DAYS', '7'))
+WEATHER_ROLLUP_HALF_LIFE_HOURS = float(os.getenv('WEATHER_ROLLUP_HALF_LIFE_HOURS', '6'))
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+WEATHER_SCHEMA = """
+CREATE TABLE IF NOT EXISTS weather_readings (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  location TEXT NOT NULL,
+  location_key TEXT NOT NULL,
+  uf TEXT,
+  latitude REAL,
+  longitude REAL,
+  temperature REAL NOT NULL,
+  humidity REAL NOT NULL,
+  description TEXT,
+  forecast TEXT,
+  plan_level TEXT DEFAULT 'publico',
+  recorded_at REAL NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_weather_readings_recorded ON weather_readings(recorded_at);
+"""
+
+READING_COLUMNS = (
+    "location", "location_key", "uf", "latitude", "longitude", "temperature",
+    "humidity", "description", "forecast", "plan_level", "recorded_at"
+)
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """
+    Distância em km entre dois pontos (lat/lon em graus)
+    """
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+# ============================================
+# ÍNDICE ESPACIAL
+# ============================================
+
+class _Entry:
+    __slots__ = ("key", "lat", "lon", "cell", "data")
+
+    def __init__(self, key: str, lat: float, lon: float, cell: Tuple[int, int], data: Dict):
+        self.key = key
+        self.lat = lat
+        self.lon = lon
+        self.cell = cell
+        self.data = data
+
+
+class SpatialIndex:
+    """
+    Grade regular de células lat/lon → entradas
+
+    Vizinhos mais próximos são buscados em anéis crescentes de células ao redor
+    do ponto, parando quando nenhuma célula ainda não visitada pode conter algo
+    mais perto que o N-ésimo candidato.
+    """
+
+    def __init__(self, cell_deg: float = WEATHER_GRID_CELL_DEG):
+        self.cell_deg = cell_deg
+        self._cells: Dict[Tuple[int, int], Dict[str, _Entry]] = {}
+        self._entries: Dict[str, _Entry] = {}
+        # Limites (i0, i1, j0, j1) das células já ocupadas; só crescem
+        self._bounds: Optional[Tuple[int, int, int, int]] = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg)
+
+    def upsert(self, key: str, lat: float, lon: float, data: Dict) -> None:
+        cell = self._cell(lat, lon)
+        entry = self._entries.get(key)
+        if entry is not None and entry.cell != cell:
+            self.remove(key)
+            entry = None
+
+        if entry is None:
+            entry = _Entry(key, lat, lon, cell, data)
+            self._entries[key] = entry
+            self._cells.setdefault(cell, {})[key] = entry
+            self._grow_bounds(cell)
+        else:
+            entry.lat, entry.lon, entry.data = lat, lon, data
+
+    def _grow_bounds(self, cell: Tuple[int, int]) -> None:
+        i, j = cell
+        if self._bounds is None:
+            self._bounds = (i, i, j, j)
+        else:
+            i0, i1, j0, j1 = self._bounds
+            self._bounds = (min(i0, i), max(i1, i), min(j0, j), max(j1, j))
+
+    def remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        bucket = self._cells.get(entry.cell)
+        if bucket is not None:
+            bucket.pop(key, None)
+            if not bucket:
+                del self._cells[entry.cell]
+
+    def _ring(self, ci: int, cj: int, r: int) -> Iterable[Tuple[int, int]]:
+        # Células do anel r (recortado aos limites ocupados)
+        i0, i1, j0, j1 = self._bounds
+        if r == 0:
+            yield ci, cj
+            return
+        lo_j, hi_j = max(cj - r, j0), min(cj + r, j1)
+        for i in (ci - r, ci + r):
+            if i0 <= i <= i1:
+                for j in range(lo_j, hi_j + 1):
+                    yield i, j
+        lo_i, hi_i = max(ci - r + 1, i0), min(ci + r - 1, i1)
+        for j in (cj - r, cj + r):
+            if j0 <= j <= j1:
+                for i in range(lo_i, hi_i + 1):
+                    yield i, j
+
+    def _min_km_outside(self, lat: float, r: int) -> float:
+        # Pontos fora dos anéis 0..r diferem em mais de r células na latitude
+        # ou na longitude; limite inferior pela fórmula de haversine usando a
+        # maior |latitude| entre o ponto e a área ocupada
+        delta = math.radians(r * self.cell_deg)
+        i0, i1, _, _ = self._bounds
+        max_lat = max(abs(lat), abs(i0 * self.cell_deg), abs((i1 + 1) * self.cell_deg))
+        cos_max = math.cos(math.radians(min(90.0, max_lat)))
+        by_lat = EARTH_RADIUS_KM * delta
+        by_lon = 2 * EARTH_RADIUS_KM * math.asin(min(1.0, cos_max * math.sin(min(math.pi, delta) / 2)))
+        return min(by_lat, by_lon)
+
+    def nearest(self, lat: float, lon: float, n: int = 5,
+                predicate: Optional[Callable[[Dict], bool]] = None) -> List[Tuple[float, _Entry]]:
+        """
+        N entradas mais próximas de (lat, lon)
+
+        Returns:
+            Lista de (distância em km, entrada), da mais próxima para a mais distante
+        """
+        if n <= 0 or not self._entries:
+            return []
+
+        ci, cj = self._cell(lat, lon)
+        # Maior anel útil: até o limite mais distante da área ocupada
+        i0, i1, j0, j1 = self._bounds
+        max_r = max(abs(i0 - ci), abs(i1 - ci), abs(j0 - cj), abs(j1 - cj))
+        heap: List[Tuple[float, int, _Entry]] = []  # max-heap por distância (negativa)
+        counter = 0
+
+        for r in range(max_r + 1):
+            for cell in self._ring(ci, cj, r):
+                bucket = self._cells.get(cell)
+                if not bucket:
+                    continue
+                for entry in bucket.values():
+                    if predicate is not None and not predicate(entry.data):
+                        continue
+                    dist = haversine_km(lat, lon, entry.lat, entry.lon)
+                    counter += 1
+                    if len(heap) < n:
+                        heapq.heappush(heap, (-dist, counter, entry))
+                    elif dist < -heap[0][0]:
+                        heapq.heapreplace(heap, (-dist, counter, entry))
+
+            if len(heap) == n and -heap[0][0] <= self._min_km_outside(lat, r):
+                break
+
+        return [(-neg, entry) for neg, _, entry in sorted(heap, key=lambda item: -item[0])]
+
+    def within(self, lat: float, lon: float, radius_km: float, limit: int = 100,
+               predicate: Optional[Callable[[Dict], bool]] = None) -> List[Tuple[float, _Entry]]:
+        """
+        Entradas a até `radius_km` de (lat, lon), da mais próxima para a mais distante
+        """
+        # Retângulo envolvente do círculo (longitude via asin(sin(d/R) / cos(lat)))
+        lat_deg = radius_km / KM_PER_DEGREE
+        ratio = math.sin(min(math.pi / 2, radius_km / EARTH_RADIUS_KM)) / max(1e-12, math.cos(math.radians(lat)))
+        if abs(lat) + lat_deg >= 90 or ratio >= 1:
+            lon_deg = 180.0
+        else:
+            lon_deg = math.degrees(math.asin(ratio))
+
+        i0, j0 = self._cell(lat - lat_deg, lon - lon_deg)
+        i1, j1 = self._cell(lat + lat_deg, lon + lon_deg)
+
+        found = []
+        if (i1 - i0 + 1) * (j1 - j0 + 1) > len(self._cells):
+            # Raio maior que a grade ocupada: percorrer só as células existentes
+            cells = [cell for cell in self._cells if i0 <= cell[0] <= i1 and j0 <= cell[1] <= j1]
+        else:
+            cells = [(i, j) for i in range(i0, i1 + 1) for j in range(j0, j1 + 1)]
+
+        for cell in cells:
+            bucket = self._cells.get(cell)
+            if not bucket:
+                continue
+            for entry in bucket.values():
+                if predicate is not None and not predicate(entry.data):
+                    continue
+                dist = haversine_km(lat, lon, entry.lat, entry.lon)
+                if dist <= radius_km:
+                    found.append((dist, entry))
+
+        found.sort(key=lambda item: item[0])
+        return found[:limit]
+
+
+# ============================================
+# MÉDIAS REGIONAIS (UF)
+# ============================================
+
+class _Rollup:
+    __slots__ = ("weight", "temperature_sum", "humidity_sum", "reference", "readings", "last_at")
+
+    def __init__(self):
+        self.weight = 0.0
+        self.temperature_sum = 0.0
+        self.humidity_sum = 0.0
+        self.reference = 0.0
+        self.readings = 0
+        self.last_at = 0.0
+
+
+class RegionalRollups:
+    """
+    Médias de temperatura e umidade por UF: primeiro por estação (local),
+    depois entre as estações, para uma estação que envia muitas leituras
+    não pesar mais que as outras
+
+    Cada estação (UF, plano, local) mantém uma média com decaimento
+    exponencial: uma leitura nova decai o acumulado até o seu horário e entra
+    com peso 1; uma leitura atrasada entra já decaída. Na média da UF cada
+    estação pesa pelo decaimento desde a sua última leitura. Estações sem
+    leituras dentro da retenção saem em `prune`.
+    """
+
+    def __init__(self, half_life_hours: float = WEATHER_ROLLUP_HALF_LIFE_HOURS):
+        self.half_life_hours = half_life_hours
+        self._tau = max(half_life_hours, 1e-6) * 3600 / math.log(2)
+        self._states: Dict[Tuple[str, str, str], _Rollup] = {}
+
+    def _decay(self, seconds: float) -> float:
+        return math.exp(-max(0.0, seconds) / self._tau)
+
+    def add(self, reading: Dict) -> None:
+        """
+        Acumula uma leitura (ignorada se não tiver UF)
+        """
+        uf = reading.get("uf")
+        if not uf:
+            return
+
+        key = (uf, reading.get("plan_level") or "publico", reading["location_key"])
+        state = self._states.get(key)
+        if state is None:
+            state = self._states[key] = _Rollup()
+
+        at = reading["recorded_at"]
+        if at >= state.reference:
+            factor = self._decay(at - state.reference)
+            state.weight *= factor
+            state.temperature_sum *= factor
+            state.humidity_sum *= factor
+            state.reference = at
+            weight = 1.0
+        else:
+            weight = self._decay(state.reference - at)
+
+        state.weight += weight
+        state.temperature_sum += weight * reading["temperature"]
+        state.humidity_sum += weight * reading["humidity"]
+        state.readings += 1
+        state.last_at = max(state.last_at, at)
+
+    def prune(self, before: float) -> int:
+        """
+        Remove as estações cuja última leitura é anterior a `before`
+
+        Returns:
+            int com o número de estações removidas
+        """
+        expired = [key for key, state in self._states.items() if state.last_at < before]
+        for key in expired:
+            del self._states[key]
+        return len(expired)
+
+    def snapshot(self, visible: Optional[Callable[[str], bool]] = None,
+                 now: Optional[float] = None) -> List[Dict]:
+        """
+        Médias atuais por UF, combinando as estações dos planos visíveis
+
+        Args:
+            visible: Filtro de plan_level (padrão: todos)
+            now: Instante de referência do decaimento (padrão: a leitura mais
+                recente, para o resultado só mudar quando chegam leituras)
+
+        Returns:
+            Lista ordenada por UF
+        """
+        if now is None:
+            now = max((state.last_at for state in self._states.values()), default=0.0)
+        totals: Dict[str, List] = {}
+
+        for (uf, plan_level, location_key), state in self._states.items():
+            if visible is not None and not visible(plan_level):
+                continue
+            total = totals.setdefault(uf, [0.0, 0.0, 0.0, 0, 0.0, set()])
+            if state.weight > 0:
+                weight = self._decay(now - state.last_at)
+                total[0] += weight
+                total[1] += weight * state.temperature_sum / state.weight
+                total[2] += weight * state.humidity_sum / state.weight
+            total[3] += state.readings
+            total[4] = max(total[4], state.last_at)
+            total[5].add(location_key)
+
+        return [
+            {
+                "uf": uf,
+                "temperature": round(temperature / weight, 2) if weight > 0 else None,
+                "humidity": round(humidity / weight, 2) if weight > 0 else None,
+                "weight": round(weight, 4),
+                "readings": readings,
+                "locations": len(locations),
+                "last_reading_at": last_at,
+            }
+            for uf, (weight, temperature, humidity, readings, last_at, locations) in sorted(totals.items())
+        ]
+
+
+# ============================================
+# SERVIÇO DE CLIMA
+# ============================================
+
+class WeatherService:
+    """
+    Leituras gravadas em `weather_readings` (SQLite WAL, compartilhado entre
+    workers) e aplicadas, em ordem de id, ao índice em memória de cada worker
+
+    Cada worker acompanha a tabela a partir do último id visto, então todos
+    enxergam as leituras recebidas pelos demais.
+    """
+
+    def __init__(self, path: Path = WEATHER_DB_PATH, cell_deg: float = WEATHER_GRID_CELL_DEG,
+                 sync_interval: float = WEATHER_SYNC_INTERVAL):
+        self.path = Path(path)
+        self.sync_interval = sync_interval
+        self.index = SpatialIndex(cell_deg)
+        self.latest: Dict[str, Dict] = {}
+        self.rollups = RegionalRollups()
+        self._listeners: List[Callable[[Dict], None]] = [self.rollups.add]
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._conn = None
+        self._sync_lock: Optional[asyncio.Lock] = None
+        self._last_id = 0
+        self._last_sync = 0.0
+        self._synced_version = -1
+        self._last_prune = 0.0
+
+    async def _run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    async def open(self) -> None:
+        # Uma thread: a conexão é usada sempre em série
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='weather')
+        self._conn = await self._run(connect_sqlite, self.path)
+        await self._run(self._conn.executescript, WEATHER_SCHEMA)
+        self._sync_lock = asyncio.Lock()
+        await self._prune()
+        await self.sync(force=True)
+
+    async def close(self) -> None:
+        if self._conn is not None:
+            await self._run(self._conn.close)
+            self._conn = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def add_listener(self, listener: Callable[[Dict], None]) -> None:
+        """
+        Registra uma função chamada para cada leitura aplicada (de qualquer worker)
+        """
+        self._listeners.append(listener)
+
+    # ---------- escrita ----------
+
+    @staticmethod
+    def build_reading(item: Dict) -> Dict:
+        """
+        Normaliza um WeatherUpdate: chave do local, UF e coordenadas
+        (informadas ou resolvidas pelo gazetteer)
+        """
+        name, uf = parse_location(item["location"])
+        lat, lon = item.get("latitude"), item.get("longitude")
+        if lat is None or lon is None:
+            lat, lon = resolve(item["location"]) or (None, None)
+
+        return {
+            "location": item["location"],
+            "location_key": f"{normalize_name(name)}|{uf or ''}",
+            "uf": uf,
+            "latitude": lat,
+            "longitude": lon,
+            "temperature": item["temperature"],
+            "humidity": item["humidity"],
+            "description": item.get("description"),
+            "forecast": item.get("forecast"),
+            "plan_level": item.get("plan_level") or "publico",
+            "recorded_at": item.get("recorded_at") or time.time(),
+        }
+
+    def _insert(self, readings: List[Dict]) -> None:
+        placeholders = ", ".join(f":{column}" for column in READING_COLUMNS)
+        sql = f"INSERT INTO weather_readings ({', '.join(READING_COLUMNS)}) VALUES ({placeholders})"
+        self._conn.execute("BEGIN")
+        try:
+            self._conn.executemany(sql, readings)
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    async def ingest(self, items: List[Dict]) -> List[Dict]:
+        """
+        Grava leituras em uma transação e as aplica ao índice local
+
+        Returns:
+            Lista com UF e coordenadas resolvidas de cada leitura
+        """
+        readings = [self.build_reading(item) for item in items]
+        await self._run(self._insert, readings)
+        bump_version("weather")
+        await self.sync(force=True)
+
+        return [
+            {
+                "uf": reading["uf"],
+                "latitude": reading["latitude"],
+                "longitude": reading["longitude"],
+                "geolocated": reading["latitude"] is not None,
+            }
+            for reading in readings
+        ]
+
+    # ---------- sincronização ----------
+
+    def _fetch_after(self, last_id: int, limit: int = 5000) -> List[Dict]:
+        rows = self._conn.execute(
+            f"SELECT id, {', '.join(READING_COLUMNS)} FROM weather_readings "
+            "WHERE id > ? ORDER BY id LIMIT ?",
+            (last_id, limit)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def _prune_rows(self, before: float) -> int:
+        return self._conn.execute("DELETE FROM weather_readings WHERE recorded_at < ?", (before,)).rowcount
+
+    async def _prune(self) -> None:
+        self._last_prune = time.monotonic()
+        if WEATHER_RETENTION_DAYS > 0:
+            before = time.time() - WEATHER_RETENTION_DAYS * 86400
+            await self._run(self._prune_rows, before)
+            if self._prune_latest(before) + self.rollups.prune(before):
+                bump_version("weather")
+
+    def _prune_latest(self, before: float) -> int:
+        # Locais cuja leitura mais recente expirou saem de `latest` e da grade
+        expired = [key for key, reading in self.latest.items() if reading["recorded_at"] < before]
+        for key in expired:
+            del self.latest[key]
+            self.index.remove(key)
+        return len(expired)
+
+    async def sync(self, force: bool = False) -> int:
+        """
+        Aplica as leituras gravadas (por qualquer worker) desde a última sincronização
+
+        Args:
+            force: Ignorar o intervalo mínimo entre sincronizações
+
+        Returns:
+            int com o número de leituras aplicadas
+        """
+        # Toda gravação incrementa a versão "weather": sem mudança de versão só
+        # sincroniza a cada `sync_interval` (gravações feitas fora do serviço)
+        version = get_version("weather")
+        recent = time.monotonic() - self._last_sync < self.sync_interval
+        if not force and version == self._synced_version and recent:
+            return 0
+
+        applied = 0
+        async with self._sync_lock:
+            while True:
+                rows = await self._run(self._fetch_after, self._last_id)
+                for row in rows:
+                    self._apply(row)
+                applied += len(rows)
+                if rows:
+                    self._last_id = rows[-1]["id"]
+                if len(rows) < 5000:
+                    break
+            self._last_sync = time.monotonic()
+            self._synced_version = version
+
+        if time.monotonic() - self._last_prune > 3600:
+            await self._prune()
+        return applied
+
+    def _apply(self, reading: Dict) -> None:
+        key = reading["location_key"]
+        current = self.latest.get(key)
+        if current is None or reading["recorded_at"] >= current["recorded_at"]:
+            self.latest[key] = reading
+            if reading["latitude"] is not None and reading["longitude"] is not None:
+                self.index.upsert(key, reading["latitude"], reading["longitude"], reading)
+            else:
+                self.index.remove(key)
+
+        for listener in self._listeners:
+            listener(reading)
+
+    # ---------- consultas ----------
+
+    async def nearest(self, lat: float, lon: float, n: int = 5,
+                      predicate: Optional[Callable[[Dict], bool]] = None) -> List[Dict]:
+        await self.sync()
+        return [_with_distance(entry.data, dist) for dist, entry in self.index.nearest(lat, lon, n, predicate)]
+
+    async def within(self, lat: float, lon: float, radius_km: float, limit: int = 100,
+                     predicate: Optional[Callable[[Dict], bool]] = None) -> List[Dict]:
+        await self.sync()
+        return [
+            _with_distance(entry.data, dist)
+            for dist, entry in self.index.within(lat, lon, radius_km, limit, predicate)
+        ]
+
+    async def regions(self, visible: Optional[Callable[[str], bool]] = None) -> List[Dict]:
+        """
+        Médias regionais por UF (pré-calculadas a cada leitura aplicada)
+        """
+        await self.sync()
+        return self.rollups.snapshot(visible)
+
+
+def _with_distance(reading: Dict, distance: float) -> Dict:
+    result = {key: value for key, value in reading.items() if key not in ("id", "location_key")}
+    result["distance_km"] = round(distance, 3)
+    return result
+
+
+# ============================================
+# INSTÂNCIA GLOBAL
+# ============================================
+
+_weather_service: Optional[WeatherService] = None
+_weather_service_lock = asyncio.Lock()
+
+
+async def get_weather_service() -> WeatherService:
+    """
+    Retorna o WeatherService global, abrindo-o na primeira chamada
+    """
+    global _weather_service
+    if _weather_service is None:
+        async with _weather_service_lock:
+            if _weather_service is None:
+                service = WeatherService()
+                await service.open()
+                _weather_service = service
+    return _weather_service
+
+
+async def close_weather_service() -> None:
+    """
+    Fecha o WeatherService global (chamado no shutdown)
+    """
+    global _weather_service
+    if _weather_service is not None:
+        await _weather_service.close()
+        _weather_service = None
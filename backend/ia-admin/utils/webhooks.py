@@ -0,0 +1,388 @@
+"""
+🪝 AGROISYNC IA - Webhooks
+Eventos de atualização (notícias, clima, cotações) entregues aos
+assinantes em segundo plano: cliente HTTP com conexões persistentes,
+limite de concorrência por destino, assinatura HMAC, novas tentativas
+e fila de falhas (dead letter) em SQLite
+"""
+
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import random
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from .storage import DATA_DIR, connect_sqlite
+
+# Configurações
+# Destinos simples (todos os eventos, WEBHOOK_SECRET): URLs separadas por vírgula
+WEBHOOK_URLS = os.getenv('WEBHOOK_URLS', '')
+# Destinos com eventos/segredo/concorrência próprios: JSON [{"url", "events", "secret", "concurrency"}]
+WEBHOOKS_FILE = os.getenv('WEBHOOKS_FILE', '')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')
+WEBHOOK_TIMEOUT = float(os.getenv('WEBHOOK_TIMEOUT', '5'))
+WEBHOOK_CONCURRENCY = int(os.getenv('WEBHOOK_CONCURRENCY', '4'))
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv('WEBHOOK_MAX_CONNECTIONS', '100'))
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv('WEBHOOK_MAX_ATTEMPTS', '6'))
+WEBHOOK_RETRY_BASE = float(os.getenv('WEBHOOK_RETRY_BASE', '1'))
+WEBHOOK_RETRY_MAX = float(os.getenv('WEBHOOK_RETRY_MAX', '60'))
+WEBHOOK_QUEUE_SIZE = int(os.getenv('WEBHOOK_QUEUE_SIZE', '10000'))
+WEBHOOK_DB_PATH = Path(os.getenv('WEBHOOK_DB_PATH', DATA_DIR / 'webhooks.db'))
+# Tempo para esvaziar as filas no shutdown
+WEBHOOK_SHUTDOWN_TIMEOUT = float(os.getenv('WEBHOOK_SHUTDOWN_TIMEOUT', '5'))
+
+SIGNATURE_HEADER = "X-Agroisync-Signature"
+
+WEBHOOK_SCHEMA = """
+CREATE TABLE IF NOT EXISTS webhook_dead (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  event_id TEXT NOT NULL,
+  event_type TEXT NOT NULL,
+  target_url TEXT NOT NULL,
+  body BLOB NOT NULL,
+  attempts INTEGER NOT NULL,
+  error TEXT,
+  failed_at REAL NOT NULL
+);
+"""
+
+
+def sign(secret: str, timestamp: int, body: bytes) -> str:
+    """
+    Assinatura do corpo: "t=<timestamp>,v1=<HMAC-SHA256 hex de '<timestamp>.<corpo>'>"
+
+    O assinante recalcula o HMAC com o mesmo segredo e rejeita timestamps antigos.
+    """
+    digest = hmac.new(secret.encode(), str(timestamp).encode() + b"." + body, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={digest}"
+
+
+class WebhookTarget:
+    """
+    Destino de webhooks com fila e `concurrency` entregas simultâneas
+    """
+
+    def __init__(self, url: str, events: Optional[List[str]] = None, secret: str = WEBHOOK_SECRET,
+                 concurrency: int = WEBHOOK_CONCURRENCY):
+        self.url = url
+        self.events = set(events) if events else None
+        self.secret = secret
+        self.concurrency = max(1, concurrency)
+        self.queue: "asyncio.Queue[Tuple[str, str, bytes, int]]" = asyncio.Queue(maxsize=WEBHOOK_QUEUE_SIZE)
+        self.delivered = 0
+        self.retries = 0
+        self.dead = 0
+        self.in_flight = 0
+        self.last_error: Optional[str] = None
+
+    def wants(self, event_type: str) -> bool:
+        if self.events is None:
+            return True
+        # "news" assina "news.created"; "*" assina tudo
+        return '*' in self.events or event_type in self.events or event_type.split('.')[0] in self.events
+
+    def stats(self) -> Dict:
+        return {
+            "url": self.url,
+            "events": sorted(self.events) if self.events else ["*"],
+            "concurrency": self.concurrency,
+            "queued": self.queue.qsize(),
+            "in_flight": self.in_flight,
+            "delivered": self.delivered,
+            "retries": self.retries,
+            "dead": self.dead,
+            "last_error": self.last_error
+        }
+
+
+def load_targets() -> List[WebhookTarget]:
+    """
+    Destinos de WEBHOOK_URLS e WEBHOOKS_FILE
+    """
+    targets = [WebhookTarget(url.strip()) for url in WEBHOOK_URLS.split(',') if url.strip()]
+    if WEBHOOKS_FILE and Path(WEBHOOKS_FILE).exists():
+        with open(WEBHOOKS_FILE, 'r', encoding='utf-8') as f:
+            for entry in json.load(f):
+                targets.append(WebhookTarget(
+                    url=entry["url"],
+                    events=entry.get("events"),
+                    secret=entry.get("secret", WEBHOOK_SECRET),
+                    concurrency=entry.get("concurrency", WEBHOOK_CONCURRENCY)
+                ))
+    return targets
+
+
+class WebhookDispatcher:
+    """
+    Publica eventos sem bloquear quem chamou
+
+    `publish` serializa o evento uma vez e o coloca na fila de cada destino
+    interessado; `concurrency` tarefas por destino fazem os POSTs por um
+    único httpx.AsyncClient (pool keep-alive compartilhado). Respostas 2xx
+    encerram a entrega; erros de rede, 408, 429 e 5xx são repetidos com
+    backoff exponencial (ou o Retry-After do destino); o resto, ou o fim das
+    tentativas, vai para a tabela webhook_dead, de onde pode ser reenviado.
+
+    Cada worker entrega os eventos das atualizações que ele mesmo recebeu.
+    """
+
+    def __init__(self, targets: Optional[List[WebhookTarget]] = None, path: Path = WEBHOOK_DB_PATH):
+        self.targets = targets if targets is not None else load_targets()
+        self.path = Path(path)
+        self.published = 0
+        self.dropped = 0
+        self._client: Optional[httpx.AsyncClient] = None
+        self._workers: List[asyncio.Task] = []
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._conn = None
+
+    async def _run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    async def open(self) -> None:
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='webhooks')
+        self._conn = await self._run(connect_sqlite, self.path)
+        await self._run(self._conn.executescript, WEBHOOK_SCHEMA)
+        if not self.targets:
+            return
+
+        self._client = httpx.AsyncClient(
+            timeout=WEBHOOK_TIMEOUT,
+            limits=httpx.Limits(max_connections=WEBHOOK_MAX_CONNECTIONS,
+                                max_keepalive_connections=WEBHOOK_MAX_CONNECTIONS),
+            headers={"Content-Type": "application/json", "User-Agent": "Agroisync-IA-Webhooks/1.0"}
+        )
+        for target in self.targets:
+            for _ in range(target.concurrency):
+                self._workers.append(asyncio.create_task(self._worker(target)))
+
+    async def close(self) -> None:
+        if self._workers:
+            try:
+                await asyncio.wait_for(
+                    asyncio.gather(*(target.queue.join() for target in self.targets)),
+                    timeout=WEBHOOK_SHUTDOWN_TIMEOUT
+                )
+            except asyncio.TimeoutError:
+                pending = sum(target.queue.qsize() + target.in_flight for target in self.targets)
+                print(f"🪝 Webhooks: {pending} entrega(s) pendente(s) descartada(s) no shutdown")
+            for task in self._workers:
+                task.cancel()
+            await asyncio.gather(*self._workers, return_exceptions=True)
+            self._workers = []
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        if self._conn is not None:
+            await self._run(self._conn.close)
+            self._conn = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    # ---------- publicação ----------
+
+    def publish(self, event_type: str, data: Dict) -> Optional[str]:
+        """
+        Enfileira um evento para os destinos que o assinam (não espera entrega)
+
+        Args:
+            event_type: Ex: "news.created", "weather.updated", "cotation.updated"
+            data: Conteúdo do evento (serializável em JSON)
+
+        Returns:
+            id do evento, ou None se nenhum destino o assina
+        """
+        targets = [target for target in self.targets if target.wants(event_type)]
+        if not targets or self._client is None:
+            return None
+
+        event_id = str(uuid.uuid4())
+        body = json.dumps(
+            {"id": event_id, "type": event_type, "created_at": time.time(), "data": data},
+            ensure_ascii=False, separators=(",", ":"), default=str
+        ).encode("utf-8")
+        self.published += 1
+
+        for target in targets:
+            try:
+                target.queue.put_nowait((event_id, event_type, body, 0))
+            except asyncio.QueueFull:
+                self.dropped += 1
+                self._dead_letter(target, event_id, event_type, body, 0, "Fila do destino cheia")
+        return event_id
+
+    # ---------- entrega ----------
+
+    async def _worker(self, target: WebhookTarget) -> None:
+        while True:
+            event_id, event_type, body, attempts = await target.queue.get()
+            target.in_flight += 1
+            try:
+                await self._deliver(target, event_id, event_type, body, attempts)
+            except Exception as e:
+                target.last_error = f"{type(e).__name__}: {e}"
+            finally:
+                target.in_flight -= 1
+                target.queue.task_done()
+
+    async def _deliver(self, target: WebhookTarget, event_id: str, event_type: str,
+                       body: bytes, attempts: int) -> None:
+        while True:
+            attempts += 1
+            timestamp = int(time.time())
+            headers = {
+                "X-Agroisync-Event": event_type,
+                "X-Agroisync-Delivery": event_id,
+                "X-Agroisync-Attempt": str(attempts),
+            }
+            if target.secret:
+                headers[SIGNATURE_HEADER] = sign(target.secret, timestamp, body)
+
+            retry_after = None
+            try:
+                response = await self._client.post(target.url, content=body, headers=headers)
+            except httpx.HTTPError as e:
+                error, retryable = f"{type(e).__name__}: {e}", True
+            else:
+                if response.status_code < 300:
+                    target.delivered += 1
+                    return
+                error = f"HTTP {response.status_code}"
+                retryable = response.status_code in (408, 429) or response.status_code >= 500
+                retry_after = response.headers.get("retry-after")
+
+            target.last_error = error
+            if not retryable or attempts >= WEBHOOK_MAX_ATTEMPTS:
+                self._dead_letter(target, event_id, event_type, body, attempts, error)
+                return
+
+            target.retries += 1
+            delay = WEBHOOK_RETRY_BASE * 2 ** (attempts - 1) * (0.5 + random.random() / 2)
+            if retry_after and retry_after.isdigit():
+                delay = float(retry_after)
+            await asyncio.sleep(min(delay, WEBHOOK_RETRY_MAX))
+
+    # ---------- dead letter ----------
+
+    def _dead_letter(self, target: WebhookTarget, event_id: str, event_type: str,
+                     body: bytes, attempts: int, error: str) -> None:
+        target.dead += 1
+        if self._executor is None:
+            return
+        self._executor.submit(self._insert_dead, (event_id, event_type, target.url, body, attempts, error, time.time()))
+
+    def _insert_dead(self, row: Tuple) -> None:
+        self._conn.execute(
+            "INSERT INTO webhook_dead (event_id, event_type, target_url, body, attempts, error, failed_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            row
+        )
+
+    def _list_dead(self, limit: int) -> List[Dict]:
+        rows = self._conn.execute(
+            "SELECT id, event_id, event_type, target_url, attempts, error, failed_at "
+            "FROM webhook_dead ORDER BY id DESC LIMIT ?",
+            (limit,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def _take_dead(self, limit: int) -> List[Dict]:
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = [dict(row) for row in conn.execute(
+                "SELECT id, event_id, event_type, target_url, body FROM webhook_dead ORDER BY id LIMIT ?",
+                (limit,)
+            ).fetchall()]
+            conn.executemany("DELETE FROM webhook_dead WHERE id = ?", [(row["id"],) for row in rows])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return rows
+
+    def _count_dead(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) AS dead FROM webhook_dead").fetchone()["dead"]
+
+    async def list_dead(self, limit: int = 50) -> List[Dict]:
+        """
+        Entregas que falharam, mais recentes primeiro (sem o corpo)
+        """
+        return await self._run(self._list_dead, limit)
+
+    async def replay_dead(self, limit: int = 1000) -> Dict:
+        """
+        Reenfileira entregas da dead letter nos destinos ainda configurados
+
+        Returns:
+            Dict com requeued e skipped (destino removido ou fila cheia)
+        """
+        by_url = {target.url: target for target in self.targets}
+        requeued = skipped = 0
+        for row in await self._run(self._take_dead, limit):
+            target = by_url.get(row["target_url"])
+            if target is None or self._client is None:
+                skipped += 1
+                await self._run(self._insert_dead, (
+                    row["event_id"], row["event_type"], row["target_url"], row["body"], 0,
+                    "Destino não configurado", time.time()
+                ))
+                continue
+            try:
+                target.queue.put_nowait((row["event_id"], row["event_type"], bytes(row["body"]), 0))
+                requeued += 1
+            except asyncio.QueueFull:
+                skipped += 1
+                self._dead_letter(target, row["event_id"], row["event_type"], bytes(row["body"]), 0,
+                                  "Fila do destino cheia")
+        return {"requeued": requeued, "skipped": skipped}
+
+    async def stats(self) -> Dict:
+        """
+        Contadores do worker (publicados, descartados) e de cada destino
+        """
+        return {
+            "pid": os.getpid(),
+            "published": self.published,
+            "dropped": self.dropped,
+            "dead_letters": await self._run(self._count_dead),
+            "targets": [target.stats() for target in self.targets]
+        }
+
+
+_webhook_dispatcher: Optional[WebhookDispatcher] = None
+_webhook_dispatcher_lock = asyncio.Lock()
+
+
+async def get_webhook_dispatcher() -> WebhookDispatcher:
+    """
+    Retorna o WebhookDispatcher global, iniciando as entregas na primeira chamada
+    """
+    global _webhook_dispatcher
+    if _webhook_dispatcher is None:
+        async with _webhook_dispatcher_lock:
+            if _webhook_dispatcher is None:
+                dispatcher = WebhookDispatcher()
+                await dispatcher.open()
+                _webhook_dispatcher = dispatcher
+    return _webhook_dispatcher
+
+
+async def close_webhook_dispatcher() -> None:
+    """
+    Espera as filas esvaziarem (até WEBHOOK_SHUTDOWN_TIMEOUT) e fecha o dispatcher
+    """
+    global _webhook_dispatcher
+    if _webhook_dispatcher is not None:
+        await _webhook_dispatcher.close()
+        _webhook_dispatcher = None
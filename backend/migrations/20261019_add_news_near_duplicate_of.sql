@@ -0,0 +1,10 @@
+-- Migration: 2026-10-19
+-- Adiciona a coluna `near_duplicate_of` à tabela `news` no D1 (SQLite), usada pelo IA Admin
+-- para marcar quase duplicatas (id da notícia original); listagens devem ignorar as marcadas.
+
+ALTER TABLE news ADD COLUMN near_duplicate_of TEXT;
+
+-- Instruções:
+-- 1) Faça backup do banco (exportar dump) antes de aplicar.
+-- 2) Aplique depois de 20261019_add_news_plan_level.sql, com wrangler (no diretório `backend`):
+--    npx wrangler d1 execute DB --remote --file ./migrations/20261019_add_news_near_duplicate_of.sql --config ./wrangler.toml -y
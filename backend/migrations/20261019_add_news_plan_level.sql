@@ -0,0 +1,13 @@
+-- Migration: 2026-10-19
+-- Adiciona a coluna `plan_level` à tabela `news` no D1 (SQLite), usada pelo IA Admin
+-- para publicar notícias por nível de plano (publico, privado, loja, admin).
+
+ALTER TABLE news ADD COLUMN plan_level TEXT DEFAULT 'publico';
+
+CREATE INDEX IF NOT EXISTS idx_news_plan_level_created ON news(plan_level, created_at);
+CREATE INDEX IF NOT EXISTS idx_news_category_plan_level_created ON news(category, plan_level, created_at);
+
+-- Instruções:
+-- 1) Faça backup do banco (exportar dump) antes de aplicar.
+-- 2) Aplique com wrangler (no diretório `backend`) utilizando:
+--    npx wrangler d1 execute DB --remote --file ./migrations/20261019_add_news_plan_level.sql --config ./wrangler.toml -y
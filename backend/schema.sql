@@ -174,12 +174,16 @@ CREATE TABLE IF NOT EXISTS news (
   category TEXT,
   image_url TEXT,
   published INTEGER DEFAULT 1,
+  plan_level TEXT DEFAULT 'publico',
+  near_duplicate_of TEXT,
   created_at TEXT DEFAULT (datetime('now')),
   updated_at TEXT DEFAULT (datetime('now'))
 );
 
 CREATE INDEX IF NOT EXISTS idx_news_category ON news(category);
 CREATE INDEX IF NOT EXISTS idx_news_published ON news(published);
+CREATE INDEX IF NOT EXISTS idx_news_plan_level_created ON news(plan_level, created_at);
+CREATE INDEX IF NOT EXISTS idx_news_category_plan_level_created ON news(category, plan_level, created_at);
 
 -- ============================================
 -- GAMIFICATION POINTS TABLE